@@ -0,0 +1,99 @@
+"""
+Benchmark the broker consumer (messages/sec) for several prefetch/ack batch sizes.
+
+Messages are published to an `InMemoryBroker` and consumed by a
+`BrokerConsumer` with one handler per intent. `--rtt-ms` adds a simulated
+network round trip to every fetch, ack and reject call, which is what
+prefetching and batched acks amortize on a real broker. The redelivery row
+fails every handler call once, so each message is delivered twice.
+
+    python bench_broker.py --messages 20000 --rtt-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from uemp_broker import BrokerConsumer, Delivery, InMemoryBroker, message_properties, routing_key
+
+QUEUE = "uemp.invoices"
+INTENTS = ("create-invoice", "credit-note")
+
+
+class SlowBroker(InMemoryBroker):
+    """`InMemoryBroker` with a fixed round-trip delay on every consumer-side call."""
+
+    def __init__(self, rtt_s: float) -> None:
+        super().__init__()
+        self.rtt_s = rtt_s
+
+    async def fetch(self, queue: str, max_messages: int, timeout_s: float | None = None) -> list[Delivery]:
+        await asyncio.sleep(self.rtt_s)
+        return await super().fetch(queue, max_messages, timeout_s)
+
+    async def ack(self, delivery_tags: Iterable[int]) -> None:
+        await asyncio.sleep(self.rtt_s)
+        await super().ack(delivery_tags)
+
+    async def reject(self, delivery_tags: Iterable[int], *, requeue: bool) -> None:
+        await asyncio.sleep(self.rtt_s)
+        await super().reject(delivery_tags, requeue=requeue)
+
+
+def make_message(n: int) -> dict[str, Any]:
+    return {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": f"uemp:BA:2026:inv-{n:08d}",
+            "intent": INTENTS[n % len(INTENTS)],
+            "conversationId": f"uemp:BA:2026:conv-{n // 10:06d}",
+        },
+        "data": {"invoice": {"id": f"INV-{n}", "total": {"amount": "100.00", "currency": "EUR"}}},
+    }
+
+
+async def run(messages: int, rtt_s: float, prefetch: int, ack_batch: int, fail_once: bool) -> tuple[float, int]:
+    broker = SlowBroker(rtt_s)
+    for n in range(messages):
+        message = make_message(n)
+        body = json.dumps(message).encode("utf-8")
+        key = routing_key("invoicing", message["meta"]["intent"])
+        await broker.publish(QUEUE, body, routing_key=key, properties=message_properties(message))
+
+    def handler(envelope, delivery: Delivery) -> None:
+        if fail_once and not delivery.redelivered:
+            raise RuntimeError("transient failure")
+
+    consumer = BrokerConsumer(
+        broker, QUEUE, {intent: handler for intent in INTENTS}, prefetch=prefetch, ack_batch=ack_batch
+    )
+    started = time.perf_counter()
+    stats = await consumer.run(idle_timeout_s=0)
+    elapsed = time.perf_counter() - started
+    assert stats.handled == messages, stats
+    return messages / elapsed, broker.ack_calls
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_broker", description="Benchmark the UEMP broker consumer")
+    p.add_argument("--messages", type=int, default=20000, help="Messages to publish and consume")
+    p.add_argument("--rtt-ms", type=float, default=0.5, help="Simulated broker round trip per call")
+    args = p.parse_args(argv)
+    rtt_s = args.rtt_ms / 1000
+
+    print(f"{args.messages} messages, {args.rtt_ms} ms per broker call")
+    print(f"{'prefetch':>9} {'ack batch':>10} {'redeliver':>10} {'msg/s':>10} {'ack calls':>10}")
+    for prefetch, ack_batch, fail_once in ((1, 1, False), (50, 25, False), (500, 250, False), (500, 250, True)):
+        messages = args.messages if prefetch > 1 else min(args.messages, 2000)
+        rate, ack_calls = asyncio.run(run(messages, rtt_s, prefetch, ack_batch, fail_once))
+        print(f"{prefetch:>9} {ack_batch:>10} {'yes' if fail_once else 'no':>10} {rate:>10.1f} {ack_calls:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
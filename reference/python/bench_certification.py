@@ -0,0 +1,95 @@
+"""
+Benchmark certification throughput in-process (ASGI transport) vs over loopback sockets.
+
+Both modes run the same generated pack against the same app; the loopback mode
+serves it with uvicorn on 127.0.0.1 in a background thread.
+
+    python bench_certification.py --cases 2000 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+
+from uemp_certification import IN_PROCESS_BASE_URL, asgi_transport, load_asgi_app, make_client, run_pack
+
+
+def make_pack(root: Path, n_cases: int) -> Path:
+    """Write a pack of `n_cases` cases sharing one small fixture."""
+    (root / "fixtures").mkdir(parents=True, exist_ok=True)
+    (root / "fixtures" / "case.xml").write_text("<Invoice><ID>INV-1</ID></Invoice>", encoding="utf-8")
+    pack = {
+        "packVersion": "1.0",
+        "packId": "bench/1.0::cert-pack",
+        "profileId": "bench/1.0",
+        "cases": [
+            {"id": f"case-{i}", "fixture": "fixtures/case.xml", "expect": {"httpStatus": 200, "valid": True}}
+            for i in range(n_cases)
+        ],
+    }
+    path = root / "pack.json"
+    path.write_text(json.dumps(pack), encoding="utf-8")
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _timed_run(pack_path: Path, base_url: str, concurrency: int, transport=None) -> float:
+    async with make_client(
+        max_connections=concurrency, max_keepalive_connections=concurrency, transport=transport
+    ) as client:
+        started = time.perf_counter()
+        report, _ = await run_pack(
+            base_url=base_url, pack_json_path=pack_path, client=client, concurrency=concurrency
+        )
+        elapsed = time.perf_counter() - started
+    return report.summary.total / elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_certification", description="Compare in-process and loopback pack runs")
+    p.add_argument("--app", default="uemp_api:app", help="ASGI app as module:attr")
+    p.add_argument("--cases", type=int, default=2000, help="Number of cases in the generated pack")
+    p.add_argument("--concurrency", type=int, default=16, help="Cases in flight")
+    args = p.parse_args(argv)
+
+    app = load_asgi_app(args.app)
+    with tempfile.TemporaryDirectory() as tmp:
+        pack_path = make_pack(Path(tmp), args.cases)
+
+        in_process = asyncio.run(_timed_run(pack_path, IN_PROCESS_BASE_URL, args.concurrency, asgi_transport(app)))
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            loopback = asyncio.run(_timed_run(pack_path, f"http://127.0.0.1:{port}", args.concurrency))
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    print(f"{'mode':>10} {'cases/s':>10}")
+    print(f"{'in-process':>10} {in_process:>10.1f}")
+    print(f"{'loopback':>10} {loopback:>10.1f}")
+    print(f"{'speedup':>10} {in_process / loopback:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
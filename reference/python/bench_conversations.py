@@ -0,0 +1,141 @@
+"""
+Benchmark the conversation store (memory per million messages, lookup latency).
+
+Indexes `--messages` accepted messages spread over conversations of
+`--per-conversation` messages (each replying to the previous one) and reports
+traced memory per message, scaled to a million. For comparison it does the same
+with bodies kept (`keep_bodies=True`) and with the parsed payload dicts a naive
+store would hold. `--sqlite` also measures the on-disk size and lookups
+of a `SQLiteConversationStore`.
+
+    python bench_conversations.py --messages 200000 --sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from uemp_conversations import MemoryConversationStore, SQLiteConversationStore, message_record
+from uemp_envelope import ValidatedEnvelope, validate_envelope
+
+
+def make_message(i: int, per_conversation: int) -> bytes:
+    c, k = divmod(i, per_conversation)
+    meta = {
+        "protocol": "uemp/1.0",
+        "id": f"uemp:BA:2026:msg-{i:08d}",
+        "intent": ("search-offers", "select-offer", "create-order", "order-confirmed")[k % 4],
+        "conversationId": f"uemp:BA:2026:conv-{c:07d}",
+        "sequence": k + 1,
+    }
+    if k:
+        meta["replyTo"] = f"uemp:BA:2026:msg-{i - 1:08d}"
+    payload = {"meta": meta, "data": {"order": {"id": f"ORD-{i}", "total": {"amount": "450.00", "currency": "GBP"}}}}
+    return json.dumps(payload).encode("utf-8")
+
+
+def accepted(n: int, per_conversation: int) -> Iterator[tuple[ValidatedEnvelope, bytes]]:
+    """Fresh (envelope, body) pairs, parsed as the server does; only what a store keeps survives."""
+    for i in range(n):
+        body = make_message(i, per_conversation)
+        yield validate_envelope(json.loads(body), header_version="1.0"), body
+
+
+def traced(fill: Callable[[], object]) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    kept = fill()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, kept
+
+
+def lookups_us(store, ids: list[str], conversations: list[str]) -> tuple[float, float]:
+    started = time.perf_counter()
+    for message_id in ids:
+        store.get(message_id)
+    get_us = (time.perf_counter() - started) / len(ids) * 1e6
+    started = time.perf_counter()
+    for conversation_id in conversations:
+        store.conversation(conversation_id)
+    return get_us, (time.perf_counter() - started) / len(conversations) * 1e6
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_conversations", description="Benchmark the UEMP conversation store")
+    p.add_argument("--messages", type=int, default=200_000, help="Messages to index")
+    p.add_argument("--per-conversation", type=int, default=6, help="Messages per conversation")
+    p.add_argument("--lookups", type=int, default=10_000, help="Random lookups to time")
+    p.add_argument("--sqlite", action="store_true", help="Also measure a SQLite store in a temp dir")
+    args = p.parse_args(argv)
+
+    rng = random.Random(7)
+    picks = [rng.randrange(args.messages) for _ in range(args.lookups)]
+    ids = [f"uemp:BA:2026:msg-{i:08d}" for i in picks]
+    conversations = [f"uemp:BA:2026:conv-{i // args.per_conversation:07d}" for i in picks]
+    scale = 1_000_000 / args.messages
+
+    print(f"{args.messages} messages, {args.per_conversation} per conversation")
+    print(f"{'store':>18} {'bytes/msg':>10} {'MB/million':>11} {'add us':>8} {'get us':>8} {'conv us':>8}")
+
+    def fill_store(store) -> Callable[[], object]:
+        def fill() -> float:
+            add_s = 0.0
+            for envelope, body in accepted(args.messages, args.per_conversation):
+                started = time.perf_counter()
+                store.add(message_record(envelope, body, keep_body=store.keep_bodies))
+                add_s += time.perf_counter() - started
+            return add_s
+
+        return fill
+
+    def report(name: str, size: int, add_s: float | None, store=None) -> None:
+        line = f"{name:>18} {size / args.messages:>10.0f} {size * scale / 1e6:>11.0f}"
+        if add_s is not None:
+            line += f" {add_s / args.messages * 1e6:>8.2f}"
+        if store is not None:
+            get_us, conv_us = lookups_us(store, ids, conversations)
+            line += f" {get_us:>8.2f} {conv_us:>8.2f}"
+        print(line)
+
+    for name, keep_bodies in (("memory", False), ("memory+bodies", True)):
+        store = MemoryConversationStore(max_messages=args.messages, keep_bodies=keep_bodies)
+        size, _ = traced(fill_store(store))
+        del store
+        # Time a second, untraced fill: tracemalloc slows every allocation down.
+        store = MemoryConversationStore(max_messages=args.messages, keep_bodies=keep_bodies)
+        report(name, size, fill_store(store)(), store)
+        del store
+
+    def payload_dicts() -> dict[str, dict]:
+        # What keeping the parsed messages would cost.
+        return {envelope.meta.id: envelope.payload for envelope, _ in accepted(args.messages, args.per_conversation)}
+
+    size, kept = traced(payload_dicts)
+    report("payload dicts", size, None)
+    del kept
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "conversations.sqlite3"
+            store = SQLiteConversationStore(path)
+            add_s = fill_store(store)()
+            with sqlite3.connect(path) as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            report("sqlite (on disk)", os.path.getsize(path), add_s, store)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark fast vs strict envelope validation (messages/sec).
+
+Each iteration does what `ingest_uemp_message` does per request: parse the
+body, validate the envelope, and encode the accepted-result document. The
+`echo` row splices the request bytes into the result instead of re-encoding.
+
+    python bench_envelope.py --seconds 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+
+from uemp_envelope import validate_envelope
+from uemp_schemas import UEMPValidationResult
+
+
+def make_envelope(target_bytes: int) -> bytes:
+    """Build an invoice-like envelope whose encoding is about `target_bytes` long."""
+    message = {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": "uemp:BA:2026:inv-000001",
+            "intent": "create-invoice",
+            "conversationId": "uemp:BA:2026:conv-000001",
+        },
+        "data": {"invoice": {"id": "INV-1", "lines": []}},
+        "context": {"summary": "benchmark envelope"},
+    }
+    lines = message["data"]["invoice"]["lines"]
+    size = len(json.dumps(message))
+    i = 0
+    while size < target_bytes:
+        line = {
+            "id": f"L{i}",
+            "description": "Widget, standard grade",
+            "quantity": {"value": "3", "unit": "EA"},
+            "price": {"amount": "19.99", "currency": "EUR"},
+            "tax": {"category": "S", "rate": "21.00"},
+        }
+        lines.append(line)
+        size += len(json.dumps(line)) + 1
+        i += 1
+    return json.dumps(message).encode("utf-8")
+
+
+def _fast(body: bytes) -> bytes:
+    envelope = validate_envelope(json.loads(body), header_version="1.0", mode="fast")
+    content = {"accepted": True, "message": envelope.payload, "validation": {"protocol": "ok", "id": "ok"}}
+    return json.dumps(content).encode("utf-8")
+
+
+def _echo(body: bytes) -> bytes:
+    validate_envelope(json.loads(body), header_version="1.0", mode="fast")
+    return b"".join((b'{"accepted":true,"validation":{"protocol":"ok","id":"ok"},"message":', body, b"}"))
+
+
+def _strict(body: bytes) -> bytes:
+    envelope = validate_envelope(json.loads(body), header_version="1.0", mode="strict")
+    content = UEMPValidationResult(
+        accepted=True,
+        message=envelope.message,
+        validation={"protocol": "ok", "id": "ok"},
+    ).model_dump(by_alias=True)
+    return json.dumps(content).encode("utf-8")
+
+
+def measure(fn: Callable[[bytes], bytes], body: bytes, seconds: float) -> float:
+    fn(body)
+    n = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        fn(body)
+        n += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - started)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_envelope", description="Benchmark envelope validation modes")
+    p.add_argument("--seconds", type=float, default=2.0, help="Measurement time per mode and size")
+    args = p.parse_args(argv)
+
+    sizes = {"small": make_envelope(0), "1MB": make_envelope(1_000_000)}
+    print(f"{'size':>6} {'bytes':>9} {'mode':>7} {'msg/s':>12}")
+    for label, body in sizes.items():
+        rates = {}
+        for mode, fn in (("fast", _fast), ("echo", _echo), ("strict", _strict)):
+            rates[mode] = measure(fn, body, args.seconds)
+            print(f"{label:>6} {len(body):>9} {mode:>7} {rates[mode]:>12.1f}")
+        print(f"{label:>6} {'':>9} {'speedup':>7} {rates['fast'] / rates['strict']:>11.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
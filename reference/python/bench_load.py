@@ -0,0 +1,194 @@
+"""
+Load test the reference API and check it against a saved baseline.
+
+Generates the `uemp_loadtest` corpus (valid envelopes up to the 1 MiB limit,
+invalid ones, a batch and lookups), sends each request once to check the app
+answers with the expected statuses, then drives it closed-loop (`--concurrency`
+workers) or open-loop (`--rate` requests/sec) and prints requests/sec and
+p50/p99/p99.9 latency per endpoint. Requests go into the app in-process, or
+with `--transport loopback` through uvicorn on 127.0.0.1.
+
+    python bench_load.py --mode closed --concurrency 16 --seconds 10 --save-baseline baseline.json
+    python bench_load.py --mode closed --concurrency 16 --seconds 10 --baseline baseline.json
+    python bench_load.py --mode open --rate 200 --seconds 10 --by case
+
+Exits 1 on unexpected statuses or when a metric regressed past its threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+
+from uemp_certification import load_asgi_app, make_client
+from uemp_loadtest import (
+    DEFAULT_MIN_DELTA_MS,
+    DEFAULT_SIZES,
+    DEFAULT_THRESHOLDS,
+    LoadResult,
+    asgi_sender,
+    baseline_document,
+    compare_to_baseline,
+    http_sender,
+    load_baseline,
+    make_corpus,
+    prime,
+    run_closed_loop,
+    run_open_loop,
+    write_corpus,
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _thresholds(args: argparse.Namespace) -> dict[str, float]:
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if args.max_regression is not None:
+        thresholds = {metric: args.max_regression for metric in thresholds}
+    for spec in args.threshold:
+        metric, sep, value = spec.partition("=")
+        if not sep:
+            raise SystemExit(f"--threshold expects METRIC=FRACTION, got {spec!r}")
+        thresholds[metric] = float(value)
+    return thresholds
+
+
+async def _drive(send, corpus, args: argparse.Namespace) -> LoadResult | list[str]:
+    mismatches = await prime(send, corpus)
+    if mismatches:
+        return mismatches
+    if args.mode == "closed":
+        return await run_closed_loop(send, corpus, concurrency=args.concurrency, duration_s=args.seconds)
+    return await run_open_loop(send, corpus, rate=args.rate, duration_s=args.seconds)
+
+
+async def _run_loopback(app, corpus, args: argparse.Namespace) -> LoadResult | list[str]:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.01)
+    connections = args.concurrency if args.mode == "closed" else 100
+    try:
+        async with make_client(max_connections=connections, max_keepalive_connections=connections) as client:
+            return await _drive(http_sender(client, f"http://127.0.0.1:{port}"), corpus, args)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _print_summary(summary: dict[str, dict[str, float]], by: str) -> None:
+    print(f"{by:>24} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9}")
+    for key, row in summary.items():
+        print(
+            f"{key:>24} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f}"
+            f" {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['p999_ms']:>9.3f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_load", description="Load test the UEMP reference API on localhost")
+    p.add_argument("--app", default="uemp_api:app", help="ASGI app as module:attr")
+    p.add_argument("--transport", choices=("asgi", "loopback"), default="asgi", help="In-process or uvicorn on 127.0.0.1")
+    p.add_argument("--mode", choices=("closed", "open"), default="closed", help="Fixed concurrency or fixed arrival rate")
+    p.add_argument("--concurrency", type=int, default=16, help="Closed loop: requests in flight")
+    p.add_argument("--rate", type=float, default=100.0, help="Open loop: requests per second")
+    p.add_argument("--seconds", type=float, default=10.0, help="Measured duration")
+    p.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated sizes (bytes) of the valid envelopes",
+    )
+    p.add_argument("--batch-lines", type=int, default=100, help="Lines in the batch request (0: no batch)")
+    p.add_argument("--no-invalid", action="store_true", help="Leave the invalid envelopes out of the corpus")
+    p.add_argument("--by", choices=("endpoint", "case"), default="endpoint", help="Group results per endpoint or case")
+    p.add_argument("--write-corpus", type=Path, help="Write the corpus to this directory and exit")
+    p.add_argument("--json", type=Path, help="Also write the summary to this file")
+    p.add_argument("--save-baseline", type=Path, help="Save this run as a baseline")
+    p.add_argument("--baseline", type=Path, help="Compare this run with a saved baseline")
+    p.add_argument("--max-regression", type=float, help="Tolerated relative change for every metric (e.g. 0.2)")
+    p.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        help="Per-metric tolerance as METRIC=FRACTION (rps, p50_ms, p99_ms, p999_ms); repeatable",
+    )
+    p.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS, help="Ignore smaller latency changes")
+    args = p.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    corpus = make_corpus(sizes=sizes, invalid=not args.no_invalid, batch_lines=args.batch_lines)
+    if args.write_corpus:
+        print(f"wrote: {write_corpus(corpus, args.write_corpus)}")
+        return 0
+    thresholds = _thresholds(args)
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    app = load_asgi_app(args.app)
+    started = time.perf_counter()
+    if args.transport == "asgi":
+        result = asyncio.run(_drive(asgi_sender(app), corpus, args))
+    else:
+        result = asyncio.run(_run_loopback(app, corpus, args))
+    if isinstance(result, list):
+        print("the app did not answer the corpus as expected:")
+        for mismatch in result:
+            print(f"  {mismatch}")
+        return 1
+
+    config = {
+        "app": args.app,
+        "transport": args.transport,
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "seconds": args.seconds,
+        "sizes": sizes,
+        "batch_lines": args.batch_lines,
+        "invalid": not args.no_invalid,
+        "by": args.by,
+    }
+    summary = result.summary(args.by)
+    print(
+        f"{args.mode} loop, {args.transport}: {result.requests} requests in {result.elapsed_s:.1f}s"
+        f" ({time.perf_counter() - started:.1f}s with priming), {result.dropped} dropped"
+    )
+    _print_summary(summary, args.by)
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2, sort_keys=True), encoding="utf-8")
+    if args.save_baseline:
+        document = baseline_document(summary, config)
+        args.save_baseline.write_text(json.dumps(document, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"wrote: {args.save_baseline}")
+
+    failed = False
+    for (name, status), count in sorted(result.unexpected.items()):
+        print(f"unexpected status: {name} got {status} x{count}")
+        failed = True
+    if baseline is not None:
+        changed = sorted(k for k in config.keys() | baseline["config"].keys() if config.get(k) != baseline["config"].get(k))
+        if changed:
+            print(f"warning: baseline was recorded with different settings: {', '.join(changed)}")
+        regressions = compare_to_baseline(baseline["results"], summary, thresholds, min_delta_ms=args.min_delta_ms)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if not regressions:
+            print(f"no regressions against {args.baseline}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
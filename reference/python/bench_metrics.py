@@ -0,0 +1,108 @@
+"""
+Measure the per-request cost of the ingest metrics.
+
+First times the instrumentation on its own: a `StageTimer` with one mark per
+`/messages` stage plus the outcome count. Then posts `--requests` messages
+straight into the ASGI app (no HTTP client or socket), with metrics on and
+off in alternating rounds, and compares the best per-request times. The
+end-to-end difference is only meaningful when it exceeds the spread between
+rounds.
+
+    python bench_metrics.py --requests 5000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import timeit
+
+from uemp_api import create_app
+from uemp_metrics import STAGES, Metrics, StageTimer
+
+BODY = json.dumps(
+    {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": "uemp:BA:2026:ord-8f3a2e",
+            "intent": "create-order",
+            "conversationId": "uemp:BA:2026:conv-1234",
+        },
+        "data": {"order": {"offerId": "OF-1", "passengers": [{"name": "A. Traveller"}]}},
+    }
+).encode("utf-8")
+
+
+def instrumentation_us(n: int) -> float:
+    metrics = Metrics()
+
+    def one_request() -> None:
+        timer = StageTimer(metrics)
+        for stage in STAGES:
+            timer.mark(stage)
+        metrics.count("messages", 200, "accepted", "create-order")
+
+    return timeit.timeit(one_request, number=n) / n * 1e6
+
+
+async def post_messages(app, n: int) -> float:
+    headers = [
+        (b"content-type", b"application/vnd.uemp+json"),
+        (b"uemp-version", b"1.0"),
+        (b"content-length", str(len(BODY)).encode()),
+        (b"prefer", b"return=minimal"),
+    ]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/uemp/messages",
+        "raw_path": b"/api/uemp/messages",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 5000),
+        "server": ("127.0.0.1", 8000),
+        "app": app,
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"status {message['status']}")
+
+    started = time.perf_counter()
+    for _ in range(n):
+        await app({**scope, "state": {}}, receive, send)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_metrics", description="Measure the UEMP metrics overhead")
+    p.add_argument("--requests", type=int, default=5000, help="Requests per round")
+    p.add_argument("--rounds", type=int, default=5, help="Alternating rounds per configuration")
+    args = p.parse_args(argv)
+
+    print(f"instrumentation alone: {instrumentation_us(200_000):.2f} us/request ({len(STAGES)} stages + count)")
+    apps = {"metrics on": create_app(), "metrics off": create_app(metrics=False)}
+    times: dict[str, list[float]] = {name: [] for name in apps}
+    for name, app in apps.items():
+        asyncio.run(post_messages(app, 500))  # warm up
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            times[name].append(asyncio.run(post_messages(app, args.requests)))
+    for name, rounds in times.items():
+        spread = max(rounds) - min(rounds)
+        print(f"{name:>12}: {min(rounds):8.2f} us/request, best of {args.rounds} x {args.requests} (spread {spread:.2f})")
+    # End to end, the difference is usually within the round-to-round spread.
+    print(f"{'difference':>12}: {min(times['metrics on']) - min(times['metrics off']):8.2f} us/request")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark JCS canonicalization and JWS verification (messages/sec).
+
+`canonicalize` is RFC 8785 over a whole message. `verify` checks a message with
+a sender signature and a gateway counter-signature using a warm `KeyStore`.
+`verify-cold` uses a store with a zero TTL, which re-reads and parses the key
+files for every signature. The batch rows run `verify_batch` over NDJSON in the
+calling thread and then in a pool of `--workers` processes.
+
+    python bench_signatures.py --size 100000 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from bench_envelope import make_envelope
+from uemp_signatures import KeyStore, canonicalize, require_cryptography, sign, verify_batch, verify_message
+
+
+def make_keys(directory: Path) -> tuple[Any, Any]:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    sender = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    gateway = ec.generate_private_key(ec.SECP256R1())
+    for name, key in (("sender", sender), ("gateway", gateway)):
+        pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        (directory / f"{name}.pem").write_bytes(pem)
+    return sender, gateway
+
+
+def make_signed(body: bytes, sender: Any, gateway: Any) -> dict[str, Any]:
+    message = json.loads(body)
+    party = {"role": "sender", "id": "BA"}
+    message["signatures"] = [sign(message, sender, signature_id="sig-1", party=party, kid="sender")]
+    message["signatures"].append(
+        sign(
+            message,
+            gateway,
+            signature_id="sig-2",
+            party={"role": "gateway", "id": "GW"},
+            algorithm="ES256",
+            scope=("meta", "data", "context"),
+            kid="gateway",
+            previous="sig-1",
+        )
+    )
+    return message
+
+
+def measure(fn: Callable[[], Any], items: int, seconds: float) -> float:
+    fn()
+    n = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        fn()
+        n += items
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - started)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_signatures", description="Benchmark JCS and signature verification")
+    p.add_argument("--size", type=int, default=100_000, help="Approximate message size in bytes")
+    p.add_argument("--lines", type=int, default=200, help="Lines per batch")
+    p.add_argument("--workers", type=int, default=4, help="Worker processes for the pooled batch row")
+    p.add_argument("--seconds", type=float, default=2.0, help="Measurement time per row")
+    args = p.parse_args(argv)
+    require_cryptography()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sender, gateway = make_keys(Path(directory))
+        message = make_signed(make_envelope(args.size), sender, gateway)
+        warm = KeyStore(directory)
+        cold = KeyStore(directory, ttl_s=0)
+        assert verify_message(message, warm).valid
+        lines = [json.dumps(message).encode("utf-8")] * args.lines
+        size = len(lines[0])
+
+        rows: dict[str, tuple[Callable[[], Any], int]] = {
+            "canonicalize": (lambda: canonicalize(message), 1),
+            "verify": (lambda: verify_message(message, warm), 1),
+            "verify-cold": (lambda: verify_message(message, cold), 1),
+            "batch": (lambda: verify_batch(lines, warm, chunk_size=32), args.lines),
+        }
+        print(f"{size} bytes per message, 2 signatures")
+        print(f"{'row':>14} {'msg/s':>12} {'MB/s':>10}")
+        for name, (fn, items) in rows.items():
+            rate = measure(fn, items, args.seconds)
+            print(f"{name:>14} {rate:>12.1f} {rate * size / 1e6:>10.1f}")
+
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(args.workers, mp_context=context) as pool:
+            rate = measure(lambda: verify_batch(lines, warm, executor=pool, chunk_size=32), args.lines, args.seconds)
+        name = f"batch x{args.workers}"
+        print(f"{name:>14} {rate:>12.1f} {rate * size / 1e6:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
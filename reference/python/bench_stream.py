@@ -0,0 +1,90 @@
+"""
+Benchmark SSE fan-out through `ConversationHub` (events/sec, memory).
+
+Starts `--subscribers` consumer tasks spread over `--conversations`
+conversations, publishes `--messages` messages round-robin, and reports
+publish and delivery rates. Traced memory is sampled after each half of the
+run. With bounded queues and shared frames, the second sample should not grow
+with the number of messages published.
+
+    python bench_stream.py --subscribers 5000 --conversations 50 --messages 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from uemp_stream import ConversationHub
+
+
+def make_message(conversation: str, n: int) -> dict:
+    return {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": f"uemp:BA:2026:msg-{n:08d}",
+            "intent": "price-update",
+            "conversationId": conversation,
+            "stream": True,
+        },
+        "data": {"flight": "BA117", "price": {"amount": "450.00", "currency": "GBP"}},
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    hub = ConversationHub(queue_size=args.queue_size, slow_consumer=args.policy, heartbeat_s=None)
+    conversations = [f"uemp:BA:2026:conv-{c:05d}" for c in range(args.conversations)]
+    delivered = 0
+    delivered_bytes = 0
+
+    async def consume(conversation: str) -> None:
+        nonlocal delivered, delivered_bytes
+        async for frame in hub.subscribe(conversation).frames():
+            delivered += 1
+            delivered_bytes += len(frame)
+
+    consumers = [asyncio.create_task(consume(conversations[i % len(conversations)])) for i in range(args.subscribers)]
+    await asyncio.sleep(0)
+    tracemalloc.start()
+    samples = []
+    started = time.perf_counter()
+    publish_s = 0.0
+    half = args.messages // 2
+    for n in range(args.messages):
+        t = time.perf_counter()
+        hub.publish(conversations[n % len(conversations)], make_message(conversations[n % len(conversations)], n))
+        publish_s += time.perf_counter() - t
+        if n % args.yield_every == 0:
+            await asyncio.sleep(0)
+        if n + 1 in (half, args.messages):
+            await asyncio.sleep(0)
+            samples.append(tracemalloc.get_traced_memory()[0])
+    for conversation in conversations:
+        hub.complete(conversation)
+    await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    print(f"{args.subscribers} subscribers, {args.conversations} conversations, {args.messages} messages")
+    print(f"publish:   {args.messages / publish_s:>12.1f} msg/s")
+    print(f"delivered: {delivered / elapsed:>12.1f} events/s ({delivered_bytes / elapsed / 1e6:.1f} MB/s)")
+    print(f"memory after {half} messages: {samples[0] / 1e6:.2f} MB; after {args.messages}: {samples[1] / 1e6:.2f} MB")
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_stream", description="Benchmark SSE conversation fan-out")
+    p.add_argument("--subscribers", type=int, default=5000, help="Concurrent subscribers")
+    p.add_argument("--conversations", type=int, default=50, help="Conversations the subscribers are spread over")
+    p.add_argument("--messages", type=int, default=20000, help="Messages published")
+    p.add_argument("--queue-size", type=int, default=64, help="Per-subscriber queue size")
+    p.add_argument("--policy", choices=("drop-oldest", "disconnect"), default="drop-oldest")
+    p.add_argument("--yield-every", type=int, default=1, help="Let consumers run after every N publishes")
+    args = p.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
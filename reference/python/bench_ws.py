@@ -0,0 +1,134 @@
+"""
+Load-test the WebSocket binding (frames/sec per connection).
+
+Each connection sends `--frames` price-update messages, keeping up to
+`--window` unanswered, and counts the results. For comparison, the same
+messages are then posted one at a time to `/api/uemp/messages` over one
+keep-alive HTTP connection per client.
+
+By default the app is served with uvicorn on 127.0.0.1 in a background thread;
+`--url ws://host:port/api/uemp/ws` targets a running server instead. Needs
+`pip install websockets` (also what uvicorn uses to serve WebSockets).
+
+    python bench_ws.py --connections 4 --frames 5000 --window 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+import uvicorn
+
+from uemp_certification import load_asgi_app
+
+
+def make_frames(n: int) -> list[str]:
+    return [
+        json.dumps(
+            {
+                "meta": {
+                    "protocol": "uemp/1.0",
+                    "id": f"uemp:BA:2026:px-{i:08d}",
+                    "intent": "price-update",
+                    "conversationId": "uemp:BA:2026:conv-feed",
+                    "stream": True,
+                },
+                "data": {"flight": "BA117", "price": {"amount": f"{450 + i % 50}.00", "currency": "GBP"}},
+            }
+        )
+        for i in range(n)
+    ]
+
+
+async def ws_connection(url: str, frames: list[str], window: int) -> float:
+    from websockets.asyncio.client import connect
+
+    async with connect(url, subprotocols=["uemp.v1"], additional_headers={"UEMP-Version": "1.0"}, max_size=None) as ws:
+        slots = asyncio.Semaphore(window)
+
+        async def send_all() -> None:
+            for frame in frames:
+                await slots.acquire()
+                await ws.send(frame)
+
+        started = time.perf_counter()
+        sender = asyncio.create_task(send_all())
+        for _ in frames:
+            result = json.loads(await ws.recv())
+            if not result["accepted"]:
+                raise RuntimeError(f"frame {result['frame']} rejected: {result['error']['code']}")
+            slots.release()
+        await sender
+        return len(frames) / (time.perf_counter() - started)
+
+
+async def http_connection(base_url: str, frames: list[str]) -> float:
+    headers = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0", "Prefer": "return=minimal"}
+    async with httpx.AsyncClient(base_url=base_url, limits=httpx.Limits(max_connections=1)) as client:
+        started = time.perf_counter()
+        for frame in frames:
+            response = await client.post("/api/uemp/messages", content=frame, headers=headers)
+            response.raise_for_status()
+        return len(frames) / (time.perf_counter() - started)
+
+
+async def run(connections: int, connection: Callable[[], Awaitable[float]]) -> tuple[list[float], float]:
+    started = time.perf_counter()
+    rates = await asyncio.gather(*(connection() for _ in range(connections)))
+    return list(rates), time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="bench_ws", description="Load-test the UEMP WebSocket binding")
+    p.add_argument("--app", default="uemp_api:app", help="ASGI app as module:attr, served on loopback")
+    p.add_argument("--url", help="Test a running server at this ws:// URL instead of --app")
+    p.add_argument("--connections", type=int, default=4, help="Concurrent connections")
+    p.add_argument("--frames", type=int, default=5000, help="Frames per connection")
+    p.add_argument("--window", type=int, default=32, help="Unanswered frames per connection")
+    p.add_argument("--no-http", action="store_true", help="Skip the HTTP comparison")
+    args = p.parse_args(argv)
+    frames = make_frames(args.frames)
+
+    server = thread = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(load_asgi_app(args.app), host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        url = f"ws://127.0.0.1:{port}/api/uemp/ws"
+    base_url = url.replace("ws://", "http://", 1).replace("wss://", "https://", 1).split("/api/", 1)[0]
+    try:
+        modes = {"websocket": lambda: ws_connection(url, frames, args.window)}
+        if not args.no_http:
+            modes["http"] = lambda: http_connection(base_url, frames)
+        print(f"{args.connections} connections x {args.frames} frames, window {args.window}")
+        print(f"{'mode':>10} {'per-conn min':>13} {'per-conn max':>13} {'total/s':>10}")
+        for mode, connection in modes.items():
+            rates, elapsed = asyncio.run(run(args.connections, connection))
+            total = args.connections * args.frames / elapsed
+            print(f"{mode:>10} {min(rates):>13.1f} {max(rates):>13.1f} {total:>10.1f}")
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,36 +4,165 @@ import argparse
 import json
 from pathlib import Path
 
-from uemp_certification import run_pack
+from uemp_certification import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_PACKS_ROOT,
+    IN_PROCESS_BASE_URL,
+    CertReport,
+    HostRateLimiter,
+    ResultCache,
+    asgi_transport,
+    find_packs,
+    load_asgi_app,
+    make_client,
+    run_pack,
+    run_packs,
+    summarize_reports,
+    target_fingerprint,
+)
+
+
+def _write_report(report: CertReport, md: str, pack_dir: Path) -> Path:
+    report_path = pack_dir / "report.json"
+    report_md_path = pack_dir / "report.md"
+    report_path.write_text(json.dumps(report.model_dump(), indent=2, sort_keys=True), encoding="utf-8")
+    report_md_path.write_text(md, encoding="utf-8")
+    print(f"wrote: {report_path}")
+    print(f"wrote: {report_md_path}")
+    return report_path
+
+
+async def _run(args: argparse.Namespace, pack_paths: list[Path]) -> list[tuple[CertReport, str]]:
+    rate_limiter = HostRateLimiter(args.rate) if args.rate else None
+    async with make_client(
+        timeout_s=float(args.timeout_s),
+        max_connections=int(args.concurrency),
+        max_keepalive_connections=int(args.concurrency),
+        http2=bool(args.http2),
+        transport=asgi_transport(args.asgi_app) if args.asgi_app is not None else None,
+    ) as client:
+        cache: ResultCache | None = None
+        target: str | None = None
+        if args.incremental:
+            try:
+                target = await target_fingerprint(client, str(args.base_url), build_id=args.build_id)
+                cache = ResultCache(args.cache_dir)
+            except Exception as e:
+                print(f"incremental disabled: cannot fingerprint target ({e}); pass --build-id")
+
+        if args.pack:
+            report, md = await run_pack(
+                base_url=str(args.base_url),
+                pack_json_path=str(pack_paths[0]),
+                client=client,
+                concurrency=int(args.concurrency),
+                rate_limiter=rate_limiter,
+                cache=cache,
+                target=target,
+            )
+            return [(report, md)]
+        return await run_packs(
+            base_url=str(args.base_url),
+            pack_json_paths=list(pack_paths),
+            client=client,
+            concurrency=int(args.concurrency),
+            rate_limiter=rate_limiter,
+            cache=cache,
+            target=target,
+        )
 
 
 def main(argv: list[str] | None = None) -> int:
-    p = argparse.ArgumentParser(prog="certify", description="Run a UEMP certification pack")
-    p.add_argument("--base-url", required=True, help="Base URL of the UEMP implementation (e.g. http://localhost:8000)")
-    p.add_argument("--pack", required=True, help="Path to pack.json")
+    p = argparse.ArgumentParser(prog="certify", description="Run UEMP certification packs")
+    server = p.add_mutually_exclusive_group(required=True)
+    server.add_argument("--base-url", help="Base URL of the UEMP implementation (e.g. http://localhost:8000)")
+    server.add_argument(
+        "--app",
+        help="Run in-process against an ASGI app given as module:attr (e.g. uemp_api:app), without a server",
+    )
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--pack", help="Path to pack.json")
+    target.add_argument(
+        "--all-packs",
+        action="store_true",
+        help="Run every pack.json under --packs-root in one process and write summary.json/summary.md",
+    )
+    p.add_argument("--packs-root", default=str(DEFAULT_PACKS_ROOT), help="Directory searched by --all-packs")
+    p.add_argument("--summary-dir", default=None, help="Where --all-packs writes the summary (default: --packs-root)")
     p.add_argument("--timeout-s", type=float, default=30.0, help="HTTP timeout in seconds")
+    p.add_argument("--concurrency", type=int, default=8, help="Maximum number of cases in flight")
+    p.add_argument("--rate", type=float, default=None, help="Maximum requests per second per host (default: unlimited)")
+    p.add_argument("--http2", action="store_true", help="Use HTTP/2 (requires the 'h2' package)")
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse cached outcomes for cases whose fixture, pack definition and target are unchanged",
+    )
+    p.add_argument(
+        "--build-id",
+        default=None,
+        help="Target fingerprint for --incremental (default: ETag of the target's /.well-known/uemp)",
+    )
+    p.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Result cache directory for --incremental")
     args = p.parse_args(argv)
-
-    pack_path = Path(args.pack).resolve()
-    report_path = pack_path.parent / "report.json"
-    report_md_path = pack_path.parent / "report.md"
+    args.asgi_app = None
+    if args.app:
+        try:
+            args.asgi_app = load_asgi_app(args.app)
+        except (ValueError, ImportError, AttributeError) as e:
+            p.error(f"--app: cannot load {args.app!r}: {e}")
+        args.base_url = IN_PROCESS_BASE_URL
 
     import asyncio
 
-    report, md = asyncio.run(
-        run_pack(base_url=str(args.base_url), pack_json_path=str(pack_path), timeout_s=float(args.timeout_s))
-    )
+    if args.pack:
+        pack_path = Path(args.pack).resolve()
+        [(report, md)] = asyncio.run(_run(args, [pack_path]))
+        print(
+            f"total={report.summary.total} passed={report.summary.passed} failed={report.summary.failed}"
+            f" reused={report.summary.reused}"
+        )
+        _write_report(report, md, pack_path.parent)
+        return 0 if report.summary.failed == 0 else 2
 
-    report_path.write_text(json.dumps(report.model_dump(), indent=2, sort_keys=True), encoding="utf-8")
-    report_md_path.write_text(md, encoding="utf-8")
+    packs_root = Path(args.packs_root).resolve()
+    pack_paths = find_packs(packs_root)
+    if not pack_paths:
+        print(f"no packs found under {packs_root}")
+        return 2
 
-    print(f"total={report.summary.total} passed={report.summary.passed} failed={report.summary.failed}")
-    print(f"wrote: {report_path}")
-    print(f"wrote: {report_md_path}")
+    results = asyncio.run(_run(args, pack_paths))
 
-    return 0 if report.summary.failed == 0 else 2
+    report_paths: list[str | None] = []
+    for pack_path, (report, md) in zip(pack_paths, results):
+        print(
+            f"{report.packId}: total={report.summary.total} passed={report.summary.passed}"
+            f" failed={report.summary.failed} reused={report.summary.reused}"
+        )
+        report_path = _write_report(report, md, pack_path.parent)
+        report_paths.append(report_path.relative_to(packs_root).as_posix())
+
+    summary, summary_md = summarize_reports(
+        [report for report, _ in results],
+        base_url=str(args.base_url),
+        report_paths=report_paths,
+    )
+    summary_dir = Path(args.summary_dir).resolve() if args.summary_dir else packs_root
+    summary_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = summary_dir / "summary.json"
+    summary_md_path = summary_dir / "summary.md"
+    summary_path.write_text(json.dumps(summary.model_dump(), indent=2, sort_keys=True), encoding="utf-8")
+    summary_md_path.write_text(summary_md, encoding="utf-8")
+
+    print(
+        f"total={summary.summary.total} passed={summary.summary.passed} failed={summary.summary.failed}"
+        f" reused={summary.summary.reused}"
+    )
+    print(f"wrote: {summary_path}")
+    print(f"wrote: {summary_md_path}")
+
+    return 0 if summary.summary.failed == 0 else 2
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
@@ -6,13 +6,31 @@ from pathlib import Path
 
 import httpx
 
-from uemp_certification import load_pack, run_pack
+from uemp_certification import (
+    HostRateLimiter,
+    ResultCache,
+    find_packs,
+    load_pack,
+    make_client,
+    run_pack,
+    run_packs,
+    summarize_reports,
+)
 
 
-def _tmp_pack(tmp_path: Path) -> Path:
+def _tmp_pack(tmp_path: Path, n_cases: int = 1) -> Path:
     pack_dir = tmp_path / "pack"
     (pack_dir / "fixtures").mkdir(parents=True)
     (pack_dir / "fixtures" / "x.xml").write_text("<X/>", encoding="utf-8")
+    cases = [
+        {
+            "id": f"c{i}",
+            "title": f"case {i}",
+            "fixture": "fixtures/x.xml",
+            "expect": {"httpStatus": 200, "valid": True},
+        }
+        for i in range(1, n_cases + 1)
+    ]
 
     (pack_dir / "pack.json").write_text(
         json.dumps(
@@ -22,14 +40,7 @@ def _tmp_pack(tmp_path: Path) -> Path:
                 "profileId": "example/1.0",
                 "revisionId": "R1",
                 "endpoint": "/api/uemp/validate-native",
-                "cases": [
-                    {
-                        "id": "c1",
-                        "title": "case 1",
-                        "fixture": "fixtures/x.xml",
-                        "expect": {"httpStatus": 200, "valid": True},
-                    }
-                ],
+                "cases": cases,
             },
             indent=2,
         ),
@@ -68,3 +79,169 @@ def test_run_pack_with_mock_transport(tmp_path: Path) -> None:
     assert report.summary.total == 1
     assert report.summary.failed == 0
     assert "UEMP Certification Report" in md
+
+
+def test_run_pack_concurrently_keeps_pack_order(tmp_path: Path) -> None:
+    pack_path = _tmp_pack(tmp_path, n_cases=12)
+    in_flight = 0
+    max_in_flight = 0
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight, calls
+        calls += 1
+        delay = 0.02 if calls % 2 else 0.0
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(delay)
+        in_flight -= 1
+        return httpx.Response(200, json={"valid": True, "errors": [], "stages": []})
+
+    async def _run() -> tuple:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await run_pack(
+                base_url="http://example.test",
+                pack_json_path=pack_path,
+                client=client,
+                concurrency=4,
+            )
+
+    report, _ = asyncio.run(_run())
+
+    assert [r.caseId for r in report.results] == [f"c{i}" for i in range(1, 13)]
+    assert max_in_flight == 4
+    assert all(r.latencyMs is not None and r.latencyMs >= 0 for r in report.results)
+    assert report.summary.passed == 12
+
+
+def test_host_rate_limiter_spaces_requests() -> None:
+    limiter = HostRateLimiter(50.0)
+
+    async def _run() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(limiter.acquire("example.test") for _ in range(5)))
+        await limiter.acquire("other.test")
+        return loop.time() - started
+
+    elapsed = asyncio.run(_run())
+
+    # Four 20 ms gaps for the first host; the other host is not delayed by it.
+    assert 0.07 <= elapsed < 0.2
+
+
+def test_run_packs_shares_client_and_summarizes(tmp_path: Path) -> None:
+    pack_paths = [_tmp_pack(tmp_path / name, n_cases=3) for name in ("a", "b")]
+    hosts: set[str] = set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.add(request.url.host)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"valid": request.url.host == "example.test"})
+
+    async def _run() -> list:
+        async with make_client(transport=httpx.MockTransport(handler)) as client:
+            return await run_packs(
+                base_url="http://example.test",
+                pack_json_paths=pack_paths,
+                client=client,
+                concurrency=4,
+            )
+
+    results = asyncio.run(_run())
+    summary, md = summarize_reports([r for r, _ in results], base_url="http://example.test")
+
+    assert len(results) == 2
+    assert hosts == {"example.test"}
+    assert summary.summary.total == 6
+    assert summary.summary.failed == 0
+    assert [p.total for p in summary.packs] == [3, 3]
+    assert "UEMP Certification Summary" in md
+
+
+def test_find_packs_discovers_repo_packs() -> None:
+    paths = find_packs()
+    assert [p.parent.name for p in paths] == ["iata-ndc__21.3", "peppol-bis-billing__3.0"]
+
+
+def test_incremental_run_reuses_unchanged_cases(tmp_path: Path) -> None:
+    pack_path = _tmp_pack(tmp_path, n_cases=2)
+    (pack_path.parent / "fixtures" / "y.xml").write_text("<Y/>", encoding="utf-8")
+    pack = json.loads(pack_path.read_text(encoding="utf-8"))
+    pack["cases"][1]["fixture"] = "fixtures/y.xml"
+    pack_path.write_text(json.dumps(pack), encoding="utf-8")
+    cache = ResultCache(tmp_path / "cache")
+    posted: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        posted.append(json.loads(request.content)["xml"])
+        return httpx.Response(200, json={"valid": True})
+
+    def _run(target: str):
+        async def _go() -> tuple:
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await run_pack(
+                    base_url="http://example.test",
+                    pack_json_path=pack_path,
+                    client=client,
+                    cache=cache,
+                    target=target,
+                )
+
+        return asyncio.run(_go())[0]
+
+    first = _run("build:1")
+    second = _run("build:1")
+    (pack_path.parent / "fixtures" / "y.xml").write_text("<Y changed='1'/>", encoding="utf-8")
+    third = _run("build:1")
+    fourth = _run("build:2")
+
+    assert [r.reused for r in first.results] == [False, False]
+    assert [r.reused for r in second.results] == [True, True]
+    assert second.summary.reused == 2 and second.summary.passed == 2
+    assert [r.reused for r in third.results] == [True, False]
+    assert [r.reused for r in fourth.results] == [False, False]
+    assert posted == ["<X/>", "<Y/>", "<Y changed='1'/>", "<X/>", "<Y changed='1'/>"]
+
+
+def test_incremental_run_does_not_cache_server_errors(tmp_path: Path) -> None:
+    pack_path = _tmp_pack(tmp_path)
+    cache = ResultCache(tmp_path / "cache")
+    statuses = iter([503, 200, 200])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        status = next(statuses)
+        return httpx.Response(status, json={"valid": status == 200})
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            report, _ = await run_pack(
+                base_url="http://example.test", pack_json_path=pack_path, client=client, cache=cache, target="build:1"
+            )
+            return report.results[0]
+
+    results = [asyncio.run(_run()) for _ in range(3)]
+
+    # The 503 is posted again on the next run; the 200 that follows is reused.
+    assert [(r.httpStatus, r.reused) for r in results] == [(503, False), (200, False), (200, True)]
+
+
+async def _validate_native_app(scope, receive, send) -> None:
+    assert scope["type"] == "http" and scope["path"] == "/api/uemp/validate-native"
+    while (await receive()).get("more_body"):
+        pass
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"valid": true, "errors": [], "stages": []}'})
+
+
+def test_certify_runs_in_process_app(tmp_path: Path) -> None:
+    import certify
+
+    pack_path = _tmp_pack(tmp_path, n_cases=3)
+
+    exit_code = certify.main(["--app", "test_certification_runner:_validate_native_app", "--pack", str(pack_path)])
+
+    report = json.loads((pack_path.parent / "report.json").read_text(encoding="utf-8"))
+    assert exit_code == 0
+    assert report["baseUrl"] == "http://uemp.in-process"
+    assert report["summary"]["passed"] == 3
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from uemp_admission import AdmissionControl, ConcurrencyLimiter, MemoryRateLimiter, SQLiteRateLimiter, party_key
+from uemp_api import _AdmissionMiddleware, create_app
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _message(party: str, n: int) -> dict:
+    return {
+        "meta": {"protocol": "uemp/1.0", "id": f"uemp:{party}:2026:msg-{n}", "intent": "create-order"},
+        "data": {},
+    }
+
+
+def _scope(message_id: str | None = None, client: tuple[str, int] | None = ("10.0.0.7", 5000)) -> dict:
+    headers = [(b"uemp-message-id", message_id.encode())] if message_id else []
+    return {"type": "http", "method": "POST", "path": "/api/uemp/messages", "headers": headers, "client": client}
+
+
+def test_party_key():
+    assert party_key(_scope("uemp:BA:2026:msg-1")) == "BA"
+    assert party_key(_scope("not-a-message-id")) == "client:10.0.0.7"
+    assert party_key(_scope(client=None)) == "client:unknown"
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_rate_limiter_allows_bursts_then_refills(backend, tmp_path):
+    clock = _Clock()
+    if backend == "memory":
+        limiter = MemoryRateLimiter(2, 3, clock=clock)
+        other_worker = limiter
+    else:
+        limiter = SQLiteRateLimiter(tmp_path / "rate.sqlite3", 2, 3, clock=clock)
+        other_worker = SQLiteRateLimiter(tmp_path / "rate.sqlite3", 2, 3, clock=clock)
+
+    assert [limiter.acquire("BA") for _ in range(2)] == [0.0, 0.0]
+    assert other_worker.acquire("BA") == 0.0
+    assert limiter.acquire("BA") == pytest.approx(0.5)
+    assert other_worker.acquire("AG") == 0.0
+    clock.now += 0.5
+    assert limiter.acquire("BA") == 0.0
+    assert other_worker.acquire("BA") == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("blocking", [False, True])
+def test_blocking_rate_limiters_run_off_the_event_loop(blocking):
+    class Recording(MemoryRateLimiter):
+        def acquire(self, key: str) -> float:
+            threads.append(threading.get_ident())
+            return super().acquire(key)
+
+    threads: list[int] = []
+    limiter = Recording(10)
+    limiter.blocking = blocking
+
+    assert asyncio.run(AdmissionControl(rate_limiter=limiter).admit(_scope("uemp:BA:2026:msg-1"))) is None
+    assert (threads[0] != threading.get_ident()) is blocking
+
+
+def test_memory_rate_limiter_prunes_full_buckets():
+    clock = _Clock()
+    limiter = MemoryRateLimiter(10, prune_every=4, clock=clock)
+    for party in ("A", "B", "C"):
+        limiter.acquire(party)
+    clock.now += 1
+    limiter.acquire("D")
+
+    assert len(limiter) == 1
+
+
+def test_concurrency_limiter_queues_in_order_and_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, max_queue_s=0.05)
+        assert await limiter.acquire() == 0.0
+        order = []
+
+        async def wait(name):
+            order.append((name, await limiter.acquire()))
+
+        waiting = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        limiter.release(0.001)
+        await asyncio.sleep(0)
+        timed_out = await asyncio.gather(*waiting)
+        # "second" was never handed a slot and gave up after max_queue_s.
+        assert timed_out == [None, None] and order[0] == ("first", 0.0) and order[1][1] >= 0.05
+        assert limiter.queued == 0 and limiter.shed == 1
+
+        limiter.service_s = 1.0
+        assert await limiter.acquire() == pytest.approx(1.0)
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_rate_limited_requests_get_429_with_retry_after():
+    client = TestClient(create_app(rate_limit=1, rate_burst=2))
+    headers = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+
+    def post(party: str, n: int):
+        message = _message(party, n)
+        return client.post(
+            "/api/uemp/messages",
+            content=json.dumps(message),
+            headers={**headers, "UEMP-Message-Id": message["meta"]["id"]},
+        )
+
+    assert [post("BA", n).status_code for n in range(2)] == [200, 200]
+    response = post("BA", 2)
+    assert post("AG", 0).status_code == 200
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["code"] == "system-rate-limited"
+    assert response.json()["recovery"]["retryAfter"] == "PT1S"
+    assert client.get("/api/uemp/capabilities").status_code == 200
+
+
+def test_requests_over_capacity_are_shed_before_the_body_is_read():
+    async def scenario():
+        release = asyncio.Event()
+        reads = []
+
+        async def app(scope, receive, send):
+            reads.append(await receive())
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        concurrency = ConcurrencyLimiter(1, max_queue_s=0.01)
+        middleware = _AdmissionMiddleware(app, AdmissionControl(concurrency=concurrency))
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        held = asyncio.create_task(middleware(_scope(), receive, send))
+        await asyncio.sleep(0)
+        await middleware(_scope(), receive, send)
+        release.set()
+        await held
+        return sent, reads, concurrency
+
+    sent, reads, concurrency = asyncio.run(scenario())
+
+    shed = sent[0]
+    assert shed["status"] == 503 and (b"retry-after", b"1") in shed["headers"]
+    assert json.loads(sent[1]["body"])["code"] == "system-service-unavailable"
+    assert sent[2]["status"] == 200
+    assert len(reads) == 1 and concurrency.active == 0
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import replace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_batches import MemoryBatchStore, SQLiteBatchStore, parse_batch_envelope
+
+HEADERS = {"Content-Type": "application/x-ndjson", "UEMP-Version": "1.0"}
+
+
+def _lines(batch_id: str, total: int) -> list[bytes]:
+    return [
+        json.dumps(
+            {
+                "meta": {
+                    "protocol": "uemp/1.0",
+                    "id": f"uemp:BA:2026:inv-{i}",
+                    "intent": "create-invoice",
+                    "batch": {"id": batch_id, "index": i, "total": total},
+                },
+                "data": {"invoice": {"id": f"INV-{i}"}},
+            }
+        ).encode("utf-8")
+        for i in range(total)
+    ]
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _checksum(lines: list[bytes]) -> str:
+    return "sha256:" + hashlib.sha256(b"".join(line + b"\n" for line in lines)).hexdigest()
+
+
+def _envelope(batch_id: str, count: int, checksum: str | None = None) -> bytes:
+    batch = {"id": batch_id, "messageCount": count, **({"checksum": checksum} if checksum else {})}
+    return json.dumps({"meta": {"intent": "batch", "batch": batch}}).encode("utf-8")
+
+
+def _post(
+    client: TestClient, envelope: bytes, lines: list[bytes], headers: dict[str, str] = HEADERS
+) -> tuple[list[dict], dict]:
+    response = client.post("/api/uemp/batch", content=b"\n".join([envelope, *lines]) + b"\n", headers=headers)
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    return results[:-1], results[-1]["batch"]
+
+
+def test_complete_batch_is_verified_and_reported():
+    client = TestClient(create_app())
+    lines = _lines("b-1", 3)
+
+    results, summary = _post(client, _envelope("b-1", 3, _checksum(lines)), lines)
+
+    assert [r["index"] for r in results] == [0, 1, 2] and all(r["accepted"] for r in results)
+    assert summary == {
+        "id": "b-1",
+        "messageCount": 3,
+        "next": 3,
+        "rejected": 0,
+        "complete": True,
+        "checksum": "verified",
+        "received": 3,
+        "skipped": 0,
+        "accepted": True,
+    }
+    status = client.get("/api/uemp/batch/b-1", headers={"UEMP-Version": "1.0"})
+    assert status.json()["checksum"] == "verified"
+    assert client.get("/api/uemp/batch/b-2", headers={"UEMP-Version": "1.0"}).json()["code"] == "protocol-unknown-batch"
+
+
+def test_checksum_and_count_mismatches_reject_the_batch():
+    client = TestClient(create_app())
+    lines = _lines("b-1", 2)
+
+    _, tampered = _post(client, _envelope("b-1", 2, _checksum([lines[0], lines[0]])), lines)
+    results, too_many = _post(client, _envelope("b-2", 1), _lines("b-2", 2))
+
+    assert tampered["accepted"] is False and tampered["checksum"] == "mismatch"
+    assert tampered["error"]["code"] == "protocol-batch-checksum-mismatch"
+    # The mismatch rejects the batch, not the lines already accepted and indexed.
+    lookup = client.get("/api/uemp/messages/uemp:BA:2026:inv-1", headers={"UEMP-Version": "1.0"})
+    assert lookup.status_code == 200
+    # The lines claim a total of 2 in a batch of 1.
+    assert results[0]["error"]["code"] == "protocol-batch-count-mismatch"
+    assert too_many["next"] == 0 and too_many["accepted"] is False
+
+
+def test_interrupted_batch_resumes_from_its_high_water_mark():
+    client = TestClient(create_app())
+    lines = _lines("b-1", 5)
+    envelope = _envelope("b-1", 5, _checksum(lines))
+
+    _, first = _post(client, envelope, lines[:3])
+    # Resuming one line early: line 2 was already processed.
+    results, second = _post(client, envelope, lines[2:])
+
+    assert first["next"] == 3 and first["checksum"] == "pending"
+    assert first["error"]["code"] == "protocol-batch-count-mismatch" and first["error"]["recovery"]["action"] == "retry"
+    assert results[0] == {"index": 2, "skipped": True}
+    assert [r["index"] for r in results[1:]] == [3, 4]
+    assert second["accepted"] is True and second["checksum"] == "verified"
+    assert (second["received"], second["skipped"]) == (2, 1)
+
+
+def test_gaps_and_changed_envelopes_are_refused():
+    client = TestClient(create_app())
+    lines = _lines("b-1", 4)
+    _post(client, _envelope("b-1", 4), lines[:1])
+
+    results, gap = _post(client, _envelope("b-1", 4), lines[2:])
+    _, changed = _post(client, _envelope("b-1", 5), lines[1:])
+
+    assert results[0]["status"] == 409 and results[0]["error"]["code"] == "protocol-batch-out-of-order"
+    assert gap["next"] == 1
+    assert changed["error"]["code"] == "protocol-batch-conflict"
+    assert "next" not in changed
+
+
+def test_batch_ids_are_scoped_to_the_sending_party():
+    client = TestClient(create_app())
+    party_a = {**HEADERS, "UEMP-Message-Id": "uemp:BA:2026:batch-1"}
+    party_b = {**HEADERS, "UEMP-Message-Id": "uemp:BB:2026:batch-1"}
+    lines = _lines("b-1", 4)
+    _post(client, _envelope("b-1", 4), lines[:2], party_a)
+
+    # The same ID with another messageCount opens a new batch for party B, not a conflict.
+    _, other = _post(client, _envelope("b-1", 3), _lines("b-1", 3)[:1], party_b)
+    _, resumed = _post(client, _envelope("b-1", 4), lines[2:], party_a)
+
+    assert (other["next"], other["skipped"]) == (1, 0)
+    assert resumed["accepted"] is True and resumed["skipped"] == 0
+    lookup = {"UEMP-Version": "1.0", "UEMP-Message-Id": "uemp:BC:2026:lookup-1"}
+    assert client.get("/api/uemp/batch/b-1", headers=lookup).json()["code"] == "protocol-unknown-batch"
+    assert client.get("/api/uemp/batch/b-1", headers={**lookup, "UEMP-Message-Id": "uemp:BB:2026:x"}).json()["next"] == 1
+
+
+def test_lines_are_indexed_only_once_the_mark_is_saved():
+    class Racing(MemoryBatchStore):
+        def save(self, progress, *, previous_next):
+            if previous_next is not None:
+                # Another request advanced the batch first.
+                super().save(replace(progress, next=previous_next + 1), previous_next=previous_next)
+            return super().save(progress, previous_next=previous_next)
+
+    client = TestClient(create_app(batch_store=Racing()))
+    results, summary = _post(client, _envelope("b-1", 2), _lines("b-1", 2))
+
+    assert all(r["accepted"] for r in results)
+    assert summary["error"]["code"] == "protocol-batch-conflict"
+    lookup = client.get("/api/uemp/messages/uemp:BA:2026:inv-0", headers={"UEMP-Version": "1.0"})
+    assert lookup.status_code == 404
+
+
+def test_batch_envelope_is_parsed_only_for_batch_intents():
+    assert parse_batch_envelope(_lines("b-1", 1)[0]) is None
+    assert parse_batch_envelope(_envelope("b-1", 3)).message_count == 3
+    bad_count = parse_batch_envelope(b'{"meta": {"intent": "batch", "batch": {"id": "b-1", "messageCount": "3"}}}')
+    assert bad_count.code == "protocol-invalid-envelope"
+    assert parse_batch_envelope(_envelope("b-1", 3, "sha256:abc")).code == "protocol-invalid-envelope"
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_saves_only_from_the_expected_mark(backend, tmp_path):
+    store = MemoryBatchStore() if backend == "memory" else SQLiteBatchStore(tmp_path / "batches.sqlite3")
+    progress = parse_batch_envelope(_envelope("b-1", 10))
+
+    assert store.save(progress, previous_next=None)
+    assert not store.save(progress, previous_next=None)
+    progress.next = 4
+    assert store.save(progress, previous_next=0)
+    assert not store.save(progress, previous_next=0)
+    assert store.get("", "b-1").next == 4
+    assert store.get("BB", "b-1") is None
+
+
+@pytest.mark.parametrize("blocking", [False, True])
+def test_blocking_stores_open_and_save_off_the_event_loop(blocking):
+    class Recording(MemoryBatchStore):
+        def get(self, party, batch_id):
+            on_loop.append(_on_event_loop())
+            return super().get(party, batch_id)
+
+        def save(self, progress, *, previous_next):
+            on_loop.append(_on_event_loop())
+            return super().save(progress, previous_next=previous_next)
+
+    on_loop: list[bool] = []
+    store = Recording()
+    store.blocking = blocking
+    client = TestClient(create_app(batch_store=store))
+    _, summary = _post(client, _envelope("b-1", 2), _lines("b-1", 2))
+    status = client.get("/api/uemp/batch/b-1", headers={"UEMP-Version": "1.0"})
+
+    assert summary["accepted"] is True and status.json()["next"] == 2
+    # Open (get, save), one chunk saved, then the status lookup.
+    assert on_loop == [not blocking] * 4
+
+
+def test_batch_resumed_from_sqlite_completes_unverified(tmp_path):
+    lines = _lines("b-1", 2)
+    envelope = _envelope("b-1", 2, _checksum(lines))
+    path = tmp_path / "batches.sqlite3"
+
+    _post(TestClient(create_app(batch_store=SQLiteBatchStore(path))), envelope, lines[:1])
+    _, summary = _post(TestClient(create_app(batch_store=SQLiteBatchStore(path))), envelope, lines[1:])
+
+    assert summary["accepted"] is True and summary["checksum"] == "unverified"
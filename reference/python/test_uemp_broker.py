@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from uemp_broker import (
+    BrokerConsumer,
+    InMemoryBroker,
+    message_properties,
+    parse_routing_key,
+    routing_key,
+)
+
+QUEUE = "uemp.orders"
+
+
+def _message(n: int, intent: str = "create-order") -> dict:
+    return {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": f"uemp:BA:2026:ord-{n:04d}",
+            "intent": intent,
+            "conversationId": "uemp:BA:2026:conv-1234",
+        },
+        "data": {"order": {"n": n}},
+    }
+
+
+async def _publish(broker: InMemoryBroker, message: dict, *, key: str | None = None, **overrides) -> None:
+    properties = {**message_properties(message, reply_to="replies"), **overrides}
+    body = json.dumps(message).encode("utf-8")
+    key = key or routing_key("air-travel", message["meta"]["intent"])
+    await broker.publish(QUEUE, body, routing_key=key, properties=properties)
+
+
+async def _replies(broker: InMemoryBroker) -> list[dict]:
+    deliveries = await broker.fetch("replies", 100, timeout_s=0)
+    await broker.ack(d.delivery_tag for d in deliveries)
+    return [json.loads(d.body) for d in deliveries]
+
+
+def test_routing_keys():
+    assert routing_key("air-travel", "create-order") == "uemp.air-travel.create-order"
+    assert parse_routing_key("uemp.air-travel.create-order") == ("air-travel", "create-order")
+    assert parse_routing_key("orders.create") is None
+
+
+def test_routes_by_intent_and_acks_in_batches():
+    async def scenario():
+        broker = InMemoryBroker()
+        for n in range(10):
+            await _publish(broker, _message(n, "create-order" if n % 2 else "cancel-order"))
+        seen: dict[str, list[int]] = {"create-order": [], "cancel-order": []}
+
+        async def cancel(envelope, delivery):
+            seen["cancel-order"].append(envelope.payload["data"]["order"]["n"])
+
+        def create(envelope, delivery):
+            seen["create-order"].append(envelope.payload["data"]["order"]["n"])
+
+        consumer = BrokerConsumer(
+            broker, QUEUE, {"create-order": create, "cancel-order": cancel}, prefetch=4, ack_batch=3
+        )
+        stats = await consumer.run(idle_timeout_s=0)
+        return broker, seen, stats
+
+    broker, seen, stats = asyncio.run(scenario())
+
+    assert seen == {"create-order": [1, 3, 5, 7, 9], "cancel-order": [0, 2, 4, 6, 8]}
+    assert stats.handled == 10 and stats.by_intent == {"create-order": 5, "cancel-order": 5}
+    assert broker.acked == 10 and broker.ack_calls == 5
+    assert not broker.unacked
+
+
+@pytest.mark.parametrize(
+    "overrides, key, code",
+    [
+        ({"type": "cancel-order"}, None, "protocol-header-mismatch"),
+        ({"correlation_id": "uemp:BA:2026:conv-other"}, None, "protocol-header-mismatch"),
+        ({"headers": {}}, None, "protocol-missing-required-header"),
+        ({"content_type": "text/plain"}, None, "protocol-unsupported-media-type"),
+        ({}, "uemp.air-travel.cancel-order", "protocol-header-mismatch"),
+        ({"type": "refund"}, "uemp.payment.refund", "protocol-unknown-intent"),
+    ],
+)
+def test_invalid_messages_are_dead_lettered_and_answered(overrides: dict, key: str | None, code: str):
+    async def scenario():
+        broker = InMemoryBroker()
+        message = _message(1, "refund") if code == "protocol-unknown-intent" else _message(1)
+        await _publish(broker, message, key=key, **overrides)
+        consumer = BrokerConsumer(broker, QUEUE, {"create-order": lambda *_: None})
+        await consumer.run(idle_timeout_s=0)
+        return broker, await _replies(broker)
+
+    broker, replies = asyncio.run(scenario())
+
+    assert len(broker.dead_letters) == 1 and not broker.unacked
+    assert replies[0]["id"] == "uemp:BA:2026:ord-0001"
+    assert replies[0]["error"]["code"] == code
+
+
+def test_failed_handlers_are_redelivered_then_dead_lettered():
+    async def scenario():
+        broker = InMemoryBroker()
+        await _publish(broker, _message(1))
+        await _publish(broker, _message(2))
+        attempts: list[tuple[int, bool]] = []
+
+        def flaky(envelope, delivery):
+            n = envelope.payload["data"]["order"]["n"]
+            attempts.append((n, delivery.redelivered))
+            if n == 2 or not delivery.redelivered:
+                raise RuntimeError("downstream unavailable")
+
+        consumer = BrokerConsumer(broker, QUEUE, {"create-order": flaky}, max_deliveries=3)
+        stats = await consumer.run(idle_timeout_s=0)
+        return broker, attempts, stats, await _replies(broker)
+
+    broker, attempts, stats, replies = asyncio.run(scenario())
+
+    assert attempts == [(1, False), (2, False), (1, True), (2, True), (2, True)]
+    assert stats.handled == 1 and stats.requeued == 3 and stats.dead_lettered == 1
+    assert broker.dead_letters[0].delivery_count == 3
+    assert replies[0]["error"]["code"] == "system-internal-error"
+
+
+def test_unacked_deliveries_come_back_after_recover():
+    async def scenario():
+        broker = InMemoryBroker()
+        for n in range(3):
+            await _publish(broker, _message(n))
+        first = await broker.fetch(QUEUE, 2)
+        await broker.ack([first[0].delivery_tag])
+        await broker.recover()
+        return [(json.loads(d.body)["meta"]["id"][-1], d.redelivered) for d in await broker.fetch(QUEUE, 10)]
+
+    assert asyncio.run(scenario()) == [("1", True), ("2", False)]
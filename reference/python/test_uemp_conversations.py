@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_conversations import MemoryConversationStore, SQLiteConversationStore, message_record
+from uemp_envelope import validate_envelope
+
+CONVERSATION = "uemp:BA:2026:conv-1234"
+HEADERS = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+
+
+def _message(n: int, *, conversation: str | None = CONVERSATION, reply_to: int | None = None) -> dict:
+    meta = {"protocol": "uemp/1.0", "id": f"uemp:BA:2026:msg-{n:04d}", "intent": "create-order"}
+    if conversation is not None:
+        meta["conversationId"] = conversation
+    if reply_to is not None:
+        meta["replyTo"] = f"uemp:BA:2026:msg-{reply_to:04d}"
+    meta["sequence"] = n
+    return {"meta": meta, "data": {"n": n}}
+
+
+def _record(message: dict, received_at: float = 1000.0, *, keep_body: bool = False):
+    body = json.dumps(message).encode("utf-8")
+    envelope = validate_envelope(message, header_version="1.0")
+    return message_record(envelope, body, keep_body=keep_body, received_at=received_at)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryConversationStore(**kwargs)
+        return SQLiteConversationStore(tmp_path / "conversations.sqlite3", **kwargs)
+
+    return make
+
+
+def test_store_indexes_by_id_conversation_and_reply_to(make_store):
+    store = make_store(clock=_Clock())
+    assert store.add(_record(_message(1)))
+    assert store.add(_record(_message(2, reply_to=1)))
+    assert store.add(_record(_message(3, conversation="uemp:BA:2026:conv-other", reply_to=1)))
+    assert store.add(_record(_message(4, reply_to=2)))
+    assert not store.add(_record(_message(1)))
+
+    record = store.get("uemp:BA:2026:msg-0002")
+    assert (record.conversation_id, record.reply_to, record.sequence) == (CONVERSATION, "uemp:BA:2026:msg-0001", 2)
+    assert record.body is None
+    assert store.get("uemp:BA:2026:msg-9999") is None
+    assert store.replies("uemp:BA:2026:msg-0001") == ["uemp:BA:2026:msg-0002", "uemp:BA:2026:msg-0003"]
+    assert [r.id[-4:] for r in store.conversation(CONVERSATION)] == ["0001", "0002", "0004"]
+    assert [r.id[-4:] for r in store.conversation(CONVERSATION, after="uemp:BA:2026:msg-0001", limit=1)] == ["0002"]
+    assert store.conversation(CONVERSATION, after="uemp:BA:2026:msg-0003") == []
+    assert store.conversation("uemp:BA:2026:conv-none") == []
+
+
+def test_store_expires_records(make_store):
+    clock = _Clock()
+    store = make_store(ttl_s=60, clock=clock)
+    store.add(_record(_message(1), received_at=clock.now))
+    clock.now += 30
+    store.add(_record(_message(2), received_at=clock.now))
+    clock.now += 31
+
+    assert store.get("uemp:BA:2026:msg-0001") is None
+    assert [r.id[-4:] for r in store.conversation(CONVERSATION)] == ["0002"]
+    assert store.add(_record(_message(1), received_at=clock.now))
+
+
+def test_memory_store_evicts_least_recently_used_and_cleans_indexes():
+    store = MemoryConversationStore(max_messages=2, clock=_Clock())
+    store.add(_record(_message(1)))
+    store.add(_record(_message(2, reply_to=1)))
+    assert store.get("uemp:BA:2026:msg-0001") is not None
+    store.add(_record(_message(3, conversation=None, reply_to=1)))
+
+    assert len(store) == 2
+    assert store.get("uemp:BA:2026:msg-0002") is None
+    assert store.replies("uemp:BA:2026:msg-0001") == ["uemp:BA:2026:msg-0003"]
+    assert [r.id for r in store.conversation(CONVERSATION)] == ["uemp:BA:2026:msg-0001"]
+    # The reply shares the stored target's ID string.
+    assert store.get("uemp:BA:2026:msg-0003").reply_to is store.get("uemp:BA:2026:msg-0001").id
+
+
+def test_lookup_endpoints():
+    app = create_app(conversation_store=MemoryConversationStore(keep_bodies=True))
+    client = TestClient(app)
+    for message in (_message(1), _message(2, reply_to=1), _message(3)):
+        assert client.post("/api/uemp/messages", content=json.dumps(message), headers=HEADERS).status_code == 200
+    batch = gzip.compress((json.dumps(_message(4, reply_to=3)) + "\n").encode("utf-8"))
+    ndjson = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip", "UEMP-Version": "1.0"}
+    assert json.loads(client.post("/api/uemp/batch", content=batch, headers=ndjson).text)["accepted"]
+
+    response = client.get("/api/uemp/messages/uemp:BA:2026:msg-0001", headers={"UEMP-Version": "1.0"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["replies"] == ["uemp:BA:2026:msg-0002"]
+    assert body["message"] == _message(1)
+    assert body["bytes"] == len(json.dumps(_message(1)))
+
+    page = client.get(f"/api/uemp/conversations/{CONVERSATION}?limit=3", headers={"UEMP-Version": "1.0"}).json()
+    assert [m["id"][-4:] for m in page["messages"]] == ["0001", "0002", "0003"]
+    assert page["next"] == "uemp:BA:2026:msg-0003"
+    rest = client.get(
+        f"/api/uemp/conversations/{CONVERSATION}?after={page['next']}", headers={"UEMP-Version": "1.0"}
+    ).json()
+    assert [m["id"][-4:] for m in rest["messages"]] == ["0004"] and "next" not in rest
+    assert rest["messages"][0]["replyTo"] == "uemp:BA:2026:msg-0003"
+
+
+@pytest.mark.parametrize("blocking", [False, True])
+def test_blocking_stores_index_off_the_event_loop(blocking):
+    class Recording(MemoryConversationStore):
+        def add(self, record):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return super().add(record)
+
+    on_loop: list[bool] = []
+    store = Recording()
+    store.blocking = blocking
+    client = TestClient(create_app(conversation_store=store))
+    assert client.post("/api/uemp/messages", content=json.dumps(_message(1)), headers=HEADERS).status_code == 200
+    ndjson = {"Content-Type": "application/x-ndjson", "UEMP-Version": "1.0"}
+    assert json.loads(client.post("/api/uemp/batch", content=json.dumps(_message(2)), headers=ndjson).text)["accepted"]
+    with client.websocket_connect("/api/uemp/ws", subprotocols=["uemp.v1"], headers={"UEMP-Version": "1.0"}) as ws:
+        ws.send_text(json.dumps(_message(3)))
+        assert json.loads(ws.receive_text())["accepted"]
+
+    assert on_loop == [not blocking] * 3
+
+
+@pytest.mark.parametrize(
+    "path, status, code",
+    [
+        ("/api/uemp/messages/uemp:BA:2026:msg-9999", 404, "protocol-unknown-message"),
+        ("/api/uemp/conversations/uemp:BA:2026:conv-9999", 404, "protocol-unknown-conversation"),
+        ("/api/uemp/messages/msg-1", 400, "protocol-malformed"),
+        (f"/api/uemp/conversations/{CONVERSATION}?limit=0", 400, "protocol-malformed"),
+    ],
+)
+def test_lookup_errors(path: str, status: int, code: str):
+    client = TestClient(create_app())
+    assert client.post("/api/uemp/messages", content=json.dumps(_message(1)), headers=HEADERS).status_code == 200
+
+    response = client.get(path, headers={"UEMP-Version": "1.0"})
+
+    assert response.status_code == status
+    assert response.json()["code"] == code
+    assert client.get("/api/uemp/messages/uemp:BA:2026:msg-0001").status_code == 400
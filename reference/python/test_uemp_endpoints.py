@@ -4,11 +4,15 @@ Tests for UEMP endpoints and strict token/media enforcement.
 
 from __future__ import annotations
 
+import asyncio
 import json
 
+import pytest
 from fastapi.testclient import TestClient
 
-from uemp_api import app
+from uemp_api import app, create_app
+from uemp_idempotency import MemoryIdempotencyStore
+from uemp_limits import UEMPLimits
 
 
 client = TestClient(app)
@@ -33,6 +37,14 @@ def _valid_uemp_message() -> dict:
     }
 
 
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
 def _uemp_headers(**overrides: str) -> dict[str, str]:
     headers = {
         "Content-Type": "application/vnd.uemp+json",
@@ -61,6 +73,44 @@ class TestUEMPDiscovery:
         assert body["protocol"] == "uemp/1.0"
         assert body["paths"]["discovery"] == "/.well-known/uemp"
 
+    def test_discovery_and_capabilities_serve_one_document(self):
+        discovery = client.get("/.well-known/uemp")
+        capabilities = client.get("/api/uemp/capabilities")
+
+        assert discovery.content == capabilities.content
+        assert discovery.headers["ETag"] == capabilities.headers["ETag"]
+        assert "max-age" in discovery.headers["Cache-Control"]
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = client.get("/.well-known/uemp").headers["ETag"]
+
+        response = client.get("/api/uemp/capabilities", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    def test_capabilities_list_loaded_profiles(self):
+        body = client.get("/.well-known/uemp").json()
+
+        assert body["uemp"]["versions"] == ["1.0"]
+        assert "IATA-NDC/21.3" in body["uemp"]["nativeProtocols"]
+        peppol = next(p for p in body["profiles"] if p["id"] == "peppol-bis-billing/3.0")
+        assert peppol["validators"] == ["xsd", "schematron"]
+        assert peppol["fidelity"] == "semantic"
+
+    def test_capabilities_include_configured_intents(self, tmp_path):
+        app_with_intents = create_app(
+            profiles_dir=tmp_path,
+            intents={"invoicing": ["credit-note", "create-invoice"]},
+        )
+
+        body = TestClient(app_with_intents).get("/.well-known/uemp").json()
+
+        assert body["uemp"]["domains"] == ["invoicing"]
+        assert body["uemp"]["intents"] == {"invoicing": ["create-invoice", "credit-note"]}
+        assert body["uemp"]["nativeProtocols"] == []
+
 
 class TestUEMPMessageValidation:
     def test_accepts_valid_uemp_message(self):
@@ -197,3 +247,317 @@ class TestUEMPMessageValidation:
         assert response.status_code == 400
         body = response.json()
         assert body["code"] == "protocol-unknown-token-family"
+
+
+def _ndjson(*messages: dict) -> bytes:
+    return b"".join(json.dumps(m).encode("utf-8") + b"\n" for m in messages)
+
+
+def _batch_headers(**overrides: str) -> dict[str, str]:
+    headers = {
+        "Content-Type": "application/x-ndjson",
+        "UEMP-Version": "1.0",
+    }
+    headers.update(overrides)
+    return headers
+
+
+class TestUEMPBatch:
+    def test_streams_one_result_per_line(self):
+        good = _valid_uemp_message()
+        bad = _valid_uemp_message()
+        bad["meta"]["id"] = "not-a-uemp-id"
+
+        response = client.post(
+            "/api/uemp/batch",
+            content=_ndjson(good, bad) + b"{not json}\n",
+            headers=_batch_headers(),
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert results[0]["accepted"] is True
+        assert results[0]["id"] == good["meta"]["id"]
+        assert results[1]["error"]["code"] == "protocol-invalid-message-id"
+        assert results[2]["error"]["code"] == "protocol-invalid-json"
+
+    def test_accepts_gzipped_batch_without_trailing_newline(self):
+        import gzip
+
+        body = _ndjson(*[_valid_uemp_message() for _ in range(50)]).rstrip(b"\n")
+        response = client.post(
+            "/api/uemp/batch",
+            content=gzip.compress(body),
+            headers=_batch_headers(**{"Content-Encoding": "gzip"}),
+        )
+
+        assert response.status_code == 200
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert len(results) == 50
+        assert all(r["accepted"] for r in results)
+
+    def test_applies_version_header_to_every_line(self):
+        response = client.post(
+            "/api/uemp/batch",
+            content=_ndjson(_valid_uemp_message()),
+            headers=_batch_headers(**{"UEMP-Version": "2.0"}),
+        )
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert results[0]["error"]["code"] == "protocol-header-mismatch"
+
+    def test_rejects_non_ndjson_media_type(self):
+        response = client.post(
+            "/api/uemp/batch",
+            content=_ndjson(_valid_uemp_message()),
+            headers=_batch_headers(**{"Content-Type": "application/json"}),
+        )
+
+        assert response.status_code == 415
+        assert response.json()["code"] == "protocol-unsupported-media-type"
+
+
+class TestUEMPEnvelopeModes:
+    strict_client = TestClient(create_app(envelope_mode="strict"))
+
+    def test_fast_mode_returns_the_response_model_shape(self):
+        payload = _valid_uemp_message()
+        payload["meta"]["extension"] = {"x": 1}
+
+        fast = client.post("/api/uemp/messages", content=json.dumps(payload), headers=_uemp_headers())
+        strict = self.strict_client.post("/api/uemp/messages", content=json.dumps(payload), headers=_uemp_headers())
+
+        assert fast.status_code == strict.status_code == 200
+        assert fast.json() == strict.json() == {
+            "accepted": True,
+            "message": {
+                "meta": {
+                    "protocol": "uemp/1.0",
+                    "id": "uemp:BA:2026:ord-8f3a2e",
+                    "intent": "create-order",
+                    "conversationId": "uemp:BA:2026:conv-1234",
+                },
+                "data": {"order": {"id": "ORD-123"}},
+                "context": {"note": "test-message"},
+                "signatures": None,
+            },
+            "validation": {"protocol": "ok", "id": "ok"},
+        }
+
+    def test_strict_mode_returns_normalized_message(self):
+        payload = _valid_uemp_message()
+        payload["meta"]["extension"] = {"x": 1}
+
+        response = self.strict_client.post(
+            "/api/uemp/messages",
+            data=json.dumps(payload),
+            headers=_uemp_headers(),
+        )
+
+        assert response.status_code == 200
+        message = response.json()["message"]
+        assert "extension" not in message["meta"]
+        assert message["signatures"] is None
+
+    def test_rejects_envelope_without_data(self):
+        payload = _valid_uemp_message()
+        del payload["data"]
+
+        for test_client in (client, self.strict_client):
+            response = test_client.post(
+                "/api/uemp/messages",
+                data=json.dumps(payload),
+                headers=_uemp_headers(),
+            )
+
+            assert response.status_code == 422
+            assert response.json()["code"] == "protocol-invalid-envelope"
+
+
+class TestUEMPResponseModes:
+    echo_client = TestClient(create_app(response_mode="echo"))
+
+    def test_echo_mode_splices_original_body_bytes(self):
+        body = json.dumps(_valid_uemp_message(), indent=3).encode("utf-8")
+
+        response = self.echo_client.post("/api/uemp/messages", content=body, headers=_uemp_headers())
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/vnd.uemp+json")
+        assert body in response.content
+        assert int(response.headers["content-length"]) == len(response.content)
+        result = response.json()
+        assert result["accepted"] is True
+        assert result["message"] == _valid_uemp_message()
+
+    def test_prefer_return_minimal_returns_summary_with_body_hash(self):
+        import hashlib
+
+        body = json.dumps(_valid_uemp_message()).encode("utf-8")
+
+        response = client.post(
+            "/api/uemp/messages",
+            content=body,
+            headers=_uemp_headers(Prefer="return=minimal"),
+        )
+
+        assert response.status_code == 200
+        assert response.headers["Preference-Applied"] == "uemp-response=summary"
+        result = response.json()
+        assert "message" not in result
+        assert result["meta"]["id"] == "uemp:BA:2026:ord-8f3a2e"
+        assert result["body"] == {"sha256": hashlib.sha256(body).hexdigest(), "bytes": len(body)}
+
+    def test_prefer_selects_echo_per_request(self):
+        body = json.dumps(_valid_uemp_message()).encode("utf-8")
+
+        response = client.post(
+            "/api/uemp/messages",
+            content=body,
+            headers=_uemp_headers(Prefer="uemp-response=echo"),
+        )
+
+        assert response.status_code == 200
+        assert response.headers["Preference-Applied"] == "uemp-response=echo"
+        assert response.content.endswith(body + b"}")
+
+
+class TestUEMPIdempotency:
+    def _client(self) -> TestClient:
+        return TestClient(create_app())
+
+    def test_replays_stored_response_for_same_payload(self):
+        idem_client = self._client()
+        body = json.dumps(_valid_uemp_message())
+        headers = _uemp_headers(**{"UEMP-Idempotency-Key": "AG-2026-order-8f3a-v1"})
+
+        first = idem_client.post("/api/uemp/messages", data=body, headers=headers)
+        second = idem_client.post("/api/uemp/messages", data=body, headers=headers)
+
+        assert first.status_code == second.status_code == 200
+        assert "UEMP-Idempotent-Replay" not in first.headers
+        assert second.headers["UEMP-Idempotent-Replay"] == "true"
+        assert second.content == first.content
+        assert second.headers["UEMP-Message-Id"] == first.headers["UEMP-Message-Id"]
+
+    def test_rejects_different_payload_with_same_key(self):
+        idem_client = self._client()
+        headers = _uemp_headers(**{"UEMP-Idempotency-Key": "AG-2026-order-8f3a-v1"})
+        changed = _valid_uemp_message()
+        changed["data"]["order"]["id"] = "ORD-999"
+
+        idem_client.post("/api/uemp/messages", data=json.dumps(_valid_uemp_message()), headers=headers)
+        response = idem_client.post("/api/uemp/messages", data=json.dumps(changed), headers=headers)
+
+        assert response.status_code == 409
+        assert response.json()["code"] == "business-duplicate-request"
+
+    def test_uses_meta_idempotency_key(self):
+        idem_client = self._client()
+        payload = _valid_uemp_message()
+        payload["meta"]["idempotencyKey"] = "AG-2026-order-8f3a-attempt-1"
+
+        idem_client.post("/api/uemp/messages", data=json.dumps(payload), headers=_uemp_headers())
+        response = idem_client.post("/api/uemp/messages", data=json.dumps(payload), headers=_uemp_headers())
+
+        assert response.headers["UEMP-Idempotent-Replay"] == "true"
+
+    def test_keys_are_scoped_to_the_sending_party(self):
+        idem_client = self._client()
+        key = {"UEMP-Idempotency-Key": "AG-2026-order-8f3a-v3"}
+        other = _valid_uemp_message()
+        other["meta"]["id"] = "uemp:XY:2026:ord-8f3a2e"
+
+        idem_client.post("/api/uemp/messages", content=json.dumps(_valid_uemp_message()), headers=_uemp_headers(**key))
+        response = idem_client.post(
+            "/api/uemp/messages",
+            content=json.dumps(other),
+            headers=_uemp_headers(**key, **{"UEMP-Message-Id": "uemp:XY:2026:ord-8f3a2e"}),
+        )
+
+        assert response.status_code == 200
+        assert "UEMP-Idempotent-Replay" not in response.headers
+        assert response.json()["message"]["meta"]["id"] == "uemp:XY:2026:ord-8f3a2e"
+
+    @pytest.mark.parametrize("blocking", [False, True])
+    def test_blocking_stores_run_off_the_event_loop(self, blocking):
+        class Recording(MemoryIdempotencyStore):
+            def get(self, key):
+                on_loop.append(_on_event_loop())
+                return super().get(key)
+
+            def put(self, key, response):
+                on_loop.append(_on_event_loop())
+                return super().put(key, response)
+
+        on_loop: list[bool] = []
+        store = Recording()
+        store.blocking = blocking
+        idem_client = TestClient(create_app(idempotency_store=store))
+        body = json.dumps(_valid_uemp_message())
+        headers = _uemp_headers(**{"UEMP-Idempotency-Key": "AG-2026-order-8f3a-v4"})
+
+        idem_client.post("/api/uemp/messages", content=body, headers=headers)
+        replayed = idem_client.post("/api/uemp/messages", content=body, headers=headers)
+
+        assert replayed.headers["UEMP-Idempotent-Replay"] == "true"
+        # get and put for the first request, get for the replay.
+        assert on_loop == [not blocking] * 3
+
+    def test_does_not_store_rejected_messages(self):
+        idem_client = self._client()
+        body = json.dumps(_valid_uemp_message())
+        key = {"UEMP-Idempotency-Key": "AG-2026-order-8f3a-v2"}
+
+        rejected = idem_client.post("/api/uemp/messages", data=body, headers=_uemp_headers(**key, **{"UEMP-Version": "2.0"}))
+        accepted = idem_client.post("/api/uemp/messages", data=body, headers=_uemp_headers(**key))
+
+        assert rejected.status_code == 400
+        assert accepted.status_code == 200
+        assert "UEMP-Idempotent-Replay" not in accepted.headers
+
+
+class TestUEMPLimits:
+    def test_rejects_oversized_message_with_413(self):
+        small_client = TestClient(create_app(limits=UEMPLimits(max_message_bytes=1024)))
+        payload = _valid_uemp_message()
+        payload["data"]["order"]["lines"] = [{"id": f"L{i}"} for i in range(200)]
+
+        response = small_client.post("/api/uemp/messages", data=json.dumps(payload), headers=_uemp_headers())
+
+        assert response.status_code == 413
+        assert response.json()["code"] == "protocol-message-too-large"
+
+    def test_rejects_deeply_nested_message(self):
+        payload = _valid_uemp_message()
+        payload["data"]["order"]["nested"] = json.loads("[" * 50 + "]" * 50)
+
+        response = client.post("/api/uemp/messages", data=json.dumps(payload), headers=_uemp_headers())
+
+        assert response.status_code == 413
+        assert response.json()["code"] == "protocol-message-too-large"
+
+    def test_reports_oversized_batch_line_and_continues(self):
+        small_client = TestClient(create_app(limits=UEMPLimits(max_message_bytes=1024)))
+        big = _valid_uemp_message()
+        big["context"]["note"] = "x" * 2048
+
+        response = small_client.post(
+            "/api/uemp/batch",
+            content=_ndjson(_valid_uemp_message(), big, _valid_uemp_message()),
+            headers=_batch_headers(),
+        )
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["accepted"] for r in results] == [True, False, True]
+        assert results[1]["status"] == 413
+        assert results[1]["error"]["code"] == "protocol-message-too-large"
+
+    def test_capabilities_advertise_configured_message_size(self):
+        small_client = TestClient(create_app(limits=UEMPLimits(max_message_bytes=256 * 1024)))
+
+        response = small_client.get("/.well-known/uemp")
+
+        assert response.json()["uemp"]["capabilities"]["maxMessageSize"] == "256KB"
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+
+from uemp_envelope import EnvelopeError, validate_envelope
+
+
+def _message() -> dict:
+    return {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": "uemp:BA:2026:ord-8f3a2e",
+            "intent": "create-order",
+            "conversationId": "uemp:BA:2026:conv-1234",
+        },
+        "data": {"order": {"id": "ORD-123"}},
+    }
+
+
+def _broken(path: tuple[str, ...], value: object) -> dict:
+    message = _message()
+    target = message
+    for key in path[:-1]:
+        target = target[key]
+    if value is KeyError:
+        del target[path[-1]]
+    else:
+        target[path[-1]] = value
+    return message
+
+
+@pytest.mark.parametrize("mode", ["fast", "strict"])
+def test_accepts_valid_envelope(mode: str) -> None:
+    envelope = validate_envelope(_message(), header_version="1.0", mode=mode)
+    assert envelope.meta.version == "1.0"
+    assert envelope.meta.id == "uemp:BA:2026:ord-8f3a2e"
+    assert envelope.meta.conversation_id == "uemp:BA:2026:conv-1234"
+    assert (envelope.message is not None) == (mode == "strict")
+
+
+@pytest.mark.parametrize(
+    ("payload", "headers", "code"),
+    [
+        ([], {}, "protocol-invalid-envelope"),
+        (_broken(("meta",), KeyError), {}, "protocol-invalid-envelope"),
+        (_broken(("meta", "id"), 7), {}, "protocol-invalid-envelope"),
+        (_broken(("meta", "intent"), ""), {}, "protocol-invalid-envelope"),
+        (_broken(("data",), []), {}, "protocol-invalid-envelope"),
+        (_broken(("meta", "protocol"), "aip/1.0"), {}, "protocol-unknown-token-family"),
+        (_broken(("meta", "protocol"), "uemp/1"), {}, "protocol-invalid-version"),
+        (_broken(("meta", "id"), "uemp:ba:2026:x"), {}, "protocol-invalid-message-id"),
+        (_message(), {"header_version": "2.0"}, "protocol-header-mismatch"),
+        (_message(), {"header_intent": "cancel-order"}, "protocol-header-mismatch"),
+        (_message(), {"header_message_id": "uemp:BA:2026:other"}, "protocol-header-mismatch"),
+    ],
+)
+def test_fast_and_strict_modes_agree_on_rejections(payload: object, headers: dict, code: str) -> None:
+    checks = {"header_version": "1.0", **headers}
+    codes = []
+    for mode in ("fast", "strict"):
+        with pytest.raises(EnvelopeError) as exc_info:
+            validate_envelope(payload, mode=mode, **checks)
+        codes.append(exc_info.value.code)
+    assert codes == [code, code]
+
+
+def test_fast_mode_reports_error_locations() -> None:
+    with pytest.raises(EnvelopeError) as exc_info:
+        validate_envelope(_broken(("meta", "id"), KeyError), header_version="1.0")
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.errors == [{"type": "missing", "loc": ["meta", "id"], "msg": "Field required"}]
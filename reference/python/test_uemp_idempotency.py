@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from uemp_idempotency import (
+    MemoryIdempotencyStore,
+    SQLiteIdempotencyStore,
+    StoredResponse,
+    TieredIdempotencyStore,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _entry(payload_hash: str = "h1", stored_at: float = 1000.0) -> StoredResponse:
+    return StoredResponse(
+        payload_hash=payload_hash,
+        status_code=200,
+        headers=(("content-type", "application/vnd.uemp+json"),),
+        body=b'{"accepted":true}',
+        stored_at=stored_at,
+    )
+
+
+def test_memory_store_expires_entries_after_ttl() -> None:
+    clock = _Clock()
+    store = MemoryIdempotencyStore(ttl_s=60, clock=clock)
+    store.put("k", _entry())
+
+    clock.now += 59
+    assert store.get("k") is not None
+    clock.now += 1
+    assert store.get("k") is None
+
+
+def test_memory_store_evicts_least_recently_used() -> None:
+    store = MemoryIdempotencyStore(max_entries=2, clock=_Clock())
+    store.put("a", _entry())
+    store.put("b", _entry())
+    store.get("a")
+    store.put("c", _entry())
+
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert len(store) == 2
+
+
+def test_memory_store_is_bounded_in_bytes() -> None:
+    store = MemoryIdempotencyStore(max_bytes=200, clock=_Clock())
+    for key in ("a", "b", "c", "d"):
+        store.put(key, _entry())
+    store.put("huge", StoredResponse("h1", 200, (), b"x" * 500, 1000.0))
+
+    assert [key for key in "abcd" if store.get(key)] == ["b", "c", "d"]
+    assert store.get("huge") is None
+    assert store.total_bytes <= 200
+
+
+def test_first_writer_wins() -> None:
+    store = MemoryIdempotencyStore(clock=_Clock())
+    store.put("k", _entry("h1"))
+
+    assert store.put("k", _entry("h2")).payload_hash == "h1"
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path: Path) -> None:
+    clock = _Clock()
+    db = tmp_path / "idempotency.sqlite"
+    worker_a = SQLiteIdempotencyStore(db, ttl_s=60, clock=clock)
+    worker_b = SQLiteIdempotencyStore(db, ttl_s=60, clock=clock)
+
+    worker_a.put("k", _entry("h1"))
+    assert worker_b.put("k", _entry("h2")).payload_hash == "h1"
+    assert worker_b.get("k") == _entry("h1")
+
+    clock.now += 60
+    assert worker_a.get("k") is None
+    assert worker_b.put("k", _entry("h2", stored_at=clock.now)).payload_hash == "h2"
+
+
+def test_tiered_store_promotes_backing_hits(tmp_path: Path) -> None:
+    clock = _Clock()
+    backing = SQLiteIdempotencyStore(tmp_path / "idempotency.sqlite", clock=clock)
+    backing.put("k", _entry())
+    tiered = TieredIdempotencyStore(MemoryIdempotencyStore(clock=clock), backing)
+
+    assert tiered.get("k") == _entry()
+    assert tiered.memory.get("k") == _entry()
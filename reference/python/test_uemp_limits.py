@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from uemp_limits import JSONLimitScanner, LimitExceeded, UEMPLimits, check_limits, read_limited_body
+
+LIMITS = UEMPLimits(max_message_bytes=4096, max_string_bytes=32, max_array_items=5, max_depth=4, max_field_name_length=8)
+
+
+def _feed(data: bytes, chunk_size: int) -> None:
+    scanner = JSONLimitScanner(LIMITS)
+    for i in range(0, len(data), chunk_size):
+        scanner.feed(data[i : i + chunk_size])
+
+
+@pytest.mark.parametrize(
+    ("document", "code"),
+    [
+        ({"a": [[[[1]]]]}, "protocol-message-too-large"),
+        ({"a": list(range(6))}, "protocol-field-too-large"),
+        ({"a": "x" * 33}, "protocol-field-too-large"),
+        ({"k" * 9: 1}, "protocol-field-too-large"),
+        ({"a": "q" * 20 + '"' * 8}, "protocol-field-too-large"),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 4096])
+def test_rejects_documents_over_limits(document, code, chunk_size):
+    with pytest.raises(LimitExceeded) as exc_info:
+        _feed(json.dumps(document).encode(), chunk_size)
+    assert exc_info.value.status_code == 413
+    assert exc_info.value.code == code
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {"a": [[[1]]], "b": list(range(5))},
+        {"k" * 8: "x" * 30},
+        {"a": ["[{,]}" * 5, "k" * 9]},
+        {"a": 'say \\"hi\\"', "b": {"c": "]]]]"}},
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_accepts_documents_within_limits(document, chunk_size):
+    _feed(json.dumps(document).encode(), chunk_size)
+
+
+def test_counts_items_per_array():
+    check_limits(json.dumps({"a": list(range(5)), "b": [list(range(5))] * 4}).encode(), LIMITS)
+
+
+def test_rejects_total_size():
+    with pytest.raises(LimitExceeded) as exc_info:
+        check_limits(b" " * 4097, LIMITS)
+    assert exc_info.value.code == "protocol-message-too-large"
+
+
+def test_read_limited_body_rejects_declared_length_before_reading():
+    async def chunks():
+        raise AssertionError("body should not be read")
+        yield b""
+
+    with pytest.raises(LimitExceeded):
+        asyncio.run(read_limited_body(chunks(), LIMITS, content_length="5000"))
+
+
+def test_read_limited_body_returns_body():
+    async def chunks():
+        yield b'{"a": '
+        yield b'"b"}'
+
+    assert asyncio.run(read_limited_body(chunks(), LIMITS)) == b'{"a": "b"}'
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_links import FileFetcher, HTTPFetcher, LinkCache, LinkError, LinkResolver, StubFetcher
+
+URL = "https://storage.example.com/inv-001/items.ndjson"
+
+
+def _collection(n: int) -> bytes:
+    return b"".join(json.dumps({"line": i, "amount": "9.99"}).encode() + b"\n" for i in range(n))
+
+
+def _link(body: bytes, count: int, url: str = URL) -> dict:
+    checksum = "sha256:" + hashlib.sha256(body).hexdigest()
+    return {"$link": url, "$type": "external-collection", "$count": count, "$checksum": checksum}
+
+
+def test_verified_collections_are_cached_by_checksum(tmp_path):
+    body = _collection(100)
+    fetcher = StubFetcher({URL: body}, chunk_bytes=100)
+    resolver = LinkResolver({"https": fetcher}, cache=LinkCache(tmp_path))
+
+    async def scenario():
+        # Concurrent references share one fetch; later ones are served from disk.
+        first, second = await asyncio.gather(resolver.resolve(_link(body, 100)), resolver.resolve(_link(body, 100)))
+        third = await resolver.resolve(_link(body, 100, url="https://storage.example.com/copy.ndjson"))
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert fetcher.fetches == {URL: 1}
+    assert (first.count, first.size, first.cached, third.cached) == (100, len(body), False, True)
+    assert second.path == third.path == tmp_path / f"{hashlib.sha256(body).hexdigest()}.ndjson"
+    assert next(third.items()) == {"line": 0, "amount": "9.99"}
+
+
+def test_cancelled_caller_does_not_cancel_a_shared_fetch(tmp_path):
+    body = _collection(10)
+    release = asyncio.Event()
+
+    class Slow:
+        fetches = 0
+
+        async def fetch(self, url):
+            Slow.fetches += 1
+            await release.wait()
+            yield body
+
+    resolver = LinkResolver({"https": Slow()}, cache=LinkCache(tmp_path))
+
+    async def scenario():
+        first = asyncio.create_task(resolver.resolve(_link(body, 10)))
+        second = asyncio.create_task(resolver.resolve(_link(body, 10)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()).count == 10
+    assert Slow.fetches == 1
+    assert asyncio.run(resolver.resolve(_link(body, 10))).cached
+
+
+def test_mismatches_are_rejected_and_not_cached(tmp_path):
+    body = _collection(50)
+    cache = LinkCache(tmp_path)
+    invalid = b'{"line": 0}\n{not json\n'
+    invalid_url = "https://storage.example.com/invalid.ndjson"
+    bodies = {URL: body, invalid_url: invalid}
+    resolver = LinkResolver({"https": StubFetcher(bodies, chunk_bytes=64)}, cache=cache)
+
+    def failure(link: dict) -> LinkError:
+        with pytest.raises(LinkError) as exc:
+            asyncio.run(resolver.resolve(link))
+        return exc.value
+
+    assert failure(_link(body, 49)).code == "protocol-link-count-mismatch"
+    assert failure(_link(body, 51)).code == "protocol-link-count-mismatch"
+    assert failure({**_link(body, 50), "$checksum": "sha256:" + "0" * 64}).code == "protocol-link-checksum-mismatch"
+    assert failure(_link(invalid, 2, url=invalid_url)).code == "protocol-link-invalid-item"
+    assert failure({**_link(body, 50), "$link": "ftp://storage.example.com/x"}).code == "protocol-link-refused"
+    assert len(cache) == 0 and list(tmp_path.iterdir()) == []
+
+
+def test_count_overflow_stops_the_download():
+    chunks = []
+
+    class Endless:
+        async def fetch(self, url):
+            for i in range(1000):
+                chunks.append(i)
+                yield b'{"line": 1}\n' * 10
+
+    resolver = LinkResolver({"https": Endless()})
+    with pytest.raises(LinkError, match="more than 11 items"):
+        asyncio.run(resolver.resolve({"$link": URL, "$type": "external-collection", "$count": 10}))
+
+    assert chunks == [0, 1]
+
+
+def test_file_fetcher_stays_under_its_root(tmp_path):
+    (tmp_path / "items.ndjson").write_bytes(_collection(3))
+    resolver = LinkResolver({"file": FileFetcher(tmp_path)})
+
+    resolved = asyncio.run(resolver.resolve({"$link": (tmp_path / "items.ndjson").as_uri(), "$count": 3}))
+    assert resolved.count == 3 and resolved.path is None
+
+    for url in (
+        "file:///etc/passwd",
+        f"file://{tmp_path}/../outside.ndjson",
+        f"file://example.com{tmp_path}/items.ndjson",
+    ):
+        with pytest.raises(LinkError) as exc:
+            asyncio.run(resolver.resolve({"$link": url}))
+        assert exc.value.code == "protocol-link-refused"
+
+
+def test_http_fetcher_only_fetches_allowlisted_origins():
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        if request.url.path == "/moved":
+            return httpx.Response(302, headers={"Location": "http://169.254.169.254/latest"})
+        return httpx.Response(200, content=_collection(2))
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    fetcher = HTTPFetcher(["https://storage.example.com:443"], client=client)
+    resolver = LinkResolver({"https": fetcher, "http": fetcher})
+
+    assert asyncio.run(resolver.resolve({"$link": URL, "$count": 2})).count == 2
+    codes = []
+    for url in ("http://storage.example.com/items", "https://internal:8443/items", "https://storage.example.com/moved"):
+        with pytest.raises(LinkError) as exc:
+            asyncio.run(resolver.resolve({"$link": url}))
+        codes.append(exc.value.code)
+
+    assert codes == ["protocol-link-refused", "protocol-link-refused", "system-link-unavailable"]
+    assert requested == [URL, "https://storage.example.com/moved"]
+
+
+def test_cache_evicts_least_recently_used_and_survives_restarts(tmp_path):
+    cache = LinkCache(tmp_path, max_bytes=250)
+    for n, name in enumerate("abc"):
+        part = cache.temporary()
+        part.write(b"x" * 100)
+        cache.commit(part, name * 64, 100, 1)
+        os.utime(cache.path_for(name * 64), (n, n))
+        if name == "b":
+            cache.get("a" * 64)  # "a" is now more recent than "b".
+
+    assert sorted(p.name[0] for p in tmp_path.iterdir()) == ["a", "c"]
+    reopened = LinkCache(tmp_path, max_bytes=150)
+    # A restart keeps the most recently used file: "a" was read after "c" was written.
+    assert len(reopened) == 1 and reopened.get("a" * 64)[1:] == (100, 1)
+
+
+def test_messages_endpoint_verifies_links_when_configured(tmp_path):
+    body = _collection(20)
+    resolver = LinkResolver({"https": StubFetcher({URL: body})}, cache=LinkCache(tmp_path))
+    headers = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+
+    def post(app, link: dict):
+        message = {
+            "meta": {"protocol": "uemp/1.0", "id": "uemp:BA:2026:inv-001", "intent": "create-invoice"},
+            "data": {"invoice": {"id": "INV-1", "lineItems": link}},
+        }
+        return TestClient(app).post("/api/uemp/messages", content=json.dumps(message), headers=headers)
+
+    app = create_app(link_resolver=resolver)
+    assert post(app, _link(body, 20)).status_code == 200
+    rejected = post(app, _link(body, 21))
+    assert rejected.status_code == 400 and rejected.json()["code"] == "protocol-link-count-mismatch"
+    assert post(create_app(), _link(body, 21)).status_code == 200
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from uemp_api import create_app
+from uemp_limits import UEMPLimits
+from uemp_loadtest import (
+    LoadRequest,
+    asgi_sender,
+    compare_to_baseline,
+    http_sender,
+    make_corpus,
+    make_envelope,
+    percentile,
+    prime,
+    run_closed_loop,
+    run_open_loop,
+    write_corpus,
+)
+
+
+def test_envelopes_have_the_requested_size():
+    limit = UEMPLimits().max_message_bytes
+    for size in (512, 4096, limit):
+        body = make_envelope(7, size)
+        assert len(body) == size
+        assert json.loads(body)["meta"]["id"] == "uemp:LT:2026:msg-7"
+    assert len(make_envelope(1, 10)) > 10
+
+
+def test_reference_app_answers_the_corpus_as_expected(tmp_path):
+    corpus = make_corpus(sizes=(512, UEMPLimits().max_message_bytes), batch_lines=5)
+    send = asgi_sender(create_app())
+
+    assert asyncio.run(prime(send, corpus)) == []
+    assert {item.endpoint for item in corpus} == {"messages", "batch", "message", "conversation"}
+    manifest = json.loads(write_corpus(corpus, tmp_path).read_text())
+    assert (tmp_path / manifest[0]["body"]).read_bytes() == corpus[0].body
+
+
+def test_closed_loop_summarizes_per_endpoint_and_case():
+    app = create_app()
+    corpus = make_corpus(sizes=(512,), batch_lines=0)
+    send = asgi_sender(app)
+    asyncio.run(prime(send, corpus))
+
+    result = asyncio.run(run_closed_loop(send, corpus, concurrency=4, requests=len(corpus) * 3))
+
+    summary = result.summary()
+    assert result.requests == len(corpus) * 3 and not result.unexpected
+    assert summary["message"]["requests"] == 6 and summary["conversation"]["requests"] == 3
+    assert summary["messages"]["p50_ms"] <= summary["messages"]["p99_ms"] <= summary["messages"]["max_ms"]
+    assert set(result.summary("case")) == {item.name for item in corpus}
+
+
+def test_open_loop_measures_from_the_scheduled_time():
+    item = LoadRequest("slow", "messages", "POST", "/", (), b"", 200)
+
+    async def slow(_: LoadRequest) -> int:
+        await asyncio.sleep(0.05)
+        return 500
+
+    result = asyncio.run(run_open_loop(slow, [item], rate=1000, duration_s=0.005, max_outstanding=3))
+
+    # All five arrive within 5 ms, before any answer: two find three outstanding.
+    assert result.requests == 3 and result.dropped == 2
+    assert result.unexpected == {("slow", 500): 3}
+    # Requests sent on time take 50 ms; nothing is measured from when a worker got free.
+    assert min(result.latencies["slow"]) >= 0.05
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 1001)]
+    assert [percentile(values, q) for q in (0.5, 0.99, 0.999, 1.0)] == [500.0, 990.0, 999.0, 1000.0]
+    assert percentile([], 0.5) == 0.0
+
+
+def test_compare_to_baseline_applies_per_metric_thresholds():
+    baseline = {
+        "messages": {"errors": 0, "rps": 1000.0, "p50_ms": 1.0, "p99_ms": 10.0},
+        "batch": {"errors": 0, "rps": 50.0, "p50_ms": 0.01, "p99_ms": 0.02},
+        "message": {"errors": 0, "rps": 10.0},
+    }
+    current = {
+        "messages": {"errors": 1, "rps": 800.0, "p50_ms": 1.1, "p99_ms": 14.0},
+        # Doubled, but by less than min_delta_ms.
+        "batch": {"errors": 0, "rps": 50.0, "p50_ms": 0.02, "p99_ms": 0.04},
+    }
+
+    regressions = compare_to_baseline(baseline, current, {"rps": 0.15, "p50_ms": 0.2, "p99_ms": 0.25})
+
+    assert regressions == [
+        "messages: errors 0 -> 1",
+        "messages: rps 1000.0 -> 800.0 (-20%, limit 15%)",
+        "messages: p99_ms 10.0 -> 14.0 (+40%, limit 25%)",
+        "message: missing from this run",
+    ]
+    assert compare_to_baseline(baseline, current, {"rps": 0.25, "p99_ms": 0.5})[1:] == ["message: missing from this run"]
+
+
+def test_http_sender_only_targets_localhost():
+    client = httpx.AsyncClient()
+    http_sender(client, "http://127.0.0.1:8000")
+    with pytest.raises(ValueError):
+        http_sender(client, "https://uemp.example.com")
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from uemp_mappings import NAMESPACES, CompiledMappings, MappingError, compile_mappings
+from uemp_profiles import DEFAULT_PROFILES_DIR, load_profiles
+
+UBL = "urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"
+CBC = NAMESPACES["cbc"]
+CAC = NAMESPACES["cac"]
+
+INVOICE = f"""<Invoice xmlns="{UBL}" xmlns:cbc="{CBC}" xmlns:cac="{CAC}">
+  <cbc:ID>INV-1</cbc:ID>
+  <cbc:DocumentCurrencyCode listID="ISO4217">EUR</cbc:DocumentCurrencyCode>
+  <cac:InvoiceLine><cbc:ID>1</cbc:ID></cac:InvoiceLine>
+  <cac:InvoiceLine><cbc:ID>2</cbc:ID></cac:InvoiceLine>
+</Invoice>"""
+
+MAPPINGS = [
+    {"uempPath": "$.data.invoice.id", "nativePath": "/*/cbc:ID", "required": True},
+    {"uempPath": "$.data.invoice.currency", "nativePath": "/*/cbc:DocumentCurrencyCode"},
+    {"uempPath": "$.data.invoice.currencyList", "nativePath": "/*/cbc:DocumentCurrencyCode/@listID"},
+    {"uempPath": "$.data.invoice.lines[1].id", "nativePath": "/*/cac:InvoiceLine[2]/cbc:ID"},
+    {"uempPath": "$.data.invoice['due date']", "nativePath": "/*/cbc:DueDate", "direction": "toUemp"},
+]
+
+
+def _invoice() -> ElementTree.Element:
+    return ElementTree.fromstring(INVOICE)
+
+
+def test_maps_native_fields_in_one_pass():
+    result = CompiledMappings(MAPPINGS).to_uemp(_invoice())
+
+    assert result.ok
+    assert result.output == {
+        "data": {
+            "invoice": {
+                "id": "INV-1",
+                "currency": "EUR",
+                "currencyList": "ISO4217",
+                "lines": [None, {"id": "2"}],
+            }
+        }
+    }
+
+
+def test_missing_required_field_is_a_normalized_error():
+    document = _invoice()
+    document.remove(document.find(f"{{{CBC}}}ID"))
+
+    result = CompiledMappings(MAPPINGS).to_uemp(document)
+
+    assert not result.ok
+    assert result.errors == [
+        {
+            "code": "validation-required-field",
+            "severity": "fatal",
+            "field": "$.data.invoice.id",
+            "message": "Required /*/cbc:ID is missing",
+            "stage": "mapping",
+            "nativePath": "/*/cbc:ID",
+        }
+    ]
+
+
+def test_round_trips_through_native():
+    mappings = CompiledMappings(MAPPINGS)
+    data = mappings.to_uemp(_invoice()).output
+
+    native = mappings.from_uemp(data, root_tag=f"{{{UBL}}}Invoice")
+
+    assert native.ok
+    assert mappings.to_uemp(native.output).output == data
+    lines = native.output.findall(f"{{{CAC}}}InvoiceLine")
+    assert len(lines) == 2 and lines[0].find(f"{{{CBC}}}ID") is None
+
+
+def test_bulk_conversion_reports_per_document():
+    mappings = CompiledMappings(MAPPINGS)
+    results = mappings.from_uemp_many(
+        [{"data": {"invoice": {"id": "A"}}}, {"data": {"invoice": {"currency": "EUR"}}}, {"data": {"invoice": {"id": {}}}}],
+        root_tag=f"{{{UBL}}}Invoice",
+    )
+
+    assert [r.ok for r in results] == [True, False, False]
+    assert results[1].errors[0]["code"] == "validation-required-field"
+    assert results[2].errors[0]["code"] == "validation-invalid-format"
+
+
+def test_unprefixed_names_match_any_namespace():
+    mappings = CompiledMappings([{"uempPath": "$.data.order.id", "nativePath": "/*/Order/@OrderID"}])
+    document = ElementTree.fromstring('<RS xmlns="urn:example"><Order OrderID="O-1"/></RS>')
+
+    assert mappings.to_uemp(document).output == {"data": {"order": {"id": "O-1"}}}
+    written = mappings.from_uemp({"data": {"order": {"id": "O-1"}}}, root_tag="{urn:example}RS").output
+    assert written.find("{urn:example}Order").get("OrderID") == "O-1"
+
+
+@pytest.mark.parametrize(
+    "mapping, message",
+    [
+        ({"uempPath": "data.id", "nativePath": "/*/cbc:ID"}, "must start with"),
+        ({"uempPath": "$.id", "nativePath": "//cbc:ID"}, "absolute path"),
+        ({"uempPath": "$.id", "nativePath": "/*/x:ID"}, "unknown namespace prefix"),
+        ({"uempPath": "$.id", "nativePath": "/*/cbc:ID[last()]"}, "unsupported step"),
+        ({"uempPath": "$.id", "nativePath": "/*/*/cbc:ID"}, "cannot be written"),
+    ],
+)
+def test_rejects_unsupported_paths(mapping: dict, message: str):
+    with pytest.raises(MappingError, match=message):
+        CompiledMappings([mapping])
+
+
+def test_rejects_overlapping_targets():
+    with pytest.raises(MappingError, match="inside mapped value"):
+        CompiledMappings(
+            [{"uempPath": "$.data", "nativePath": "/*"}, {"uempPath": "$.data.id", "nativePath": "/*/cbc:ID"}]
+        )
+
+
+def test_example_profiles_compile():
+    compiled = {loaded.profile.id: compile_mappings(loaded) for loaded in load_profiles(DEFAULT_PROFILES_DIR)}
+
+    assert compiled["peppol-bis-billing/3.0"].to_uemp(_invoice()).output == {"data": {"invoice": {"id": "INV-1"}}}
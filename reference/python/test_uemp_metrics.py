@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_metrics import Counter, Histogram, Metrics, StackSampler
+
+HEADERS = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+
+
+def _message(n: int, intent: str = "create-order") -> dict:
+    return {"meta": {"protocol": "uemp/1.0", "id": f"uemp:BA:2026:msg-{n}", "intent": intent}, "data": {}}
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    counter = Counter("uemp_test_total", "Test counter.", ("code",))
+    counter.inc(('say "hi"\\',))
+    counter.inc(('say "hi"\\',), 2)
+    histogram = Histogram("uemp_test_seconds", "Test histogram.", ("stage",), buckets=(0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 2.0):
+        histogram.observe(("read",), value)
+
+    assert counter.render() == [
+        "# HELP uemp_test_total Test counter.",
+        "# TYPE uemp_test_total counter",
+        'uemp_test_total{code="say \\"hi\\"\\\\"} 3',
+    ]
+    assert histogram.render()[2:] == [
+        'uemp_test_seconds_bucket{stage="read",le="0.001"} 2',
+        'uemp_test_seconds_bucket{stage="read",le="0.01"} 3',
+        'uemp_test_seconds_bucket{stage="read",le="+Inf"} 4',
+        'uemp_test_seconds_sum{stage="read"} 2.0065',
+        'uemp_test_seconds_count{stage="read"} 4',
+    ]
+
+
+def test_intent_labels_are_capped():
+    metrics = Metrics(max_intents=2)
+    for intent in ("a", "b", "c", "a", None, ["a"]):
+        metrics.count("messages", 200, "accepted", intent)
+
+    assert metrics.requests.values == {
+        ("messages", 200, "accepted", "a"): 2,
+        ("messages", 200, "accepted", "b"): 1,
+        ("messages", 200, "accepted", "other"): 1,
+        ("messages", 200, "accepted", ""): 2,
+    }
+
+
+def test_metrics_endpoint_counts_outcomes_and_times_stages():
+    app = create_app()
+    client = TestClient(app)
+    keyed = {**HEADERS, "UEMP-Idempotency-Key": "key-1", "UEMP-Message-Id": "uemp:BA:2026:msg-1"}
+    assert client.post("/api/uemp/messages", content=json.dumps(_message(1)), headers=keyed).status_code == 200
+    assert client.post("/api/uemp/messages", content=json.dumps(_message(1)), headers=keyed).status_code == 200
+    assert client.post("/api/uemp/messages", content=b"{", headers=HEADERS).status_code == 400
+    mismatch = {**HEADERS, "UEMP-Intent": "cancel-order"}
+    assert client.post("/api/uemp/messages", content=json.dumps(_message(2)), headers=mismatch).status_code == 400
+    batch = (json.dumps(_message(3)) + "\n{\n").encode("utf-8")
+    client.post("/api/uemp/batch", content=batch, headers={"Content-Type": "application/x-ndjson", "UEMP-Version": "1.0"})
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = set(response.text.splitlines())
+    assert {
+        'uemp_requests_total{endpoint="messages",status="200",outcome="accepted",intent="create-order"} 1',
+        'uemp_requests_total{endpoint="messages",status="200",outcome="replayed",intent=""} 1',
+        'uemp_requests_total{endpoint="messages",status="400",outcome="protocol-invalid-json",intent=""} 1',
+        'uemp_requests_total{endpoint="messages",status="400",outcome="protocol-header-mismatch",intent="create-order"} 1',
+        'uemp_requests_total{endpoint="batch",status="200",outcome="accepted",intent=""} 1',
+        'uemp_requests_total{endpoint="batch",status="400",outcome="protocol-invalid-json",intent=""} 1',
+        'uemp_stage_seconds_count{stage="read"} 4',
+        'uemp_stage_seconds_count{stage="parse"} 2',
+        'uemp_stage_seconds_count{stage="validate"} 1',
+        'uemp_stage_seconds_count{stage="publish"} 1',
+    } <= lines
+    assert TestClient(create_app(metrics=False)).get("/metrics").status_code == 404
+
+
+def test_rate_limited_requests_are_counted():
+    client = TestClient(create_app(rate_limit=1, rate_burst=1))
+    for n in range(2):
+        client.post("/api/uemp/messages", content=json.dumps(_message(n)), headers=HEADERS)
+
+    assert 'uemp_requests_total{endpoint="messages",status="429",outcome="system-rate-limited",intent=""} 1' in (
+        client.get("/metrics").text
+    )
+
+
+def _busy_wait_for_sampler(stop: threading.Event) -> None:
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+def test_stack_sampler_records_the_sampled_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_wait_for_sampler, args=(stop,))
+    worker.start()
+    sampler = StackSampler(worker.ident, interval_s=0.001).start()
+    time.sleep(0.05)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert any(stack.endswith("test_uemp_metrics:_busy_wait_for_sampler") for stack in sampler.samples)
+    assert sampler.collapsed().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_profile_endpoint_is_opt_in():
+    assert TestClient(create_app()).get("/metrics/profile?seconds=0.01").status_code == 404
+    client = TestClient(create_app(profiling=True))
+
+    assert client.get("/metrics/profile?seconds=0.01").status_code == 200
+    assert client.get("/metrics/profile?seconds=120").json()["code"] == "protocol-malformed"
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_profiles import DEFAULT_PROFILES_DIR
+from uemp_registry import ProfileRegistry
+
+
+@pytest.fixture()
+def profiles_dir(tmp_path: Path) -> Path:
+    root = tmp_path / "profiles"
+    for name in ("minimal", "peppol-bis-billing__3.0"):
+        shutil.copytree(DEFAULT_PROFILES_DIR / name, root / name)
+    return root
+
+
+def _edit(path: Path, **changes) -> None:
+    document = json.loads(path.read_text(encoding="utf-8"))
+    document.update(changes)
+    path.write_text(json.dumps(document), encoding="utf-8")
+    # Make the change visible even on filesystems with coarse mtimes.
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_indexes_example_profiles():
+    snapshot = ProfileRegistry(DEFAULT_PROFILES_DIR).snapshot
+
+    assert snapshot.get("iata-ndc/21.3").profile.protocol == "IATA-NDC"
+    assert [p.profile.id for p in snapshot.find("peppol_bis_billing", "3.0")] == ["peppol-bis-billing/3.0"]
+    assert len(snapshot.with_support_level("L0")) == len(snapshot.profiles)
+
+
+def test_artifacts_are_read_once(profiles_dir: Path):
+    loaded = ProfileRegistry(profiles_dir).get("iata-ndc/21.3")
+    chain = loaded.read_artifact("validationChain")
+
+    (profiles_dir / "minimal" / "validation-chain.json").write_text("{}", encoding="utf-8")
+
+    assert loaded.read_artifact("validationChain") is chain
+
+
+def test_artifacts_are_parsed_on_first_use(profiles_dir: Path):
+    (profiles_dir / "minimal" / "fidelity.json").write_text("{broken", encoding="utf-8")
+    registry = ProfileRegistry(profiles_dir)
+    peppol = registry.get("peppol-bis-billing/3.0")
+
+    with pytest.raises(ValueError):
+        registry.get("iata-ndc/21.3").read_artifact("fidelity")
+
+    # A reload parses the changed profile's artifacts only.
+    shutil.copy(DEFAULT_PROFILES_DIR / "minimal" / "fidelity.json", profiles_dir / "minimal" / "fidelity.json")
+    _edit(profiles_dir / "minimal" / "fidelity.json")
+    assert registry.refresh() is True
+    assert registry.get("iata-ndc/21.3")._artifacts.keys() == {"mappings", "validationChain", "fidelity", "edgeCases"}
+    assert registry.get("peppol-bis-billing/3.0") is peppol and peppol._artifacts == {}
+
+
+def test_touching_a_file_keeps_the_snapshot(profiles_dir: Path):
+    registry = ProfileRegistry(profiles_dir)
+    before = registry.snapshot
+
+    path = profiles_dir / "minimal" / "mappings.json"
+    path.write_bytes(path.read_bytes())
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000_000))
+
+    assert registry.refresh() is False
+    assert registry.snapshot is before
+
+
+def test_changed_artifact_swaps_in_a_new_snapshot(profiles_dir: Path):
+    registry = ProfileRegistry(profiles_dir)
+    in_flight = registry.get("iata-ndc/21.3")
+    old_chain = in_flight.read_artifact("validationChain")
+
+    _edit(profiles_dir / "minimal" / "validation-chain.json", stages=[])
+
+    assert registry.refresh() is True
+    assert registry.snapshot.generation == 2
+    assert registry.get("iata-ndc/21.3").read_artifact("validationChain")["stages"] == []
+    assert in_flight.read_artifact("validationChain") is old_chain
+    # Unchanged profiles are carried over with their cached artifacts.
+    assert registry.get("peppol-bis-billing/3.0") is not None
+
+
+def test_broken_profile_keeps_the_last_good_version(profiles_dir: Path):
+    registry = ProfileRegistry(profiles_dir)
+    shutil.rmtree(profiles_dir / "peppol-bis-billing__3.0")
+    (profiles_dir / "minimal" / "profile.json").write_text("{", encoding="utf-8")
+
+    assert registry.refresh() is True
+    assert [p.profile.id for p in registry.profiles] == ["iata-ndc/21.3"]
+    assert list(registry.errors) == [str(profiles_dir / "minimal" / "profile.json")]
+
+
+def test_broken_artifact_keeps_serving_the_last_good_version(profiles_dir: Path):
+    client = TestClient(create_app(profiles_dir=profiles_dir))
+    registry = client.app.state.uemp.registry
+    before = registry.snapshot
+    chain = profiles_dir / "minimal" / "validation-chain.json"
+
+    for broken in ("{broken", '{"stages": {"adapter": "xsd"}}'):
+        chain.write_text(broken, encoding="utf-8")
+        os.utime(chain, ns=(chain.stat().st_atime_ns, chain.stat().st_mtime_ns + 1_000_000_000))
+
+        assert registry.refresh() is False
+        assert registry.snapshot is before
+        assert list(registry.errors) == [str(profiles_dir / "minimal" / "profile.json")]
+        assert client.get("/.well-known/uemp").status_code == 200
+
+
+def test_capabilities_follow_reloads(profiles_dir: Path):
+    with TestClient(create_app(profiles_dir=profiles_dir, profile_reload_interval_s=0.05)) as client:
+        before = client.get("/.well-known/uemp")
+        _edit(profiles_dir / "minimal" / "profile.json", supportLevel="L2")
+
+        deadline = time.monotonic() + 5
+        while client.get("/.well-known/uemp").headers["ETag"] == before.headers["ETag"]:
+            assert time.monotonic() < deadline, "profile change was not picked up"
+            time.sleep(0.05)
+
+        levels = {p["id"]: p["supportLevel"] for p in client.get("/.well-known/uemp").json()["profiles"]}
+        assert levels["iata-ndc/21.3"] == "L2"
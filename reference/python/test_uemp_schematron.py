@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("lxml")
+
+from uemp_api import create_app
+from uemp_schematron import SchematronEngine, SchematronError
+from uemp_xsd import parse_document
+
+XSLT_ID = "peppol/PEPPOL-EN16931-UBL"
+UBL = "urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"
+CBC = "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2"
+
+# What a Schematron compiler emits, reduced to one fatal and one warning assertion.
+SVRL_XSLT = f"""<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:svrl="http://purl.oclc.org/dsdl/svrl" xmlns:ubl="{UBL}" xmlns:cbc="{CBC}">
+  <xsl:template match="/">
+    <svrl:schematron-output>
+      <xsl:for-each select="/ubl:Invoice">
+        <xsl:if test="not(cbc:ID)">
+          <svrl:failed-assert id="BR-02" flag="fatal" location="/Invoice" test="cbc:ID">
+            <svrl:text>An Invoice shall have an Invoice number (BT-1).</svrl:text>
+          </svrl:failed-assert>
+        </xsl:if>
+        <xsl:if test="not(cbc:Note)">
+          <svrl:failed-assert id="PEPPOL-R001" flag="warning" location="/Invoice" test="cbc:Note">
+            <svrl:text>A note is recommended.</svrl:text>
+          </svrl:failed-assert>
+        </xsl:if>
+      </xsl:for-each>
+    </svrl:schematron-output>
+  </xsl:template>
+</xsl:stylesheet>
+"""
+
+VALID = f'<Invoice xmlns="{UBL}" xmlns:cbc="{CBC}"><cbc:ID>INV-1</cbc:ID></Invoice>'
+INVALID = f'<Invoice xmlns="{UBL}" xmlns:cbc="{CBC}"><cbc:Note>n</cbc:Note></Invoice>'
+
+
+@pytest.fixture()
+def schematron_root(tmp_path: Path) -> Path:
+    root = tmp_path / "schematron"
+    (root / "peppol").mkdir(parents=True)
+    (root / f"{XSLT_ID}.xslt").write_text(SVRL_XSLT, encoding="utf-8")
+    return root
+
+
+@pytest.fixture()
+def profiles_dir(tmp_path: Path) -> Path:
+    profile_dir = tmp_path / "profiles" / "peppol"
+    profile_dir.mkdir(parents=True)
+    (profile_dir / "profile.json").write_text(
+        json.dumps(
+            {
+                "id": "peppol-bis-billing/3.0",
+                "protocol": "UBL",
+                "version": "2.1",
+                "title": "Peppol BIS Billing 3.0",
+                "status": "draft",
+                "supportLevel": "L1",
+                "updatedAt": "2026-02-07T00:00:00Z",
+                "artifacts": {"validationChain": "validation-chain.json"},
+            }
+        ),
+        encoding="utf-8",
+    )
+    (profile_dir / "validation-chain.json").write_text(
+        json.dumps(
+            {
+                "profileId": "peppol-bis-billing/3.0",
+                "stages": [
+                    {"adapter": "xsd", "mode": "warning", "config": {"schemaSet": "UBL/2.1"}},
+                    {"adapter": "schematron", "mode": "fatal", "config": {"xsltId": XSLT_ID}},
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    return tmp_path / "profiles"
+
+
+def _client(profiles_dir: Path, schematron_root: Path, tmp_path: Path, **kwargs) -> TestClient:
+    app = create_app(profiles_dir=profiles_dir, xsd_root=tmp_path / "no-xsd", schematron_root=schematron_root, **kwargs)
+    return TestClient(app)
+
+
+def test_pool_never_exceeds_its_size_under_concurrency(schematron_root: Path):
+    engine = SchematronEngine(schematron_root, pool_size=2)
+    document = parse_document(INVALID)
+    results: list[list[str]] = []
+
+    def _run() -> None:
+        for _ in range(20):
+            results.append([issue.id for issue in engine.validate(XSLT_ID, document).issues])
+
+    threads = [threading.Thread(target=_run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 160
+    assert all(ids == ["BR-02"] for ids in results)
+    assert engine.pool(XSLT_ID).created <= 2
+
+
+def test_rejects_assets_outside_the_allowlist(schematron_root: Path):
+    with pytest.raises(SchematronError, match="not allowlisted"):
+        SchematronEngine(schematron_root).pool("peppol/../../etc/passwd")
+
+
+def test_fatal_assertion_fails_the_document(profiles_dir: Path, schematron_root: Path, tmp_path: Path):
+    client = _client(profiles_dir, schematron_root, tmp_path)
+
+    response = client.post("/api/uemp/validate-native", json={"profileId": "peppol-bis-billing/3.0", "xml": INVALID})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["valid"] is False
+    assert [(e["code"], e["nativeCode"], e["severity"]) for e in body["errors"]] == [
+        ("validation-constraint-failed", "BR-02", "fatal")
+    ]
+    xsd_stage, schematron_stage = body["stages"][1:]
+    assert xsd_stage["status"] == "skipped"
+    assert schematron_stage["status"] == "failed"
+    assert schematron_stage["compileMs"] > 0
+    assert schematron_stage["executionMs"] >= 0
+
+
+def test_warning_assertion_keeps_the_document_valid(profiles_dir: Path, schematron_root: Path, tmp_path: Path):
+    client = _client(profiles_dir, schematron_root, tmp_path)
+
+    response = client.post("/api/uemp/validate-native", json={"profileId": "peppol-bis-billing/3.0", "xml": VALID})
+
+    body = response.json()
+    assert body["valid"] is True
+    assert [(e["nativeCode"], e["severity"]) for e in body["errors"]] == [("PEPPOL-R001", "warning")]
+
+
+def test_warm_up_compiles_referenced_assets(profiles_dir: Path, schematron_root: Path, tmp_path: Path):
+    client = _client(profiles_dir, schematron_root, tmp_path, warm_validators_on_start=True)
+
+    warmup = {entry["asset"]: entry for entry in client.app.state.uemp.warmup}
+
+    assert warmup[XSLT_ID]["compileMs"] > 0
+    assert "not installed" in warmup["UBL/2.1"]["error"]
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import copy
+import datetime as dt
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import uemp_api
+from uemp_api import create_app
+from uemp_signatures import SECTIONS, KeyStore, canonicalize, sign, verify_batch, verify_message
+
+cryptography = pytest.importorskip("cryptography")
+
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+SENDER_CERT = "https://pki.agency.example/certs/sender.pem"
+SENDER = {"role": "sender", "id": "BA"}
+GATEWAY = {"role": "gateway", "id": "GW"}
+
+
+def _message() -> dict:
+    return {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": "uemp:BA:2026:ord-8f3a2e",
+            "intent": "create-order",
+            "conversationId": "uemp:BA:2026:conv-1234",
+        },
+        "data": {"order": {"id": "ORD-123", "total": 1250.5, "lines": [{"qty": 2}]}},
+        "context": {"note": "test-message"},
+    }
+
+
+def _certificate(key, *, days: int) -> bytes:
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "sender.example")])
+    now = dt.datetime.now(dt.timezone.utc)
+    not_after = now + dt.timedelta(days=days)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(min(now, not_after) - dt.timedelta(days=1))
+        .not_valid_after(not_after)
+        .sign(key, hashes.SHA256())
+    )
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+def _public_pem(key) -> bytes:
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+@pytest.fixture(scope="module")
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture(scope="module")
+def ec_key():
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+@pytest.fixture()
+def keys_dir(tmp_path: Path, rsa_key, ec_key) -> Path:
+    root = tmp_path / "keys"
+    (root / "pki.agency.example" / "certs").mkdir(parents=True)
+    (root / "pki.agency.example" / "certs" / "sender.pem").write_bytes(_certificate(rsa_key, days=30))
+    (root / "gateway-1.pem").write_bytes(_public_pem(ec_key))
+    return root
+
+
+def _chain(rsa_key, ec_key) -> dict:
+    """A sender signature over meta+data, counter-signed by a gateway over everything."""
+    message = _message()
+    message["signatures"] = [sign(message, rsa_key, signature_id="sig-1", party=SENDER, certificate=SENDER_CERT)]
+    message["signatures"].append(
+        sign(
+            message,
+            ec_key,
+            signature_id="sig-2",
+            party=GATEWAY,
+            algorithm="ES256",
+            scope=SECTIONS,
+            kid="gateway-1",
+            previous="sig-1",
+        )
+    )
+    return message
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ({"b": [1e21, 1e-7, -0.0], "a": 333333333.33333329}, '{"a":333333333.3333333,"b":[1e+21,1e-7,0]}'),
+        ({"€": 1, "\r": 2, "\U0001f600": 3, "דּ": 4}, '{"\\r":2,"€":1,"\U0001f600":3,"דּ":4}'),
+        ([4.5, 0.000001, 1e23, 2**53, " "], '[4.5,0.000001,1e+23,9007199254740992," "]'),
+    ],
+)
+def test_canonicalize_matches_rfc8785(value, expected: str):
+    assert canonicalize(value) == expected.encode("utf-8")
+
+
+def test_counter_signature_chain_verifies(keys_dir: Path, rsa_key, ec_key):
+    report = verify_message(_chain(rsa_key, ec_key), KeyStore(keys_dir))
+
+    assert report.valid
+    assert [result["id"] for result in report.results] == ["sig-2", "sig-1"]
+    assert report.sections_canonicalized == 3
+
+
+def test_shared_scope_is_canonicalized_once(keys_dir: Path, rsa_key):
+    message = _message()
+    message["signatures"] = [
+        sign(message, rsa_key, signature_id=f"sig-{i}", party=SENDER, certificate=SENDER_CERT, detached=i % 2 == 0)
+        for i in range(4)
+    ]
+
+    report = verify_message(message, KeyStore(keys_dir))
+
+    assert report.valid
+    assert report.sections_canonicalized == 2
+
+
+def test_tampering_is_reported_per_signature(keys_dir: Path, rsa_key, ec_key):
+    message = _chain(rsa_key, ec_key)
+    message["context"]["note"] = "changed in transit"
+
+    report = verify_message(message, KeyStore(keys_dir))
+
+    assert not report.valid
+    assert [result["valid"] for result in report.results] == [False, True]
+    assert report.errors()[0]["code"] == "protocol-signature-invalid"
+    assert report.errors()[0]["field"] == "signatures[1]"
+
+    message["data"]["order"]["total"] = 1
+    assert not any(result["valid"] for result in verify_message(message, KeyStore(keys_dir)).results)
+
+
+def test_replacing_the_previous_signature_breaks_the_chain(keys_dir: Path, rsa_key, ec_key):
+    message = _chain(rsa_key, ec_key)
+    # Valid on its own, but its value (attached payload) is not the one sig-2 signed.
+    forged = sign(_message(), rsa_key, signature_id="sig-1", party=SENDER, certificate=SENDER_CERT, detached=False)
+    message["signatures"][0] = forged
+
+    results = {result["id"]: result["valid"] for result in verify_message(message, KeyStore(keys_dir)).results}
+
+    assert results == {"sig-1": True, "sig-2": False}
+
+
+def test_only_transport_signatures_may_cover_context(keys_dir: Path, rsa_key):
+    message = _message()
+    payload = sign(message, rsa_key, signature_id="sig-1", party=SENDER, certificate=SENDER_CERT, scope=SECTIONS)
+    transport = {**payload, "id": "sig-2", "profile": "transport"}
+    jades = {**payload, "id": "sig-3", "profile": "JAdES-B-LTA"}
+    message["signatures"] = [payload, transport, jades]
+
+    results = {r["id"]: r for r in verify_message(message, KeyStore(keys_dir)).results}
+
+    assert [results[i]["valid"] for i in ("sig-1", "sig-2", "sig-3")] == [False, True, False]
+    assert "payload signature must not include context" in results["sig-1"]["error"]["message"]
+
+
+def test_expired_certificate(tmp_path: Path, rsa_key):
+    (tmp_path / "old.pem").write_bytes(_certificate(rsa_key, days=-1))
+    message = _message()
+    message["signatures"] = [sign(message, rsa_key, signature_id="sig-1", party=SENDER, kid="old")]
+
+    report = verify_message(message, KeyStore(tmp_path))
+
+    assert report.errors()[0]["code"] == "protocol-signature-expired"
+
+
+def test_unknown_key_and_escaping_certificate_url(keys_dir: Path, rsa_key):
+    message = _message()
+    message["signatures"] = [
+        sign(message, rsa_key, signature_id="sig-1", party=SENDER, kid="missing"),
+        sign(message, rsa_key, signature_id="sig-2", party=SENDER, certificate="https://pki.agency.example/../../x.pem"),
+    ]
+
+    messages = [error["message"] for error in verify_message(message, KeyStore(keys_dir)).errors()]
+
+    assert "does not map into the key directory" in messages[0]
+    assert "is not installed" in messages[1]
+
+
+def test_eddsa_with_attached_payload(tmp_path: Path):
+    key = ed25519.Ed25519PrivateKey.generate()
+    (tmp_path / "ed.pem").write_bytes(_public_pem(key))
+    message = _message()
+    message["signatures"] = [
+        sign(message, key, signature_id="sig-1", party=SENDER, algorithm="EdDSA", kid="ed", detached=False)
+    ]
+
+    assert verify_message(message, KeyStore(tmp_path)).valid
+    message["signatures"][0]["algorithm"] = "RS256"
+    assert not verify_message(message, KeyStore(tmp_path)).valid
+
+
+def test_keys_are_cached_for_the_ttl(keys_dir: Path, rsa_key):
+    now = [0.0]
+    store = KeyStore(keys_dir, ttl_s=60, clock=lambda: now[0])
+    first = store.get("gateway-1")
+
+    (keys_dir / "gateway-1.pem").write_bytes(_public_pem(rsa_key))
+    assert store.get("gateway-1") is first
+
+    now[0] = 61
+    assert store.get("gateway-1").fingerprint != first.fingerprint
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_verify_batch(keys_dir: Path, rsa_key, ec_key, workers: int):
+    signed = _chain(rsa_key, ec_key)
+    tampered = copy.deepcopy(signed)
+    tampered["meta"]["intent"] = "cancel-order"
+    lines = [json.dumps(m).encode("utf-8") for m in (signed, _message(), tampered)] + [b"{"]
+
+    reports = verify_batch(lines, KeyStore(keys_dir), workers=workers, chunk_size=2)
+
+    assert [r and r["valid"] for r in reports] == [True, None, False, None]
+
+
+def test_api_rejects_bad_signatures(keys_dir: Path, rsa_key, ec_key):
+    client = TestClient(create_app(signature_keys_dir=keys_dir))
+    headers = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+    message = _chain(rsa_key, ec_key)
+
+    assert client.get("/.well-known/uemp").json()["uemp"]["capabilities"]["signatures"] is True
+    assert client.post("/api/uemp/messages", content=json.dumps(message), headers=headers).status_code == 200
+
+    message["data"]["order"]["id"] = "ORD-999"
+    response = client.post("/api/uemp/messages", content=json.dumps(message), headers=headers)
+    assert response.status_code == 400
+    body = response.json()
+    assert body["code"] == "protocol-signature-invalid"
+    assert [error["field"] for error in body["errors"]] == ["signatures[1]", "signatures[0]"]
+
+
+def test_api_verifies_batches_in_the_signature_pool(keys_dir: Path, rsa_key, ec_key, monkeypatch):
+    executors = []
+
+    def recording(lines, keys, *, executor=None, **kwargs):
+        executors.append(executor)
+        return verify_batch(lines, keys, executor=executor, **kwargs)
+
+    monkeypatch.setattr(uemp_api, "verify_batch", recording)
+    signed = _chain(rsa_key, ec_key)
+    tampered = copy.deepcopy(signed)
+    tampered["meta"]["intent"] = "cancel-order"
+    body = b"".join(json.dumps(m).encode("utf-8") + b"\n" for m in (signed, tampered, _message()))
+    headers = {"Content-Type": "application/x-ndjson", "UEMP-Version": "1.0"}
+
+    app = create_app(signature_keys_dir=keys_dir, signature_workers=1)
+    with TestClient(app) as client:
+        response = client.post("/api/uemp/batch", content=body, headers=headers)
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [(r["accepted"], r["status"]) for r in results] == [(True, 200), (False, 400), (True, 200)]
+    assert results[1]["error"]["code"] == "protocol-signature-invalid"
+    assert executors == [app.state.uemp.signature_pool] and executors[0] is not None
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from uemp_api import create_app
+from uemp_stream import HEARTBEAT, ConversationHub
+
+CONVERSATION = "uemp:BA:2026:conv-1234"
+
+
+def _message(n: int, *, final: bool = False) -> dict:
+    meta = {
+        "protocol": "uemp/1.0",
+        "id": f"uemp:BA:2026:msg-{n:04d}",
+        "intent": "order-confirmed" if final else "ack-processing",
+        "conversationId": CONVERSATION,
+    }
+    if final:
+        meta["workflow"] = {"stateModel": "air-travel/booking-flow/v2", "current": "ticketed", "validTransitions": []}
+    return {"meta": meta, "data": {"n": n}}
+
+
+async def _drain(subscription, heartbeat_s: float | None = None) -> list[bytes]:
+    return [frame async for frame in subscription.frames(heartbeat_s)]
+
+
+def _events(frames: list[bytes]) -> list[tuple[str, dict]]:
+    events = []
+    for frame in b"".join(frames).decode("utf-8").split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_frames_are_encoded_once_and_shared():
+    async def scenario():
+        hub = ConversationHub()
+        subscriptions = [hub.subscribe(CONVERSATION) for _ in range(3)]
+        assert hub.publish(CONVERSATION, _message(1)) == 3
+        assert hub.publish("uemp:BA:2026:conv-other", _message(2)) == 0
+        hub.complete(CONVERSATION)
+        return [await _drain(s) for s in subscriptions], hub
+
+    received, hub = asyncio.run(scenario())
+
+    assert received[0][0] is received[1][0] is received[2][0]
+    assert _events(received[0]) == [
+        ("uemp-message", _message(1)),
+        ("done", {"conversationId": CONVERSATION, "messageCount": 1}),
+    ]
+    assert hub.subscriber_count == 0
+
+
+def test_slow_consumer_drops_oldest():
+    async def scenario():
+        hub = ConversationHub(queue_size=2)
+        subscription = hub.subscribe(CONVERSATION)
+        for n in range(5):
+            hub.publish(CONVERSATION, _message(n))
+        hub.complete(CONVERSATION)
+        return await _drain(subscription)
+
+    events = _events(asyncio.run(scenario()))
+
+    assert [data["data"]["n"] for event, data in events if event == "uemp-message"] == [3, 4]
+    assert events[-1] == ("done", {"conversationId": CONVERSATION, "messageCount": 2, "dropped": 3})
+
+
+def test_slow_consumer_is_disconnected():
+    async def scenario():
+        hub = ConversationHub(queue_size=2, slow_consumer="disconnect")
+        slow, fast = hub.subscribe(CONVERSATION), hub.subscribe(CONVERSATION)
+        fast_frames: list[bytes] = []
+
+        async def read_fast():
+            async for frame in fast.frames():
+                fast_frames.append(frame)
+
+        reader = asyncio.create_task(read_fast())
+        for n in range(3):
+            hub.publish(CONVERSATION, _message(n))
+            await asyncio.sleep(0)
+        assert hub.subscriber_count == 1
+        hub.complete(CONVERSATION)
+        await reader
+        return await _drain(slow), fast_frames
+
+    slow, fast = asyncio.run(scenario())
+
+    assert [event for event, _ in _events(slow)] == ["error"]
+    assert _events(slow)[0][1]["code"] == "system-rate-limited"
+    assert _events(fast)[-1] == ("done", {"conversationId": CONVERSATION, "messageCount": 3})
+
+
+def test_idle_stream_gets_heartbeats():
+    async def scenario():
+        hub = ConversationHub()
+        frames = hub.subscribe(CONVERSATION).frames(heartbeat_s=0.01)
+        first = await anext(frames)
+        await frames.aclose()
+        return first, hub.subscriber_count
+
+    assert asyncio.run(scenario()) == (HEARTBEAT, 0)
+
+
+def test_stream_endpoint_follows_the_conversation():
+    app = create_app(stream_heartbeat_s=None)
+    headers = {"Content-Type": "application/vnd.uemp+json", "UEMP-Version": "1.0"}
+    with TestClient(app) as client:
+        result = {}
+        reader = threading.Thread(
+            target=lambda: result.setdefault(
+                "response", client.get(f"/api/uemp/stream?conversationId={CONVERSATION}", headers={"UEMP-Version": "1.0"})
+            )
+        )
+        reader.start()
+        deadline = time.monotonic() + 5
+        while app.state.uemp.stream.subscriber_count == 0:
+            assert time.monotonic() < deadline, "stream did not subscribe"
+            time.sleep(0.01)
+
+        for message in (_message(1), _message(2, final=True)):
+            assert client.post("/api/uemp/messages", content=json.dumps(message), headers=headers).status_code == 200
+        reader.join(5)
+
+    response = result["response"]
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["UEMP-Conversation-Id"] == CONVERSATION
+    events = _events([response.content])
+    assert [data["meta"]["id"] for event, data in events if event == "uemp-message"] == [
+        "uemp:BA:2026:msg-0001",
+        "uemp:BA:2026:msg-0002",
+    ]
+    assert events[-1] == ("done", {"conversationId": CONVERSATION, "messageCount": 2})
+
+
+def test_stream_endpoint_rejects_bad_requests():
+    client = TestClient(create_app(stream_max_subscribers=0))
+
+    assert client.get("/api/uemp/stream?conversationId=conv-1", headers={"UEMP-Version": "1.0"}).status_code == 400
+    assert client.get(f"/api/uemp/stream?conversationId={CONVERSATION}").status_code == 400
+    response = client.get(f"/api/uemp/stream?conversationId={CONVERSATION}", headers={"UEMP-Version": "1.0"})
+    assert response.status_code == 503
+    assert response.json()["code"] == "system-service-unavailable"
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("lxml")
+
+from uemp_api import create_app
+from uemp_certification import DEFAULT_PACKS_ROOT
+from uemp_limits import UEMPLimits
+from uemp_xsd import SchemaSetCache, SchemaSetError, parse_document
+
+NDC_PACK = DEFAULT_PACKS_ROOT / "iata-ndc__21.3"
+MSG_NS = "http://www.iata.org/IATA/2015/EASD/00/IATA_OffersAndOrdersMessage"
+COMMON_NS = "http://www.iata.org/IATA/2015/EASD/00/IATA_OffersAndOrdersCommonTypes"
+
+# A cut-down stand-in for the IATA NDC bundle: a message XSD importing a common-types XSD.
+MESSAGE_XSD = f"""<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="{MSG_NS}"
+    xmlns:c="{COMMON_NS}" elementFormDefault="qualified">
+  <xs:import namespace="{COMMON_NS}" schemaLocation="common/IATA_OffersAndOrdersCommonTypes.xsd"/>
+  <xs:element name="IATA_AirShoppingRQ">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="DistributionChain" minOccurs="0" type="c:AnyContent"/>
+        <xs:element name="PayloadAttributes" type="c:PayloadAttributesType"/>
+        <xs:element name="Request" type="c:AnyContent"/>
+      </xs:sequence>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+COMMON_XSD = f"""<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="{COMMON_NS}"
+    elementFormDefault="qualified">
+  <xs:complexType name="AnyContent">
+    <xs:sequence><xs:any minOccurs="0" maxOccurs="unbounded" processContents="skip"/></xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="PayloadAttributesType">
+    <xs:sequence>
+      <xs:element name="VersionNumber">
+        <xs:simpleType>
+          <xs:restriction base="xs:string"><xs:pattern value="[0-9]+\\.[0-9]+"/></xs:restriction>
+        </xs:simpleType>
+      </xs:element>
+    </xs:sequence>
+  </xs:complexType>
+</xs:schema>
+"""
+
+
+@pytest.fixture()
+def xsd_root(tmp_path: Path) -> Path:
+    set_dir = tmp_path / "IATA-NDC" / "21.3"
+    (set_dir / "common").mkdir(parents=True)
+    (set_dir / "IATA_AirShoppingRQ.xsd").write_text(MESSAGE_XSD, encoding="utf-8")
+    (set_dir / "common" / "IATA_OffersAndOrdersCommonTypes.xsd").write_text(COMMON_XSD, encoding="utf-8")
+    return tmp_path
+
+
+def _validate(client: TestClient, fixture: str, profile_id: str = "iata-ndc/21.3"):
+    xml = (NDC_PACK / fixture).read_text(encoding="utf-8")
+    return client.post("/api/uemp/validate-native", json={"profileId": profile_id, "xml": xml})
+
+
+class TestSchemaSetCache:
+    def test_compiles_each_entry_point_once(self, xsd_root: Path):
+        cache = SchemaSetCache(xsd_root)
+        document = parse_document((NDC_PACK / "fixtures/valid/airshoppingrq_valid.xml").read_bytes())
+
+        first = cache.schema_for("IATA-NDC/21.3", document.getroot().tag)
+        assert cache.validate("IATA-NDC/21.3", document) == []
+        assert cache.schema_for("IATA-NDC/21.3", document.getroot().tag) is first
+        assert cache.compiled_count() == 1
+
+    def test_rejects_sets_outside_the_allowlist(self, xsd_root: Path):
+        with pytest.raises(SchemaSetError, match="not allowlisted"):
+            SchemaSetCache(xsd_root).entry_points("../IATA-NDC/21.3")
+
+    def test_uses_manifest_entry_points(self, xsd_root: Path):
+        set_dir = xsd_root / "IATA-NDC" / "21.3"
+        (set_dir / "schema-set.json").write_text(
+            json.dumps({"entryPoints": {f"{{{MSG_NS}}}IATA_AirShoppingRQ": "IATA_AirShoppingRQ.xsd"}}),
+            encoding="utf-8",
+        )
+
+        entry_points = SchemaSetCache(xsd_root).entry_points("IATA-NDC/21.3")
+
+        assert list(entry_points) == [f"{{{MSG_NS}}}IATA_AirShoppingRQ"]
+
+
+class TestValidateNative:
+    def test_valid_document(self, xsd_root: Path):
+        client = TestClient(create_app(xsd_root=xsd_root))
+
+        response = _validate(client, "fixtures/valid/airshoppingrq_valid.xml")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["valid"] is True
+        assert body["errors"] == []
+        assert [(s["adapter"], s["status"]) for s in body["stages"]] == [("parse", "passed"), ("xsd", "passed")]
+
+    def test_invalid_document_reports_normalized_errors(self, xsd_root: Path):
+        client = TestClient(create_app(xsd_root=xsd_root))
+
+        response = _validate(client, "fixtures/invalid/airshoppingrq_minimal_invalid.xml")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["valid"] is False
+        assert body["errors"][0]["code"] == "validation-required-field"
+        assert body["errors"][0]["severity"] == "fatal"
+        assert body["errors"][0]["location"]["line"] > 0
+
+    def test_malformed_xml_is_invalid(self, xsd_root: Path):
+        client = TestClient(create_app(xsd_root=xsd_root))
+
+        response = client.post("/api/uemp/validate-native", json={"profileId": "iata-ndc/21.3", "xml": "<a><b></a>"})
+
+        assert response.status_code == 200
+        assert response.json()["valid"] is False
+        assert response.json()["stages"][0]["status"] == "failed"
+
+    def test_unknown_profile(self, xsd_root: Path):
+        client = TestClient(create_app(xsd_root=xsd_root))
+
+        response = _validate(client, "fixtures/valid/airshoppingrq_valid.xml", profile_id="nope/1.0")
+
+        assert response.status_code == 400
+        assert response.json()["code"] == "protocol-unknown-profile"
+
+    def test_request_body_is_read_under_the_message_limits(self, xsd_root: Path):
+        limits = UEMPLimits(max_message_bytes=4096, max_string_bytes=1024)
+        client = TestClient(create_app(xsd_root=xsd_root, limits=limits))
+        xml = (NDC_PACK / "fixtures/valid/airshoppingrq_valid.xml").read_text(encoding="utf-8")
+
+        too_large = {"profileId": "iata-ndc/21.3", "xml": xml + " " * 4096}
+        response = client.post("/api/uemp/validate-native", json=too_large)
+
+        assert response.status_code == 413
+        assert response.json()["code"] == "protocol-message-too-large"
+        # The 1.8 KB document itself may be longer than the string limit.
+        assert _validate(client, "fixtures/valid/airshoppingrq_valid.xml").status_code == 200
+
+    def test_missing_schema_set_is_unavailable(self, tmp_path: Path):
+        client = TestClient(create_app(xsd_root=tmp_path))
+
+        response = _validate(client, "fixtures/valid/airshoppingrq_valid.xml")
+
+        assert response.status_code == 503
+        assert response.json()["code"] == "system-service-unavailable"
+        assert response.json()["recovery"]["action"] == "retry"
+        assert response.headers["Retry-After"] == "60"
+
+    def test_ndc_certification_pack_passes_in_process(self, xsd_root: Path, tmp_path: Path):
+        import asyncio
+        import shutil
+
+        import httpx
+
+        from uemp_certification import asgi_transport, run_pack
+
+        pack_dir = tmp_path / "pack"
+        shutil.copytree(NDC_PACK, pack_dir)
+        app = create_app(xsd_root=xsd_root)
+
+        async def _run():
+            async with httpx.AsyncClient(transport=asgi_transport(app)) as client:
+                return await run_pack(base_url="http://uemp.test", pack_json_path=pack_dir / "pack.json", client=client)
+
+        report, _ = asyncio.run(_run())
+
+        assert report.summary.failed == 0
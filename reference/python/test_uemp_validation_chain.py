@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import signal
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("lxml")
+
+from test_uemp_validate_native import NDC_PACK, xsd_root  # noqa: F401 - fixture
+from uemp_profiles import load_profiles
+from uemp_schematron import SchematronEngine
+from uemp_validation import NativeValidationError, StageOutcome, ValidationChainExecutor, ValidatorAssets, xsd_stage
+from uemp_xsd import SchemaSetCache
+
+VALID = (NDC_PACK / "fixtures/valid/airshoppingrq_valid.xml").read_text(encoding="utf-8")
+INVALID = (NDC_PACK / "fixtures/invalid/airshoppingrq_minimal_invalid.xml").read_text(encoding="utf-8")
+
+
+def slow_stage(document, config, mode, assets) -> StageOutcome:
+    time.sleep(config.get("sleepS", 5))
+    return StageOutcome()
+
+
+def rules_stage(document, config, mode, assets) -> StageOutcome:
+    return StageOutcome(details={"rules": len(document.getroot())})
+
+
+ADAPTERS = {"xsd": xsd_stage, "business-rules": slow_stage, "edi-grammar": rules_stage}
+
+
+def _profile(tmp_path: Path, stages: list[dict]):
+    profile_dir = tmp_path / "profiles" / "ndc"
+    profile_dir.mkdir(parents=True)
+    (profile_dir / "profile.json").write_text(
+        json.dumps(
+            {
+                "id": "iata-ndc/21.3",
+                "protocol": "NDC",
+                "version": "21.3",
+                "title": "IATA NDC 21.3",
+                "status": "draft",
+                "supportLevel": "L1",
+                "updatedAt": "2026-02-07T00:00:00Z",
+                "artifacts": {"validationChain": "validation-chain.json"},
+            }
+        ),
+        encoding="utf-8",
+    )
+    (profile_dir / "validation-chain.json").write_text(
+        json.dumps({"profileId": "iata-ndc/21.3", "stages": stages}), encoding="utf-8"
+    )
+    (loaded,) = load_profiles(tmp_path / "profiles")
+    return loaded
+
+
+def _executor(xsd_root: Path, tmp_path: Path, **kwargs) -> ValidationChainExecutor:
+    assets = ValidatorAssets(SchemaSetCache(xsd_root), SchematronEngine(tmp_path / "no-schematron"))
+    return ValidationChainExecutor(assets, adapters=ADAPTERS, **kwargs)
+
+
+XSD = {"adapter": "xsd", "mode": "fatal", "config": {"schemaSet": "IATA-NDC/21.3"}}
+
+
+def test_fatal_timeout_stops_the_chain(xsd_root: Path, tmp_path: Path):
+    loaded = _profile(
+        tmp_path,
+        [{"adapter": "business-rules", "mode": "fatal", "timeoutMs": 50, "config": {"sleepS": 1}}, XSD],
+    )
+    executor = _executor(xsd_root, tmp_path)
+
+    async def _run():
+        started = time.perf_counter()
+        # The abandoned thread keeps sleeping; asyncio.run waits for it on exit.
+        return await executor.run(loaded, VALID), time.perf_counter() - started
+
+    result, elapsed = asyncio.run(_run())
+
+    assert elapsed < 0.5
+    assert result["valid"] is False
+    assert [(e["code"], e["severity"]) for e in result["errors"]] == [("system-timeout", "fatal")]
+    assert [(s["adapter"], s["status"]) for s in result["stages"]] == [("parse", "passed"), ("business-rules", "timeout")]
+    assert result["stages"][1]["durationMs"] >= 50
+
+
+def test_warning_timeout_continues(xsd_root: Path, tmp_path: Path):
+    loaded = _profile(
+        tmp_path,
+        [{"adapter": "business-rules", "mode": "warning", "config": {"sleepS": 0.3}}, XSD],
+    )
+    executor = _executor(xsd_root, tmp_path, default_timeout_ms=50)
+
+    result = asyncio.run(executor.run(loaded, VALID))
+
+    assert result["valid"] is True
+    assert [(e["code"], e["severity"]) for e in result["errors"]] == [("system-timeout", "warning")]
+    assert [s["status"] for s in result["stages"]] == ["passed", "timeout", "passed"]
+    assert all(s["durationMs"] >= 0 for s in result["stages"])
+
+
+def test_cpu_bound_stages_run_in_worker_processes(xsd_root: Path, tmp_path: Path):
+    loaded = _profile(tmp_path, [{"adapter": "edi-grammar", "mode": "warning"}, XSD])
+    executor = _executor(xsd_root, tmp_path, process_workers=1)
+
+    async def _run():
+        return await asyncio.gather(executor.run(loaded, VALID), executor.run(loaded, INVALID))
+
+    try:
+        valid, invalid = asyncio.run(_run())
+    finally:
+        executor.shutdown()
+
+    assert valid["valid"] is True
+    assert valid["stages"][1]["rules"] == 3
+    assert invalid["valid"] is False
+    assert invalid["errors"][0]["code"] == "validation-required-field"
+    assert invalid["stages"][2]["schemaSet"] == "IATA-NDC/21.3"
+
+
+def test_stuck_worker_processes_are_replaced(xsd_root: Path, tmp_path: Path):
+    loaded = _profile(tmp_path, [{"adapter": "business-rules", "mode": "fatal", "config": {"sleepS": 0}}, XSD])
+    slow = _profile(
+        tmp_path / "slow",
+        [{"adapter": "business-rules", "mode": "fatal", "timeoutMs": 200, "config": {"sleepS": 60}}],
+    )
+    executor = _executor(xsd_root, tmp_path, process_workers=1, offload=frozenset({"business-rules", "xsd"}))
+
+    async def _run():
+        stuck = await executor.run(slow, VALID)
+        workers = list(executor._context.processes)
+        # The first worker is still sleeping; the next request gets a fresh pool.
+        fast = await executor.run(loaded, VALID.encode())
+        return stuck, fast, workers
+
+    try:
+        stuck, fast, workers = asyncio.run(_run())
+    finally:
+        executor.shutdown()
+
+    for worker in workers:
+        worker.join(5)
+    assert [worker.exitcode for worker in workers] == [-signal.SIGTERM]
+
+    assert stuck["stages"][1]["status"] == "timeout"
+    assert fast["valid"] is True
+    assert [s["status"] for s in fast["stages"]] == ["passed", "passed", "passed"]
+
+
+def test_unknown_adapter_is_skipped_only_in_warning_stages(xsd_root: Path, tmp_path: Path):
+    warning = _profile(tmp_path / "warning", [{"adapter": "ocr", "mode": "warning"}, XSD])
+    fatal = _profile(tmp_path / "fatal", [XSD, {"adapter": "ocr", "mode": "fatal"}])
+    executor = _executor(xsd_root, tmp_path)
+
+    result = asyncio.run(executor.run(warning, VALID))
+    with pytest.raises(NativeValidationError) as exc:
+        asyncio.run(executor.run(fatal, VALID))
+
+    assert result["valid"] is True and result["stages"][1]["status"] == "skipped"
+    assert exc.value.status_code == 503 and "'ocr'" in exc.value.message
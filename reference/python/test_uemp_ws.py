@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import uemp_api
+from uemp_api import create_app
+from uemp_limits import UEMPLimits
+
+
+HEADERS = {"UEMP-Version": "1.0"}
+
+
+def _message(name: str, **meta) -> str:
+    return json.dumps(
+        {
+            "meta": {"protocol": "uemp/1.0", "id": f"uemp:BA:2026:{name}", "intent": "price-update", **meta},
+            "data": {"flight": "BA117", "price": {"amount": "450.00", "currency": "GBP"}},
+        }
+    )
+
+
+def test_one_result_per_frame_correlated_by_id():
+    client = TestClient(create_app())
+    with client.websocket_connect("/api/uemp/ws", subprotocols=["uemp.v1"], headers=HEADERS) as ws:
+        assert ws.accepted_subprotocol == "uemp.v1"
+        ws.send_text(_message("px-1"))
+        ws.send_text(_message("px-2", protocol="uemp/9.0"))
+        ws.send_text("{")
+        ws.send_bytes(b"\x00")
+        # Frames are checked concurrently; results are matched up by frame number.
+        results = sorted((json.loads(ws.receive_text()) for _ in range(4)), key=lambda r: r["frame"])
+
+    assert results[0] == {"id": "uemp:BA:2026:px-1", "frame": 0, "accepted": True, "status": 200}
+    assert results[1]["id"] == "uemp:BA:2026:px-2" and results[1]["error"]["code"] == "protocol-header-mismatch"
+    assert [r["error"]["code"] for r in results[2:]] == ["protocol-invalid-json", "protocol-malformed"]
+
+
+def test_frames_over_the_size_limit_are_rejected():
+    client = TestClient(create_app(limits=UEMPLimits(max_message_bytes=512)))
+    with client.websocket_connect("/api/uemp/ws", subprotocols=["uemp.v1"], headers=HEADERS) as ws:
+        ws.send_text(_message("big", note="x" * 600))
+        ws.send_text(_message("small"))
+        big, small = sorted((json.loads(ws.receive_text()) for _ in range(2)), key=lambda r: r["frame"])
+
+    assert big["status"] == 413 and big["error"]["code"] == "protocol-message-too-large"
+    assert small["accepted"] is True
+
+
+def test_subprotocol_is_required():
+    client = TestClient(create_app())
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/uemp/ws", subprotocols=["graphql-ws"]):
+            pass
+    assert exc.value.code == 1002
+
+
+def test_uemp_version_is_required():
+    client = TestClient(create_app())
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/uemp/ws", subprotocols=["uemp.v1"]):
+            pass
+    assert exc.value.code == 1002 and exc.value.reason == "UEMP-Version header required"
+
+
+@pytest.mark.parametrize("in_flight, order", [(4, ["fast", "slow"]), (1, ["slow", "fast"])])
+def test_in_flight_frames_complete_out_of_order(monkeypatch, in_flight: int, order: list[str]):
+    app = create_app(ws_max_in_flight=in_flight)
+    check = uemp_api.check_message
+
+    def slow_check(line, limits, keys, **checks):
+        if b"slow" in line:
+            time.sleep(0.3)
+        return check(line, limits, keys, **checks)
+
+    monkeypatch.setattr(uemp_api, "check_message", slow_check)
+    with TestClient(app).websocket_connect("/api/uemp/ws", subprotocols=["uemp.v1"], headers=HEADERS) as ws:
+        ws.send_text(_message("slow"))
+        ws.send_text(_message("fast"))
+        ids = [json.loads(ws.receive_text())["id"] for _ in range(2)]
+
+    assert [i.rsplit(":", 1)[1] for i in ids] == order
@@ -0,0 +1,292 @@
+"""
+Admission control for the ingest endpoints (spec 5.2.1: 429 with Retry-After).
+
+Runs on the raw request scope, before the body is read:
+
+- per-party rate limits: token buckets keyed by the `{party}` of
+  `UEMP-Message-Id`, or by client address when the header is absent;
+- a global concurrency cap: requests over it wait in a FIFO queue, and are
+  shed as soon as their expected (or actual) wait exceeds `max_queue_s`.
+
+The buckets use GCRA (the generic cell rate algorithm), which behaves like a
+token bucket but keeps a single float per key: the time at which the bucket
+is full again.
+
+Rate limiters:
+- `MemoryRateLimiter`: per-process, keys pruned once their bucket is full
+- `SQLiteRateLimiter`: one budget shared by all workers pointing at the same file
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Collection
+from pathlib import Path
+from typing import Any, Protocol
+
+from uemp_envelope import EnvelopeError
+from uemp_schemas import UEMP_MESSAGE_ID_PATTERN
+
+DEFAULT_MAX_QUEUE_S = 0.5
+
+
+def party_key(scope: dict[str, Any]) -> str:
+    """The `{party}` of the `UEMP-Message-Id` header, else `client:{address}`."""
+    for name, value in scope.get("headers") or ():
+        if name == b"uemp-message-id":
+            message_id = value.decode("latin-1")
+            if UEMP_MESSAGE_ID_PATTERN.fullmatch(message_id):
+                return message_id.split(":", 2)[1]
+            break
+    client = scope.get("client")
+    return f"client:{client[0] if client else 'unknown'}"
+
+
+class RateLimiter(Protocol):
+    # True for limiters that do I/O (or may wait on a lock held by another
+    # process); `AdmissionControl` then calls `acquire` in a worker thread.
+    blocking: bool
+
+    def acquire(self, key: str) -> float:
+        """Take one token for `key`: 0.0 if admitted, else the seconds until one is available."""
+        ...
+
+
+def _gcra(tat: float | None, now: float, interval: float, burst: int) -> tuple[float, float]:
+    """(new theoretical arrival time, retry-after); the TAT is unchanged when refused."""
+    tat = now if tat is None or tat < now else tat
+    allow_at = tat + interval - burst * interval
+    if now < allow_at:
+        return tat, allow_at - now
+    return tat + interval, 0.0
+
+
+class MemoryRateLimiter:
+    """Per-process token buckets of `burst` tokens refilled at `rate` per second."""
+
+    blocking = False
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int | None = None,
+        *,
+        prune_every: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, math.ceil(rate)) if burst is None else burst
+        self.prune_every = prune_every
+        self._interval = 1.0 / rate
+        self._clock = clock
+        # Key -> theoretical arrival time; a key whose TAT has passed has a full bucket.
+        self._tat: dict[str, float] = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def acquire(self, key: str) -> float:
+        now = self._clock()
+        with self._lock:
+            tat, retry_after = _gcra(self._tat.get(key), now, self._interval, self.burst)
+            self._tat[key] = tat
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                self._tat = {k: t for k, t in self._tat.items() if t > now}
+            return retry_after
+
+
+class SQLiteRateLimiter:
+    """Token buckets in a SQLite file, so several worker processes share one budget per key.
+
+    `acquire` takes the database write lock, waiting up to 5s for other
+    workers, so it is `blocking` and runs off the event loop.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str | Path,
+        rate: float,
+        burst: int | None = None,
+        *,
+        prune_every: int = 1024,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.path = str(path)
+        self.rate = rate
+        self.burst = max(1, math.ceil(rate)) if burst is None else burst
+        self.prune_every = prune_every
+        self._interval = 1.0 / rate
+        self._clock = clock
+        self._calls = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS uemp_rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self._clock()
+            row = conn.execute("SELECT tat FROM uemp_rate_limits WHERE key = ?", (key,)).fetchone()
+            tat, retry_after = _gcra(None if row is None else row[0], now, self._interval, self.burst)
+            if not retry_after:
+                conn.execute("INSERT OR REPLACE INTO uemp_rate_limits (key, tat) VALUES (?, ?)", (key, tat))
+            self._calls += 1
+            if self.prune_every and self._calls % self.prune_every == 0:
+                conn.execute("DELETE FROM uemp_rate_limits WHERE tat <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+class ConcurrencyLimiter:
+    """At most `max_concurrent` requests at once; the rest wait in FIFO order.
+
+    A request is shed (instead of queued) when the expected wait, from the queue
+    length and the recent average service time, exceeds `max_queue_s`, and
+    when it has actually waited that long.
+    """
+
+    def __init__(self, max_concurrent: int, *, max_queue_s: float = DEFAULT_MAX_QUEUE_S) -> None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue_s = max_queue_s
+        self.active = 0
+        self.shed = 0
+        self.service_s = 0.0
+        self._waiters: deque[asyncio.Future[bool]] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait_s(self) -> float:
+        return (len(self._waiters) + 1) / self.max_concurrent * self.service_s
+
+    def retry_after_s(self) -> float:
+        return max(self.expected_wait_s(), self.max_queue_s)
+
+    async def acquire(self) -> float:
+        """0.0 once a slot is held (call `release` afterwards), else a retry-after in seconds."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return 0.0
+        if self.expected_wait_s() > self.max_queue_s:
+            self.shed += 1
+            return self.retry_after_s()
+        loop = asyncio.get_running_loop()
+        waiter: asyncio.Future[bool] = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(self.max_queue_s, self._expire, waiter)
+        try:
+            admitted = await waiter
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled() and waiter.result():
+                # A slot was handed over just as the request went away.
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+        if not admitted:
+            self.shed += 1
+            return self.retry_after_s()
+        return 0.0
+
+    def _expire(self, waiter: asyncio.Future[bool]) -> None:
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            waiter.set_result(False)
+
+    def release(self, service_s: float | None = None) -> None:
+        """Free a slot, handing it straight to the oldest waiter, if any."""
+        if service_s is not None:
+            # Exponentially weighted average over roughly the last 10 requests.
+            self.service_s += (service_s - self.service_s) * 0.1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+class AdmissionControl:
+    """Per-party rate limiting and a global concurrency cap for `paths` (POST only)."""
+
+    def __init__(
+        self,
+        *,
+        rate_limiter: RateLimiter | None = None,
+        concurrency: ConcurrencyLimiter | None = None,
+        key: Callable[[dict[str, Any]], str] = party_key,
+        paths: Collection[str] = ("/api/uemp/messages", "/api/uemp/batch"),
+    ) -> None:
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.key = key
+        self.paths = frozenset(paths)
+
+    def applies(self, scope: dict[str, Any]) -> bool:
+        return scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths
+
+    async def admit(self, scope: dict[str, Any]) -> EnvelopeError | None:
+        """None once admitted (with a concurrency slot to `release`), else the error to send."""
+        if self.rate_limiter is not None:
+            key = self.key(scope)
+            if self.rate_limiter.blocking:
+                retry_after = await asyncio.to_thread(self.rate_limiter.acquire, key)
+            else:
+                retry_after = self.rate_limiter.acquire(key)
+            if retry_after:
+                return EnvelopeError(
+                    status_code=429,
+                    code="system-rate-limited",
+                    message=f"Rate limit exceeded for '{key}'",
+                    hint="Retry after the Retry-After delay, or send fewer requests",
+                    action="retry",
+                    retry_after=retry_after,
+                )
+        if self.concurrency is not None:
+            retry_after = await self.concurrency.acquire()
+            if retry_after:
+                return EnvelopeError(
+                    status_code=503,
+                    code="system-service-unavailable",
+                    message="Server is at capacity",
+                    hint="Retry after the Retry-After delay",
+                    action="retry",
+                    retry_after=retry_after,
+                )
+        return None
+
+    def release(self, service_s: float) -> None:
+        if self.concurrency is not None:
+            self.concurrency.release(service_s)
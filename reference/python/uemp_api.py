@@ -4,34 +4,139 @@ UEMP protocol endpoints (public reference implementation).
 Scope:
 - Strict UEMP wire token/media validation
 - Message envelope validation
+- Per-party rate limits and load shedding on ingest
+- NDJSON batch ingest (spec D1)
+- SSE conversation streams (spec 5.2.1)
+- Message and conversation lookups (spec C1)
+- WebSocket binding with pipelined validation (spec 5.2.3)
+- Native document validation through profile validation chains (spec 9.6.2)
 - Capability document endpoint
+- Prometheus metrics (`/metrics`) and an opt-in sampling profiler
 """
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import json
+import os
+import time
+import zlib
+from collections.abc import AsyncIterator, Callable
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
 
-from fastapi import APIRouter, FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
+from uemp_admission import (
+    DEFAULT_MAX_QUEUE_S,
+    AdmissionControl,
+    ConcurrencyLimiter,
+    MemoryRateLimiter,
+    RateLimiter,
+    party_key,
+)
+from uemp_batches import BatchStore, BatchTracker, MemoryBatchStore, open_batch, parse_batch_envelope
+from uemp_capabilities import CachedDocument, build_capabilities, encode_document
+from uemp_conversations import ConversationStore, MemoryConversationStore, message_record
+from uemp_envelope import ENVELOPE_MODES, EnvelopeError, ValidatedEnvelope, validate_envelope
+from uemp_idempotency import IdempotencyStore, MemoryIdempotencyStore, StoredResponse
+from uemp_ingest import check_message
+from uemp_limits import LimitExceeded, UEMPLimits, read_limited_body
+from uemp_links import LinkResolver
+from uemp_metrics import Metrics, NullStageTimer, StackSampler, StageTimer
+from uemp_profiles import DEFAULT_PROFILES_DIR
+from uemp_registry import ProfileRegistry
 from uemp_schemas import (
     UEMP_MEDIA_TYPE,
-    UEMP_VERSIONED_MEDIA_TYPE,
     UEMP_MESSAGE_ID_PATTERN,
-    UEMP_PROTOCOL_PATTERN,
-    UEMPMessage,
+    UEMP_VERSIONED_MEDIA_TYPE,
+    NativeValidationRequest,
     UEMPValidationResult,
 )
+from uemp_schematron import DEFAULT_POOL_SIZE, DEFAULT_SCHEMATRON_ROOT, SchematronEngine, schematron_engine
+from uemp_signatures import (
+    DEFAULT_KEY_TTL_S,
+    KeyStore,
+    SignatureReport,
+    key_store,
+    signature_error,
+    signature_pool,
+    verify_batch,
+    verify_message,
+)
+from uemp_stream import DEFAULT_HEARTBEAT_S, DEFAULT_QUEUE_SIZE, ConversationHub, ends_conversation
+from uemp_validation import (
+    NativeValidationError,
+    ValidationChainExecutor,
+    ValidatorAssets,
+    chain_assets,
+    warm_validators,
+)
+from uemp_xsd import DEFAULT_XSD_ROOT, SchemaSetCache, schema_set_cache
 
 router = APIRouter(prefix="/uemp", tags=["uemp"])
 
+
+@dataclass(frozen=True)
+class UEMPSettings:
+    """Per-deployment options, stored on `app.state.uemp` by `create_app`."""
+
+    envelope_mode: str = "fast"
+    response_mode: str = "full"
+    idempotency: IdempotencyStore | None = None
+    conversations: ConversationStore | None = None
+    batches: BatchStore | None = None
+    links: LinkResolver | None = None
+    limits: UEMPLimits = UEMPLimits()
+    registry: ProfileRegistry | None = None
+    intents: Mapping[str, Sequence[str]] | None = None
+    signature_keys: KeyStore | None = None
+    # Process pool `verify_batch` spreads batch chunks over (None: the calling thread).
+    signature_pool: concurrent.futures.Executor | None = None
+    stream: ConversationHub | None = None
+    ws_max_in_flight: int = 8
+    admission: AdmissionControl | None = None
+    metrics: Metrics | None = None
+    xsd: SchemaSetCache | None = None
+    schematron: SchematronEngine | None = None
+    validation: ValidationChainExecutor | None = None
+    warmup: tuple[dict[str, Any], ...] = ()
+
+
+_DEFAULT_SETTINGS = UEMPSettings()
+
+
+def _settings(request: Request | WebSocket) -> UEMPSettings:
+    return getattr(request.app.state, "uemp", _DEFAULT_SETTINGS)
+
+
 _UEMP_ACCEPTED_CONTENT_TYPES = {
     UEMP_MEDIA_TYPE,
     UEMP_VERSIONED_MEDIA_TYPE,
     "application/json",  # Fallback until IANA registration per spec.
 }
 
+# Accepted-message response modes (deployment default, or per request via
+# `Prefer: uemp-response=<mode>`; `return=minimal` selects "summary"):
+# - full: re-serialize the validated message into the result document
+# - echo: splice the original request body bytes into the result document
+# - summary: return meta, the validation summary and the body hash only
+RESPONSE_MODES = ("full", "echo", "summary")
+
+_NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Upper bound on decompressed bytes produced per inflate step, so a small
+# gzipped chunk cannot expand into an unbounded buffer.
+_GZIP_MAX_INFLATE = 256 * 1024
+
 
 def _normalize_content_type(content_type: str | None) -> str:
     if not content_type:
@@ -46,6 +151,18 @@ def _find_legacy_aip_header(request: Request) -> str | None:
     return None
 
 
+class _ErrorResponse(JSONResponse):
+    """A UEMP error body; `outcome` is its error code (see `Metrics.count`)."""
+
+    def __init__(self, outcome: str, content: Any, *, status_code: int, headers: dict[str, str] | None = None) -> None:
+        super().__init__(content, status_code=status_code, headers=headers)
+        self.outcome = outcome
+
+
+class _ReplayedResponse(Response):
+    outcome = "replayed"
+
+
 def _protocol_error(
     *,
     status_code: int,
@@ -54,7 +171,8 @@ def _protocol_error(
     hint: str,
     action: str = "upgrade-client",
 ) -> JSONResponse:
-    return JSONResponse(
+    return _ErrorResponse(
+        code,
         status_code=status_code,
         content={
             "code": code,
@@ -68,9 +186,99 @@ def _protocol_error(
     )
 
 
-@router.post("/messages", response_model=UEMPValidationResult)
-async def ingest_uemp_message(request: Request):
-    """Validate and accept a UEMP envelope."""
+def _envelope_error_response(exc: EnvelopeError) -> JSONResponse:
+    headers = {"Retry-After": str(exc.retry_after_s)} if exc.retry_after is not None else None
+    return _ErrorResponse(exc.code, exc.content(), status_code=exc.status_code, headers=headers)
+
+
+class _AdmissionMiddleware:
+    """Apply `AdmissionControl` to ingest requests before their body is read.
+
+    A concurrency slot is held until the response (including a streamed batch
+    response) has been sent.
+    """
+
+    def __init__(self, app, admission: AdmissionControl, metrics: Metrics | None = None) -> None:
+        self.app = app
+        self.admission = admission
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not self.admission.applies(scope):
+            await self.app(scope, receive, send)
+            return
+        rejected = await self.admission.admit(scope)
+        if rejected is not None:
+            if self.metrics is not None:
+                self.metrics.count(scope["path"].rsplit("/", 1)[-1], rejected.status_code, rejected.code)
+            await _envelope_error_response(rejected)(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(time.perf_counter() - started)
+
+
+class _SplicedResponse(Response):
+    """Response whose body is sent as several pre-encoded parts without joining them."""
+
+    def __init__(
+        self,
+        parts: list[bytes],
+        *,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+        media_type: str | None = None,
+    ) -> None:
+        self.parts = parts
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**(headers or {}), "content-length": str(sum(len(part) for part in parts))})
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        last = len(self.parts) - 1
+        for i, part in enumerate(self.parts):
+            await send({"type": "http.response.body", "body": part, "more_body": i < last})
+
+
+def _preferred_response_mode(request: Request, default: str) -> str:
+    """Resolve the response mode from the `Prefer` header (RFC 7240)."""
+    prefer = request.headers.get("prefer")
+    if not prefer:
+        return default
+    for preference in prefer.split(","):
+        token, _, value = preference.split(";", 1)[0].partition("=")
+        token = token.strip().lower()
+        value = value.strip().strip('"').lower()
+        if token == "uemp-response" and value in RESPONSE_MODES:
+            return value
+        if token == "return" and value == "minimal":
+            return "summary"
+        if token == "return" and value == "representation" and default == "summary":
+            return "full"
+    return default
+
+
+def _strip_utf8_bom(body: bytes) -> bytes | None:
+    """Return the body as spliceable UTF-8 bytes, or None if it is not UTF-8."""
+    encoding = json.detect_encoding(body)
+    if encoding == "utf-8":
+        return body
+    if encoding == "utf-8-sig":
+        return body[3:]
+    return None
+
+
+def _check_request_headers(
+    request: Request,
+    *,
+    accepted_content_types: set[str],
+    content_type_hint: str,
+) -> JSONResponse | None:
+    """Media-type and header checks shared by the single and batch ingest routes."""
     content_type = _normalize_content_type(request.headers.get("content-type"))
     if content_type.startswith("application/vnd.aip"):
         return _protocol_error(
@@ -80,15 +288,20 @@ async def ingest_uemp_message(request: Request):
             hint=f"Use Content-Type: {UEMP_MEDIA_TYPE}",
             action="fix-request",
         )
-    if content_type not in _UEMP_ACCEPTED_CONTENT_TYPES:
+    if content_type not in accepted_content_types:
         return _protocol_error(
             status_code=415,
             code="protocol-unsupported-media-type",
             message=f"Unsupported media type '{content_type or 'missing'}'",
-            hint=f"Use Content-Type: {UEMP_MEDIA_TYPE} (or {UEMP_VERSIONED_MEDIA_TYPE}; fallback: application/json)",
+            hint=content_type_hint,
             action="fix-request",
         )
 
+    return _check_uemp_headers(request)
+
+
+def _check_uemp_headers(request: Request) -> JSONResponse | None:
+    """Reject legacy AIP headers and require UEMP-Version (all UEMP routes)."""
     legacy_header = _find_legacy_aip_header(request)
     if legacy_header:
         return _protocol_error(
@@ -99,8 +312,7 @@ async def ingest_uemp_message(request: Request):
             action="fix-request",
         )
 
-    header_version = request.headers.get("uemp-version")
-    if not header_version:
+    if not request.headers.get("uemp-version"):
         return _protocol_error(
             status_code=400,
             code="protocol-missing-required-header",
@@ -108,10 +320,156 @@ async def ingest_uemp_message(request: Request):
             hint="Set UEMP-Version to the envelope protocol version (e.g. 1.0)",
             action="fix-request",
         )
+    return None
+
+
+def _accepted_response(request: Request, envelope: ValidatedEnvelope, body: bytes, body_hash: str | None) -> Response:
+    settings = _settings(request)
+    headers = {
+        "UEMP-Version": envelope.meta.version,
+        "UEMP-Message-Id": envelope.meta.id,
+    }
+    validation = {"protocol": "ok", "id": "ok"}
+    response_mode = _preferred_response_mode(request, settings.response_mode)
+    if request.headers.get("prefer"):
+        headers["Preference-Applied"] = f"uemp-response={response_mode}"
+
+    if response_mode == "summary":
+        content = {
+            "accepted": True,
+            "meta": envelope.payload["meta"],
+            "validation": validation,
+            "body": {"sha256": body_hash or hashlib.sha256(body).hexdigest(), "bytes": len(body)},
+        }
+        return JSONResponse(status_code=200, content=content, headers=headers, media_type=UEMP_MEDIA_TYPE)
+
+    if response_mode == "echo":
+        spliceable = _strip_utf8_bom(body)
+        if spliceable is not None:
+            prefix = b'{"accepted":true,"validation":' + json.dumps(validation).encode("utf-8") + b',"message":'
+            return _SplicedResponse(
+                [prefix, spliceable, b"}"],
+                status_code=200,
+                headers=headers,
+                media_type=UEMP_MEDIA_TYPE,
+            )
+
+    # The `UEMPValidationResult` shape in both envelope modes.
+    content = {"accepted": True, "message": envelope.dump(), "validation": validation}
+    return JSONResponse(status_code=200, content=content, headers=headers, media_type=UEMP_MEDIA_TYPE)
+
+
+def _idempotency_conflict(key: str) -> JSONResponse:
+    return _protocol_error(
+        status_code=409,
+        code="business-duplicate-request",
+        message=f"Idempotency key '{key}' was already used with a different payload",
+        hint="Use a new UEMP-Idempotency-Key for a different payload",
+        action="fix-request",
+    )
+
+
+def _scoped_key(party: str, key: str) -> str:
+    # Parties and client addresses contain no spaces, so keys of different parties never meet.
+    return f"{party} {key}"
+
+
+async def _replay(store: IdempotencyStore, party: str, key: str, body_hash: str) -> Response | None:
+    """Answer from the idempotency store: the stored response, 409, or None on a miss."""
+    if store.blocking:
+        entry = await asyncio.to_thread(store.get, _scoped_key(party, key))
+    else:
+        entry = store.get(_scoped_key(party, key))
+    if entry is None:
+        return None
+    if entry.payload_hash != body_hash:
+        return _idempotency_conflict(key)
+    headers = dict(entry.headers)
+    headers["UEMP-Idempotent-Replay"] = "true"
+    return _ReplayedResponse(content=entry.body, status_code=entry.status_code, headers=headers)
+
+
+async def _remember(
+    store: IdempotencyStore, party: str, key: str, body_hash: str, response: Response
+) -> Response:
+    body = b"".join(response.parts) if isinstance(response, _SplicedResponse) else bytes(response.body)
+    entry = StoredResponse(
+        payload_hash=body_hash,
+        status_code=response.status_code,
+        headers=tuple((name, value) for name, value in response.headers.items() if name != "content-length"),
+        body=body,
+        stored_at=time.time(),
+    )
+    if store.blocking:
+        winner = await asyncio.to_thread(store.put, _scoped_key(party, key), entry)
+    else:
+        winner = store.put(_scoped_key(party, key), entry)
+    if winner.payload_hash != body_hash:
+        # A concurrent request with the same key but another payload got there first.
+        return _idempotency_conflict(key)
+    return response
+
+
+@router.post("/messages", response_model=UEMPValidationResult)
+async def ingest_uemp_message(request: Request):
+    """Validate and accept a UEMP envelope.
+
+    With an idempotency key (`UEMP-Idempotency-Key` or `meta.idempotencyKey`),
+    a retry of the same payload replays the stored response without
+    re-validating, and a different payload under the same key gets 409.
+    Keys are scoped to the sending party: the `{party}` of `UEMP-Message-Id`,
+    else of `meta.id`, else the client address.
+
+    Each response is counted in `app.state.uemp.metrics` by status, outcome
+    (error code, `accepted` or `replayed`) and intent. The stages it got
+    through are timed: `read` (headers and body), `parse` (JSON and
+    idempotency lookup), `validate`, `checks` (signatures and `$link`
+    collections), `serialize` (response and idempotency store) and `publish`
+    (conversation index and stream).
+    """
+    metrics = _settings(request).metrics
+    if metrics is None:
+        return await _ingest_message(request, NullStageTimer())
+    timer = StageTimer(metrics)
+    response = await _ingest_message(request, timer)
+    metrics.count("messages", response.status_code, getattr(response, "outcome", "accepted"), timer.intent)
+    return response
+
+
+async def _ingest_message(request: Request, timer: StageTimer | NullStageTimer) -> Response:
+    rejected = _check_request_headers(
+        request,
+        accepted_content_types=_UEMP_ACCEPTED_CONTENT_TYPES,
+        content_type_hint=f"Use Content-Type: {UEMP_MEDIA_TYPE} (or {UEMP_VERSIONED_MEDIA_TYPE}; fallback: application/json)",
+    )
+    if rejected is not None:
+        return rejected
+
+    settings = _settings(request)
+    store = settings.idempotency
+    header_key = request.headers.get("uemp-idempotency-key")
+    try:
+        body = await read_limited_body(
+            request.stream(),
+            settings.limits,
+            content_length=request.headers.get("content-length"),
+        )
+    except LimitExceeded as exc:
+        return _envelope_error_response(exc)
+    timer.mark("read")
+    body_hash: str | None = None
+    party = party_key(request.scope)
+    # Without a UEMP-Message-Id header, the party is only known once meta.id is parsed.
+    header_party = not party.startswith("client:")
+    if store is not None and header_key and header_party:
+        body_hash = hashlib.sha256(body).hexdigest()
+        replayed = await _replay(store, party, header_key, body_hash)
+        if replayed is not None:
+            return replayed
 
     try:
-        payload = await request.json()
-    except (ValueError, json.JSONDecodeError):
+        payload = json.loads(body)
+    except ValueError:
         return _protocol_error(
             status_code=400,
             code="protocol-invalid-json",
@@ -120,170 +478,972 @@ async def ingest_uemp_message(request: Request):
             action="fix-request",
         )
 
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    if isinstance(meta, dict):
+        timer.intent = meta.get("intent")
+    meta_key = meta.get("idempotencyKey") if isinstance(meta, dict) else None
+    if header_key and isinstance(meta_key, str) and meta_key != header_key:
+        return _protocol_error(
+            status_code=400,
+            code="protocol-header-mismatch",
+            message=f"Header UEMP-Idempotency-Key '{header_key}' does not match meta.idempotencyKey '{meta_key}'",
+            hint="Set UEMP-Idempotency-Key to match meta.idempotencyKey or omit the header",
+            action="fix-request",
+        )
+    idempotency_key = header_key or (meta_key if isinstance(meta_key, str) and meta_key else None)
+    meta_id = meta.get("id") if isinstance(meta, dict) else None
+    if not header_party and isinstance(meta_id, str) and UEMP_MESSAGE_ID_PATTERN.fullmatch(meta_id):
+        party = meta_id.split(":", 2)[1]
+    if store is not None and idempotency_key and body_hash is None:
+        body_hash = hashlib.sha256(body).hexdigest()
+        replayed = await _replay(store, party, idempotency_key, body_hash)
+        if replayed is not None:
+            return replayed
+    timer.mark("parse")
+
     try:
-        message = UEMPMessage.model_validate(payload)
-    except ValidationError as exc:
-        return JSONResponse(
-            status_code=422,
-            content={
-                "code": "protocol-invalid-envelope",
-                "severity": "fatal",
-                "message": "Invalid UEMP envelope",
-                "errors": exc.errors(),
-            },
+        envelope = validate_envelope(
+            payload,
+            header_version=request.headers["uemp-version"],
+            header_message_id=request.headers.get("uemp-message-id"),
+            header_intent=request.headers.get("uemp-intent"),
+            header_conversation_id=request.headers.get("uemp-conversation-id"),
+            mode=settings.envelope_mode,
         )
+    except EnvelopeError as exc:
+        return _envelope_error_response(exc)
+    timer.mark("validate")
+
+    if settings.signature_keys is not None and payload.get("signatures"):
+        report = await run_in_threadpool(verify_message, payload, settings.signature_keys)
+        if not report.valid:
+            return _envelope_error_response(signature_error(report))
+    # `\u` escapes could spell "$link"; anything else without it has no links to resolve.
+    if settings.links is not None and (b"$link" in body or b"\\u" in body):
+        failure = await settings.links.check_message(payload)
+        if failure is not None:
+            return _envelope_error_response(failure)
+    timer.mark("checks")
+
+    response = _accepted_response(request, envelope, body, body_hash)
+    if store is not None and idempotency_key:
+        response = await _remember(store, party, idempotency_key, body_hash, response)
+        if response.status_code != 200:
+            return response
+    timer.mark("serialize")
+    await _record(settings, envelope, body)
+    _publish(settings, envelope)
+    timer.mark("publish")
+    return response
+
+
+def _stream_hub(settings: UEMPSettings) -> ConversationHub:
+    return settings.stream or _default_stream()
+
+
+@functools.cache
+def _default_stream() -> ConversationHub:
+    return ConversationHub()
+
+
+async def _record(settings: UEMPSettings, envelope: ValidatedEnvelope, body: bytes) -> None:
+    """Index an accepted message for `/messages/{id}` and `/conversations/{id}`."""
+    store = settings.conversations
+    if store is None:
+        return
+    record = message_record(envelope, body, keep_body=store.keep_bodies)
+    if store.blocking:
+        await asyncio.to_thread(store.add, record)
+    else:
+        store.add(record)
+
+
+def _publish(settings: UEMPSettings, envelope: ValidatedEnvelope) -> None:
+    """Fan an accepted message out to its conversation's stream subscribers."""
+    conversation_id = envelope.meta.conversation_id
+    if not conversation_id:
+        return
+    hub = _stream_hub(settings)
+    hub.publish(conversation_id, envelope.payload)
+    if ends_conversation(envelope.payload["meta"]):
+        hub.complete(conversation_id)
+
+
+def _malformed_id(name: str, value: str) -> JSONResponse:
+    return _protocol_error(
+        status_code=400,
+        code="protocol-malformed",
+        message=f"Invalid {name} '{value}'",
+        hint=f"Pass {name} as uemp:{{party}}:{{year}}:{{id}}",
+        action="fix-request",
+    )
+
 
-    protocol_token = message.meta.protocol
-    if protocol_token.lower().startswith("aip/"):
+def _lookup_headers(request: Request) -> dict[str, str]:
+    return {"UEMP-Version": request.headers["uemp-version"]}
+
+
+@router.get("/messages/{message_id}")
+async def get_uemp_message(request: Request, message_id: str):
+    """Look up an accepted message by `meta.id` (404 if unknown or expired).
+
+    Returns the stored record, the IDs of messages whose `meta.replyTo` is this
+    message, and the original message when the store keeps bodies.
+    """
+    rejected = _check_uemp_headers(request)
+    if rejected is not None:
+        return rejected
+    if not UEMP_MESSAGE_ID_PATTERN.fullmatch(message_id):
+        return _malformed_id("message ID", message_id)
+    store = _settings(request).conversations
+    record = store.get(message_id) if store is not None else None
+    if record is None:
         return _protocol_error(
-            status_code=400,
-            code="protocol-unknown-token-family",
-            message=f"Token family 'aip' is not supported in protocol token '{protocol_token}'",
-            hint="Use protocol token format uemp/X.Y",
-            action="fix-message",
+            status_code=404,
+            code="protocol-unknown-message",
+            message=f"Unknown message ID '{message_id}'",
+            hint="Only accepted messages are kept, and only until they expire",
+            action="fix-request",
         )
-    if not UEMP_PROTOCOL_PATTERN.fullmatch(protocol_token):
+    content = record.summary()
+    content["replies"] = store.replies(message_id)
+    if record.body is not None:
+        content["message"] = json.loads(record.body)
+    return JSONResponse(content, headers=_lookup_headers(request))
+
+
+_CONVERSATION_PAGE = 100
+_CONVERSATION_MAX_PAGE = 1000
+
+
+@router.get("/conversations/{conversation_id}")
+async def get_uemp_conversation(request: Request, conversation_id: str):
+    """List a conversation's accepted messages in arrival order (404 if none are known).
+
+    Pages hold `?limit=` records (default 100, at most 1000); pass the
+    returned `next` as `?after=` for the following page.
+    """
+    rejected = _check_uemp_headers(request)
+    if rejected is not None:
+        return rejected
+    if not UEMP_MESSAGE_ID_PATTERN.fullmatch(conversation_id):
+        return _malformed_id("conversation ID", conversation_id)
+    limit = request.query_params.get("limit") or str(_CONVERSATION_PAGE)
+    if not limit.isdigit() or not 1 <= int(limit) <= _CONVERSATION_MAX_PAGE:
         return _protocol_error(
             status_code=400,
-            code="protocol-invalid-version",
-            message=f"Invalid protocol token '{protocol_token}'",
-            hint="Use protocol token format uemp/X.Y",
-            action="fix-message",
+            code="protocol-malformed",
+            message=f"Invalid limit '{limit}'",
+            hint=f"Pass ?limit= between 1 and {_CONVERSATION_MAX_PAGE}",
+            action="fix-request",
         )
-
-    version = protocol_token.split("/", 1)[1]
-    if header_version != version:
+    after = request.query_params.get("after")
+    store = _settings(request).conversations
+    records = store.conversation(conversation_id, after=after, limit=int(limit) + 1) if store is not None else []
+    if not records and after is None:
         return _protocol_error(
-            status_code=400,
-            code="protocol-header-mismatch",
-            message=f"Header UEMP-Version '{header_version}' does not match meta.protocol '{protocol_token}'",
-            hint=f"Set UEMP-Version to '{version}'",
+            status_code=404,
+            code="protocol-unknown-conversation",
+            message=f"Unknown conversation ID '{conversation_id}'",
+            hint="Only conversations with accepted, unexpired messages are kept",
             action="fix-request",
         )
+    page = records[: int(limit)]
+    content: dict[str, Any] = {"conversationId": conversation_id, "messages": [r.summary() for r in page]}
+    if len(records) > len(page):
+        content["next"] = page[-1].id
+    return JSONResponse(content, headers=_lookup_headers(request))
+
+
+@router.get("/stream")
+async def stream_conversation(request: Request):
+    """Stream a conversation's accepted messages as Server-Sent Events (spec 5.2.1).
+
+    Each message accepted on `/messages` for `?conversationId=` becomes a
+    `uemp-message` event. The stream ends with `done` once a message's
+    `meta.workflow.validTransitions` is empty. Slow readers are handled by the
+    hub's queue policy (see `ConversationHub`).
+    """
+    rejected = _check_uemp_headers(request)
+    if rejected is not None:
+        return rejected
+    conversation_id = request.query_params.get("conversationId") or ""
+    if not UEMP_MESSAGE_ID_PATTERN.fullmatch(conversation_id):
+        return _malformed_id("conversationId", conversation_id)
+    hub = _stream_hub(_settings(request))
+    try:
+        subscription = hub.subscribe(conversation_id)
+    except EnvelopeError as exc:
+        return _envelope_error_response(exc)
+    return StreamingResponse(
+        subscription.frames(hub.heartbeat_s),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "UEMP-Version": request.headers["uemp-version"],
+            "UEMP-Conversation-Id": conversation_id,
+        },
+    )
+
+
+class _RequestDrivenStreamingResponse(StreamingResponse):
+    """Streaming response whose body iterator consumes the request body.
+
+    The stock `StreamingResponse` may listen for client disconnects by calling
+    `receive()` concurrently, which would steal request body chunks from
+    `request.stream()`. Disconnects still surface through the request stream.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    *,
+    gzipped: bool,
+    max_line_bytes: int,
+) -> AsyncIterator[list[bytes | None]]:
+    """Yield the complete, non-blank lines available after each received chunk.
+
+    A line longer than `max_line_bytes` is dropped while it streams in and
+    reported as None, so one oversized line cannot grow the buffer.
+    """
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    # Fragments of the current, not yet terminated line (joined once complete).
+    pending: list[bytes] = []
+    pending_bytes = 0
+    oversized = False
+
+    def _split(data: bytes) -> list[bytes | None]:
+        nonlocal pending_bytes, oversized
+        *complete, tail = data.split(b"\n")
+        lines: list[bytes | None] = []
+        for i, line in enumerate(complete):
+            if i == 0 and (oversized or pending):
+                if oversized or pending_bytes + len(line) > max_line_bytes:
+                    lines.append(None)
+                else:
+                    lines.append(b"".join(pending) + line)
+                pending.clear()
+                pending_bytes = 0
+                oversized = False
+            elif len(line) > max_line_bytes:
+                lines.append(None)
+            elif line.strip():
+                lines.append(line)
+        if tail and not oversized:
+            pending_bytes += len(tail)
+            if pending_bytes > max_line_bytes:
+                pending.clear()
+                oversized = True
+            else:
+                pending.append(tail)
+        return [line for line in lines if line is None or line.strip()]
+
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if inflater is None:
+            lines = _split(chunk)
+            if lines:
+                yield lines
+            continue
+        data = inflater.decompress(chunk, _GZIP_MAX_INFLATE)
+        while True:
+            lines = _split(data)
+            if lines:
+                yield lines
+            if not inflater.unconsumed_tail:
+                break
+            data = inflater.decompress(inflater.unconsumed_tail, _GZIP_MAX_INFLATE)
+
+    if inflater is not None:
+        lines = _split(inflater.flush())
+        if lines:
+            yield lines
+    if oversized:
+        yield [None]
+    else:
+        last = b"".join(pending)
+        if last.strip():
+            yield [last]
+
+
+def _batch_line_result(
+    index: int,
+    line: bytes | None,
+    limits: UEMPLimits,
+    keys: KeyStore | None = None,
+    accepted: list[tuple[ValidatedEnvelope, bytes]] | None = None,
+    tracker: BatchTracker | None = None,
+    signatures: dict[str, Any] | None = None,
+    **checks: Any,
+) -> dict[str, Any]:
+    """The result line for one batch line; accepted envelopes are appended to `accepted`.
+
+    `signatures` is the line's report from `verify_batch`, when its signatures
+    were verified ahead of the other checks.
+    """
+    payload, outcome = check_message(line, limits, keys, **checks)
+    if signatures is not None and not signatures["valid"] and not isinstance(outcome, EnvelopeError):
+        outcome = signature_error(SignatureReport(valid=False, results=signatures["signatures"]))
+    if tracker is not None:
+        index, placed = tracker.place(line, payload)
+        if placed is False:
+            return {"index": index, "skipped": True}
+        if placed is not True:
+            outcome = placed
+        elif isinstance(outcome, EnvelopeError):
+            tracker.reject()
+    if isinstance(outcome, EnvelopeError):
+        return {"index": index, "accepted": False, "status": outcome.status_code, "error": outcome.content()}
+    if accepted is not None:
+        accepted.append((outcome, line))
+    return {"index": index, "accepted": True, "status": 200, "id": outcome.meta.id}
+
+
+def _batch_results(
+    start: int,
+    lines: list[bytes | None],
+    limits: UEMPLimits,
+    keys: KeyStore | None,
+    tracker: BatchTracker | None,
+    checks: dict[str, Any],
+    pool: concurrent.futures.Executor | None = None,
+) -> tuple[list[dict[str, Any]], list[tuple[ValidatedEnvelope, bytes]]]:
+    """Result lines for a chunk of batch lines, and the accepted envelopes to index once it is saved.
+
+    With `keys`, the chunk's signatures are verified first with `verify_batch`
+    (in `pool` if given), then each line gets the remaining checks.
+    """
+    reports: list[dict[str, Any] | None] = [None] * len(lines)
+    if keys is not None:
+        reports = verify_batch([b"" if line is None else line for line in lines], keys, executor=pool)
+    accepted: list[tuple[ValidatedEnvelope, bytes]] = []
+    results = [
+        _batch_line_result(start + i, line, limits, None, accepted, tracker, reports[i], **checks)
+        for i, line in enumerate(lines)
+    ]
+    return results, accepted
+
+
+def _batch_failure(error: EnvelopeError) -> bytes:
+    """The only result line of a batch whose envelope was refused."""
+    failure = {"accepted": False, "status": error.status_code, "error": error.content()}
+    return (json.dumps({"batch": failure}) + "\n").encode("utf-8")
+
+
+def _batch_moved(tracker: BatchTracker) -> EnvelopeError:
+    batch_id = tracker.progress.id
+    return EnvelopeError(
+        status_code=409,
+        code="protocol-batch-conflict",
+        message=f"Batch '{batch_id}' was continued by another request",
+        hint=f"Send one request per batch at a time; GET /api/uemp/batch/{batch_id} for where to resume",
+        action="retry",
+    )
 
-    message_id = message.meta.id
-    if message_id.lower().startswith("aip:"):
+
+async def _batch_call(store: BatchStore, func: Callable[..., Any], *args: Any) -> Any:
+    """`func(*args)`, in a worker thread when `store` is blocking."""
+    if store.blocking:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+@router.post("/batch")
+async def ingest_uemp_batch(request: Request):
+    """Validate an NDJSON batch line by line, streaming one result per line.
+
+    The body is read incrementally from `request.stream()` (optionally with
+    `Content-Encoding: gzip`), so neither the batch nor its results are held
+    in memory. `UEMP-Version`, `UEMP-Intent` and `UEMP-Conversation-Id` apply
+    to every line; per-line message IDs are not compared with a header.
+
+    A first line that is a batch envelope (`meta.intent` "batch", see
+    `uemp_batches`) makes the batch resumable: lines are placed by
+    `meta.batch.index`, checked against `messageCount` and the streaming
+    `checksum`, and the high-water mark is saved after each chunk of lines.
+    A closing `{"batch": {...}}` line reports where the batch stands. Batch
+    IDs are scoped to the sending party (`party_key`).
+    """
+    rejected = _check_request_headers(
+        request,
+        accepted_content_types={_NDJSON_MEDIA_TYPE},
+        content_type_hint=f"Use Content-Type: {_NDJSON_MEDIA_TYPE}",
+    )
+    if rejected is not None:
+        return rejected
+
+    content_encoding = (request.headers.get("content-encoding") or "identity").strip().lower()
+    if content_encoding not in ("identity", "gzip"):
         return _protocol_error(
-            status_code=400,
-            code="protocol-unknown-token-family",
-            message=f"Token family 'aip' is not supported in message ID '{message_id}'",
-            hint="Use format uemp:{party}:{year}:{id}",
-            action="fix-message",
+            status_code=415,
+            code="protocol-unsupported-media-type",
+            message=f"Unsupported content encoding '{content_encoding}'",
+            hint="Send the batch uncompressed or with Content-Encoding: gzip",
+            action="fix-request",
         )
-    if not UEMP_MESSAGE_ID_PATTERN.fullmatch(message_id):
+
+    settings = _settings(request)
+    party = party_key(request.scope)
+    header_version = request.headers["uemp-version"]
+    header_checks = {
+        "header_version": header_version,
+        "header_intent": request.headers.get("uemp-intent"),
+        "header_conversation_id": request.headers.get("uemp-conversation-id"),
+        "mode": settings.envelope_mode,
+    }
+
+    async def results() -> AsyncIterator[bytes]:
+        index = 0
+        tracker: BatchTracker | None = None
+        first = True
+        try:
+            async for lines in _iter_ndjson_lines(
+                request.stream(),
+                gzipped=content_encoding == "gzip",
+                max_line_bytes=settings.limits.max_message_bytes,
+            ):
+                if first and settings.batches is not None and lines[0] is not None:
+                    opened = parse_batch_envelope(lines[0])
+                    if opened is not None:
+                        if not isinstance(opened, EnvelopeError):
+                            opened = await _batch_call(
+                                settings.batches, open_batch, settings.batches, replace(opened, party=party)
+                            )
+                        if isinstance(opened, EnvelopeError):
+                            yield _batch_failure(opened)
+                            return
+                        tracker = opened
+                        lines = lines[1:]
+                first = False
+                if not lines:
+                    continue
+                keys = settings.signature_keys
+                if keys is None:
+                    checked, accepted = _batch_results(index, lines, settings.limits, None, tracker, header_checks)
+                else:
+                    # Signature checks are CPU-bound; keep them off the event loop.
+                    checked, accepted = await run_in_threadpool(
+                        _batch_results,
+                        index,
+                        lines,
+                        settings.limits,
+                        keys,
+                        tracker,
+                        header_checks,
+                        settings.signature_pool,
+                    )
+                index += len(lines)
+                if settings.metrics is not None:
+                    for result in checked:
+                        if "skipped" not in result:
+                            outcome = result["error"]["code"] if "error" in result else "accepted"
+                            settings.metrics.count("batch", result["status"], outcome)
+                # Saved before the results are sent, so a client that drops now resumes after them.
+                saved = tracker is None or await _batch_call(settings.batches, tracker.save, settings.batches)
+                # Indexed only once saved: a request that lost the batch to another one
+                # must not index lines the other request will index too.
+                if saved:
+                    for envelope, line in accepted:
+                        await _record(settings, envelope, line)
+                out = [json.dumps(result) for result in checked]
+                yield ("\n".join(out) + "\n").encode("utf-8")
+                if not saved:
+                    yield (json.dumps(tracker.summary(_batch_moved(tracker))) + "\n").encode("utf-8")
+                    return
+        except zlib.error:
+            failure = EnvelopeError(
+                status_code=400,
+                code="protocol-malformed",
+                message="Batch body is not valid gzip data",
+                hint="Compress the whole NDJSON body with gzip or send it uncompressed",
+                action="fix-request",
+            )
+            error_line = {"index": index, "accepted": False, "status": failure.status_code, "error": failure.content()}
+            yield (json.dumps(error_line) + "\n").encode("utf-8")
+        if tracker is not None:
+            yield (json.dumps(tracker.summary()) + "\n").encode("utf-8")
+
+    return _RequestDrivenStreamingResponse(
+        results(),
+        status_code=200,
+        media_type=_NDJSON_MEDIA_TYPE,
+        headers={"UEMP-Version": header_version},
+    )
+
+
+@router.get("/batch/{batch_id}")
+async def get_uemp_batch(request: Request, batch_id: str):
+    """Where the sending party's batch stands: `next` is the index to resume from (404 if unknown or expired)."""
+    rejected = _check_uemp_headers(request)
+    if rejected is not None:
+        return rejected
+    store = _settings(request).batches
+    progress = await _batch_call(store, store.get, party_key(request.scope), batch_id) if store is not None else None
+    if progress is None:
         return _protocol_error(
-            status_code=400,
-            code="protocol-invalid-message-id",
-            message=f"Invalid UEMP message ID '{message_id}'",
-            hint="Use format uemp:{party}:{year}:{id}",
-            action="fix-message",
+            status_code=404,
+            code="protocol-unknown-batch",
+            message=f"Unknown batch ID '{batch_id}'",
+            hint="Batches are kept only until they expire; open it again with its batch envelope",
+            action="fix-request",
         )
+    return JSONResponse(progress.status(), headers=_lookup_headers(request))
+
+
+WS_SUBPROTOCOL = "uemp.v1"
+# Close code for a handshake without the uemp.v1 subprotocol (RFC 6455 protocol error).
+_WS_PROTOCOL_ERROR = 1002
+
+
+def _ws_result(frame: int, payload: Any, outcome: ValidatedEnvelope | EnvelopeError) -> str:
+    if isinstance(outcome, EnvelopeError):
+        meta = payload.get("meta") if isinstance(payload, dict) else None
+        message_id = meta.get("id") if isinstance(meta, dict) and isinstance(meta.get("id"), str) else None
+        result = {"id": message_id, "frame": frame, "accepted": False, "status": outcome.status_code}
+        result["error"] = outcome.content()
+    else:
+        result = {"id": outcome.meta.id, "frame": frame, "accepted": True, "status": 200}
+    return json.dumps(result)
+
+
+@router.websocket("/ws")
+async def uemp_websocket(websocket: WebSocket):
+    """UEMP over WebSocket (spec 5.2.3): one message per text frame, one result per message.
 
-    header_message_id = request.headers.get("uemp-message-id")
-    if header_message_id and header_message_id != message_id:
+    The client must offer the `uemp.v1` subprotocol and, as on every HTTP
+    route, send `UEMP-Version` on the handshake. Each frame gets the
+    `/messages` envelope, limit and signature checks, and accepted messages are
+    published to their conversation stream. Up to `ws_max_in_flight` frames per
+    connection are validated concurrently, so results may arrive out of order;
+    each carries the message's `meta.id` and the frame's sequence number.
+    Reading pauses while the window is full.
+    """
+    if WS_SUBPROTOCOL not in websocket.scope.get("subprotocols", ()):
+        await websocket.close(code=_WS_PROTOCOL_ERROR, reason=f"subprotocol {WS_SUBPROTOCOL} required")
+        return
+    header_version = websocket.headers.get("uemp-version")
+    if not header_version:
+        await websocket.close(code=_WS_PROTOCOL_ERROR, reason="UEMP-Version header required")
+        return
+    await websocket.accept(subprotocol=WS_SUBPROTOCOL)
+
+    settings = _settings(websocket)
+    checks = {
+        "header_version": header_version,
+        "mode": settings.envelope_mode,
+    }
+    keys = settings.signature_keys
+    window = asyncio.Semaphore(settings.ws_max_in_flight)
+    send_lock = asyncio.Lock()
+    in_flight: set[asyncio.Task] = set()
+
+    async def handle(frame: int, data: bytes | None, text: str | None) -> None:
+        try:
+            if text is None:
+                payload, outcome = None, EnvelopeError(
+                    status_code=400,
+                    code="protocol-malformed",
+                    message="Binary frames are not supported",
+                    hint="Send one UEMP JSON message per text frame",
+                    action="fix-message",
+                )
+            else:
+                # Checks run in worker threads so the frames in the window overlap
+                # (and CPU-bound signature checks stay off the event loop).
+                payload, outcome = await asyncio.to_thread(check_message, data, settings.limits, keys, **checks)
+            if not isinstance(outcome, EnvelopeError):
+                await _record(settings, outcome, data)
+                _publish(settings, outcome)
+            if settings.metrics is not None:
+                if isinstance(outcome, EnvelopeError):
+                    settings.metrics.count("ws", outcome.status_code, outcome.code)
+                else:
+                    settings.metrics.count("ws", 200, "accepted", outcome.meta.intent)
+            result = _ws_result(frame, payload, outcome)
+            # The client may close while results are still being computed.
+            with contextlib.suppress(WebSocketDisconnect, RuntimeError, OSError):
+                async with send_lock:
+                    await websocket.send_text(result)
+        finally:
+            window.release()
+
+    frame = 0
+    try:
+        while True:
+            await window.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                window.release()
+                break
+            text = message.get("text")
+            data = text.encode("utf-8") if text is not None else None
+            task = asyncio.create_task(handle(frame, data, text))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            frame += 1
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+@functools.cache
+def _default_validation() -> ValidationChainExecutor:
+    return ValidationChainExecutor(ValidatorAssets(schema_set_cache(), schematron_engine()))
+
+
+@router.post("/validate-native")
+async def validate_native_document(request: Request):
+    """Validate a native XML document with the chain of `profileId` (spec 9.6.2).
+
+    Returns `{"valid", "profileId", "errors", "stages"}`; an invalid document
+    is still a 200. Stages run off the event loop (see `ValidationChainExecutor`)
+    against schemas compiled once per process.
+
+    The body is read under the D5 limits like any other POST, except that the
+    `xml` string may take up the whole message size.
+    """
+    settings = _settings(request)
+    limits = settings.limits
+    try:
+        body = await read_limited_body(
+            request.stream(),
+            replace(limits, max_string_bytes=limits.max_message_bytes),
+            content_length=request.headers.get("content-length"),
+        )
+    except LimitExceeded as exc:
+        return _envelope_error_response(exc)
+    try:
+        payload = NativeValidationRequest.model_validate_json(body)
+    except ValidationError as e:
         return _protocol_error(
             status_code=400,
-            code="protocol-header-mismatch",
-            message=f"Header UEMP-Message-Id '{header_message_id}' does not match meta.id '{message_id}'",
-            hint="Set UEMP-Message-Id to match meta.id or omit the header",
-            action="fix-request",
+            code="protocol-malformed",
+            message=f"Invalid validation request: {e.error_count()} error(s)",
+            hint='Send JSON {"profileId": ..., "xml": ...} (optionally "revisionId")',
+            action="fix-message",
         )
 
-    header_intent = request.headers.get("uemp-intent")
-    if header_intent and header_intent != message.meta.intent:
+    loaded = _registry(settings).get(payload.profileId)
+    if loaded is None:
         return _protocol_error(
             status_code=400,
-            code="protocol-header-mismatch",
-            message=f"Header UEMP-Intent '{header_intent}' does not match meta.intent '{message.meta.intent}'",
-            hint="Set UEMP-Intent to match meta.intent or omit the header",
-            action="fix-request",
+            code="protocol-unknown-profile",
+            message=f"Unknown profileId: {payload.profileId}",
+            hint="Supported profiles are listed in /.well-known/uemp",
+            action="fix-message",
         )
 
-    header_conversation_id = request.headers.get("uemp-conversation-id")
-    if header_conversation_id and header_conversation_id != (
-        message.meta.conversation_id or ""
-    ):
+    try:
+        result = await (settings.validation or _default_validation()).run(loaded, payload.xml)
+    except NativeValidationError as exc:
+        return _envelope_error_response(exc)
+    if payload.revisionId:
+        result["revisionId"] = payload.revisionId
+    return JSONResponse(result)
+
+
+@functools.cache
+def _default_registry() -> ProfileRegistry:
+    return ProfileRegistry(DEFAULT_PROFILES_DIR)
+
+
+def _registry(settings: UEMPSettings) -> ProfileRegistry:
+    return settings.registry or _default_registry()
+
+
+def _capabilities_document(settings: UEMPSettings) -> CachedDocument:
+    """The encoded capability document, built once per profile snapshot."""
+    return _registry(settings).snapshot.derived(
+        "capabilities",
+        lambda snapshot: encode_document(
+            build_capabilities(
+                snapshot.profiles,
+                intents=settings.intents,
+                limits=settings.limits,
+                signatures=settings.signature_keys is not None,
+            )
+        ),
+    )
+
+
+def _discovery_response(request: Request) -> Response:
+    document = _capabilities_document(_settings(request))
+    headers = {"ETag": document.etag, "Cache-Control": document.cache_control}
+    if document.not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
+
+
+@router.get("/capabilities")
+async def get_uemp_capabilities(request: Request):
+    """Return UEMP capabilities (same document as `/.well-known/uemp`)."""
+    return _discovery_response(request)
+
+
+_PROFILE_MAX_S = 60
+
+
+async def _metrics_response(request: Request) -> Response:
+    return PlainTextResponse(_settings(request).metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def _profile_response(request: Request) -> Response:
+    seconds = request.query_params.get("seconds") or "5"
+    try:
+        duration = float(seconds)
+    except ValueError:
+        duration = -1.0
+    if not 0 < duration <= _PROFILE_MAX_S:
         return _protocol_error(
             status_code=400,
-            code="protocol-header-mismatch",
-            message=(
-                f"Header UEMP-Conversation-Id '{header_conversation_id}' does not match "
-                f"meta.conversationId '{message.meta.conversation_id or ''}'"
-            ),
-            hint="Set UEMP-Conversation-Id to match meta.conversationId or omit the header",
+            code="protocol-malformed",
+            message=f"Invalid seconds '{seconds}'",
+            hint=f"Pass ?seconds= between 0 and {_PROFILE_MAX_S}",
             action="fix-request",
         )
+    # This handler runs on the event loop thread, which is the one sampled.
+    sampler = StackSampler().start()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        sampler.stop()
+    return PlainTextResponse(sampler.collapsed())
 
-    response = UEMPValidationResult(
-        accepted=True,
-        message=message,
-        validation={"protocol": "ok", "id": "ok"},
-    )
-    return JSONResponse(
-        status_code=200,
-        content=response.model_dump(by_alias=True),
-        headers={
-            "UEMP-Version": version,
-            "UEMP-Message-Id": message_id,
-        },
-        media_type=UEMP_MEDIA_TYPE,
-    )
 
+def create_app(
+    *,
+    envelope_mode: str = "fast",
+    response_mode: str = "full",
+    profiles_dir: str | Path | None = None,
+    intents: Mapping[str, Sequence[str]] | None = None,
+    idempotency_store: IdempotencyStore | None = None,
+    conversation_store: ConversationStore | None = None,
+    batch_store: BatchStore | None = None,
+    link_resolver: LinkResolver | None = None,
+    limits: UEMPLimits | None = None,
+    xsd_root: str | Path | None = None,
+    schematron_root: str | Path | None = None,
+    schematron_pool_size: int = DEFAULT_POOL_SIZE,
+    warm_validators_on_start: bool = False,
+    validation_workers: int = 0,
+    validation_timeout_ms: int | None = None,
+    profile_reload_interval_s: float | None = None,
+    signature_keys_dir: str | Path | None = None,
+    signature_key_ttl_s: float = DEFAULT_KEY_TTL_S,
+    signature_workers: int = 0,
+    stream_queue_size: int = DEFAULT_QUEUE_SIZE,
+    stream_slow_consumer: str = "drop-oldest",
+    stream_max_subscribers: int | None = None,
+    stream_heartbeat_s: float | None = DEFAULT_HEARTBEAT_S,
+    ws_max_in_flight: int = 8,
+    rate_limit: float | None = None,
+    rate_burst: int | None = None,
+    rate_limiter: RateLimiter | None = None,
+    max_concurrent: int | None = None,
+    max_queue_s: float = DEFAULT_MAX_QUEUE_S,
+    metrics: bool = True,
+    profiling: bool = False,
+) -> FastAPI:
+    """Build the reference app.
 
-@router.get("/capabilities")
-async def get_uemp_capabilities():
-    """Return API-local UEMP capabilities."""
-    return {
-        "protocol": "uemp/1.0",
-        "mediaTypes": [UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE],
-        "paths": {
-            "messages": "/api/uemp/messages",
-            "discovery": "/.well-known/uemp",
-        },
-        "headers": {
-            "required": ["UEMP-Version"],
-            "supported": [
-                "UEMP-Version",
-                "UEMP-Message-Id",
-                "UEMP-Intent",
-                "UEMP-Conversation-Id",
-            ],
-        },
-    }
+    `envelope_mode` selects `uemp_envelope` validation: "fast" (meta-only
+    checks, `data`/`context` left opaque) or "strict" (Pydantic models).
+    `response_mode` is the default accepted-message response (see
+    `RESPONSE_MODES`); clients may override it per request with `Prefer`.
+
+    The capability document is built once per profile snapshot from the
+    profiles under `profiles_dir` (default: the repository's example profiles)
+    and the per-domain `intents`, then served pre-encoded with an ETag.
+
+    `idempotency_store` defaults to a per-process `MemoryIdempotencyStore`;
+    pass a `TieredIdempotencyStore` over a `SQLiteIdempotencyStore` to share
+    keys between workers.
+
+    `conversation_store` indexes accepted messages for
+    `/api/uemp/messages/{id}` and `/api/uemp/conversations/{id}`; it defaults
+    to a per-process `MemoryConversationStore` holding compact records
+    without bodies. Use a `SQLiteConversationStore` to share it between workers.
+
+    `batch_store` keeps the high-water marks of resumable batches
+    (`/api/uemp/batch` with a batch envelope); it defaults to a per-process
+    `MemoryBatchStore`. A `SQLiteBatchStore` lets any worker resume a batch,
+    but cannot verify the checksum of a batch resumed from it.
+
+    `link_resolver` makes `/api/uemp/messages` fetch and verify every
+    `$type: external-collection` `$link` in `data` (`$count`, `$checksum`)
+    before accepting the message; without one, links stay opaque.
+
+    `limits` overrides the spec D5 size limits enforced while request bodies
+    (and batch lines) are streamed in.
+
+    `xsd_root` is where `/api/uemp/validate-native` finds the allowlisted XSD
+    schema sets (default: `$UEMP_XSD_ROOT` or `profiles/xsd`); compiled
+    schemas are shared process-wide per root. Likewise `schematron_root`
+    (default: `$UEMP_SCHEMATRON_ROOT` or `profiles/schematron`) holds the
+    allowlisted Schematron XSLT, each compiled into a pool of at most
+    `schematron_pool_size` transformers.
+
+    `warm_validators_on_start` compiles every XSD set and XSLT referenced by
+    the loaded validation chains before the app is returned, instead of on
+    first use; compile times (or errors) end up in `app.state.uemp.warmup`.
+
+    `validation_workers` > 0 runs the CPU-bound chain stages (xsd, schematron)
+    in a pool of that many processes, so large documents never hold the GIL
+    the event loop needs; each worker compiles the referenced assets as it
+    starts when `warm_validators_on_start` is set. `validation_timeout_ms`
+    applies to stages without their own `timeoutMs`.
 
+    `profile_reload_interval_s` re-scans `profiles_dir` at that interval while
+    the app runs and swaps in changed profiles (and a rebuilt capability
+    document) without a restart; see `ProfileRegistry`.
+
+    `signature_keys_dir` enables verification of `signatures` (spec A1) on
+    `/messages` and `/batch` against the certificates and public keys in that
+    directory, each parsed once per `signature_key_ttl_s`; see `uemp_signatures`.
+    `signature_workers` > 0 verifies each chunk of a `/batch` body with
+    `verify_batch` in one pool of that many processes, kept for the life of
+    the app; otherwise chunks are verified in a worker thread.
+
+    `/api/uemp/stream` subscribers each get a queue of `stream_queue_size`
+    events; a reader further behind loses its oldest events
+    (`stream_slow_consumer="drop-oldest"`) or is disconnected (`"disconnect"`).
+    `stream_max_subscribers` caps open streams (503 beyond it), and idle streams
+    get a comment line every `stream_heartbeat_s`; see `uemp_stream`.
+
+    `ws_max_in_flight` is how many frames of one `/api/uemp/ws` connection are
+    validated concurrently before the server stops reading from it.
+
+    Admission control on `/api/uemp/messages` and `/api/uemp/batch` runs
+    before the body is read (see `uemp_admission`). `rate_limit` allows each
+    party (the `{party}` of `UEMP-Message-Id`, else the client address) that
+    many requests per second, in bursts of `rate_burst` (default: one
+    second's worth). Beyond that it gets 429 with `Retry-After`.
+    `rate_limiter` replaces the per-process buckets, e.g. with a
+    `SQLiteRateLimiter` shared between workers. `max_concurrent` caps the
+    requests in progress. Requests beyond the cap queue for at most
+    `max_queue_s`, or are shed right away with 503 and `Retry-After` when the
+    expected wait is longer.
+
+    `metrics` counts ingest outcomes and times the `/messages` stages, served
+    as Prometheus text on `/metrics` (see `uemp_metrics`). `profiling` also
+    enables `/metrics/profile?seconds=N`, which samples the event loop
+    thread's stack for N seconds and returns collapsed stacks for a flame graph.
+    """
+    if envelope_mode not in ENVELOPE_MODES:
+        raise ValueError(f"envelope_mode must be one of {ENVELOPE_MODES}, got {envelope_mode!r}")
+    if response_mode not in RESPONSE_MODES:
+        raise ValueError(f"response_mode must be one of {RESPONSE_MODES}, got {response_mode!r}")
+    if ws_max_in_flight < 1:
+        raise ValueError("ws_max_in_flight must be at least 1")
+
+    if rate_limiter is None and rate_limit is not None:
+        rate_limiter = MemoryRateLimiter(rate_limit, rate_burst)
+    admission = None
+    if rate_limiter is not None or max_concurrent is not None:
+        concurrency = None if max_concurrent is None else ConcurrencyLimiter(max_concurrent, max_queue_s=max_queue_s)
+        admission = AdmissionControl(rate_limiter=rate_limiter, concurrency=concurrency)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        watcher = asyncio.create_task(registry.watch(profile_reload_interval_s)) if profile_reload_interval_s else None
+        try:
+            yield
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            stream.close()
+            validation.shutdown()
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
 
-def create_app() -> FastAPI:
     app = FastAPI(
         title="UEMP Reference API",
         version="0.1.0",
         description="Public reference implementation for UEMP envelope validation",
+        lifespan=lifespan,
+    )
+    limits = limits or UEMPLimits()
+    registry = ProfileRegistry(DEFAULT_PROFILES_DIR if profiles_dir is None else profiles_dir)
+    profiles = list(registry.profiles)
+    xsd = schema_set_cache(DEFAULT_XSD_ROOT if xsd_root is None else Path(xsd_root).resolve())
+    schematron = schematron_engine(
+        DEFAULT_SCHEMATRON_ROOT if schematron_root is None else Path(schematron_root).resolve(),
+        schematron_pool_size,
     )
+    warmup = warm_validators(profiles, xsd=xsd, schematron=schematron) if warm_validators_on_start else []
+    validation = ValidationChainExecutor(
+        ValidatorAssets(xsd, schematron),
+        process_workers=validation_workers,
+        default_timeout_ms=validation_timeout_ms,
+        warm_assets=tuple(chain_assets(profiles)) if warm_validators_on_start else (),
+    )
+    stream = ConversationHub(
+        queue_size=stream_queue_size,
+        slow_consumer=stream_slow_consumer,
+        max_subscribers=stream_max_subscribers,
+        heartbeat_s=stream_heartbeat_s,
+    )
+    signature_keys = pool = None
+    if signature_keys_dir is not None:
+        signature_keys = key_store(str(Path(signature_keys_dir).resolve()), signature_key_ttl_s)
+        if signature_workers > 0:
+            pool = signature_pool(signature_workers)
+    app.state.uemp = UEMPSettings(
+        envelope_mode=envelope_mode,
+        response_mode=response_mode,
+        idempotency=MemoryIdempotencyStore() if idempotency_store is None else idempotency_store,
+        conversations=MemoryConversationStore() if conversation_store is None else conversation_store,
+        batches=MemoryBatchStore() if batch_store is None else batch_store,
+        links=link_resolver,
+        limits=limits,
+        registry=registry,
+        intents=intents,
+        signature_keys=signature_keys,
+        signature_pool=pool,
+        stream=stream,
+        ws_max_in_flight=ws_max_in_flight,
+        admission=admission,
+        metrics=Metrics() if metrics else None,
+        xsd=xsd,
+        schematron=schematron,
+        validation=validation,
+        warmup=tuple(warmup),
+    )
+    _capabilities_document(app.state.uemp)
     api = APIRouter(prefix="/api")
     api.include_router(router)
     app.include_router(api)
+    if admission is not None:
+        app.add_middleware(_AdmissionMiddleware, admission=admission, metrics=app.state.uemp.metrics)
+    if metrics:
+        app.add_api_route("/metrics", _metrics_response, methods=["GET"], include_in_schema=False)
+    if profiling:
+        app.add_api_route("/metrics/profile", _profile_response, methods=["GET"], include_in_schema=False)
 
     @app.get("/.well-known/uemp")
-    async def well_known_uemp():
-        return {
-            "protocol": "uemp/1.0",
-            "mediaTypes": [UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE],
-            "paths": {
-                "messages": "/api/uemp/messages",
-                "capabilities": "/api/uemp/capabilities",
-                "discovery": "/.well-known/uemp",
-            },
-            "headers": {
-                "required": ["UEMP-Version"],
-                "supported": [
-                    "UEMP-Version",
-                    "UEMP-Message-Id",
-                    "UEMP-Intent",
-                    "UEMP-Conversation-Id",
-                ],
-            },
-        }
+    async def well_known_uemp(request: Request):
+        return _discovery_response(request)
 
     return app
 
 
-app = create_app()
+# `uvicorn uemp_api:app`; set UEMP_WARM_VALIDATORS=1 to compile validators before serving and
+# UEMP_VALIDATION_WORKERS=N to run CPU-bound validation stages in N processes;
+# UEMP_PROFILE_RELOAD_S=S re-scans the profiles every S seconds; UEMP_RATE_LIMIT=R allows
+# each party R ingest requests per second and UEMP_MAX_CONCURRENT=N caps requests in progress.
+app = create_app(
+    warm_validators_on_start=os.environ.get("UEMP_WARM_VALIDATORS") == "1",
+    validation_workers=int(os.environ.get("UEMP_VALIDATION_WORKERS") or 0),
+    profile_reload_interval_s=float(os.environ.get("UEMP_PROFILE_RELOAD_S") or 0) or None,
+    rate_limit=float(os.environ.get("UEMP_RATE_LIMIT") or 0) or None,
+    max_concurrent=int(os.environ.get("UEMP_MAX_CONCURRENT") or 0) or None,
+)
@@ -0,0 +1,437 @@
+"""
+Resumable NDJSON batches (spec D1).
+
+A batch opens with a batch envelope line:
+
+    {"meta": {"intent": "batch", "batch": {"id": "b-001", "messageCount": 50000, "checksum": "sha256:..."}}}
+
+Each following line is placed at its `meta.batch.index` (or the next index
+when it has none). The store keeps each batch's high-water mark: the index
+up to which every line has been processed. A client that lost its connection
+sends the envelope again with the lines from that index; lines below the
+mark are skipped, and a line past it is refused until the gap is filled.
+Batch IDs are scoped to the party that sent the batch (`BatchProgress.party`).
+
+`checksum` is the SHA-256 of the message lines, each followed by `\\n` (the
+NDJSON body after the envelope line, without blank lines). It is computed
+while the lines stream in. The running hash lives with the batch in a memory
+store. A resumed batch whose hash state was not kept (`SQLiteBatchStore`,
+another process, or a line too large to read) completes with the checksum
+`unverified`.
+
+Stores:
+- `MemoryBatchStore`: per-process LRU with TTL eviction, keeps hash state
+- `SQLiteBatchStore`: high-water marks shared by all workers pointing at the same file
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Protocol
+
+from uemp_envelope import EnvelopeError
+from uemp_schemas import UEMP_CHECKSUM_PATTERN
+
+DEFAULT_TTL_S = 24 * 60 * 60
+MAX_BATCH_ID_LENGTH = 128
+
+
+@dataclass(slots=True)
+class BatchProgress:
+    """How far a batch got: lines `[0, next)` are processed."""
+
+    id: str
+    message_count: int
+    checksum: str | None
+    # The sending party; batch IDs are scoped to it, so one party cannot resume another's batch.
+    party: str = ""
+    next: int = 0
+    rejected: int = 0
+    # Whether `checksum` matched once the batch was complete (None: not known).
+    checksum_ok: bool | None = None
+    updated_at: float = 0.0
+    # Running SHA-256 over lines `[0, next)`; None when it was lost.
+    digest: Any = None
+
+    @property
+    def complete(self) -> bool:
+        return self.next >= self.message_count
+
+    def checksum_status(self) -> str:
+        if self.checksum is None:
+            return "none"
+        if not self.complete:
+            return "pending"
+        return {True: "verified", False: "mismatch", None: "unverified"}[self.checksum_ok]
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "messageCount": self.message_count,
+            "next": self.next,
+            "rejected": self.rejected,
+            "complete": self.complete,
+            "checksum": self.checksum_status(),
+        }
+
+    def copy(self) -> BatchProgress:
+        return replace(self, digest=None if self.digest is None else self.digest.copy())
+
+
+class BatchStore(Protocol):
+    # True for stores that do I/O (or may wait on a lock held by another
+    # process); the API then opens and saves batches in a worker thread.
+    blocking: bool
+
+    def get(self, party: str, batch_id: str) -> BatchProgress | None: ...
+
+    def save(self, progress: BatchProgress, *, previous_next: int | None) -> bool:
+        """Store `progress` if the stored mark is still `previous_next` (None: not stored yet)."""
+        ...
+
+
+class MemoryBatchStore:
+    """In-process LRU bounded by `max_batches`, with batches expiring `ttl_s` after their last update."""
+
+    blocking = False
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_batches: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.max_batches = max_batches
+        self._clock = clock
+        self._batches: OrderedDict[tuple[str, str], BatchProgress] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._batches)
+
+    def _live(self, key: tuple[str, str], now: float) -> BatchProgress | None:
+        progress = self._batches.get(key)
+        if progress is not None and now - progress.updated_at >= self.ttl_s:
+            del self._batches[key]
+            return None
+        return progress
+
+    def get(self, party: str, batch_id: str) -> BatchProgress | None:
+        with self._lock:
+            progress = self._live((party, batch_id), self._clock())
+            if progress is None:
+                return None
+            self._batches.move_to_end((party, batch_id))
+            return progress.copy()
+
+    def save(self, progress: BatchProgress, *, previous_next: int | None) -> bool:
+        with self._lock:
+            now = self._clock()
+            key = (progress.party, progress.id)
+            stored = self._live(key, now)
+            if (None if stored is None else stored.next) != previous_next:
+                return False
+            self._batches[key] = replace(progress.copy(), updated_at=now)
+            self._batches.move_to_end(key)
+            # Only the least recently used end is checked: a batch read since its last
+            # update sits further back even once expired, and is dropped when next read.
+            while self._batches:
+                oldest = next(iter(self._batches.values()))
+                if len(self._batches) > self.max_batches or now - oldest.updated_at >= self.ttl_s:
+                    del self._batches[oldest.party, oldest.id]
+                else:
+                    break
+            return True
+
+
+class SQLiteBatchStore:
+    """High-water marks in a SQLite file shared by several worker processes.
+
+    Hash state is not stored, so a batch resumed from here (rather than
+    finished in the request that started it) completes `unverified`. Expired
+    rows are purged every `purge_every` writes. `save` takes the database
+    write lock, waiting up to 5s for other workers, so the store is `blocking`.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        purge_every: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = str(path)
+        self.ttl_s = ttl_s
+        self.purge_every = purge_every
+        self._clock = clock
+        self._writes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uemp_batches ("
+                " party TEXT NOT NULL,"
+                " id TEXT NOT NULL,"
+                " message_count INTEGER NOT NULL,"
+                " checksum TEXT,"
+                " next INTEGER NOT NULL,"
+                " rejected INTEGER NOT NULL,"
+                " checksum_ok INTEGER,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (party, id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS uemp_batches_updated_at ON uemp_batches (updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, party: str, batch_id: str) -> BatchProgress | None:
+        row = self._connect().execute(
+            "SELECT message_count, checksum, next, rejected, checksum_ok, updated_at FROM uemp_batches"
+            " WHERE party = ? AND id = ? AND updated_at > ?",
+            (party, batch_id, self._clock() - self.ttl_s),
+        ).fetchone()
+        if row is None:
+            return None
+        message_count, checksum, next_index, rejected, checksum_ok, updated_at = row
+        return BatchProgress(
+            id=batch_id,
+            message_count=message_count,
+            checksum=checksum,
+            party=party,
+            next=next_index,
+            rejected=rejected,
+            checksum_ok=None if checksum_ok is None else bool(checksum_ok),
+            updated_at=updated_at,
+            # Nothing is lost before the first line.
+            digest=hashlib.sha256() if next_index == 0 else None,
+        )
+
+    def save(self, progress: BatchProgress, *, previous_next: int | None) -> bool:
+        conn = self._connect()
+        now = self._clock()
+        checksum_ok = None if progress.checksum_ok is None else int(progress.checksum_ok)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM uemp_batches WHERE party = ? AND id = ? AND updated_at <= ?",
+                (progress.party, progress.id, now - self.ttl_s),
+            )
+            if previous_next is None:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO uemp_batches"
+                    " (party, id, message_count, checksum, next, rejected, checksum_ok, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        progress.party,
+                        progress.id,
+                        progress.message_count,
+                        progress.checksum,
+                        progress.next,
+                        progress.rejected,
+                        checksum_ok,
+                        now,
+                    ),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE uemp_batches SET next = ?, rejected = ?, checksum_ok = ?, updated_at = ?"
+                    " WHERE party = ? AND id = ? AND next = ?",
+                    (progress.next, progress.rejected, checksum_ok, now, progress.party, progress.id, previous_next),
+                )
+            self._writes += 1
+            if self.purge_every and self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM uemp_batches WHERE updated_at <= ?", (now - self.ttl_s,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+
+def _envelope_error(message: str, hint: str) -> EnvelopeError:
+    return EnvelopeError(
+        status_code=400, code="protocol-invalid-envelope", message=message, hint=hint, action="fix-request"
+    )
+
+
+def parse_batch_envelope(line: bytes) -> BatchProgress | EnvelopeError | None:
+    """The new batch a batch envelope line opens, None if `line` is an ordinary message."""
+    if b'"batch"' not in line:
+        return None
+    try:
+        payload = json.loads(line)
+    except ValueError:
+        return None
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    if not isinstance(meta, dict) or meta.get("intent") != "batch":
+        return None
+    batch = meta.get("batch")
+    hint = 'Open the batch with {"meta": {"intent": "batch", "batch": {"id", "messageCount", "checksum"}}}'
+    if not isinstance(batch, dict):
+        return _envelope_error("Batch envelope has no meta.batch object", hint)
+    batch_id = batch.get("id")
+    if not isinstance(batch_id, str) or not 0 < len(batch_id) <= MAX_BATCH_ID_LENGTH:
+        return _envelope_error(f"meta.batch.id must be a string of 1 to {MAX_BATCH_ID_LENGTH} characters", hint)
+    count = batch.get("messageCount")
+    if count.__class__ is not int or count < 0:
+        return _envelope_error("meta.batch.messageCount must be a non-negative integer", hint)
+    checksum = batch.get("checksum")
+    if checksum is not None:
+        if not isinstance(checksum, str) or not UEMP_CHECKSUM_PATTERN.fullmatch(checksum.lower()):
+            return _envelope_error("meta.batch.checksum must be 'sha256:' and 64 hex digits", hint)
+        checksum = checksum.lower()
+    return BatchProgress(id=batch_id, message_count=count, checksum=checksum, digest=hashlib.sha256())
+
+
+def open_batch(store: BatchStore, opened: BatchProgress) -> BatchTracker | EnvelopeError:
+    """Start the batch from its envelope, or resume it at its high-water mark."""
+    for _ in range(2):
+        progress = store.get(opened.party, opened.id)
+        if progress is None:
+            if store.save(opened, previous_next=None):
+                return BatchTracker(opened)
+            continue  # Opened concurrently; resume that one.
+        if (progress.message_count, progress.checksum) != (opened.message_count, opened.checksum):
+            return EnvelopeError(
+                status_code=409,
+                code="protocol-batch-conflict",
+                message=f"Batch '{opened.id}' was opened with a different messageCount or checksum",
+                hint="Resume with the original batch envelope, or use a new batch ID",
+                action="fix-request",
+            )
+        return BatchTracker(progress, resumed=True)
+    raise RuntimeError(f"batch {opened.id!r} changed while it was opened")
+
+
+class BatchTracker:
+    """Place, hash and count the lines one request sends for a batch.
+
+    `place` runs for every line in order; `save` persists the high-water mark
+    after each chunk of lines, and fails when another request moved it.
+    """
+
+    def __init__(self, progress: BatchProgress, *, resumed: bool = False) -> None:
+        self.progress = progress
+        self.resumed = resumed
+        self.received = 0
+        self.skipped = 0
+        self._saved_next = progress.next
+
+    def place(self, line: bytes | None, payload: Any) -> tuple[int, bool | EnvelopeError]:
+        """The line's batch index, and True to process it, False if it was processed before, or the error.
+
+        A line at the high-water mark advances it and is hashed; the caller
+        counts it with `reject` when the message itself is refused.
+        """
+        progress = self.progress
+        index = progress.next
+        meta = payload.get("meta") if isinstance(payload, dict) else None
+        batch = meta.get("batch") if isinstance(meta, dict) else None
+        if isinstance(batch, dict):
+            if batch.get("index").__class__ is int:
+                index = batch["index"]
+            if "id" in batch and batch["id"] != progress.id:
+                return index, _batch_line_error(
+                    400, "protocol-batch-mismatch", f"meta.batch.id '{batch['id']}' is not batch '{progress.id}'"
+                )
+            if "total" in batch and batch["total"] != progress.message_count:
+                return index, _batch_line_error(
+                    400,
+                    "protocol-batch-count-mismatch",
+                    f"meta.batch.total {batch['total']!r} does not match messageCount {progress.message_count}",
+                )
+        if index < progress.next:
+            self.skipped += 1
+            return index, False
+        if index > progress.next:
+            return index, _batch_line_error(
+                409,
+                "protocol-batch-out-of-order",
+                f"Line {index} of batch '{progress.id}' arrived before line {progress.next}",
+                f"Send the lines in order, resuming from index {progress.next}",
+            )
+        if index >= progress.message_count:
+            return index, _batch_line_error(
+                400,
+                "protocol-batch-count-mismatch",
+                f"Batch '{progress.id}' has more than its messageCount of {progress.message_count} messages",
+            )
+        if progress.digest is not None:
+            if line is None:
+                progress.digest = None  # Too large to read: the hash cannot be continued.
+            else:
+                progress.digest.update(line)
+                progress.digest.update(b"\n")
+        progress.next += 1
+        self.received += 1
+        if progress.complete and progress.checksum is not None and progress.digest is not None:
+            progress.checksum_ok = f"sha256:{progress.digest.hexdigest()}" == progress.checksum
+        return index, True
+
+    def reject(self) -> None:
+        self.progress.rejected += 1
+
+    def save(self, store: BatchStore) -> bool:
+        if self.progress.next == self._saved_next:
+            return True
+        if not store.save(self.progress, previous_next=self._saved_next):
+            return False
+        self._saved_next = self.progress.next
+        return True
+
+    def summary(self, error: EnvelopeError | None = None) -> dict[str, Any]:
+        """The closing result line: progress, and whether the batch as a whole is accepted."""
+        progress = self.progress
+        summary = {**progress.status(), "received": self.received, "skipped": self.skipped}
+        if error is None and not progress.complete:
+            error = EnvelopeError(
+                status_code=400,
+                code="protocol-batch-count-mismatch",
+                message=(
+                    f"Batch '{progress.id}' ended after {progress.next} of {progress.message_count} messages"
+                ),
+                hint=f"Resume by sending the batch envelope and the lines from index {progress.next}",
+                action="retry",
+            )
+        if error is None and progress.checksum_ok is False:
+            error = EnvelopeError(
+                status_code=400,
+                code="protocol-batch-checksum-mismatch",
+                message=f"Batch '{progress.id}' does not match its checksum {progress.checksum}",
+                hint="The checksum covers every message line followed by a newline; re-send the batch under a new ID",
+                action="fix-request",
+            )
+        summary["accepted"] = error is None
+        if error is not None:
+            summary["status"] = error.status_code
+            summary["error"] = error.content()
+        return {"batch": summary}
+
+
+def _batch_line_error(status_code: int, code: str, message: str, hint: str | None = None) -> EnvelopeError:
+    return EnvelopeError(
+        status_code=status_code,
+        code=code,
+        message=message,
+        hint=hint or "Set meta.batch to match the batch envelope",
+        action="fix-message",
+    )
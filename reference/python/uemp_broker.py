@@ -0,0 +1,357 @@
+"""
+Broker binding (spec 5.2.2): a transport-neutral consumer and an in-memory broker.
+
+AMQP properties map onto `meta` as in the spec table: `message_id` is
+`meta.id`, `correlation_id` is `meta.conversationId`, `type` is `meta.intent`
+and `headers["uemp-version"]` is the protocol version. The consumer checks
+them against the body like the HTTP binding checks `UEMP-*` headers, with the
+same limits, envelope and signature checks (`uemp_ingest.check_message`).
+Routing keys follow `uemp.{domain}.{intent}`.
+
+`BrokerConsumer` fetches up to `prefetch` deliveries at a time, routes each
+valid message to the handler for its `meta.intent` and acknowledges in
+batches of `ack_batch`. Invalid messages are rejected without requeue (dead-
+lettered) and, when `reply_to` is set, answered with the C3 error. A handler
+that raises gets its message requeued until `max_deliveries`.
+
+Anything implementing the `Broker` protocol can be consumed;
+`InMemoryBroker` is the in-process stand-in used by tests and benchmarks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from uemp_envelope import EnvelopeError, ValidatedEnvelope
+from uemp_ingest import check_message
+from uemp_limits import UEMPLimits
+from uemp_schemas import UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE
+from uemp_signatures import KeyStore
+
+ROUTING_KEY_PREFIX = "uemp"
+ACCEPTED_CONTENT_TYPES = frozenset({UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE, "application/json"})
+
+
+def routing_key(domain: str, intent: str) -> str:
+    """`uemp.{domain}.{intent}`, e.g. `uemp.air-travel.create-order`."""
+    return f"{ROUTING_KEY_PREFIX}.{domain}.{intent}"
+
+
+def parse_routing_key(key: str) -> tuple[str, str] | None:
+    """(domain, intent) of a `uemp.{domain}.{intent}` key, or None for other keys."""
+    prefix, _, rest = key.partition(".")
+    domain, _, intent = rest.partition(".")
+    if prefix != ROUTING_KEY_PREFIX or not domain or not intent or "." in intent:
+        return None
+    return domain, intent
+
+
+def message_properties(message: Mapping[str, Any], *, reply_to: str | None = None) -> dict[str, Any]:
+    """AMQP properties for publishing a UEMP message (spec 5.2.2)."""
+    meta = message["meta"]
+    properties: dict[str, Any] = {
+        "content_type": UEMP_MEDIA_TYPE,
+        "message_id": meta["id"],
+        "type": meta["intent"],
+        "headers": {"uemp-version": meta["protocol"].split("/", 1)[1]},
+    }
+    conversation_id = meta.get("conversationId")
+    if conversation_id:
+        properties["correlation_id"] = conversation_id
+    if reply_to:
+        properties["reply_to"] = reply_to
+    return properties
+
+
+@dataclass
+class Delivery:
+    body: bytes
+    routing_key: str
+    properties: dict[str, Any]
+    delivery_tag: int = 0
+    redelivered: bool = False
+    # How often the broker has handed this message out (1 on first delivery).
+    delivery_count: int = 1
+    # Publish order within the queue; requeued deliveries go back to their place.
+    sequence: int = 0
+
+
+class Broker(Protocol):
+    async def fetch(self, queue: str, max_messages: int, timeout_s: float | None = None) -> list[Delivery]:
+        """Up to `max_messages` deliveries; waits at most `timeout_s` for the first one."""
+
+    async def ack(self, delivery_tags: Iterable[int]) -> None: ...
+
+    async def reject(self, delivery_tags: Iterable[int], *, requeue: bool) -> None: ...
+
+    async def publish(self, queue: str, body: bytes, *, routing_key: str = "", properties: dict[str, Any]) -> None: ...
+
+
+class InMemoryBroker:
+    """Named in-process queues with AMQP-style delivery tags, acks and redelivery.
+
+    Unacknowledged deliveries go back to their original place in the queue,
+    marked `redelivered`, when rejected with `requeue=True` or on `recover()` (what
+    a broker does when a consumer's channel closes). Rejected deliveries
+    without requeue land in `dead_letters`.
+    """
+
+    def __init__(self) -> None:
+        self.queues: dict[str, deque[Delivery]] = {}
+        self.unacked: dict[int, tuple[str, Delivery]] = {}
+        self.dead_letters: list[Delivery] = []
+        self.acked = 0
+        self.ack_calls = 0
+        self._next_tag = 0
+        self._published = 0
+        self._ready = asyncio.Condition()
+
+    def _queue(self, name: str) -> deque[Delivery]:
+        return self.queues.setdefault(name, deque())
+
+    async def publish(self, queue: str, body: bytes, *, routing_key: str = "", properties: dict[str, Any]) -> None:
+        async with self._ready:
+            self._published += 1
+            delivery = Delivery(body, routing_key, dict(properties), delivery_count=0, sequence=self._published)
+            self._queue(queue).append(delivery)
+            self._ready.notify_all()
+
+    async def fetch(self, queue: str, max_messages: int, timeout_s: float | None = None) -> list[Delivery]:
+        async with self._ready:
+            pending = self._queue(queue)
+            if not pending and timeout_s != 0:
+                try:
+                    await asyncio.wait_for(self._ready.wait_for(lambda: bool(pending)), timeout_s)
+                except asyncio.TimeoutError:
+                    return []
+            batch = []
+            while pending and len(batch) < max_messages:
+                delivery = pending.popleft()
+                self._next_tag += 1
+                delivery.delivery_tag = self._next_tag
+                delivery.redelivered = delivery.delivery_count > 0
+                delivery.delivery_count += 1
+                self.unacked[delivery.delivery_tag] = (queue, delivery)
+                batch.append(delivery)
+            return batch
+
+    async def ack(self, delivery_tags: Iterable[int]) -> None:
+        self.ack_calls += 1
+        for tag in delivery_tags:
+            if self.unacked.pop(tag, None) is not None:
+                self.acked += 1
+
+    async def reject(self, delivery_tags: Iterable[int], *, requeue: bool) -> None:
+        async with self._ready:
+            returned = []
+            for tag in delivery_tags:
+                entry = self.unacked.pop(tag, None)
+                if entry is None:
+                    continue
+                if requeue:
+                    returned.append(entry)
+                else:
+                    self.dead_letters.append(entry[1])
+            for queue, delivery in returned:
+                pending = self._queue(queue)
+                position = 0
+                while position < len(pending) and pending[position].sequence < delivery.sequence:
+                    position += 1
+                pending.insert(position, delivery)
+            if returned:
+                self._ready.notify_all()
+
+    async def recover(self) -> None:
+        """Requeue every unacknowledged delivery (the consumer went away)."""
+        await self.reject(list(self.unacked), requeue=True)
+
+    def depth(self, queue: str) -> int:
+        return len(self._queue(queue))
+
+
+Handler = Callable[[ValidatedEnvelope, Delivery], Awaitable[None] | None]
+
+
+@dataclass
+class ConsumerStats:
+    received: int = 0
+    handled: int = 0
+    rejected: int = 0
+    requeued: int = 0
+    dead_lettered: int = 0
+    by_intent: dict[str, int] = field(default_factory=dict)
+
+
+class BrokerConsumer:
+    """Validate, route and acknowledge UEMP messages from one broker queue.
+
+    `handlers` maps `meta.intent` to a handler (sync or async) called with the
+    validated envelope and the delivery; `"*"` catches intents without their
+    own. Deliveries are acknowledged after their handler returns, in batches
+    of `ack_batch` (and whenever a fetched batch is finished), so a crash
+    redelivers at most the unacknowledged ones. Failed deliveries are
+    requeued together once their batch is finished.
+    """
+
+    def __init__(
+        self,
+        broker: Broker,
+        queue: str,
+        handlers: Mapping[str, Handler],
+        *,
+        prefetch: int = 100,
+        ack_batch: int = 50,
+        max_deliveries: int = 5,
+        limits: UEMPLimits | None = None,
+        signature_keys: KeyStore | None = None,
+        envelope_mode: str = "fast",
+    ) -> None:
+        if prefetch < 1 or ack_batch < 1:
+            raise ValueError("prefetch and ack_batch must be at least 1")
+        self.broker = broker
+        self.queue = queue
+        self.handlers = dict(handlers)
+        self.prefetch = prefetch
+        self.ack_batch = ack_batch
+        self.max_deliveries = max_deliveries
+        self.limits = limits or UEMPLimits()
+        self.signature_keys = signature_keys
+        self.envelope_mode = envelope_mode
+        self.stats = ConsumerStats()
+        self._pending_acks: list[int] = []
+        self._pending_requeues: list[int] = []
+
+    def check(self, delivery: Delivery) -> ValidatedEnvelope | EnvelopeError:
+        """The HTTP binding's checks, with AMQP properties in place of the UEMP-* headers."""
+        properties = delivery.properties
+        content_type = (properties.get("content_type") or "").split(";", 1)[0].strip().lower()
+        if content_type not in ACCEPTED_CONTENT_TYPES:
+            return EnvelopeError(
+                status_code=415,
+                code="protocol-unsupported-media-type",
+                message=f"Unsupported content_type '{content_type or 'missing'}'",
+                hint=f"Publish with content_type {UEMP_MEDIA_TYPE}",
+                action="fix-request",
+            )
+        version = (properties.get("headers") or {}).get("uemp-version")
+        if not version:
+            return EnvelopeError(
+                status_code=400,
+                code="protocol-missing-required-header",
+                message="Missing required header 'uemp-version'",
+                hint="Set headers.uemp-version to the envelope protocol version (e.g. 1.0)",
+                action="fix-request",
+            )
+        _, outcome = check_message(
+            delivery.body,
+            self.limits,
+            self.signature_keys,
+            header_version=str(version),
+            header_message_id=properties.get("message_id"),
+            header_intent=properties.get("type"),
+            header_conversation_id=properties.get("correlation_id"),
+            mode=self.envelope_mode,
+        )
+        routed = parse_routing_key(delivery.routing_key)
+        if not isinstance(outcome, EnvelopeError) and routed is not None and routed[1] != outcome.meta.intent:
+            return EnvelopeError(
+                status_code=400,
+                code="protocol-header-mismatch",
+                message=f"Routing key '{delivery.routing_key}' does not match meta.intent '{outcome.meta.intent}'",
+                hint="Publish with routing key uemp.{domain}.{intent}",
+                action="fix-request",
+            )
+        return outcome
+
+    async def _reply(self, delivery: Delivery, result: dict[str, Any]) -> None:
+        reply_to = delivery.properties.get("reply_to")
+        if reply_to:
+            properties = {"content_type": "application/json", "correlation_id": delivery.properties.get("message_id")}
+            await self.broker.publish(reply_to, json.dumps(result).encode("utf-8"), properties=properties)
+
+    async def _dead_letter(self, delivery: Delivery, error: EnvelopeError) -> None:
+        self.stats.dead_lettered += 1
+        await self.broker.reject([delivery.delivery_tag], requeue=False)
+        result = {"id": delivery.properties.get("message_id"), "accepted": False, "status": error.status_code}
+        result["error"] = error.content()
+        await self._reply(delivery, result)
+
+    async def _flush_acks(self) -> None:
+        if self._pending_acks:
+            tags, self._pending_acks = self._pending_acks, []
+            await self.broker.ack(tags)
+
+    async def _flush(self) -> None:
+        await self._flush_acks()
+        if self._pending_requeues:
+            tags, self._pending_requeues = self._pending_requeues, []
+            await self.broker.reject(tags, requeue=True)
+
+    async def _handle(self, delivery: Delivery) -> None:
+        self.stats.received += 1
+        if self.signature_keys is not None:
+            # Signature checks are CPU-bound; keep them off the event loop.
+            outcome = await asyncio.to_thread(self.check, delivery)
+        else:
+            outcome = self.check(delivery)
+        if isinstance(outcome, EnvelopeError):
+            self.stats.rejected += 1
+            await self._dead_letter(delivery, outcome)
+            return
+        intent = outcome.meta.intent
+        handler = self.handlers.get(intent) or self.handlers.get("*")
+        if handler is None:
+            self.stats.rejected += 1
+            unknown = EnvelopeError(
+                status_code=400,
+                code="protocol-unknown-intent",
+                message=f"No handler for intent '{intent}'",
+                hint="Publish only intents this consumer handles",
+                action="fix-message",
+            )
+            await self._dead_letter(delivery, unknown)
+            return
+        try:
+            result = handler(outcome, delivery)
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                await result
+        except Exception as e:
+            if delivery.delivery_count >= self.max_deliveries:
+                failure = EnvelopeError(
+                    status_code=500,
+                    code="system-internal-error",
+                    message=f"Handler for '{intent}' failed {delivery.delivery_count} time(s): {type(e).__name__}",
+                    hint="Inspect the dead-lettered message",
+                    action="retry",
+                )
+                await self._dead_letter(delivery, failure)
+            else:
+                self.stats.requeued += 1
+                self._pending_requeues.append(delivery.delivery_tag)
+            return
+        self.stats.handled += 1
+        self.stats.by_intent[intent] = self.stats.by_intent.get(intent, 0) + 1
+        self._pending_acks.append(delivery.delivery_tag)
+        if len(self._pending_acks) >= self.ack_batch:
+            await self._flush_acks()
+
+    async def consume_batch(self, timeout_s: float | None = None) -> int:
+        """Fetch, handle and acknowledge one prefetch window; returns the deliveries handled."""
+        deliveries = await self.broker.fetch(self.queue, self.prefetch, timeout_s)
+        try:
+            for delivery in deliveries:
+                await self._handle(delivery)
+        finally:
+            await self._flush()
+        return len(deliveries)
+
+    async def run(self, *, idle_timeout_s: float | None = None) -> ConsumerStats:
+        """Consume until cancelled, or until the queue stays empty for `idle_timeout_s`."""
+        while await self.consume_batch(idle_timeout_s):
+            pass
+        return self.stats
@@ -0,0 +1,143 @@
+"""
+Capability discovery document (spec 5.3 / 9.6.6), built once per app.
+
+The document is encoded to bytes once with a strong ETag so that discovery
+polls only compare headers and write pre-encoded bytes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from uemp_limits import UEMPLimits
+from uemp_profiles import LoadedProfile, fidelity_class
+from uemp_schemas import UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE
+
+SUPPORTED_VERSIONS = ("1.0",)
+DISCOVERY_CACHE_CONTROL = "public, max-age=300"
+
+
+@dataclass(frozen=True)
+class CachedDocument:
+    """A JSON document pre-encoded once, with its strong ETag."""
+
+    body: bytes
+    etag: str
+    cache_control: str = DISCOVERY_CACHE_CONTROL
+
+    def not_modified(self, if_none_match: str | None) -> bool:
+        """True if an `If-None-Match` header value matches this document."""
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            # If-None-Match uses weak comparison (RFC 9110 13.1.2).
+            if candidate.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+
+def encode_document(document: Mapping[str, Any], *, cache_control: str = DISCOVERY_CACHE_CONTROL) -> CachedDocument:
+    body = json.dumps(document, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return CachedDocument(body=body, etag=etag, cache_control=cache_control)
+
+
+def _format_size(n: int) -> str:
+    for unit, size in (("MB", 1024 * 1024), ("KB", 1024)):
+        if n % size == 0:
+            return f"{n // size}{unit}"
+    return f"{n}B"
+
+
+def _profile_entry(loaded: LoadedProfile) -> dict[str, Any]:
+    profile = loaded.profile
+    chain = loaded.read_artifact("validationChain") or {}
+    validators: list[str] = []
+    for stage in chain.get("stages", []):
+        adapter = stage.get("adapter")
+        if adapter and adapter not in validators:
+            validators.append(adapter)
+    entry: dict[str, Any] = {
+        "id": profile.id,
+        "protocolFamily": profile.protocol,
+        "protocolVersion": profile.version,
+        "supportLevel": profile.supportLevel,
+        "status": profile.status,
+        "validators": validators,
+    }
+    fidelity = fidelity_class(loaded.read_artifact("fidelity"))
+    if fidelity is not None:
+        entry["fidelity"] = fidelity
+    return entry
+
+
+def build_capabilities(
+    profiles: Sequence[LoadedProfile] = (),
+    *,
+    intents: Mapping[str, Sequence[str]] | None = None,
+    limits: UEMPLimits | None = None,
+    signatures: bool = False,
+) -> dict[str, Any]:
+    """Build the discovery document served by `/.well-known/uemp` and `/api/uemp/capabilities`.
+
+    `nativeProtocols` and `profiles` come from the loaded profile artifacts;
+    `domains` are the keys of the configured `intents` mapping; `signatures`
+    advertises that signed messages are verified.
+    """
+    limits = limits or UEMPLimits()
+    intents = {domain: sorted(set(names)) for domain, names in sorted((intents or {}).items())}
+    native_protocols = sorted({f"{p.profile.protocol}/{p.profile.version}" for p in profiles})
+    paths = {
+        "messages": "/api/uemp/messages",
+        "batch": "/api/uemp/batch",
+        "batchStatus": "/api/uemp/batch/{batchId}",
+        "stream": "/api/uemp/stream",
+        "websocket": "/api/uemp/ws",
+        "message": "/api/uemp/messages/{messageId}",
+        "conversation": "/api/uemp/conversations/{conversationId}",
+        "validateNative": "/api/uemp/validate-native",
+        "capabilities": "/api/uemp/capabilities",
+        "discovery": "/.well-known/uemp",
+    }
+    return {
+        "protocol": f"uemp/{SUPPORTED_VERSIONS[-1]}",
+        "mediaTypes": [UEMP_MEDIA_TYPE, UEMP_VERSIONED_MEDIA_TYPE],
+        "paths": paths,
+        "headers": {
+            "required": ["UEMP-Version"],
+            "supported": [
+                "UEMP-Version",
+                "UEMP-Message-Id",
+                "UEMP-Intent",
+                "UEMP-Conversation-Id",
+                "UEMP-Idempotency-Key",
+            ],
+        },
+        "uemp": {
+            "versions": list(SUPPORTED_VERSIONS),
+            "domains": list(intents),
+            "intents": intents,
+            "capabilities": {
+                "signatures": signatures,
+                "encryption": False,
+                "streaming": True,
+                "batch": True,
+                "maxMessageSize": _format_size(limits.max_message_bytes),
+            },
+            "endpoints": {
+                "sync": paths["messages"],
+                "stream": paths["stream"],
+                "websocket": paths["websocket"],
+                "batch": paths["batch"],
+            },
+            "nativeProtocols": native_protocols,
+        },
+        "profiles": [_profile_entry(p) for p in profiles],
+    }
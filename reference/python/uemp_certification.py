@@ -1,6 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import importlib
+import importlib.util
 import json
+import os
+import sys
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
@@ -42,12 +49,15 @@ class CaseResult(BaseModel):
     expectedValid: bool
     actualValid: bool | None = None
     error: str | None = None
+    latencyMs: float | None = None
+    reused: bool = False
 
 
 class ReportSummary(BaseModel):
     total: int
     passed: int
     failed: int
+    reused: int = 0
 
 
 class CertReport(BaseModel):
@@ -63,6 +73,31 @@ class CertReport(BaseModel):
     summary: ReportSummary
 
 
+class PackSummary(BaseModel):
+    packId: str
+    profileId: str
+    revisionId: str | None = None
+    report: str | None = None
+    total: int
+    passed: int
+    failed: int
+    reused: int = 0
+
+
+class CertSummary(BaseModel):
+    reportVersion: str = "1.0"
+    baseUrl: str
+    startedAt: str
+    finishedAt: str
+    packs: list[PackSummary]
+    summary: ReportSummary
+
+
+DEFAULT_PACKS_ROOT = Path(__file__).resolve().parents[2] / "certification" / "packs"
+DEFAULT_CACHE_DIR = DEFAULT_PACKS_ROOT.parent / ".cache"
+IN_PROCESS_BASE_URL = "http://uemp.in-process"
+
+
 @dataclass(frozen=True)
 class LoadedPack:
     pack: CertPack
@@ -77,6 +112,56 @@ def load_pack(pack_json_path: str | Path) -> LoadedPack:
     return LoadedPack(pack=pack, pack_path=p, pack_dir=p.parent)
 
 
+def find_packs(packs_root: str | Path = DEFAULT_PACKS_ROOT) -> list[Path]:
+    """All `pack.json` files under `packs_root`, in a stable order."""
+    return sorted(Path(packs_root).rglob("pack.json"))
+
+
+def make_client(
+    *,
+    timeout_s: float = 30.0,
+    max_connections: int = 64,
+    max_keepalive_connections: int = 32,
+    http2: bool = False,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """An `AsyncClient` tuned to be shared by every pack in a run.
+
+    Keep-alive connections are reused across packs, so each host pays for TCP
+    and TLS setup at most `max_connections` times. `http2` needs the `h2`
+    package (`pip install httpx[http2]`).
+    """
+    if http2 and importlib.util.find_spec("h2") is None:
+        raise RuntimeError("HTTP/2 requires the 'h2' package: pip install 'httpx[http2]'")
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=30.0,
+    )
+    return httpx.AsyncClient(timeout=timeout_s, limits=limits, http2=http2, transport=transport)
+
+
+def load_asgi_app(spec: str) -> Any:
+    """Import an ASGI app from a uvicorn-style `module:attr` spec (e.g. `uemp_api:app`)."""
+    module_name, sep, attr = spec.partition(":")
+    if not sep or not module_name or not attr:
+        raise ValueError(f"expected 'module:attr', got {spec!r}")
+    if "" not in sys.path and os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    app: Any = importlib.import_module(module_name)
+    for name in attr.split("."):
+        app = getattr(app, name)
+    return app
+
+
+def asgi_transport(app: Any) -> httpx.ASGITransport:
+    """Drive `app` in-process: no sockets, and app errors become 500 responses as on a server.
+
+    Lifespan events are not run, so the app must not depend on startup hooks.
+    """
+    return httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
@@ -107,6 +192,8 @@ def _render_report_md(report: CertReport) -> str:
     lines.append(f"- total: {report.summary.total}")
     lines.append(f"- passed: {report.summary.passed}")
     lines.append(f"- failed: {report.summary.failed}")
+    if report.summary.reused:
+        lines.append(f"- reused: {report.summary.reused}")
     lines.append("")
     lines.append("## Results")
     lines.append("")
@@ -117,102 +204,261 @@ def _render_report_md(report: CertReport) -> str:
         lines.append(f"  - fixture: `{r.fixture}`")
         lines.append(f"  - http: {r.httpStatus} (expected {r.expectedHttpStatus})")
         lines.append(f"  - valid: {r.actualValid} (expected {r.expectedValid})")
+        if r.reused:
+            lines.append("  - reused: cached result")
+        elif r.latencyMs is not None:
+            lines.append(f"  - latency: {r.latencyMs:.1f} ms")
         if r.error:
             lines.append(f"  - error: {r.error}")
     lines.append("")
     return "\n".join(lines)
 
 
+class ResultCache:
+    """Case outcomes stored by content-addressed key, one small JSON file each.
+
+    A key covers everything that can change an outcome: the fixture bytes, the
+    case definition, the pack's profile/revision/endpoint and the target
+    fingerprint (see `case_cache_key`).
+    """
+
+    def __init__(self, root: str | Path = DEFAULT_CACHE_DIR) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> CaseResult | None:
+        try:
+            return CaseResult.model_validate_json(self._path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, result: CaseResult) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(result.model_dump_json(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def case_cache_key(*, pack: CertPack, case: CertCase, fixture_sha256: str, base_url: str, target: str) -> str:
+    material = {
+        "fixtureSha256": fixture_sha256,
+        "case": case.model_dump(mode="json"),
+        "profileId": pack.profileId,
+        "revisionId": pack.revisionId,
+        "endpoint": pack.endpoint,
+        "baseUrl": base_url.rstrip("/"),
+        "target": target,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+async def target_fingerprint(client: httpx.AsyncClient, base_url: str, *, build_id: str | None = None) -> str:
+    """Identify the deployment under test: a user-supplied build ID, else the discovery document ETag.
+
+    The discovery document only changes with configuration (profiles, limits,
+    versions); pass `build_id` when validator code changes must invalidate
+    cached outcomes.
+    """
+    if build_id:
+        return f"build:{build_id}"
+    resp = await client.get(_join_url(base_url, "/.well-known/uemp"))
+    resp.raise_for_status()
+    etag = resp.headers.get("etag") or '"' + hashlib.sha256(resp.content).hexdigest() + '"'
+    return f"discovery:{etag}"
+
+
+class HostRateLimiter:
+    """Space out requests to each host so none receives more than `rate_per_s` requests per second."""
+
+    def __init__(self, rate_per_s: float) -> None:
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be positive")
+        self.interval_s = 1.0 / rate_per_s
+        self._next_slot: dict[str, float] = {}
+
+    async def acquire(self, host: str) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Reserve the next free slot before sleeping, so concurrent callers queue up in order.
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval_s
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _run_case(
+    client: httpx.AsyncClient,
+    *,
+    loaded: LoadedPack,
+    case: CertCase,
+    base_url: str,
+    url: str,
+    rate_limiter: HostRateLimiter | None,
+    cache: ResultCache | None,
+    target: str | None,
+) -> CaseResult:
+    pack = loaded.pack
+    fixture_path = (loaded.pack_dir / case.fixture).resolve()
+    try:
+        raw = fixture_path.read_bytes()
+        xml = raw.decode("utf-8")
+    except Exception as e:
+        return CaseResult(
+            caseId=case.id,
+            title=case.title,
+            fixture=case.fixture,
+            passed=False,
+            httpStatus=0,
+            expectedHttpStatus=case.expect.httpStatus,
+            expectedValid=case.expect.valid,
+            actualValid=None,
+            error=f"fixture-read-failed: {e}",
+        )
+
+    cache_key: str | None = None
+    if cache is not None and target is not None:
+        cache_key = case_cache_key(
+            pack=pack,
+            case=case,
+            fixture_sha256=hashlib.sha256(raw).hexdigest(),
+            base_url=base_url,
+            target=target,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached.model_copy(update={"title": case.title, "latencyMs": None, "reused": True})
+
+    result = await _post_case(client, pack=pack, case=case, xml=xml, url=url, rate_limiter=rate_limiter)
+    # Transport failures and 5xx (e.g. 503 for validator assets not installed yet) are
+    # transient: installing assets does not change the target's fingerprint, so they
+    # would be replayed indefinitely. Only real, non-server-error responses are cached.
+    if cache_key is not None and 0 < result.httpStatus < 500:
+        cache.put(cache_key, result)
+    return result
+
+
+async def _post_case(
+    client: httpx.AsyncClient,
+    *,
+    pack: CertPack,
+    case: CertCase,
+    xml: str,
+    url: str,
+    rate_limiter: HostRateLimiter | None,
+) -> CaseResult:
+    payload: dict[str, Any] = {"profileId": pack.profileId, "xml": xml}
+    if pack.revisionId:
+        payload["revisionId"] = pack.revisionId
+    if rate_limiter is not None:
+        await rate_limiter.acquire(httpx.URL(url).host)
+    started = time.perf_counter()
+    try:
+        resp = await client.post(url, json=payload)
+    except Exception as e:
+        return CaseResult(
+            caseId=case.id,
+            title=case.title,
+            fixture=case.fixture,
+            passed=False,
+            httpStatus=0,
+            expectedHttpStatus=case.expect.httpStatus,
+            expectedValid=case.expect.valid,
+            actualValid=None,
+            error=f"request-failed: {e}",
+            latencyMs=_elapsed_ms(started),
+        )
+    latency_ms = _elapsed_ms(started)
+
+    actual_status = int(resp.status_code)
+    actual_valid: bool | None = None
+    err: str | None = None
+
+    if resp.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = resp.json()
+            if isinstance(body, dict):
+                v = body.get("valid")
+                if isinstance(v, bool):
+                    actual_valid = v
+        except Exception as e:
+            err = f"response-json-parse-failed: {e}"
+
+    passed = (actual_status == case.expect.httpStatus) and (actual_valid == case.expect.valid)
+
+    return CaseResult(
+        caseId=case.id,
+        title=case.title,
+        fixture=case.fixture,
+        passed=bool(passed),
+        httpStatus=actual_status,
+        expectedHttpStatus=case.expect.httpStatus,
+        expectedValid=case.expect.valid,
+        actualValid=actual_valid,
+        error=err,
+        latencyMs=latency_ms,
+    )
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
 async def run_pack(
     *,
     base_url: str,
     pack_json_path: str | Path,
     timeout_s: float = 30.0,
     client: httpx.AsyncClient | None = None,
+    concurrency: int = 1,
+    rate_limiter: HostRateLimiter | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+    cache: ResultCache | None = None,
+    target: str | None = None,
 ) -> tuple[CertReport, str]:
+    """Run every case of a pack, with up to `concurrency` requests in flight.
+
+    Results are reported in pack order regardless of completion order. Pass a
+    `HostRateLimiter` to cap the request rate per host, or a `semaphore` shared
+    with other packs to bound in-flight requests across all of them.
+
+    With a `cache` and a `target` fingerprint, cases whose key is already
+    cached are not re-sent and are reported with `reused=True`.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
     loaded = load_pack(pack_json_path)
     pack = loaded.pack
+    url = _join_url(base_url, pack.endpoint)
 
     started = _utc_now_iso()
-    results: list[CaseResult] = []
 
     close_client = False
     if client is None:
         client = httpx.AsyncClient(timeout=timeout_s)
         close_client = True
 
-    try:
-        for case in pack.cases:
-            fixture_path = (loaded.pack_dir / case.fixture).resolve()
-            try:
-                xml = fixture_path.read_text(encoding="utf-8")
-            except Exception as e:
-                results.append(
-                    CaseResult(
-                        caseId=case.id,
-                        title=case.title,
-                        fixture=case.fixture,
-                        passed=False,
-                        httpStatus=0,
-                        expectedHttpStatus=case.expect.httpStatus,
-                        expectedValid=case.expect.valid,
-                        actualValid=None,
-                        error=f"fixture-read-failed: {e}",
-                    )
-                )
-                continue
-
-            url = _join_url(base_url, pack.endpoint)
-            payload: dict[str, Any] = {"profileId": pack.profileId, "xml": xml}
-            if pack.revisionId:
-                payload["revisionId"] = pack.revisionId
-            try:
-                resp = await client.post(url, json=payload)
-                actual_status = int(resp.status_code)
-                actual_valid: bool | None = None
-                err: str | None = None
-
-                if resp.headers.get("content-type", "").startswith("application/json"):
-                    try:
-                        body = resp.json()
-                        if isinstance(body, dict):
-                            v = body.get("valid")
-                            if isinstance(v, bool):
-                                actual_valid = v
-                    except Exception as e:
-                        err = f"response-json-parse-failed: {e}"
-
-                passed = (actual_status == case.expect.httpStatus) and (
-                    actual_valid == case.expect.valid
-                )
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+    async def _bounded(case: CertCase) -> CaseResult:
+        async with semaphore:
+            return await _run_case(
+                client,
+                loaded=loaded,
+                case=case,
+                base_url=base_url,
+                url=url,
+                rate_limiter=rate_limiter,
+                cache=cache,
+                target=target,
+            )
 
-                results.append(
-                    CaseResult(
-                        caseId=case.id,
-                        title=case.title,
-                        fixture=case.fixture,
-                        passed=bool(passed),
-                        httpStatus=actual_status,
-                        expectedHttpStatus=case.expect.httpStatus,
-                        expectedValid=case.expect.valid,
-                        actualValid=actual_valid,
-                        error=err,
-                    )
-                )
-            except Exception as e:
-                results.append(
-                    CaseResult(
-                        caseId=case.id,
-                        title=case.title,
-                        fixture=case.fixture,
-                        passed=False,
-                        httpStatus=0,
-                        expectedHttpStatus=case.expect.httpStatus,
-                        expectedValid=case.expect.valid,
-                        actualValid=None,
-                        error=f"request-failed: {e}",
-                    )
-                )
+    try:
+        # gather() returns results in argument order, i.e. pack order.
+        results: list[CaseResult] = list(await asyncio.gather(*(_bounded(case) for case in pack.cases)))
     finally:
         if close_client and client is not None:
             await client.aclose()
@@ -221,6 +467,7 @@ async def run_pack(
     total = len(results)
     passed_n = sum(1 for r in results if r.passed)
     failed_n = total - passed_n
+    reused_n = sum(1 for r in results if r.reused)
 
     report = CertReport(
         packId=pack.packId,
@@ -231,8 +478,119 @@ async def run_pack(
         startedAt=started,
         finishedAt=finished,
         results=results,
-        summary=ReportSummary(total=total, passed=passed_n, failed=failed_n),
+        summary=ReportSummary(total=total, passed=passed_n, failed=failed_n, reused=reused_n),
     )
 
     md = _render_report_md(report)
     return report, md
+
+
+async def run_packs(
+    *,
+    base_url: str,
+    pack_json_paths: list[str | Path],
+    timeout_s: float = 30.0,
+    client: httpx.AsyncClient | None = None,
+    concurrency: int = 8,
+    rate_limiter: HostRateLimiter | None = None,
+    http2: bool = False,
+    cache: ResultCache | None = None,
+    target: str | None = None,
+) -> list[tuple[CertReport, str]]:
+    """Run several packs in one event loop over one shared connection pool.
+
+    All packs run at once and share one `concurrency` budget, so the run
+    takes about as long as its slowest pack. Reports are returned in the
+    order of `pack_json_paths`.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    close_client = False
+    if client is None:
+        client = make_client(
+            timeout_s=timeout_s,
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency,
+            http2=http2,
+        )
+        close_client = True
+
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        return list(
+            await asyncio.gather(
+                *(
+                    run_pack(
+                        base_url=base_url,
+                        pack_json_path=path,
+                        client=client,
+                        rate_limiter=rate_limiter,
+                        semaphore=semaphore,
+                        cache=cache,
+                        target=target,
+                    )
+                    for path in pack_json_paths
+                )
+            )
+        )
+    finally:
+        if close_client:
+            await client.aclose()
+
+
+def summarize_reports(
+    reports: list[CertReport],
+    *,
+    base_url: str,
+    report_paths: list[str | None] | None = None,
+) -> tuple[CertSummary, str]:
+    """Aggregate per-pack reports into one summary (JSON model + Markdown).
+
+    The summary spans from the earliest pack start to the latest pack finish.
+    """
+    paths = report_paths or [None] * len(reports)
+    packs = [
+        PackSummary(
+            packId=r.packId,
+            profileId=r.profileId,
+            revisionId=r.revisionId,
+            report=path,
+            total=r.summary.total,
+            passed=r.summary.passed,
+            failed=r.summary.failed,
+            reused=r.summary.reused,
+        )
+        for r, path in zip(reports, paths)
+    ]
+    total = sum(p.total for p in packs)
+    passed_n = sum(p.passed for p in packs)
+    reused_n = sum(p.reused for p in packs)
+    summary = CertSummary(
+        baseUrl=base_url,
+        startedAt=min(r.startedAt for r in reports),
+        finishedAt=max(r.finishedAt for r in reports),
+        packs=packs,
+        summary=ReportSummary(total=total, passed=passed_n, failed=total - passed_n, reused=reused_n),
+    )
+    return summary, _render_summary_md(summary)
+
+
+def _render_summary_md(summary: CertSummary) -> str:
+    lines: list[str] = []
+    lines.append("# UEMP Certification Summary")
+    lines.append("")
+    lines.append(f"- baseUrl: `{summary.baseUrl}`")
+    lines.append(f"- startedAt: `{summary.startedAt}`")
+    lines.append(f"- finishedAt: `{summary.finishedAt}`")
+    lines.append(f"- total: {summary.summary.total}")
+    lines.append(f"- passed: {summary.summary.passed}")
+    lines.append(f"- failed: {summary.summary.failed}")
+    lines.append(f"- reused: {summary.summary.reused}")
+    lines.append("")
+    lines.append("| Pack | Profile | Total | Passed | Failed | Reused | Status |")
+    lines.append("|---|---|---|---|---|---|---|")
+    for p in summary.packs:
+        status = "PASS" if p.failed == 0 else "FAIL"
+        lines.append(f"| `{p.packId}` | `{p.profileId}` | {p.total} | {p.passed} | {p.failed} | {p.reused} | {status} |")
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,355 @@
+"""
+Accepted-message index for conversation correlation (spec C1) and 404 lookups.
+
+Each accepted message is kept as a compact `MessageRecord` (ids, intent,
+sequence, body hash and size) indexed by `meta.id`, `meta.conversationId` and
+`meta.replyTo`. The raw body is only kept by stores built with
+`keep_bodies=True`.
+
+Stores:
+- `MemoryConversationStore`: per-process LRU bounded by message count, with TTL eviction
+- `SQLiteConversationStore`: shared by all workers pointing at the same file
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Protocol
+
+from uemp_envelope import ValidatedEnvelope
+
+DEFAULT_TTL_S = 7 * 24 * 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class MessageRecord:
+    id: str
+    conversation_id: str | None
+    reply_to: str | None
+    intent: str
+    sequence: int | None
+    received_at: float
+    sha256: bytes
+    size: int
+    body: bytes | None = None
+
+    def summary(self) -> dict[str, Any]:
+        """The record as JSON, without the body."""
+        out: dict[str, Any] = {"id": self.id, "intent": self.intent}
+        if self.conversation_id is not None:
+            out["conversationId"] = self.conversation_id
+        if self.reply_to is not None:
+            out["replyTo"] = self.reply_to
+        if self.sequence is not None:
+            out["sequence"] = self.sequence
+        out["receivedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.received_at))
+        out["sha256"] = self.sha256.hex()
+        out["bytes"] = self.size
+        return out
+
+
+def message_record(
+    envelope: ValidatedEnvelope,
+    body: bytes,
+    *,
+    keep_body: bool = False,
+    received_at: float | None = None,
+) -> MessageRecord:
+    meta = envelope.payload["meta"]
+    reply_to = meta.get("replyTo")
+    sequence = meta.get("sequence")
+    conversation_id = envelope.meta.conversation_id
+    return MessageRecord(
+        id=envelope.meta.id,
+        # Shared by every message of a conversation (or intent), so keep one copy.
+        conversation_id=sys.intern(conversation_id) if conversation_id else None,
+        reply_to=reply_to if isinstance(reply_to, str) and reply_to else None,
+        intent=sys.intern(envelope.meta.intent),
+        sequence=sequence if isinstance(sequence, int) and not isinstance(sequence, bool) else None,
+        received_at=time.time() if received_at is None else received_at,
+        sha256=hashlib.sha256(body).digest(),
+        size=len(body),
+        body=bytes(body) if keep_body else None,
+    )
+
+
+class ConversationStore(Protocol):
+    keep_bodies: bool
+    # True for stores that do I/O (or may wait on a lock held by another
+    # process); the API then calls `add` in a worker thread.
+    blocking: bool
+
+    def add(self, record: MessageRecord) -> bool: ...
+
+    def get(self, message_id: str) -> MessageRecord | None: ...
+
+    def conversation(
+        self, conversation_id: str, *, after: str | None = None, limit: int | None = None
+    ) -> list[MessageRecord]: ...
+
+    def replies(self, message_id: str) -> list[str]: ...
+
+
+class MemoryConversationStore:
+    """In-process index bounded by `max_messages` (LRU), with records expiring after `ttl_s`.
+
+    Lookups by message ID and reply target are O(1). A conversation lists in
+    arrival order; `after` skips up to and including that message.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_messages: int = 100_000,
+        keep_bodies: bool = False,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.max_messages = max_messages
+        self.keep_bodies = keep_bodies
+        self._clock = clock
+        self._messages: OrderedDict[str, MessageRecord] = OrderedDict()
+        # Conversation -> message IDs in arrival order (dict as an ordered set, O(1) removal).
+        self._conversations: dict[str, dict[str, None]] = {}
+        # Reply target -> reply IDs; a bare ID while there is only one (the usual case).
+        self._replies: dict[str, str | list[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def _expired(self, record: MessageRecord, now: float) -> bool:
+        return now - record.received_at >= self.ttl_s
+
+    def add(self, record: MessageRecord) -> bool:
+        """Index `record` unless its message ID is already stored; True if it was added."""
+        with self._lock:
+            existing = self._messages.get(record.id)
+            if existing is not None:
+                if not self._expired(existing, self._clock()):
+                    return False
+                self._remove(existing)
+            target = self._messages.get(record.reply_to) if record.reply_to else None
+            if target is not None:
+                # Share the target's ID string instead of holding a second copy
+                # (built directly; `dataclasses.replace` is several times slower).
+                r = record
+                record = MessageRecord(
+                    r.id, r.conversation_id, target.id, r.intent, r.sequence, r.received_at, r.sha256, r.size, r.body
+                )
+            self._messages[record.id] = record
+            if record.conversation_id is not None:
+                self._conversations.setdefault(record.conversation_id, {})[record.id] = None
+            if record.reply_to is not None:
+                replies = self._replies.get(record.reply_to)
+                if replies is None:
+                    self._replies[record.reply_to] = record.id
+                elif isinstance(replies, str):
+                    self._replies[record.reply_to] = [replies, record.id]
+                else:
+                    replies.append(record.id)
+            self._evict()
+            return True
+
+    def get(self, message_id: str) -> MessageRecord | None:
+        with self._lock:
+            record = self._messages.get(message_id)
+            if record is None:
+                return None
+            if self._expired(record, self._clock()):
+                self._remove(record)
+                return None
+            self._messages.move_to_end(message_id)
+            return record
+
+    def conversation(
+        self, conversation_id: str, *, after: str | None = None, limit: int | None = None
+    ) -> list[MessageRecord]:
+        with self._lock:
+            ids = iter(self._conversations.get(conversation_id, ()))
+            if after is not None:
+                for message_id in ids:
+                    if message_id == after:
+                        break
+            now = self._clock()
+            records = (self._messages[message_id] for message_id in ids)
+            return list(islice((r for r in records if not self._expired(r, now)), limit))
+
+    def replies(self, message_id: str) -> list[str]:
+        with self._lock:
+            replies = self._replies.get(message_id, [])
+            return [replies] if isinstance(replies, str) else list(replies)
+
+    def _remove(self, record: MessageRecord) -> None:
+        del self._messages[record.id]
+        if record.conversation_id is not None:
+            members = self._conversations[record.conversation_id]
+            del members[record.id]
+            if not members:
+                del self._conversations[record.conversation_id]
+        if record.reply_to is not None:
+            replies = self._replies[record.reply_to]
+            if isinstance(replies, str):
+                del self._replies[record.reply_to]
+            else:
+                replies.remove(record.id)
+                if len(replies) == 1:
+                    self._replies[record.reply_to] = replies[0]
+
+    def _evict(self) -> None:
+        now = self._clock()
+        # Only the least recently used end is checked: a record read since it arrived
+        # sits further back even once expired, and is dropped when it is next read.
+        while self._messages:
+            oldest = next(iter(self._messages.values()))
+            if len(self._messages) > self.max_messages or self._expired(oldest, now):
+                self._remove(oldest)
+            else:
+                break
+
+
+_COLUMNS = "id, conversation_id, reply_to, intent, sequence, received_at, sha256, size, body"
+
+
+class SQLiteConversationStore:
+    """Message index in a SQLite file shared by several worker processes.
+
+    Every lookup is an index seek (O(log n)); a conversation lists in arrival
+    order. The first worker to store a message ID wins (`INSERT OR IGNORE`),
+    and expired rows are purged every `purge_every` writes. `add` takes the
+    database write lock, waiting up to 5s for other workers, so the store is
+    `blocking`.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        keep_bodies: bool = False,
+        purge_every: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = str(path)
+        self.ttl_s = ttl_s
+        self.keep_bodies = keep_bodies
+        self.purge_every = purge_every
+        self._clock = clock
+        self._writes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uemp_messages ("
+                " seq INTEGER PRIMARY KEY,"
+                " id TEXT NOT NULL UNIQUE,"
+                " conversation_id TEXT,"
+                " reply_to TEXT,"
+                " intent TEXT NOT NULL,"
+                " sequence INTEGER,"
+                " received_at REAL NOT NULL,"
+                " sha256 BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " body BLOB)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS uemp_messages_conversation ON uemp_messages (conversation_id, seq)"
+                " WHERE conversation_id IS NOT NULL"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS uemp_messages_reply_to ON uemp_messages (reply_to)"
+                " WHERE reply_to IS NOT NULL"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS uemp_messages_received_at ON uemp_messages (received_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, record: MessageRecord) -> bool:
+        conn = self._connect()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM uemp_messages WHERE id = ? AND received_at <= ?", (record.id, now - self.ttl_s))
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO uemp_messages ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.id,
+                    record.conversation_id,
+                    record.reply_to,
+                    record.intent,
+                    record.sequence,
+                    record.received_at,
+                    record.sha256,
+                    record.size,
+                    record.body,
+                ),
+            )
+            self._writes += 1
+            if self.purge_every and self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM uemp_messages WHERE received_at <= ?", (now - self.ttl_s,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def get(self, message_id: str) -> MessageRecord | None:
+        row = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM uemp_messages WHERE id = ? AND received_at > ?",
+            (message_id, self._clock() - self.ttl_s),
+        ).fetchone()
+        return None if row is None else _record_from_row(row)
+
+    def conversation(
+        self, conversation_id: str, *, after: str | None = None, limit: int | None = None
+    ) -> list[MessageRecord]:
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM uemp_messages"
+            " WHERE conversation_id = ? AND received_at > ?"
+            " AND (? IS NULL OR seq > (SELECT seq FROM uemp_messages WHERE id = ? AND conversation_id = ?))"
+            " ORDER BY seq LIMIT ?",
+            (conversation_id, self._clock() - self.ttl_s, after, after, conversation_id, -1 if limit is None else limit),
+        ).fetchall()
+        return [_record_from_row(row) for row in rows]
+
+    def replies(self, message_id: str) -> list[str]:
+        rows = self._connect().execute(
+            "SELECT id FROM uemp_messages WHERE reply_to = ? AND received_at > ? ORDER BY seq",
+            (message_id, self._clock() - self.ttl_s),
+        ).fetchall()
+        return [message_id for (message_id,) in rows]
+
+
+def _record_from_row(row: tuple[Any, ...]) -> MessageRecord:
+    message_id, conversation_id, reply_to, intent, sequence, received_at, sha256, size, body = row
+    return MessageRecord(
+        id=message_id,
+        conversation_id=conversation_id,
+        reply_to=reply_to,
+        intent=intent,
+        sequence=sequence,
+        received_at=received_at,
+        sha256=bytes(sha256),
+        size=size,
+        body=None if body is None else bytes(body),
+    )
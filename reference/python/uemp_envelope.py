@@ -0,0 +1,281 @@
+"""
+Transport-independent UEMP envelope validation.
+
+Two modes share the same token and header-agreement checks:
+
+- fast (default): checks only the `meta` shape and treats `data`/`context` as
+  opaque, without building Pydantic models.
+- strict: the original `UEMPMessage.model_validate` path.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import ValidationError
+
+from uemp_schemas import UEMP_MESSAGE_ID_PATTERN, UEMP_PROTOCOL_PATTERN, UEMPMessage
+
+ENVELOPE_MODES = ("fast", "strict")
+
+
+class EnvelopeError(Exception):
+    """A UEMP protocol error with its HTTP status and C3 error body."""
+
+    def __init__(
+        self,
+        *,
+        status_code: int,
+        code: str,
+        message: str,
+        hint: str | None = None,
+        action: str = "upgrade-client",
+        errors: list[dict[str, Any]] | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.hint = hint
+        self.action = action
+        self.errors = errors
+        self.retry_after = retry_after
+
+    def content(self) -> dict[str, Any]:
+        body: dict[str, Any] = {
+            "code": self.code,
+            "severity": "fatal",
+            "message": self.message,
+        }
+        if self.errors is not None:
+            body["errors"] = self.errors
+        if self.hint is not None:
+            body["recovery"] = {"action": self.action, "hint": self.hint}
+            if self.retry_after is not None:
+                body["recovery"]["retryAfter"] = f"PT{self.retry_after_s}S"
+        return body
+
+    @property
+    def retry_after_s(self) -> int:
+        """`retry_after` rounded up to whole seconds, as sent in `Retry-After`."""
+        return max(1, math.ceil(self.retry_after or 0))
+
+
+@dataclass(frozen=True, slots=True)
+class EnvelopeMeta:
+    protocol: str
+    version: str
+    id: str
+    intent: str
+    conversation_id: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class ValidatedEnvelope:
+    meta: EnvelopeMeta
+    payload: dict[str, Any]
+    message: UEMPMessage | None = None
+
+    def dump(self) -> dict[str, Any]:
+        """The message in `UEMPMessage.model_dump(by_alias=True)` form, in either mode.
+
+        Fast mode builds it from the payload: `meta` is cut down to the model's
+        fields and `data`/`context`/`signatures` are passed through uncopied.
+        """
+        if self.message is not None:
+            return self.message.model_dump(by_alias=True)
+        meta, payload = self.meta, self.payload
+        return {
+            "meta": {
+                "protocol": meta.protocol,
+                "id": meta.id,
+                "intent": meta.intent,
+                "conversationId": meta.conversation_id,
+            },
+            "data": payload["data"],
+            "context": payload.get("context"),
+            "signatures": payload.get("signatures"),
+        }
+
+
+def _shape_error(loc: tuple[str | int, ...], error_type: str, msg: str) -> dict[str, Any]:
+    return {"type": error_type, "loc": list(loc), "msg": msg}
+
+
+def _check_shape(payload: Any) -> list[dict[str, Any]]:
+    """Shallow structural checks mirroring the `UEMPMessage` field types."""
+    if not isinstance(payload, dict):
+        return [_shape_error((), "model_type", "Input should be an object")]
+
+    errors: list[dict[str, Any]] = []
+    meta = payload.get("meta")
+    if meta is None and "meta" not in payload:
+        errors.append(_shape_error(("meta",), "missing", "Field required"))
+    elif not isinstance(meta, dict):
+        errors.append(_shape_error(("meta",), "model_type", "Input should be an object"))
+    else:
+        for field in ("protocol", "id", "intent"):
+            if field not in meta:
+                errors.append(_shape_error(("meta", field), "missing", "Field required"))
+            elif not isinstance(meta[field], str):
+                errors.append(_shape_error(("meta", field), "string_type", "Input should be a valid string"))
+        if isinstance(meta.get("intent"), str) and not meta["intent"]:
+            errors.append(_shape_error(("meta", "intent"), "string_too_short", "String should have at least 1 character"))
+        alias = "conversationId" if "conversationId" in meta else "conversation_id"
+        conversation_id = meta.get(alias)
+        if conversation_id is not None and not isinstance(conversation_id, str):
+            errors.append(_shape_error(("meta", alias), "string_type", "Input should be a valid string"))
+
+    if "data" not in payload:
+        errors.append(_shape_error(("data",), "missing", "Field required"))
+    elif not isinstance(payload["data"], dict):
+        errors.append(_shape_error(("data",), "dict_type", "Input should be a valid dictionary"))
+
+    context = payload.get("context")
+    if context is not None and not isinstance(context, dict):
+        errors.append(_shape_error(("context",), "dict_type", "Input should be a valid dictionary"))
+
+    signatures = payload.get("signatures")
+    if signatures is not None:
+        if not isinstance(signatures, list):
+            errors.append(_shape_error(("signatures",), "list_type", "Input should be a valid list"))
+        else:
+            for i, signature in enumerate(signatures):
+                if not isinstance(signature, dict):
+                    errors.append(_shape_error(("signatures", i), "dict_type", "Input should be a valid dictionary"))
+    return errors
+
+
+def _invalid_envelope(errors: list[dict[str, Any]]) -> EnvelopeError:
+    return EnvelopeError(
+        status_code=422,
+        code="protocol-invalid-envelope",
+        message="Invalid UEMP envelope",
+        errors=errors,
+    )
+
+
+def validate_envelope(
+    payload: Any,
+    *,
+    header_version: str,
+    header_message_id: str | None = None,
+    header_intent: str | None = None,
+    header_conversation_id: str | None = None,
+    mode: str = "fast",
+) -> ValidatedEnvelope:
+    """Validate a parsed envelope and its transport headers.
+
+    Raises `EnvelopeError` on the first failing check. In strict mode the
+    returned envelope also carries the validated `UEMPMessage`.
+    """
+    message: UEMPMessage | None = None
+    if mode == "strict":
+        try:
+            message = UEMPMessage.model_validate(payload)
+        except ValidationError as exc:
+            raise _invalid_envelope(exc.errors()) from None
+        protocol_token = message.meta.protocol
+        message_id = message.meta.id
+        intent = message.meta.intent
+        conversation_id = message.meta.conversation_id
+    elif mode == "fast":
+        errors = _check_shape(payload)
+        if errors:
+            raise _invalid_envelope(errors)
+        meta = payload["meta"]
+        protocol_token = meta["protocol"]
+        message_id = meta["id"]
+        intent = meta["intent"]
+        conversation_id = meta["conversationId"] if "conversationId" in meta else meta.get("conversation_id")
+    else:
+        raise ValueError(f"unknown envelope validation mode: {mode!r}")
+
+    if protocol_token.lower().startswith("aip/"):
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-unknown-token-family",
+            message=f"Token family 'aip' is not supported in protocol token '{protocol_token}'",
+            hint="Use protocol token format uemp/X.Y",
+            action="fix-message",
+        )
+    if not UEMP_PROTOCOL_PATTERN.fullmatch(protocol_token):
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-invalid-version",
+            message=f"Invalid protocol token '{protocol_token}'",
+            hint="Use protocol token format uemp/X.Y",
+            action="fix-message",
+        )
+
+    version = protocol_token.split("/", 1)[1]
+    if header_version != version:
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-header-mismatch",
+            message=f"Header UEMP-Version '{header_version}' does not match meta.protocol '{protocol_token}'",
+            hint=f"Set UEMP-Version to '{version}'",
+            action="fix-request",
+        )
+
+    if message_id.lower().startswith("aip:"):
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-unknown-token-family",
+            message=f"Token family 'aip' is not supported in message ID '{message_id}'",
+            hint="Use format uemp:{party}:{year}:{id}",
+            action="fix-message",
+        )
+    if not UEMP_MESSAGE_ID_PATTERN.fullmatch(message_id):
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-invalid-message-id",
+            message=f"Invalid UEMP message ID '{message_id}'",
+            hint="Use format uemp:{party}:{year}:{id}",
+            action="fix-message",
+        )
+
+    if header_message_id and header_message_id != message_id:
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-header-mismatch",
+            message=f"Header UEMP-Message-Id '{header_message_id}' does not match meta.id '{message_id}'",
+            hint="Set UEMP-Message-Id to match meta.id or omit the header",
+            action="fix-request",
+        )
+
+    if header_intent and header_intent != intent:
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-header-mismatch",
+            message=f"Header UEMP-Intent '{header_intent}' does not match meta.intent '{intent}'",
+            hint="Set UEMP-Intent to match meta.intent or omit the header",
+            action="fix-request",
+        )
+
+    if header_conversation_id and header_conversation_id != (conversation_id or ""):
+        raise EnvelopeError(
+            status_code=400,
+            code="protocol-header-mismatch",
+            message=(
+                f"Header UEMP-Conversation-Id '{header_conversation_id}' does not match "
+                f"meta.conversationId '{conversation_id or ''}'"
+            ),
+            hint="Set UEMP-Conversation-Id to match meta.conversationId or omit the header",
+            action="fix-request",
+        )
+
+    return ValidatedEnvelope(
+        meta=EnvelopeMeta(
+            protocol=protocol_token,
+            version=version,
+            id=message_id,
+            intent=intent,
+            conversation_id=conversation_id,
+        ),
+        payload=payload,
+        message=message,
+    )
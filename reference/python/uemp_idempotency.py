@@ -0,0 +1,244 @@
+"""
+Idempotency key -> result storage (spec C4).
+
+A stored entry keeps the SHA-256 of the original request body and the full
+response, so a retry with the same key and payload is answered from the store
+and a retry with a different payload can be rejected with 409.
+
+Stores:
+- `MemoryIdempotencyStore`: per-process LRU bounded in entries and bytes, with TTL eviction
+- `SQLiteIdempotencyStore`: shared by all workers pointing at the same file
+- `TieredIdempotencyStore`: memory in front of a shared backing store
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+DEFAULT_TTL_S = 24 * 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    payload_hash: str
+    status_code: int
+    headers: tuple[tuple[str, str], ...]
+    body: bytes
+    stored_at: float
+
+
+class IdempotencyStore(Protocol):
+    # True for stores that do I/O (or may wait on a lock held by another
+    # process); the API then calls `get` and `put` in a worker thread.
+    blocking: bool
+
+    def get(self, key: str) -> StoredResponse | None: ...
+
+    def put(self, key: str, response: StoredResponse) -> StoredResponse: ...
+
+
+def _entry_bytes(key: str, response: StoredResponse) -> int:
+    return len(key) + len(response.body) + sum(len(name) + len(value) for name, value in response.headers)
+
+
+class MemoryIdempotencyStore:
+    """In-process LRU bounded by `max_entries` and `max_bytes`, with entries expiring after `ttl_s`.
+
+    Responses can be as large as the message they echo, so `max_bytes` (keys,
+    headers and bodies) is what bounds memory; an entry larger than it on its
+    own is not kept.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> StoredResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry.stored_at >= self.ttl_s:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, response: StoredResponse) -> StoredResponse:
+        """Store `response` unless a live entry exists; return the entry that wins."""
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and self._clock() - existing.stored_at < self.ttl_s:
+                self._entries.move_to_end(key)
+                return existing
+            if existing is not None:
+                self._remove(key)
+            size = _entry_bytes(key, response)
+            if size > self.max_bytes:
+                return response
+            self._entries[key] = response
+            self._bytes += size
+            self._evict()
+            return response
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= _entry_bytes(key, self._entries.pop(key))
+
+    def _evict(self) -> None:
+        now = self._clock()
+        # Only the least recently used end is checked: an entry read since it was stored
+        # sits further back even once expired, and is dropped when it is next read.
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+                or now - oldest.stored_at >= self.ttl_s
+            ):
+                self._remove(oldest_key)
+            else:
+                break
+
+
+class SQLiteIdempotencyStore:
+    """Idempotency store in a SQLite file shared by several worker processes.
+
+    The first worker to store a key wins (`INSERT OR IGNORE`); expired rows
+    are purged every `purge_every` writes. `put` takes the database write
+    lock, waiting up to 5s for other workers, so the store is `blocking`.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        purge_every: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = str(path)
+        self.ttl_s = ttl_s
+        self.purge_every = purge_every
+        self._clock = clock
+        self._writes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uemp_idempotency ("
+                " key TEXT PRIMARY KEY,"
+                " payload_hash TEXT NOT NULL,"
+                " status_code INTEGER NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS uemp_idempotency_stored_at ON uemp_idempotency (stored_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> StoredResponse | None:
+        row = self._connect().execute(
+            "SELECT payload_hash, status_code, headers, body, stored_at FROM uemp_idempotency"
+            " WHERE key = ? AND stored_at > ?",
+            (key, self._clock() - self.ttl_s),
+        ).fetchone()
+        if row is None:
+            return None
+        payload_hash, status_code, headers, body, stored_at = row
+        return StoredResponse(
+            payload_hash=payload_hash,
+            status_code=status_code,
+            headers=tuple((name, value) for name, value in json.loads(headers)),
+            body=bytes(body),
+            stored_at=stored_at,
+        )
+
+    def put(self, key: str, response: StoredResponse) -> StoredResponse:
+        conn = self._connect()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM uemp_idempotency WHERE key = ? AND stored_at <= ?", (key, now - self.ttl_s))
+            conn.execute(
+                "INSERT OR IGNORE INTO uemp_idempotency (key, payload_hash, status_code, headers, body, stored_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.payload_hash,
+                    response.status_code,
+                    json.dumps(list(response.headers)),
+                    response.body,
+                    response.stored_at,
+                ),
+            )
+            self._writes += 1
+            if self.purge_every and self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM uemp_idempotency WHERE stored_at <= ?", (now - self.ttl_s,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(key) or response
+
+
+class TieredIdempotencyStore:
+    """Serve hits from `memory`, falling back to (and writing through to) `backing`."""
+
+    def __init__(self, memory: MemoryIdempotencyStore, backing: IdempotencyStore) -> None:
+        self.memory = memory
+        self.backing = backing
+
+    @property
+    def blocking(self) -> bool:
+        return self.backing.blocking
+
+    def get(self, key: str) -> StoredResponse | None:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        entry = self.backing.get(key)
+        if entry is not None:
+            self.memory.put(key, entry)
+        return entry
+
+    def put(self, key: str, response: StoredResponse) -> StoredResponse:
+        winner = self.backing.put(key, response)
+        return self.memory.put(key, winner)
@@ -0,0 +1,54 @@
+"""
+Transport-neutral message checks shared by the UEMP bindings.
+
+`check_message` applies the spec D5 limits, the envelope checks and (with a
+key store) signature verification to one encoded message, the same way for
+an NDJSON batch line, a WebSocket frame or a broker delivery.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from uemp_envelope import EnvelopeError, ValidatedEnvelope, validate_envelope
+from uemp_limits import LimitExceeded, UEMPLimits, check_limits, message_too_large
+from uemp_signatures import KeyStore, signature_error, verify_message
+
+
+def check_message(
+    data: bytes | None, limits: UEMPLimits, keys: KeyStore | None = None, **checks: Any
+) -> tuple[Any, ValidatedEnvelope | EnvelopeError]:
+    """Limit, envelope and signature checks for one message (None: it was too large to read).
+
+    `checks` are the `validate_envelope` keyword arguments (transport headers
+    and mode). Returns the parsed payload (None if it could not be parsed) and
+    the validated envelope, or the error that rejected it.
+    """
+    try:
+        if data is None:
+            raise message_too_large(limits)
+        check_limits(data, limits)
+    except LimitExceeded as exc:
+        return None, exc
+
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return None, EnvelopeError(
+            status_code=400,
+            code="protocol-invalid-json",
+            message="Message is not valid JSON",
+            hint="Send one complete UEMP envelope per line, frame or delivery",
+            action="fix-message",
+        )
+
+    try:
+        envelope = validate_envelope(payload, **checks)
+        if keys is not None and payload.get("signatures"):
+            report = verify_message(payload, keys)
+            if not report.valid:
+                raise signature_error(report)
+    except EnvelopeError as exc:
+        return payload, exc
+    return payload, envelope
@@ -0,0 +1,240 @@
+"""
+Incremental enforcement of the spec D5 message and field size limits.
+
+`JSONLimitScanner` tokenizes JSON chunk by chunk without building objects and
+raises `LimitExceeded` as soon as a limit is crossed, so a request can be cut
+off before the rest of its body is read. It does not check JSON syntax; the
+body is still parsed by `json.loads` once it is known to be within limits.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+
+from uemp_envelope import EnvelopeError
+
+_STRING_END = re.compile(rb'["\\]')
+_NON_STRUCTURAL = bytes(b for b in range(256) if b not in b"[]{},")
+_WHITESPACE = b" \t\r\n"
+
+
+def _trailing_backslashes(data: bytes) -> int:
+    return len(data) - len(data.rstrip(b"\\"))
+
+
+def _split_strings(text: bytes) -> list[bytes]:
+    """Split `text` (starting outside a string) into alternating outside/inside segments."""
+    parts = text.split(b'"')
+    if b'\\"' not in text:
+        return parts
+    # Rejoin parts split at escaped quotes (only possible inside strings).
+    segments = [parts[0]]
+    inside = False
+    for part in parts[1:]:
+        previous = segments[-1]
+        if inside and _trailing_backslashes(previous) % 2 == 1:
+            segments[-1] = previous + b'"' + part
+        else:
+            segments.append(part)
+            inside = not inside
+    return segments
+
+
+@dataclass(frozen=True)
+class UEMPLimits:
+    max_message_bytes: int = 1024 * 1024
+    max_string_bytes: int = 64 * 1024
+    max_array_items: int = 10_000
+    max_depth: int = 20
+    max_field_name_length: int = 128
+
+
+class LimitExceeded(EnvelopeError):
+    def __init__(self, *, code: str, message: str, hint: str) -> None:
+        super().__init__(status_code=413, code=code, message=message, hint=hint, action="fix-message")
+
+
+def message_too_large(limits: UEMPLimits) -> LimitExceeded:
+    return LimitExceeded(
+        code="protocol-message-too-large",
+        message=f"Message exceeds the {limits.max_message_bytes} byte limit",
+        hint="Move large collections behind $link references or use batch mode",
+    )
+
+
+class JSONLimitScanner:
+    """Track size, depth, string, array and field-name limits across chunks.
+
+    Each chunk is split at quotes so string lengths are measured in bulk, and
+    only the remaining `[]{},` bytes are walked one by one. String and
+    field-name lengths are measured on their encoded bytes (escapes included),
+    which never undercounts the decoded length.
+    """
+
+    def __init__(self, limits: UEMPLimits) -> None:
+        self.limits = limits
+        self.total_bytes = 0
+        # Enclosing containers of the current one: -1 for objects, else the array's comma count.
+        self._stack: list[int] = []
+        # The current container, encoded like the stack entries (-1 at top level too).
+        self._top = -1
+        self._in_string = False
+        self._string_bytes = 0
+        self._escape_pending = False
+        # Length of a string that closed at a chunk end and may still turn out to be a key.
+        self._maybe_key_bytes: int | None = None
+
+    def feed(self, chunk: bytes) -> None:
+        limits = self.limits
+        self.total_bytes += len(chunk)
+        if self.total_bytes > limits.max_message_bytes:
+            raise message_too_large(limits)
+
+        if self._maybe_key_bytes is not None:
+            rest = chunk.lstrip(_WHITESPACE)
+            if not rest:
+                return
+            if rest[:1] == b":":
+                self._check_key(self._maybe_key_bytes)
+            self._maybe_key_bytes = None
+
+        text = chunk
+        if self._in_string:
+            pos = self._finish_string(chunk)
+            if pos is None:
+                return
+            following = chunk[pos:].lstrip(_WHITESPACE)
+            if not following:
+                self._maybe_key_bytes = self._string_bytes
+                return
+            if following[:1] == b":":
+                self._check_key(self._string_bytes)
+            text = chunk[pos:]
+
+        segments = _split_strings(text)
+        if len(segments) > 1:
+            lengths = list(map(len, segments[1::2]))
+            longest = max(lengths)
+            unterminated = len(segments) % 2 == 0
+            if unterminated:
+                tail = segments[-1]
+                self._in_string = True
+                self._string_bytes = len(tail)
+                self._escape_pending = _trailing_backslashes(tail) % 2 == 1
+            self._check_value(longest)
+            if longest > limits.max_field_name_length:
+                for i, length in enumerate(lengths):
+                    if length > limits.max_field_name_length and 2 * i + 2 < len(segments):
+                        if segments[2 * i + 2].lstrip(_WHITESPACE)[:1] == b":":
+                            self._check_key(length)
+            if not unterminated and not segments[-1].strip(_WHITESPACE):
+                # The chunk ends with a complete string; a ':' in the next chunk makes it a key.
+                self._maybe_key_bytes = lengths[-1]
+            skeleton = b"".join(segments[0::2])
+        else:
+            skeleton = text
+
+        self._scan_structure(skeleton.translate(None, _NON_STRUCTURAL))
+
+    def _finish_string(self, chunk: bytes) -> int | None:
+        """Consume the rest of a string carried over from the previous chunk.
+
+        Returns the offset just past the closing quote, or None if the string
+        continues into the next chunk.
+        """
+        pos = 0
+        end = len(chunk)
+        while pos < end:
+            if self._escape_pending:
+                self._escape_pending = False
+                self._string_bytes += 1
+                pos += 1
+                continue
+            m = _STRING_END.search(chunk, pos)
+            if m is None:
+                self._string_bytes += end - pos
+                break
+            at = m.start()
+            if chunk[at] == 0x5C:  # backslash: the next byte is escaped
+                self._string_bytes += at - pos + 1
+                self._escape_pending = True
+                pos = at + 1
+                continue
+            self._string_bytes += at - pos
+            self._in_string = False
+            self._check_value(self._string_bytes)
+            return at + 1
+        self._check_value(self._string_bytes)
+        return None
+
+    def _scan_structure(self, compact: bytes) -> None:
+        """Walk a string of only `[]{},` bytes, tracking depth and array item counts."""
+        max_items = self.limits.max_array_items
+        max_depth = self.limits.max_depth
+        stack = self._stack
+        top = self._top
+        try:
+            for token in compact:
+                if token == 0x2C:  # ,
+                    if top >= 0:
+                        top += 1
+                        if top >= max_items:
+                            raise LimitExceeded(
+                                code="protocol-field-too-large",
+                                message=f"Array exceeds {max_items} items",
+                                hint="Use a $link external collection or batch mode for large collections",
+                            )
+                elif token == 0x7B or token == 0x5B:  # { [
+                    stack.append(top)
+                    top = -1 if token == 0x7B else 0
+                    if len(stack) > max_depth:
+                        raise LimitExceeded(
+                            code="protocol-message-too-large",
+                            message=f"Nesting depth exceeds {max_depth} levels",
+                            hint="Flatten the message structure",
+                        )
+                elif stack:  # } ]
+                    top = stack.pop()
+        finally:
+            self._top = top
+
+    def _check_key(self, length: int) -> None:
+        if length > self.limits.max_field_name_length:
+            raise LimitExceeded(
+                code="protocol-field-too-large",
+                message=f"Field name exceeds {self.limits.max_field_name_length} characters",
+                hint="Use shorter field names",
+            )
+
+    def _check_value(self, length: int) -> None:
+        if length > self.limits.max_string_bytes:
+            raise LimitExceeded(
+                code="protocol-field-too-large",
+                message=f"String value exceeds {self.limits.max_string_bytes} bytes",
+                hint="Move large values behind $link references",
+            )
+
+
+def check_limits(data: bytes, limits: UEMPLimits) -> None:
+    """Check one complete JSON document (e.g. a batch line or frame)."""
+    JSONLimitScanner(limits).feed(data)
+
+
+async def read_limited_body(
+    chunks: AsyncIterable[bytes],
+    limits: UEMPLimits,
+    *,
+    content_length: str | None = None,
+) -> bytes:
+    """Read a request body, raising `LimitExceeded` as soon as a limit is crossed."""
+    if content_length is not None and content_length.isdigit() and int(content_length) > limits.max_message_bytes:
+        raise message_too_large(limits)
+    scanner = JSONLimitScanner(limits)
+    parts: list[bytes] = []
+    async for chunk in chunks:
+        if chunk:
+            scanner.feed(chunk)
+            parts.append(chunk)
+    return b"".join(parts)
@@ -0,0 +1,523 @@
+"""
+`$link` external collections (spec D2): fetched, verified and cached.
+
+    {"$link": "https://storage.example.com/inv-001/items.ndjson", "$type": "external-collection",
+     "$count": 10000, "$checksum": "sha256:..."}
+
+`LinkResolver.resolve` streams the linked NDJSON through the fetcher for the
+URL's scheme. Each chunk is hashed, split into lines, parsed and counted as
+it arrives, so a collection with too many items, an oversized line or
+invalid JSON is abandoned when it shows rather than after the download.
+`$checksum` is the SHA-256 of the fetched bytes.
+
+Collections that verify are kept in a `LinkCache`: files named by their
+SHA-256 under one directory, bounded in total size with least-recently-used
+eviction. A link whose `$checksum` is cached is answered from disk, and
+concurrent resolutions of one checksum share a single fetch.
+
+Fetchers:
+- `FileFetcher`: `file://` URLs under one root directory
+- `StubFetcher`: fixed bodies per URL, for tests and offline runs
+- `HTTPFetcher`: `http(s)://` through httpx, to allowlisted origins only and
+  without following redirects
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Collection, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import unquote, urlsplit
+
+import httpx
+
+from uemp_envelope import EnvelopeError
+from uemp_schemas import UEMP_CHECKSUM_PATTERN
+
+DEFAULT_CHUNK_BYTES = 64 * 1024
+DEFAULT_MAX_COLLECTION_BYTES = 256 * 1024 * 1024
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+EXTERNAL_COLLECTION = "external-collection"
+
+
+class LinkError(EnvelopeError):
+    def __init__(self, *, status_code: int = 400, code: str, message: str, hint: str, action: str = "fix-message"):
+        super().__init__(status_code=status_code, code=code, message=message, hint=hint, action=action)
+
+
+def _unavailable(url: str, reason: str) -> LinkError:
+    return LinkError(
+        status_code=502,
+        code="system-link-unavailable",
+        message=f"Could not fetch $link '{url}': {reason}",
+        hint="Retry once the linked collection is reachable",
+        action="retry",
+    )
+
+
+def _collection_error(url: str, status_code: int, code: str, problem: str) -> LinkError:
+    return LinkError(
+        status_code=status_code,
+        code=code,
+        message=f"Linked collection '{url}' {problem}",
+        hint="Fix the linked collection or its $count/$checksum",
+    )
+
+
+def _count_mismatch(link: Link, count: int) -> LinkError:
+    more = "more than " if count > (link.count or 0) else ""
+    return _collection_error(
+        link.url, 400, "protocol-link-count-mismatch", f"has {more}{count} items, not $count {link.count}"
+    )
+
+
+def _refused(url: str, reason: str) -> LinkError:
+    return LinkError(
+        code="protocol-link-refused",
+        message=f"$link '{url}' is not allowed: {reason}",
+        hint="Link to a location this server is configured to fetch from",
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Link:
+    url: str
+    count: int | None = None
+    checksum: str | None = None
+
+    @property
+    def sha256(self) -> str | None:
+        return None if self.checksum is None else self.checksum.removeprefix("sha256:")
+
+
+def parse_link(value: Mapping[str, Any]) -> Link:
+    """The `$link`, `$count` and `$checksum` of an external-collection object."""
+    url = value.get("$link")
+    if not isinstance(url, str) or not url:
+        raise LinkError(
+            code="protocol-invalid-link", message="$link must be a URL", hint="Set $link to the collection URL"
+        )
+    count = value.get("$count")
+    if count is not None and (count.__class__ is not int or count < 0):
+        raise LinkError(
+            code="protocol-invalid-link",
+            message=f"$count of '{url}' must be a non-negative integer",
+            hint="Set $count to the number of items in the collection",
+        )
+    checksum = value.get("$checksum")
+    if checksum is not None:
+        if not isinstance(checksum, str) or not UEMP_CHECKSUM_PATTERN.fullmatch(checksum.lower()):
+            raise LinkError(
+                code="protocol-invalid-link",
+                message=f"$checksum of '{url}' must be 'sha256:' and 64 hex digits",
+                hint="Set $checksum to the SHA-256 of the collection's bytes",
+            )
+        checksum = checksum.lower()
+    return Link(url, count, checksum)
+
+
+def external_collections(data: Any) -> list[Mapping[str, Any]]:
+    """Every `$type: external-collection` object in `data`, depth first."""
+    found = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if "$link" in value and value.get("$type") == EXTERNAL_COLLECTION:
+                found.append(value)
+            else:
+                stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    found.reverse()
+    return found
+
+
+class Fetcher(Protocol):
+    def fetch(self, url: str) -> AsyncIterator[bytes]:
+        """The resource's bytes in chunks; raises `LinkError` if it cannot be fetched."""
+        ...
+
+
+class FileFetcher:
+    """`file://` URLs of files under `root` (anything outside it is refused)."""
+
+    def __init__(self, root: str | Path, *, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> None:
+        self.root = Path(root).resolve()
+        self.chunk_bytes = chunk_bytes
+
+    def path_for(self, url: str) -> Path:
+        parts = urlsplit(url)
+        if parts.scheme != "file" or parts.netloc not in ("", "localhost"):
+            raise _refused(url, "only local file:// URLs are read")
+        path = Path(unquote(parts.path)).resolve()
+        if not path.is_relative_to(self.root):
+            raise _refused(url, "outside the linked-file root")
+        return path
+
+    async def fetch(self, url: str) -> AsyncIterator[bytes]:
+        path = self.path_for(url)
+        try:
+            f = await asyncio.to_thread(path.open, "rb")
+        except OSError as exc:
+            raise _unavailable(url, exc.strerror or "cannot open") from exc
+        try:
+            while chunk := await asyncio.to_thread(f.read, self.chunk_bytes):
+                yield chunk
+        finally:
+            f.close()
+
+
+class StubFetcher:
+    """Serve fixed bodies by URL; `fetches` counts requests per URL."""
+
+    def __init__(self, bodies: Mapping[str, bytes], *, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> None:
+        self.bodies = dict(bodies)
+        self.chunk_bytes = chunk_bytes
+        self.fetches: dict[str, int] = {}
+
+    async def fetch(self, url: str) -> AsyncIterator[bytes]:
+        self.fetches[url] = self.fetches.get(url, 0) + 1
+        body = self.bodies.get(url)
+        if body is None:
+            raise _unavailable(url, "not found")
+        for start in range(0, len(body), self.chunk_bytes):
+            yield body[start : start + self.chunk_bytes]
+            await asyncio.sleep(0)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    default_port = {"http": 80, "https": 443}.get(parts.scheme)
+    port = parts.port if parts.port not in (None, default_port) else None
+    return f"{parts.scheme}://{parts.hostname or ''}" + (f":{port}" if port else "")
+
+
+class HTTPFetcher:
+    """GET `http(s)://` URLs on `allowed_origins` (e.g. `https://storage.example.com`).
+
+    Every other origin is refused before any connection is made, and
+    redirects are not followed, so a link cannot reach internal addresses.
+    """
+
+    def __init__(
+        self,
+        allowed_origins: Collection[str],
+        *,
+        timeout_s: float = 10.0,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.allowed_origins = frozenset(_origin(origin) for origin in allowed_origins)
+        self._client = client or httpx.AsyncClient(timeout=timeout_s, follow_redirects=False)
+
+    async def fetch(self, url: str) -> AsyncIterator[bytes]:
+        try:
+            allowed = urlsplit(url).scheme in ("http", "https") and _origin(url) in self.allowed_origins
+        except ValueError:
+            allowed = False
+        if not allowed:
+            raise _refused(url, "origin not on the allowlist")
+        try:
+            async with self._client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    raise _unavailable(url, f"HTTP {response.status_code}")
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+        except httpx.HTTPError as exc:
+            raise _unavailable(url, type(exc).__name__) from exc
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class _CollectionCheck:
+    """Hash, split, parse and count one collection chunk by chunk, optionally copying it to `sink`."""
+
+    def __init__(self, link: Link, *, max_bytes: int, max_line_bytes: int, sink: Any = None) -> None:
+        self.link = link
+        self.max_bytes = max_bytes
+        self.max_line_bytes = max_line_bytes
+        self.sink = sink
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.count = 0
+        self._pending: list[bytes] = []
+        self._pending_bytes = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise self._error(413, "protocol-link-too-large", f"is larger than {self.max_bytes} bytes")
+        self.digest.update(chunk)
+        if self.sink is not None:
+            self.sink.write(chunk)
+        *complete, tail = chunk.split(b"\n")
+        if complete:
+            if self._pending:
+                self._pending.append(complete[0])
+                complete[0] = b"".join(self._pending)
+                self._pending.clear()
+                self._pending_bytes = 0
+            for line in complete:
+                self._line(line)
+        if tail:
+            self._pending.append(tail)
+            self._pending_bytes += len(tail)
+            if self._pending_bytes > self.max_line_bytes:
+                raise self._error(413, "protocol-link-too-large", f"has an item over {self.max_line_bytes} bytes")
+
+    def _line(self, line: bytes) -> None:
+        if not line.strip():
+            return
+        if len(line) > self.max_line_bytes:
+            raise self._error(413, "protocol-link-too-large", f"has an item over {self.max_line_bytes} bytes")
+        try:
+            json.loads(line)
+        except ValueError:
+            raise self._error(400, "protocol-link-invalid-item", f"item {self.count} is not valid JSON") from None
+        self.count += 1
+        if self.link.count is not None and self.count > self.link.count:
+            raise _count_mismatch(self.link, self.count)
+
+    def finish(self) -> None:
+        if self._pending:
+            self._line(b"".join(self._pending))
+            self._pending.clear()
+        if self.link.count is not None and self.count != self.link.count:
+            raise _count_mismatch(self.link, self.count)
+        if self.link.sha256 is not None and self.digest.hexdigest() != self.link.sha256:
+            raise self._error(400, "protocol-link-checksum-mismatch", f"does not match {self.link.checksum}")
+
+    def _error(self, status_code: int, code: str, problem: str) -> LinkError:
+        return _collection_error(self.link.url, status_code, code, problem)
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedCollection:
+    """A verified collection; `path` is its cached file (None when it was not cached)."""
+
+    url: str
+    count: int
+    size: int
+    sha256: str
+    path: Path | None = None
+    cached: bool = False
+
+    def items(self) -> Iterator[Any]:
+        """Parse the cached collection's items one line at a time."""
+        if self.path is None:
+            raise ValueError(f"{self.url} is not cached")
+        with self.path.open("rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LinkCache:
+    """Verified collections stored as `{root}/{sha256}.ndjson`, at most `max_bytes` in total (LRU).
+
+    The order survives restarts through file modification times, which a hit
+    refreshes. Item counts of files found at startup are counted on first use.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        # SHA-256 hex -> [size, item count or None], least recently used first.
+        self._entries: OrderedDict[str, list[Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        for stale in self.root.glob("*.part"):
+            stale.unlink(missing_ok=True)
+        files = sorted(self.root.glob("*.ndjson"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = [size, None]
+            self._bytes += size
+        self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / f"{sha256}.ndjson"
+
+    def get(self, sha256: str) -> tuple[Path, int, int] | None:
+        """(path, size, item count) of a cached collection, marking it recently used."""
+        with self._lock:
+            entry = self._entries.get(sha256)
+            if entry is None:
+                return None
+            self._entries.move_to_end(sha256)
+            size, count = entry
+        path = self.path_for(sha256)
+        try:
+            os.utime(path)
+            if count is None:
+                with path.open("rb") as f:
+                    count = sum(1 for line in f if line.strip())
+                entry[1] = count
+        except FileNotFoundError:
+            with self._lock:
+                if self._entries.pop(sha256, None) is not None:
+                    self._bytes -= size
+            return None
+        return path, size, count
+
+    def temporary(self) -> Any:
+        """An open file to stream a collection into before `commit` (or `discard`)."""
+        return tempfile.NamedTemporaryFile(dir=self.root, suffix=".part", delete=False)
+
+    def commit(self, part: Any, sha256: str, size: int, count: int) -> Path | None:
+        """Move a verified temporary file into place; None if it is too large to keep."""
+        part.close()
+        if size > self.max_bytes:
+            os.unlink(part.name)
+            return None
+        path = self.path_for(sha256)
+        os.replace(part.name, path)
+        with self._lock:
+            previous = self._entries.pop(sha256, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[sha256] = [size, count]
+            self._bytes += size
+            self._evict()
+        return path
+
+    @staticmethod
+    def discard(part: Any) -> None:
+        part.close()
+        Path(part.name).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            sha256, (size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.path_for(sha256).unlink(missing_ok=True)
+
+
+class LinkResolver:
+    """Fetch and verify external collections, by URL scheme, through a `LinkCache`.
+
+    `fetchers` maps schemes to fetchers (`{"file": FileFetcher(root)}`); a
+    link with any other scheme is refused. Collections without `$checksum`
+    are verified by `$count` only and not cached.
+    """
+
+    def __init__(
+        self,
+        fetchers: Mapping[str, Fetcher],
+        *,
+        cache: LinkCache | None = None,
+        max_bytes: int = DEFAULT_MAX_COLLECTION_BYTES,
+        max_line_bytes: int = 1024 * 1024,
+        max_links: int = 16,
+        timeout_s: float = 30.0,
+    ) -> None:
+        self.fetchers = dict(fetchers)
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.max_line_bytes = max_line_bytes
+        self.max_links = max_links
+        self.timeout_s = timeout_s
+        self.fetched = 0
+        self._inflight: dict[tuple[str, int | None], asyncio.Task[ResolvedCollection]] = {}
+
+    async def resolve(self, value: Mapping[str, Any] | Link) -> ResolvedCollection:
+        """Verify one linked collection, from the cache when its checksum is there; raises `LinkError`."""
+        link = value if isinstance(value, Link) else parse_link(value)
+        sha256 = link.sha256
+        if sha256 is None:
+            return await self._fetch(link)
+        if self.cache is not None:
+            hit = await asyncio.to_thread(self.cache.get, sha256)
+            if hit is not None:
+                path, size, count = hit
+                if link.count is not None and count != link.count:
+                    raise _count_mismatch(link, count)
+                return ResolvedCollection(link.url, count, size, sha256, path, cached=True)
+        # Concurrent references to one collection share its fetch. The fetch runs as
+        # its own task, so a caller that is cancelled (its client went away) does
+        # not cancel it for the others, and a finished fetch still fills the cache.
+        # Links that disagree on `$count` do not share: one's mismatch is not another's.
+        key = (sha256, link.count)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(link))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._fetch_done(key, done))
+        return await asyncio.shield(task)
+
+    def _fetch_done(self, key: tuple[str, int | None], task: asyncio.Task[ResolvedCollection]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here, so a failure nobody awaits any more is not reported.
+
+    async def _fetch(self, link: Link) -> ResolvedCollection:
+        fetcher = self.fetchers.get(urlsplit(link.url).scheme)
+        if fetcher is None:
+            raise _refused(link.url, "no fetcher for this URL scheme")
+        cache = self.cache if link.sha256 is not None else None
+        part = await asyncio.to_thread(cache.temporary) if cache is not None else None
+        check = _CollectionCheck(link, max_bytes=self.max_bytes, max_line_bytes=self.max_line_bytes, sink=part)
+        self.fetched += 1
+        try:
+            async with asyncio.timeout(self.timeout_s):
+                async with contextlib.aclosing(fetcher.fetch(link.url)) as chunks:
+                    async for chunk in chunks:
+                        # Hashing, parsing and writing are CPU and disk work; keep them off the event loop.
+                        await asyncio.to_thread(check.feed, chunk)
+            check.finish()
+        except TimeoutError:
+            if part is not None:
+                cache.discard(part)
+            raise LinkError(
+                status_code=504,
+                code="system-timeout",
+                message=f"Fetching $link '{link.url}' took longer than {self.timeout_s:g}s",
+                hint="Retry later, or link a smaller collection",
+                action="retry",
+            ) from None
+        except BaseException:
+            if part is not None:
+                cache.discard(part)
+            raise
+        sha256 = check.digest.hexdigest()
+        path = None
+        if part is not None:
+            path = await asyncio.to_thread(cache.commit, part, sha256, check.size, check.count)
+        return ResolvedCollection(link.url, check.count, check.size, sha256, path)
+
+    async def check_message(self, payload: Mapping[str, Any]) -> LinkError | None:
+        """Resolve every external collection in the message's `data`; the first failure, if any."""
+        found = external_collections(payload.get("data"))
+        if not found:
+            return None
+        if len(found) > self.max_links:
+            return LinkError(
+                code="protocol-link-refused",
+                message=f"Message has {len(found)} external collections; at most {self.max_links} are resolved",
+                hint="Merge the linked collections or send them in separate messages",
+            )
+        try:
+            links = [parse_link(value) for value in found]
+            await asyncio.gather(*(self.resolve(link) for link in links))
+        except LinkError as exc:
+            return exc
+        return None
@@ -0,0 +1,451 @@
+"""
+Load testing for the reference API, on localhost only.
+
+- `make_corpus`: valid envelopes of chosen sizes (up to exactly the message
+  size limit), invalid ones (bad JSON, header mismatch, over the size and
+  depth limits, ...), an NDJSON batch and message/conversation lookups, each
+  with the HTTP status it should get
+- `run_closed_loop`: a fixed number of workers, each sending its next request
+  as soon as the previous one is answered (measures capacity)
+- `run_open_loop`: requests sent at a fixed rate whether or not earlier ones
+  are answered; latency counts from the scheduled send time, so a stalled
+  server shows up as queueing delay instead of fewer samples
+- `LoadResult.summary`: requests, unexpected statuses, requests/sec and
+  p50/p99/p99.9 latency per endpoint (or per corpus case)
+- `compare_to_baseline`: regressions of a summary against a saved baseline,
+  each metric with its own tolerance
+
+Requests go straight into an ASGI app (`asgi_sender`) or through an HTTP
+client to a server bound to a loopback address (`http_sender`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+from uemp_limits import UEMPLimits
+
+BASELINE_FORMAT = "uemp-load-baseline/1"
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+# Largest message sizes (bytes) in the default corpus; the last is exactly the limit.
+DEFAULT_SIZES = (512, 16 * 1024, 256 * 1024, UEMPLimits().max_message_bytes)
+# Relative change, per summary metric, tolerated before it counts as a regression.
+DEFAULT_THRESHOLDS = {"rps": 0.15, "p50_ms": 0.20, "p99_ms": 0.25, "p999_ms": 0.50}
+# Latency changes smaller than this are timer and scheduling noise.
+DEFAULT_MIN_DELTA_MS = 0.05
+
+_UEMP_HEADERS = ((b"content-type", b"application/vnd.uemp+json"), (b"uemp-version", b"1.0"))
+
+
+@dataclass(frozen=True)
+class LoadRequest:
+    """One corpus entry: a request and the status the reference app answers it with."""
+
+    name: str
+    endpoint: str
+    method: str
+    path: str
+    headers: tuple[tuple[bytes, bytes], ...]
+    body: bytes
+    status: int
+
+
+def make_envelope(n: int, target_bytes: int = 0, *, party: str = "LT") -> bytes:
+    """An order envelope encoded in exactly `target_bytes` (or as small as it gets).
+
+    Size comes from order lines plus a padding note, so the envelope stays
+    within the string, array and depth limits at any size up to 1 MiB.
+    """
+    message: dict[str, Any] = {
+        "meta": {
+            "protocol": "uemp/1.0",
+            "id": f"uemp:{party}:2026:msg-{n}",
+            "intent": "create-order",
+            "conversationId": f"uemp:{party}:2026:conv-{n // 10}",
+        },
+        "data": {"order": {"id": f"ORD-{n}", "lines": []}},
+        "context": {"note": ""},
+    }
+    lines = message["data"]["order"]["lines"]
+    size = len(json.dumps(message))
+    for i in itertools.count():
+        line = {
+            "id": f"L{i}",
+            "description": "Widget, standard grade",
+            "quantity": {"value": "3", "unit": "EA"},
+            "price": {"amount": "19.99", "currency": "EUR"},
+        }
+        # The ", " separator is counted for every line; the note makes up the rest.
+        added = len(json.dumps(line)) + 2
+        if size + added > target_bytes:
+            break
+        lines.append(line)
+        size += added
+    message["context"]["note"] = "x" * max(0, target_bytes - len(json.dumps(message)))
+    return json.dumps(message).encode("utf-8")
+
+
+def _size_name(size: int) -> str:
+    if size % (1024 * 1024) == 0:
+        return f"{size // (1024 * 1024)}MiB"
+    if size % 1024 == 0:
+        return f"{size // 1024}KiB"
+    return f"{size}B"
+
+
+def _post(name: str, endpoint: str, path: str, body: bytes, status: int, headers=_UEMP_HEADERS) -> LoadRequest:
+    headers = (*headers, (b"content-length", str(len(body)).encode("ascii")))
+    return LoadRequest(name, endpoint, "POST", path, headers, body, status)
+
+
+def _get(name: str, endpoint: str, path: str, status: int) -> LoadRequest:
+    return LoadRequest(name, endpoint, "GET", path, ((b"uemp-version", b"1.0"),), b"", status)
+
+
+def make_corpus(
+    *,
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    limits: UEMPLimits | None = None,
+    invalid: bool = True,
+    batch_lines: int = 100,
+    lookups: bool = True,
+    base_path: str = "/api/uemp",
+) -> list[LoadRequest]:
+    """Requests for every endpoint under load; valid posts come before the lookups that find them."""
+    limits = limits or UEMPLimits()
+    if any(size > limits.max_message_bytes for size in sizes):
+        raise ValueError(f"sizes must not exceed the {limits.max_message_bytes} byte message limit")
+    messages = f"{base_path}/messages"
+    corpus = [
+        _post(f"valid-{_size_name(size)}", "messages", messages, make_envelope(i, size), 200)
+        for i, size in enumerate(sizes)
+    ]
+    if batch_lines:
+        ndjson = b"\n".join(make_envelope(1000 + i) for i in range(batch_lines)) + b"\n"
+        batch_headers = ((b"content-type", b"application/x-ndjson"), (b"uemp-version", b"1.0"))
+        corpus.append(_post(f"batch-{batch_lines}", "batch", f"{base_path}/batch", ndjson, 200, batch_headers))
+    if invalid:
+        small = make_envelope(2000)
+        deep: Any = "leaf"
+        for _ in range(limits.max_depth + 5):
+            deep = {"d": deep}
+        too_deep = {**json.loads(small), "data": deep}
+        wrong_protocol = json.loads(small)
+        wrong_protocol["meta"]["protocol"] = "uemp/9.0"
+        corpus += [
+            _post("invalid-json", "messages", messages, b'{"meta": {"protocol": ', 400),
+            _post(
+                "invalid-header-mismatch",
+                "messages",
+                messages,
+                small,
+                400,
+                (*_UEMP_HEADERS, (b"uemp-intent", b"cancel-order")),
+            ),
+            _post("invalid-protocol", "messages", messages, json.dumps(wrong_protocol).encode("utf-8"), 400),
+            _post("invalid-too-deep", "messages", messages, json.dumps(too_deep).encode("utf-8"), 413),
+            _post("invalid-too-large", "messages", messages, make_envelope(2001, limits.max_message_bytes + 1), 413),
+        ]
+    if lookups and sizes:
+        corpus += [
+            _get("lookup-message", "message", f"{messages}/{quote('uemp:LT:2026:msg-0', safe=':')}", 200),
+            _get(
+                "lookup-conversation",
+                "conversation",
+                f"{base_path}/conversations/{quote('uemp:LT:2026:conv-0', safe=':')}",
+                200,
+            ),
+            _get("lookup-unknown-message", "message", f"{messages}/uemp:LT:2026:msg-unknown", 404),
+        ]
+    return corpus
+
+
+def write_corpus(corpus: Iterable[LoadRequest], directory: str | Path) -> Path:
+    """Write each body to `{name}.body` and a `corpus.json` manifest, for other load tools."""
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for item in corpus:
+        if item.body:
+            (root / f"{item.name}.body").write_bytes(item.body)
+        manifest.append(
+            {
+                "name": item.name,
+                "endpoint": item.endpoint,
+                "method": item.method,
+                "path": item.path,
+                "headers": {k.decode("latin-1"): v.decode("latin-1") for k, v in item.headers},
+                "body": f"{item.name}.body" if item.body else None,
+                "status": item.status,
+            }
+        )
+    path = root / "corpus.json"
+    path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return path
+
+
+Send = Callable[[LoadRequest], Awaitable[int]]
+
+
+def asgi_sender(app: Any) -> Send:
+    """Call `app` directly with a raw ASGI scope: no HTTP client, parser or socket."""
+    base_scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "scheme": "http",
+        "query_string": b"",
+        "client": ("127.0.0.1", 5000),
+        "server": ("127.0.0.1", 8000),
+        "app": app,
+    }
+
+    async def send_request(item: LoadRequest) -> int:
+        status = 0
+        done = asyncio.Event()
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": item.body, "more_body": False}
+            # Streaming responses listen for a disconnect until they finish.
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        scope = {
+            **base_scope,
+            "method": item.method,
+            "path": item.path,
+            "raw_path": item.path.encode("ascii"),
+            "headers": list(item.headers),
+            "state": {},
+        }
+        await app(scope, receive, send)
+        done.set()
+        return status
+
+    return send_request
+
+
+def http_sender(client: httpx.AsyncClient, base_url: str) -> Send:
+    """Send over HTTP to a server on a loopback address (anything else is refused)."""
+    host = urlsplit(base_url).hostname
+    if host not in LOOPBACK_HOSTS:
+        raise ValueError(f"load tests only run against localhost, not {host!r}")
+    base_url = base_url.rstrip("/")
+
+    async def send_request(item: LoadRequest) -> int:
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in item.headers if k != b"content-length"]
+        response = await client.request(item.method, base_url + item.path, headers=headers, content=item.body)
+        await response.aclose()
+        return response.status_code
+
+    return send_request
+
+
+async def prime(send: Send, corpus: Iterable[LoadRequest]) -> list[str]:
+    """Send each request once, in order; the ones answered with an unexpected status."""
+    mismatches = []
+    for item in corpus:
+        status = await send(item)
+        if status != item.status:
+            mismatches.append(f"{item.name}: expected {item.status}, got {status}")
+    return mismatches
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (`q` in 0..1) of already sorted values; 0.0 when empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+@dataclass
+class LoadResult:
+    """Latencies (seconds) per corpus case, and the statuses that differed from the corpus."""
+
+    mode: str
+    elapsed_s: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    endpoints: dict[str, str] = field(default_factory=dict)
+    unexpected: Counter[tuple[str, int]] = field(default_factory=Counter)
+    dropped: int = 0
+
+    def record(self, item: LoadRequest, latency_s: float, status: int) -> None:
+        samples = self.latencies.get(item.name)
+        if samples is None:
+            samples = self.latencies[item.name] = []
+            self.endpoints[item.name] = item.endpoint
+        samples.append(latency_s)
+        if status != item.status:
+            self.unexpected[item.name, status] += 1
+
+    @property
+    def requests(self) -> int:
+        return sum(len(samples) for samples in self.latencies.values())
+
+    def summary(self, by: str = "endpoint") -> dict[str, dict[str, float]]:
+        """Per endpoint (or per corpus `case`): requests, errors, rps and latency percentiles in ms."""
+        if by not in ("endpoint", "case"):
+            raise ValueError("by must be 'endpoint' or 'case'")
+        groups: dict[str, list[float]] = {}
+        errors: Counter[str] = Counter()
+        for name, samples in self.latencies.items():
+            groups.setdefault(self.endpoints[name] if by == "endpoint" else name, []).extend(samples)
+        for (name, _), count in self.unexpected.items():
+            errors[self.endpoints[name] if by == "endpoint" else name] += count
+        elapsed = self.elapsed_s or float("inf")
+        summary = {}
+        for key, samples in sorted(groups.items()):
+            samples.sort()
+            summary[key] = {
+                "requests": len(samples),
+                "errors": errors[key],
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+                "p999_ms": round(percentile(samples, 0.999) * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+            }
+        return summary
+
+
+async def run_closed_loop(
+    send: Send,
+    corpus: Sequence[LoadRequest],
+    *,
+    concurrency: int = 16,
+    duration_s: float | None = None,
+    requests: int | None = None,
+) -> LoadResult:
+    """`concurrency` workers cycling through `corpus` until `duration_s` or `requests` is reached."""
+    if duration_s is None and requests is None:
+        raise ValueError("pass duration_s or requests")
+    result = LoadResult("closed")
+    counter = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration_s if duration_s is not None else math.inf
+    limit = requests if requests is not None else math.inf
+
+    async def worker() -> None:
+        while True:
+            i = next(counter)
+            if i >= limit or time.perf_counter() >= deadline:
+                return
+            item = corpus[i % len(corpus)]
+            sent = time.perf_counter()
+            status = await send(item)
+            result.record(item, time.perf_counter() - sent, status)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+async def run_open_loop(
+    send: Send,
+    corpus: Sequence[LoadRequest],
+    *,
+    rate: float,
+    duration_s: float,
+    max_outstanding: int = 10_000,
+) -> LoadResult:
+    """Send `rate` requests per second for `duration_s`, cycling through `corpus`.
+
+    Each latency is measured from the request's scheduled send time. Arrivals
+    that find `max_outstanding` requests unanswered are not sent and are
+    counted in `dropped`.
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    result = LoadResult("open")
+    outstanding: set[asyncio.Task[None]] = set()
+
+    async def one(item: LoadRequest, scheduled: float) -> None:
+        status = await send(item)
+        result.record(item, time.perf_counter() - scheduled, status)
+
+    started = time.perf_counter()
+    for i in range(int(rate * duration_s)):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(outstanding) >= max_outstanding:
+            result.dropped += 1
+            continue
+        task = asyncio.create_task(one(corpus[i % len(corpus)], scheduled))
+        outstanding.add(task)
+        task.add_done_callback(outstanding.discard)
+    await asyncio.gather(*outstanding)
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+def baseline_document(summary: Mapping[str, Mapping[str, float]], config: Mapping[str, Any]) -> dict[str, Any]:
+    """The JSON saved as a baseline: the run's configuration and its summary."""
+    return {"format": BASELINE_FORMAT, "config": dict(config), "results": {k: dict(v) for k, v in summary.items()}}
+
+
+def load_baseline(path: str | Path) -> dict[str, Any]:
+    document = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(document, dict) or document.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"{path} is not a {BASELINE_FORMAT} document")
+    return document
+
+
+def compare_to_baseline(
+    baseline: Mapping[str, Mapping[str, float]],
+    current: Mapping[str, Mapping[str, float]],
+    thresholds: Mapping[str, float] = DEFAULT_THRESHOLDS,
+    *,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> list[str]:
+    """Regressions of `current` against `baseline` (both `LoadResult.summary` shapes).
+
+    `rps` regresses when it drops by more than its threshold, `*_ms` metrics
+    when they grow by more than theirs (and by at least `min_delta_ms`), and
+    `errors` whenever there are more than in the baseline. Groups missing
+    from the current run are reported; new ones are ignored.
+    """
+    regressions = []
+    for key, base in baseline.items():
+        now = current.get(key)
+        if now is None:
+            regressions.append(f"{key}: missing from this run")
+            continue
+        if now.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{key}: errors {base.get('errors', 0)} -> {now['errors']}")
+        for metric, tolerance in thresholds.items():
+            if metric not in base or metric not in now:
+                continue
+            before, after = base[metric], now[metric]
+            if metric == "rps":
+                regressed = after < before * (1 - tolerance)
+            else:
+                regressed = after > before * (1 + tolerance) and after - before >= min_delta_ms
+            if regressed:
+                change = (after - before) / before if before else math.inf
+                regressions.append(f"{key}: {metric} {before} -> {after} ({change:+.0%}, limit {tolerance:.0%})")
+    return regressions
@@ -0,0 +1,431 @@
+"""
+Profile field mappings (spec 9.6 `mappings.json`), compiled for bulk transformation.
+
+Each mapping pairs a `uempPath` with a `nativePath`. `CompiledMappings` parses
+all of a profile's paths once into one trie per side. Converting a document is
+then a single walk that visits only the branches some mapping needs, however
+many mappings the profile has.
+
+Supported path syntax:
+
+- `uempPath`: `$` followed by `.name`, `['name']` or `[index]` segments.
+- `nativePath`: an absolute location path of child steps (`name`,
+  `prefix:name` or `*`, each with an optional `[position]`), optionally ending
+  in `@attr` or `text()`. Prefixes resolve through `NAMESPACES` plus any passed
+  in. Mapping files declare no default namespace, so an unprefixed name matches
+  that local name in any namespace when reading and takes its parent's
+  namespace when writing.
+
+Without `text()` or `@attr`, an element's value is its XPath string value
+(all descendant text). Missing `required` mappings produce spec C3 errors.
+"""
+
+from __future__ import annotations
+
+import re
+import xml.etree.ElementTree as ElementTree
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any
+
+from uemp_profiles import LoadedProfile
+from uemp_xsd import parse_document
+
+NAMESPACES = {
+    "cbc": "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2",
+    "cac": "urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2",
+    "rsm": "urn:un:unece:uncefact:data:standard:CrossIndustryInvoice:100",
+    "ram": "urn:un:unece:uncefact:data:standard:ReusableAggregateBusinessInformationEntity:100",
+    "udt": "urn:un:unece:uncefact:data:standard:UnqualifiedDataType:100",
+    "qdt": "urn:un:unece:uncefact:data:standard:QualifiedDataType:100",
+}
+DIRECTIONS = ("toUemp", "fromUemp", "bidirectional")
+TEXT = "text()"
+
+_NAME = r"[A-Za-z_][\w.-]*"
+_STEP = re.compile(rf"(?:(\*)|(?:({_NAME}):)?({_NAME}))(?:\[([1-9]\d*)\])?")
+_ATTRIBUTE = re.compile(rf"@(?:({_NAME}):)?({_NAME})")
+_MEMBER = re.compile(r"\.([A-Za-z_$][\w$-]*)|\['((?:[^'\\]|\\.)*)'\]|\[\"((?:[^\"\\]|\\.)*)\"\]|\[(\d+)\]")
+
+
+class MappingError(ValueError):
+    """A mapping is malformed or outside the supported path syntax."""
+
+
+@dataclass(frozen=True, slots=True)
+class NativeStep:
+    """One child step. `namespace` None matches any namespace; `local` None is `*`."""
+
+    namespace: str | None
+    local: str | None
+    position: int | None = None
+
+    def matches(self, tag: str) -> bool:
+        if self.local is None:
+            return True
+        namespace, _, local = tag[1:].rpartition("}") if tag.startswith("{") else ("", "", tag)
+        return local == self.local and (self.namespace is None or namespace == self.namespace)
+
+
+@dataclass(frozen=True, slots=True)
+class FieldMapping:
+    index: int
+    uemp_path: str
+    native_path: str
+    direction: str
+    required: bool
+    uemp_steps: tuple[str | int, ...]
+    native_steps: tuple[NativeStep, ...]
+    # None: element string value; TEXT: the element's own text; otherwise an attribute name.
+    native_leaf: str | None
+
+
+@dataclass
+class MappingResult:
+    output: Any
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not any(error["severity"] == "fatal" for error in self.errors)
+
+
+def parse_uemp_path(path: str) -> tuple[str | int, ...]:
+    if not path.startswith("$"):
+        raise MappingError(f"uempPath {path!r} must start with '$'")
+    steps: list[str | int] = []
+    pos = 1
+    while pos < len(path):
+        match = _MEMBER.match(path, pos)
+        if match is None:
+            raise MappingError(f"unsupported uempPath syntax at {path[pos:]!r} in {path!r}")
+        dotted, single, double, index = match.groups()
+        if index is not None:
+            steps.append(int(index))
+        else:
+            quoted = single if single is not None else double
+            steps.append(dotted if dotted is not None else re.sub(r"\\(.)", r"\1", quoted))
+        pos = match.end()
+    if not steps:
+        raise MappingError(f"uempPath {path!r} selects no member")
+    return tuple(steps)
+
+
+def _namespace(prefix: str, namespaces: Mapping[str, str], path: str) -> str:
+    try:
+        return namespaces[prefix]
+    except KeyError:
+        raise MappingError(f"unknown namespace prefix {prefix!r} in nativePath {path!r}") from None
+
+
+def parse_native_path(path: str, namespaces: Mapping[str, str] = NAMESPACES) -> tuple[tuple[NativeStep, ...], str | None]:
+    if not path.startswith("/") or path.startswith("//"):
+        raise MappingError(f"nativePath {path!r} must be an absolute path of child steps")
+    parts = path[1:].split("/")
+    leaf: str | None = None
+    if parts[-1] == TEXT:
+        leaf = TEXT
+        parts.pop()
+    elif parts[-1].startswith("@"):
+        match = _ATTRIBUTE.fullmatch(parts.pop())
+        if match is None:
+            raise MappingError(f"unsupported attribute step in nativePath {path!r}")
+        prefix, local = match.groups()
+        leaf = f"{{{_namespace(prefix, namespaces, path)}}}{local}" if prefix else local
+    steps: list[NativeStep] = []
+    for part in parts:
+        match = _STEP.fullmatch(part)
+        if match is None:
+            raise MappingError(f"unsupported step {part!r} in nativePath {path!r}")
+        star, prefix, local, position = match.groups()
+        steps.append(
+            NativeStep(
+                namespace=_namespace(prefix, namespaces, path) if prefix else None,
+                local=None if star else local,
+                position=int(position) if position else None,
+            )
+        )
+    if not steps:
+        raise MappingError(f"nativePath {path!r} selects no element")
+    return tuple(steps), leaf
+
+
+class _NativeNode:
+    """Trie over native steps, indexed by exact tag, local name and wildcard."""
+
+    __slots__ = ("children", "exact", "local", "wildcard", "leaves")
+
+    def __init__(self) -> None:
+        self.children: dict[NativeStep, _NativeNode] = {}
+        self.exact: dict[str, list[tuple[NativeStep, _NativeNode]]] = {}
+        self.local: dict[str, list[tuple[NativeStep, _NativeNode]]] = {}
+        self.wildcard: list[tuple[NativeStep, _NativeNode]] = []
+        self.leaves: list[tuple[int, str | None]] = []
+
+    def child(self, step: NativeStep) -> _NativeNode:
+        node = self.children.get(step)
+        if node is None:
+            node = self.children[step] = _NativeNode()
+            if step.local is None:
+                self.wildcard.append((step, node))
+            elif step.namespace is None:
+                self.local.setdefault(step.local, []).append((step, node))
+            else:
+                self.exact.setdefault(f"{{{step.namespace}}}{step.local}", []).append((step, node))
+        return node
+
+
+class _UEMPNode:
+    __slots__ = ("children", "leaves")
+
+    def __init__(self) -> None:
+        self.children: dict[str | int, _UEMPNode] = {}
+        self.leaves: list[int] = []
+
+
+def _string_value(element: Any, leaf: str | None) -> str | None:
+    if leaf is None:
+        return "".join(text for text in element.itertext() if isinstance(text, str))
+    if leaf == TEXT:
+        return element.text or ""
+    return element.get(leaf)
+
+
+def _descend(children: Iterable[Any], node: _NativeNode, found: dict[int, str]) -> None:
+    counts: dict[NativeStep, int] = {}
+    for child in children:
+        tag = child.tag
+        if not isinstance(tag, str):  # comments and processing instructions (lxml)
+            continue
+        local = tag.rpartition("}")[2]
+        for step, sub in chain(node.exact.get(tag, ()), node.local.get(local, ()), node.wildcard):
+            if step.position is not None:
+                seen = counts[step] = counts.get(step, 0) + 1
+                if seen != step.position:
+                    continue
+            for index, leaf in sub.leaves:
+                if index not in found:
+                    value = _string_value(child, leaf)
+                    if value is not None:
+                        found[index] = value
+            if sub.children:
+                _descend(child, sub, found)
+
+
+def _pick(value: Any, node: _UEMPNode, found: dict[int, Any]) -> None:
+    for index in node.leaves:
+        found[index] = value
+    for key, sub in node.children.items():
+        if isinstance(key, int):
+            if not isinstance(value, list) or key >= len(value):
+                continue
+        elif not isinstance(value, dict) or key not in value:
+            continue
+        child = value[key]
+        if child is not None:
+            _pick(child, sub, found)
+
+
+def _assign(target: dict[str, Any], steps: tuple[str | int, ...], value: Any) -> None:
+    node: Any = target
+    for step, following in zip(steps, steps[1:]):
+        empty: Any = [] if isinstance(following, int) else {}
+        if isinstance(step, int):
+            node.extend([None] * (step + 1 - len(node)))
+            if node[step] is None:
+                node[step] = empty
+            node = node[step]
+        else:
+            node = node.setdefault(step, empty)
+    last = steps[-1]
+    if isinstance(last, int):
+        node.extend([None] * (last + 1 - len(node)))
+    node[last] = value
+
+
+def _native_text(value: Any) -> str | None:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    return None
+
+
+def _tag(step: NativeStep, parent_tag: str | None) -> str:
+    namespace = step.namespace
+    if namespace is None and parent_tag and parent_tag.startswith("{"):
+        namespace = parent_tag[1:].partition("}")[0]
+    return f"{{{namespace}}}{step.local}" if namespace else step.local
+
+
+def _child_for(parent: ElementTree.Element, step: NativeStep) -> ElementTree.Element:
+    matching = [child for child in parent if step.matches(child.tag)]
+    wanted = step.position or 1
+    while len(matching) < wanted:
+        matching.append(ElementTree.SubElement(parent, _tag(step, parent.tag)))
+    return matching[wanted - 1]
+
+
+def _missing(mapping: FieldMapping, path: str) -> dict[str, Any]:
+    return {
+        "code": "validation-required-field",
+        "severity": "fatal",
+        "field": mapping.uemp_path,
+        "message": f"Required {path} is missing",
+        "stage": "mapping",
+        "nativePath": mapping.native_path,
+    }
+
+
+class CompiledMappings:
+    """A profile's mappings, parsed once; reusable and safe to share between threads."""
+
+    def __init__(
+        self,
+        mappings: Sequence[Mapping[str, Any]],
+        *,
+        profile_id: str | None = None,
+        namespaces: Mapping[str, str] | None = None,
+    ) -> None:
+        self.profile_id = profile_id
+        resolved = {**NAMESPACES, **(namespaces or {})}
+        compiled: list[FieldMapping] = []
+        for index, entry in enumerate(mappings):
+            direction = entry.get("direction", "bidirectional")
+            if direction not in DIRECTIONS:
+                raise MappingError(f"mapping {index}: direction must be one of {DIRECTIONS}, got {direction!r}")
+            try:
+                uemp_path, native_path = entry["uempPath"], entry["nativePath"]
+            except KeyError as e:
+                raise MappingError(f"mapping {index}: missing {e.args[0]}") from None
+            native_steps, native_leaf = parse_native_path(native_path, resolved)
+            if direction != "toUemp" and any(step.local is None for step in native_steps[1:]):
+                raise MappingError(f"nativePath {native_path!r} cannot be written: only the root step may be '*'")
+            compiled.append(
+                FieldMapping(
+                    index=index,
+                    uemp_path=uemp_path,
+                    native_path=native_path,
+                    direction=direction,
+                    required=bool(entry.get("required", False)),
+                    uemp_steps=parse_uemp_path(uemp_path),
+                    native_steps=native_steps,
+                    native_leaf=native_leaf,
+                )
+            )
+        self.mappings = tuple(compiled)
+        self._to_uemp = tuple(m for m in compiled if m.direction != "fromUemp")
+        self._from_uemp = tuple(m for m in compiled if m.direction != "toUemp")
+
+        self._native_trie = _NativeNode()
+        for mapping in self._to_uemp:
+            node = self._native_trie
+            for step in mapping.native_steps:
+                node = node.child(step)
+            node.leaves.append((mapping.index, mapping.native_leaf))
+
+        self._uemp_trie = _UEMPNode()
+        for mapping in self._from_uemp:
+            node = self._uemp_trie
+            for step in mapping.uemp_steps:
+                node = node.children.setdefault(step, _UEMPNode())
+            node.leaves.append(mapping.index)
+        _check_uemp_paths(self._to_uemp)
+
+    def to_uemp(self, document: Any) -> MappingResult:
+        """Map one native document (XML text, or an ElementTree/lxml tree or element) to UEMP data."""
+        root = _root_element(document)
+        found: dict[int, str] = {}
+        _descend((root,), self._native_trie, found)
+        output: dict[str, Any] = {}
+        errors: list[dict[str, Any]] = []
+        for mapping in self._to_uemp:
+            value = found.get(mapping.index)
+            if value is None:
+                if mapping.required:
+                    errors.append(_missing(mapping, mapping.native_path))
+                continue
+            _assign(output, mapping.uemp_steps, value)
+        return MappingResult(output, errors)
+
+    def to_uemp_many(self, documents: Iterable[Any]) -> list[MappingResult]:
+        return [self.to_uemp(document) for document in documents]
+
+    def from_uemp(self, message: Mapping[str, Any], *, root_tag: str | None = None) -> MappingResult:
+        """Map UEMP data (the message, or `{"data": ...}`) to a native `xml.etree.ElementTree.Element`.
+
+        `root_tag` (Clark notation) names the document element when the
+        mappings start with `/*`.
+        """
+        found: dict[int, Any] = {}
+        _pick(message, self._uemp_trie, found)
+        root: ElementTree.Element | None = None
+        errors: list[dict[str, Any]] = []
+        for mapping in self._from_uemp:
+            value = found.get(mapping.index)
+            if value is None:
+                if mapping.required:
+                    errors.append(_missing(mapping, mapping.uemp_path))
+                continue
+            text = _native_text(value)
+            if text is None:
+                errors.append(
+                    {
+                        "code": "validation-invalid-format",
+                        "severity": "fatal",
+                        "field": mapping.uemp_path,
+                        "message": f"{mapping.uemp_path} must be a string, number or boolean to map to {mapping.native_path}",
+                        "stage": "mapping",
+                        "nativePath": mapping.native_path,
+                    }
+                )
+                continue
+            first = mapping.native_steps[0]
+            if root is None:
+                tag = root_tag if first.local is None else _tag(first, root_tag)
+                if tag is None:
+                    raise MappingError("root_tag is required when nativePath starts with '/*'")
+                root = ElementTree.Element(tag)
+            element = root
+            for step in mapping.native_steps[1:]:
+                element = _child_for(element, step)
+            if mapping.native_leaf is None or mapping.native_leaf == TEXT:
+                element.text = text
+            else:
+                element.set(mapping.native_leaf, text)
+        return MappingResult(root, errors)
+
+    def from_uemp_many(self, messages: Iterable[Mapping[str, Any]], *, root_tag: str | None = None) -> list[MappingResult]:
+        return [self.from_uemp(message, root_tag=root_tag) for message in messages]
+
+
+def _check_uemp_paths(mappings: Sequence[FieldMapping]) -> None:
+    # Two targets where one is inside the other (or a key used both as a list
+    # index and a member name) cannot both be written into one document.
+    targets = {m.uemp_steps: m.uemp_path for m in mappings}
+    for steps, path in targets.items():
+        for n in range(1, len(steps)):
+            if steps[:n] in targets:
+                raise MappingError(f"uempPath {path!r} is inside mapped value {targets[steps[:n]]!r}")
+    kinds: dict[tuple[str | int, ...], type] = {}
+    for steps in targets:
+        for n, step in enumerate(steps):
+            kind = int if isinstance(step, int) else str
+            if kinds.setdefault(steps[:n], kind) is not kind:
+                raise MappingError(f"uempPath {targets[steps]!r} mixes list indexes and member names")
+
+
+def _root_element(document: Any) -> Any:
+    if isinstance(document, (str, bytes)):
+        document = parse_document(document)
+    getroot = getattr(document, "getroot", None)
+    return getroot() if getroot is not None else document
+
+
+def compile_mappings(loaded: LoadedProfile, *, namespaces: Mapping[str, str] | None = None) -> CompiledMappings | None:
+    """Compile the `mappings.json` artifact of `loaded` (None when it has none)."""
+    artifact = loaded.read_artifact("mappings")
+    if artifact is None:
+        return None
+    return CompiledMappings(artifact.get("mappings", []), profile_id=loaded.profile.id, namespaces=namespaces)
@@ -0,0 +1,94 @@
+"""
+Protocol profile artifacts (spec 9.6) loaded from profile directories.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+DEFAULT_PROFILES_DIR = Path(__file__).resolve().parents[2] / "profiles" / "examples"
+
+
+class ProfileArtifacts(BaseModel):
+    mappings: str | None = None
+    validationChain: str | None = None
+    fidelity: str | None = None
+    edgeCases: str | None = None
+
+
+class ProfileManifest(BaseModel):
+    id: str = Field(..., min_length=1)
+    protocol: str = Field(..., min_length=1)
+    protocolId: str | None = None
+    version: str = Field(..., min_length=1)
+    title: str = Field(..., min_length=1)
+    description: str | None = None
+    status: str
+    supportLevel: str
+    updatedAt: str
+    artifacts: ProfileArtifacts | None = None
+
+
+@dataclass(frozen=True)
+class LoadedProfile:
+    profile: ProfileManifest
+    profile_dir: Path
+    # Artifacts are read on first use and kept for the life of this object (treat them
+    # as read-only); `ProfileRegistry` replaces the whole object when files change.
+    _artifacts: dict[str, dict[str, Any] | None] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def artifact_path(self, name: str) -> Path | None:
+        artifacts = self.profile.artifacts
+        filename = getattr(artifacts, name, None) if artifacts is not None else None
+        return self.profile_dir / filename if filename else None
+
+    def read_artifact(self, name: str) -> dict[str, Any] | None:
+        try:
+            return self._artifacts[name]
+        except KeyError:
+            pass
+        path = self.artifact_path(name)
+        artifact = json.loads(path.read_text(encoding="utf-8")) if path is not None and path.exists() else None
+        return self._artifacts.setdefault(name, artifact)
+
+    def read_artifacts(self, names: Iterable[str]) -> None:
+        """Read `names` now; raises ValueError if one is not valid JSON or not a JSON object."""
+        for name in names:
+            artifact = self.read_artifact(name)
+            if artifact is None:
+                continue
+            if not isinstance(artifact, dict):
+                raise ValueError(f"{name} artifact must be a JSON object")
+            stages = artifact.get("stages", []) if name == "validationChain" else []
+            if not isinstance(stages, list) or not all(isinstance(stage, dict) for stage in stages):
+                raise ValueError("validationChain stages must be a list of objects")
+
+
+def load_profile(profile_json_path: str | Path) -> LoadedProfile:
+    p = Path(profile_json_path).resolve()
+    profile = ProfileManifest.model_validate(json.loads(p.read_text(encoding="utf-8")))
+    return LoadedProfile(profile=profile, profile_dir=p.parent)
+
+
+def load_profiles(profiles_dir: str | Path) -> list[LoadedProfile]:
+    """Load every `*/profile.json` under `profiles_dir`, sorted by profile id."""
+    root = Path(profiles_dir)
+    if not root.exists():
+        return []
+    profiles = [load_profile(p) for p in sorted(root.glob("*/profile.json"))]
+    return sorted(profiles, key=lambda loaded: loaded.profile.id)
+
+
+def fidelity_class(fidelity: dict[str, Any] | None) -> str | None:
+    """Strongest declared round-trip fidelity class (byte > structural > semantic)."""
+    round_trip = (fidelity or {}).get("roundTrip") or {}
+    for level in ("byte", "structural", "semantic"):
+        if round_trip.get(level) is True:
+            return level
+    return None
@@ -0,0 +1,197 @@
+"""
+Indexed, hot-reloadable registry of protocol profiles (spec 9.6).
+
+`ProfileRegistry` scans `*/profile.json` under a root once at startup and
+publishes an immutable `ProfileSnapshot`, indexed by `id`,
+`protocolId`/`version` and `supportLevel`. A profile's artifacts are parsed
+on first use and kept on its `LoadedProfile`.
+
+`refresh()` stats the profile files and re-reads only the profiles whose
+files changed. A changed mtime whose content hash is unchanged counts as no
+change. The artifacts of a changed profile are parsed before it replaces the
+old version, so a broken edit keeps the last good one. Changes are published by swapping in a new snapshot in one
+assignment. Requests that already hold the old snapshot, or a `LoadedProfile`
+from it, finish against it, and nothing waits on a lock to read.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+from uemp_profiles import LoadedProfile, load_profile
+
+T = TypeVar("T")
+
+ARTIFACT_NAMES = ("mappings", "validationChain", "fidelity", "edgeCases")
+
+
+@dataclass(frozen=True)
+class ProfileSnapshot:
+    """One consistent generation of the registry; never mutated after it is published."""
+
+    generation: int
+    profiles: tuple[LoadedProfile, ...]
+    by_id: dict[str, LoadedProfile]
+    by_protocol: dict[tuple[str, str], tuple[LoadedProfile, ...]]
+    by_support_level: dict[str, tuple[LoadedProfile, ...]]
+    _derived: dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def build(cls, generation: int, profiles: Iterable[LoadedProfile]) -> ProfileSnapshot:
+        ordered = tuple(sorted(profiles, key=lambda loaded: loaded.profile.id))
+        by_protocol: dict[tuple[str, str], list[LoadedProfile]] = {}
+        by_support_level: dict[str, list[LoadedProfile]] = {}
+        for loaded in ordered:
+            profile = loaded.profile
+            by_protocol.setdefault((profile.protocolId or profile.protocol, profile.version), []).append(loaded)
+            by_support_level.setdefault(profile.supportLevel, []).append(loaded)
+        return cls(
+            generation=generation,
+            profiles=ordered,
+            by_id={loaded.profile.id: loaded for loaded in ordered},
+            by_protocol={key: tuple(group) for key, group in by_protocol.items()},
+            by_support_level={key: tuple(group) for key, group in by_support_level.items()},
+        )
+
+    def get(self, profile_id: str) -> LoadedProfile | None:
+        return self.by_id.get(profile_id)
+
+    def find(self, protocol_id: str, version: str) -> tuple[LoadedProfile, ...]:
+        """Profiles for a protocol version (`protocolId`, or `protocol` when no id is set)."""
+        return self.by_protocol.get((protocol_id, version), ())
+
+    def with_support_level(self, level: str) -> tuple[LoadedProfile, ...]:
+        return self.by_support_level.get(level, ())
+
+    def derived(self, key: str, build: Callable[[ProfileSnapshot], T]) -> T:
+        """`build(self)`, computed once per snapshot (e.g. the capability document)."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            return self._derived.setdefault(key, build(self))
+
+
+@dataclass(frozen=True)
+class _Entry:
+    loaded: LoadedProfile
+    # profile.json and its artifact files, their (name, mtime_ns, size) and content hash.
+    files: tuple[Path, ...]
+    stamp: tuple[tuple[str, int, int], ...]
+    digest: str
+
+
+def _profile_files(loaded: LoadedProfile | None, profile_json: Path) -> tuple[Path, ...]:
+    if loaded is None:
+        try:
+            loaded = load_profile(profile_json)
+        except Exception:
+            return (profile_json,)
+    return (profile_json, *(path for name in ARTIFACT_NAMES if (path := loaded.artifact_path(name)) is not None))
+
+
+def _stamp(files: tuple[Path, ...]) -> tuple[tuple[str, int, int], ...]:
+    stamp = []
+    for path in files:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            stamp.append((path.name, -1, -1))
+        else:
+            stamp.append((path.name, st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _digest(files: tuple[Path, ...]) -> str:
+    h = hashlib.sha256()
+    for path in files:
+        h.update(path.name.encode("utf-8") + b"\0")
+        h.update(path.read_bytes() if path.exists() else b"\0missing")
+    return h.hexdigest()
+
+
+class ProfileRegistry:
+    """Profiles under `root`, served from the current `snapshot`."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.errors: dict[str, str] = {}
+        self._entries: dict[Path, _Entry] = {}
+        self._refresh_lock = threading.Lock()
+        self._snapshot = ProfileSnapshot.build(0, ())
+        self.refresh(strict=True)
+
+    @property
+    def snapshot(self) -> ProfileSnapshot:
+        return self._snapshot
+
+    @property
+    def profiles(self) -> tuple[LoadedProfile, ...]:
+        return self._snapshot.profiles
+
+    def get(self, profile_id: str) -> LoadedProfile | None:
+        return self._snapshot.get(profile_id)
+
+    def refresh(self, *, strict: bool = False) -> bool:
+        """Pick up added, changed and removed profiles; returns True if a new snapshot was published.
+
+        A profile that fails to load, or a changed profile with an artifact
+        that does not parse, keeps its last good version (its error is in
+        `errors`), unless `strict`, as on the initial scan, where it raises.
+        Artifacts of profiles seen for the first time are left to first use.
+        """
+        with self._refresh_lock:
+            previous = self._entries
+            entries: dict[Path, _Entry] = {}
+            errors: dict[str, str] = {}
+            changed = False
+            paths = sorted(self.root.glob("*/profile.json")) if self.root.exists() else []
+            for profile_json in paths:
+                old = previous.get(profile_json)
+                # The artifact list only changes with profile.json, so it is not re-parsed otherwise.
+                same_manifest = old is not None and _stamp((profile_json,)) == old.stamp[:1]
+                files = old.files if same_manifest else _profile_files(None, profile_json)
+                stamp = _stamp(files)
+                if old is not None and old.stamp == stamp:
+                    entries[profile_json] = old
+                    continue
+                try:
+                    digest = _digest(files)
+                    if old is not None and old.digest == digest:
+                        entries[profile_json] = _Entry(old.loaded, files, stamp, digest)
+                        continue
+                    loaded = load_profile(profile_json)
+                    files = _profile_files(loaded, profile_json)
+                    # Stamped and hashed before the artifacts are parsed, so a write
+                    # landing during the parse shows up as a change next time.
+                    stamp, digest = _stamp(files), _digest(files)
+                    if old is not None:
+                        # Parse a changed profile's artifacts before publishing; a broken or
+                        # half-written one keeps the last good version rather than failing requests.
+                        loaded.read_artifacts(ARTIFACT_NAMES)
+                    entries[profile_json] = _Entry(loaded, files, stamp, digest)
+                    changed = True
+                except Exception as e:
+                    if strict:
+                        raise
+                    errors[str(profile_json)] = f"{type(e).__name__}: {e}"
+                    if old is not None:
+                        entries[profile_json] = old
+            changed = changed or previous.keys() != entries.keys()
+            self._entries = entries
+            self.errors = errors
+            if changed:
+                loaded = [entry.loaded for entry in entries.values()]
+                self._snapshot = ProfileSnapshot.build(self._snapshot.generation + 1, loaded)
+            return changed
+
+    async def watch(self, interval_s: float) -> None:
+        """Refresh every `interval_s` (in a worker thread) until cancelled."""
+        while True:
+            await asyncio.sleep(interval_s)
+            await asyncio.to_thread(self.refresh)
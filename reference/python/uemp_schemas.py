@@ -16,6 +16,8 @@ UEMP_PROTOCOL_PATTERN = re.compile(r"^uemp/[0-9]+\.[0-9]+$")
 UEMP_MESSAGE_ID_PATTERN = re.compile(
     r"^uemp:[A-Z0-9-]{1,32}:[0-9]{4}:[a-z0-9-]{1,64}$"
 )
+# Batch envelope `checksum` and `$link` `$checksum` values (spec D1, D2).
+UEMP_CHECKSUM_PATTERN = re.compile(r"^sha256:[0-9a-f]{64}$")
 
 
 class UEMPMeta(BaseModel):
@@ -48,3 +50,11 @@ class UEMPValidationResult(BaseModel):
     accepted: bool = True
     message: UEMPMessage
     validation: dict[str, str]
+
+
+class NativeValidationRequest(BaseModel):
+    """Request payload for validating a native document against a profile."""
+
+    profileId: str = Field(..., min_length=1)
+    revisionId: str | None = None
+    xml: str = Field(..., min_length=1)
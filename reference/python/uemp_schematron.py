@@ -0,0 +1,198 @@
+"""
+Schematron validation (spec 9.6.2 `schematron` adapter) with pooled, compiled XSLT.
+
+Profiles reference Schematron by allowlisted `xsltId` (see
+`profiles/SCHEMATRON_ASSETS.md`), never by path. Like XSD sets (spec 13.3), the
+compiled Schematron XSLT is not bundled: `xsltId` `peppol/PEPPOL-EN16931-UBL` is
+read from `<root>/peppol/PEPPOL-EN16931-UBL.xslt` (or `.xsl`), where `root` is
+`$UEMP_SCHEMATRON_ROOT` or `profiles/schematron` in the repository. The XSLT
+must emit SVRL; `svrl:failed-assert` elements become issues.
+
+Each asset is compiled once into a `XSLTPool` of at most `pool_size`
+transformer instances. A request borrows one instance for the duration of a
+transform, so no instance is used by two threads at once.
+
+Uses lxml's XSLT 1.0 processor (`pip install lxml`); XSLT 2.0 releases of a
+rule set need converting to 1.0 first.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from uemp_xsd import etree, require_lxml
+
+SCHEMATRON_ASSETS = (
+    "peppol/PEPPOL-EN16931-UBL",
+    "en16931/EN16931-UBL-validation",
+    "en16931/EN16931-CII-validation",
+    "xrechnung/XRechnung-UBL-validation",
+    "xrechnung/XRechnung-CII-validation",
+)
+DEFAULT_SCHEMATRON_ROOT = Path(
+    os.environ.get("UEMP_SCHEMATRON_ROOT") or Path(__file__).resolve().parents[2] / "profiles" / "schematron"
+)
+DEFAULT_POOL_SIZE = 4
+MAX_ISSUES = 100
+
+_SVRL = "{http://purl.oclc.org/dsdl/svrl}"
+
+
+class SchematronError(Exception):
+    """An `xsltId` is not allowlisted, not installed, does not compile, or fails to run."""
+
+
+@dataclass(frozen=True, slots=True)
+class SchematronIssue:
+    id: str | None
+    flag: str
+    location: str | None
+    test: str | None
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class SchematronRun:
+    issues: list[SchematronIssue]
+    compile_ms: float
+    execution_ms: float
+
+
+class XSLTPool:
+    """Up to `size` compiled instances of one stylesheet, each used by one thread at a time."""
+
+    def __init__(self, path: Path, *, size: int = DEFAULT_POOL_SIZE) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.path = path
+        self.size = size
+        started = time.perf_counter()
+        self._stylesheet = etree.parse(str(path), etree.XMLParser(resolve_entities=False, no_network=True))
+        first = self._compile()
+        self.compile_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._idle = [first]
+        self._created = 1
+        self._cond = threading.Condition()
+
+    def _compile(self) -> Any:
+        # Stylesheets may not read or write files or reach the network.
+        access = etree.XSLTAccessControl.DENY_ALL
+        return etree.XSLT(self._stylesheet, access_control=access)
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            transform = self._idle.pop() if self._idle else None
+            if transform is None:
+                self._created += 1
+        if transform is None:
+            try:
+                transform = self._compile()
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        try:
+            yield transform
+        finally:
+            with self._cond:
+                self._idle.append(transform)
+                self._cond.notify()
+
+
+class SchematronEngine:
+    """Compile-once `XSLTPool`s for the allowlisted Schematron assets under `root`."""
+
+    def __init__(
+        self,
+        root: str | Path = DEFAULT_SCHEMATRON_ROOT,
+        *,
+        allowlist: tuple[str, ...] = SCHEMATRON_ASSETS,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ) -> None:
+        self.root = Path(root)
+        self.allowlist = allowlist
+        self.pool_size = pool_size
+        self._pools: dict[str, XSLTPool] = {}
+        self._lock = threading.Lock()
+
+    def asset_path(self, xslt_id: str) -> Path:
+        if xslt_id not in self.allowlist:
+            raise SchematronError(f"xsltId {xslt_id!r} is not allowlisted")
+        for suffix in (".xslt", ".xsl"):
+            path = self.root / f"{xslt_id}{suffix}"
+            if path.is_file():
+                return path
+        raise SchematronError(f"xsltId {xslt_id!r} is not installed under {self.root}")
+
+    def pool(self, xslt_id: str) -> XSLTPool:
+        pool = self._pools.get(xslt_id)
+        if pool is not None:
+            return pool
+        require_lxml()
+        path = self.asset_path(xslt_id)
+        with self._lock:
+            pool = self._pools.get(xslt_id)
+            if pool is None:
+                try:
+                    pool = XSLTPool(path, size=self.pool_size)
+                except (etree.XSLTParseError, etree.XMLSyntaxError, OSError) as e:
+                    raise SchematronError(f"cannot compile xsltId {xslt_id!r}: {e}") from e
+                self._pools[xslt_id] = pool
+        return pool
+
+    def warm(self, xslt_id: str) -> float:
+        """Compile `xslt_id` now; returns its compile time in ms."""
+        return self.pool(xslt_id).compile_ms
+
+    def validate(self, xslt_id: str, document: Any) -> SchematronRun:
+        pool = self.pool(xslt_id)
+        with pool.acquire() as transform:
+            started = time.perf_counter()
+            try:
+                svrl = transform(document)
+            except etree.XSLTApplyError as e:
+                raise SchematronError(f"xsltId {xslt_id!r} failed: {e}") from e
+            execution_ms = round((time.perf_counter() - started) * 1000, 3)
+        return SchematronRun(issues=_svrl_issues(svrl), compile_ms=pool.compile_ms, execution_ms=execution_ms)
+
+
+def _svrl_issues(svrl: Any) -> list[SchematronIssue]:
+    root = svrl.getroot()
+    if root is None:
+        return []
+    issues: list[SchematronIssue] = []
+    for node in root.iter(f"{_SVRL}failed-assert"):
+        issues.append(
+            SchematronIssue(
+                id=node.get("id"),
+                flag=node.get("flag") or "fatal",
+                location=node.get("location"),
+                test=node.get("test"),
+                text=" ".join((node.findtext(f"{_SVRL}text") or "").split()),
+            )
+        )
+        if len(issues) >= MAX_ISSUES:
+            break
+    return issues
+
+
+@functools.cache
+def schematron_engine(root: Path = DEFAULT_SCHEMATRON_ROOT, pool_size: int = DEFAULT_POOL_SIZE) -> SchematronEngine:
+    """The process-wide engine for `root`, shared by every app instance and request."""
+    return SchematronEngine(root, pool_size=pool_size)
@@ -0,0 +1,571 @@
+"""
+JWS signature verification over RFC 8785 (JCS) canonical JSON (spec A1, B1).
+
+Each entry of `signatures` carries a compact JWS (`value`) over the JCS form
+of the message sections in its `scope` (`meta`, `data`, and for transport
+signatures optionally `context`). When `previousSignature` names an earlier
+signature, its JWS `value` is part of the signed object as the member
+`previousSignature`, which chains the counter-signature to it. Both attached
+and detached (`header..signature`, RFC 7515 appendix F) payloads are accepted.
+A signature is a transport signature when its `profile` says so or, without
+one, when it has a `previousSignature`; any other signature (payload, jades)
+must not cover `context`.
+
+`verify_message` canonicalizes each section once per message and builds each
+distinct signing payload once, however many signatures share it.
+Signatures are checked latest first.
+
+Keys come from a local `KeyStore` directory and are never fetched. A
+`certificate` URL `https://host/path` resolves to `<dir>/host/path`, a JWS
+`x5t#S256` header or a `sha256:<hex>` reference resolves by fingerprint, and a
+`kid` resolves to `<dir>/<kid>.pem`. Parsed keys are cached for `ttl_s`
+seconds.
+
+Requires `cryptography` (`pip install cryptography`).
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import concurrent.futures
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+except ImportError:  # pragma: no cover - exercised only without cryptography
+    x509 = None
+
+from uemp_envelope import EnvelopeError
+
+SECTIONS = ("meta", "data", "context")
+REQUIRED_SCOPE = ("meta", "data")
+DEFAULT_KEY_TTL_S = 300.0
+_KID = re.compile(r"[A-Za-z0-9._-]{1,128}")
+
+
+class SignatureError(Exception):
+    """A key store or signature input that cannot be used at all."""
+
+
+def require_cryptography() -> None:
+    if x509 is None:
+        raise SignatureError("signature verification requires cryptography: pip install cryptography")
+
+
+# -- RFC 8785 canonicalization ------------------------------------------------
+
+
+def _jcs_number(value: float) -> str:
+    """ECMAScript Number.prototype.toString (RFC 8785 section 3.2.2.3)."""
+    if not math.isfinite(value):
+        raise ValueError("JCS cannot represent NaN or Infinity")
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    mantissa, _, exp = repr(abs(value)).partition("e")
+    int_part, _, frac = mantissa.partition(".")
+    digits = int_part + frac
+    stripped = digits.lstrip("0")
+    # value = 0.<digits> x 10**n
+    n = len(int_part) + int(exp or 0) - (len(digits) - len(stripped))
+    digits = stripped.rstrip("0")
+    k = len(digits)
+    if k <= n <= 21:
+        return sign + digits + "0" * (n - k)
+    if 0 < n <= 21:
+        return sign + digits[:n] + "." + digits[n:]
+    if -6 < n <= 0:
+        return sign + "0." + "0" * -n + digits
+    e = n - 1
+    exponent = f"e{'+' if e >= 0 else '-'}{abs(e)}"
+    return sign + (digits if k == 1 else digits[0] + "." + digits[1:]) + exponent
+
+
+# The C string encoder json.dumps uses; it escapes exactly what RFC 8785 requires.
+_string = json.encoder.encode_basestring
+
+
+def _jcs(value: Any, out: list[str]) -> None:
+    if value is None:
+        out.append("null")
+    elif value is True:
+        out.append("true")
+    elif value is False:
+        out.append("false")
+    elif isinstance(value, str):
+        out.append(_string(value))
+    elif isinstance(value, int):
+        out.append(str(value) if abs(value) <= 2**53 else _jcs_number(float(value)))
+    elif isinstance(value, float):
+        out.append(_jcs_number(value))
+    elif isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise ValueError("JCS object keys must be strings")
+        out.append("{")
+        # Members are ordered by their UTF-16 code units, which for ASCII is plain string order.
+        if all(key.isascii() for key in value):
+            keys = sorted(value)
+        else:
+            keys = sorted(value, key=lambda k: k.encode("utf-16-be", "surrogatepass"))
+        for i, key in enumerate(keys):
+            if i:
+                out.append(",")
+            out.append(_string(key))
+            out.append(":")
+            _jcs(value[key], out)
+        out.append("}")
+    elif isinstance(value, (list, tuple)):
+        out.append("[")
+        for i, item in enumerate(value):
+            if i:
+                out.append(",")
+            _jcs(item, out)
+        out.append("]")
+    else:
+        raise ValueError(f"JCS cannot represent {type(value).__name__}")
+
+
+def canonicalize(value: Any) -> bytes:
+    """RFC 8785 canonical UTF-8 bytes of a JSON value (lone surrogates raise)."""
+    out: list[str] = []
+    _jcs(value, out)
+    try:
+        return "".join(out).encode("utf-8")
+    except UnicodeEncodeError as e:
+        raise ValueError("JCS strings must be valid Unicode") from e
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class CanonicalMessage:
+    """Signing payloads of one message, each section canonicalized at most once."""
+
+    def __init__(self, message: dict[str, Any]) -> None:
+        self.message = message
+        self.sections_canonicalized = 0
+        self._sections: dict[str, bytes] = {}
+        self._payloads: dict[tuple[tuple[str, ...], str | None], str] = {}
+
+    def section(self, name: str) -> bytes:
+        cached = self._sections.get(name)
+        if cached is None:
+            cached = self._sections[name] = canonicalize(self.message[name])
+            self.sections_canonicalized += 1
+        return cached
+
+    def payload(self, scope: Sequence[str], previous: str | None = None) -> str:
+        """base64url of the JCS form of the scoped sections (plus `previousSignature`)."""
+        key = (tuple(sorted(set(scope))), previous)
+        cached = self._payloads.get(key)
+        if cached is None:
+            # Section names are ASCII, so sorting them is the JCS member order.
+            members = [(name, self.section(name)) for name in key[0] if name in self.message]
+            if previous is not None:
+                members.append(("previousSignature", canonicalize(previous)))
+            members.sort()
+            body = b",".join(json.dumps(name).encode("ascii") + b":" + value for name, value in members)
+            cached = self._payloads[key] = b64url(b"{" + body + b"}")
+        return cached
+
+
+# -- keys ---------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class VerificationKey:
+    public_key: Any
+    fingerprint: str
+    not_after: datetime | None
+    source: Path
+
+
+def _load_key(path: Path) -> VerificationKey:
+    data = path.read_bytes()
+    try:
+        if b"-----BEGIN CERTIFICATE-----" in data:
+            cert = x509.load_pem_x509_certificate(data)
+            der = cert.public_bytes(serialization.Encoding.DER)
+            return VerificationKey(cert.public_key(), hashlib.sha256(der).hexdigest(), cert.not_valid_after_utc, path)
+        public_key = serialization.load_pem_public_key(data)
+    except ValueError as e:
+        raise SignatureError(f"{path.name} is not a PEM certificate or public key: {e}") from e
+    der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return VerificationKey(public_key, hashlib.sha256(der).hexdigest(), None, path)
+
+
+class KeyStore:
+    """Certificates and public keys under a local directory, parsed once per `ttl_s`.
+
+    Pickles as its directory and TTL, so worker processes build their own cache.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        ttl_s: float = DEFAULT_KEY_TTL_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        require_cryptography()
+        self.directory = Path(directory).resolve()
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._keys: dict[str, tuple[float, VerificationKey]] = {}
+        self._fingerprints: tuple[float, dict[str, Path]] | None = None
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (key_store, (str(self.directory), self.ttl_s))
+
+    def _path_for(self, reference: str) -> Path:
+        if reference.startswith(("https://", "http://")):
+            url = urlsplit(reference)
+            path = (self.directory / (url.hostname or "") / url.path.lstrip("/")).resolve()
+            if not url.hostname or not path.is_relative_to(self.directory.joinpath(url.hostname)):
+                raise SignatureError(f"certificate {reference!r} does not map into the key directory")
+            return path
+        if reference.startswith("sha256:"):
+            return self._by_fingerprint(reference[len("sha256:") :].lower())
+        if not _KID.fullmatch(reference):
+            raise SignatureError(f"unsupported key reference {reference!r}")
+        return self.directory / f"{reference}.pem"
+
+    def _by_fingerprint(self, fingerprint: str) -> Path:
+        now = self._clock()
+        with self._lock:
+            if self._fingerprints is None or self._fingerprints[0] <= now:
+                index: dict[str, Path] = {}
+                for path in sorted(self.directory.rglob("*.pem")):
+                    try:
+                        index[_load_key(path).fingerprint] = path
+                    except SignatureError:
+                        continue
+                self._fingerprints = (now + self.ttl_s, index)
+            index = self._fingerprints[1]
+        try:
+            return index[fingerprint]
+        except KeyError:
+            raise SignatureError(f"no key with fingerprint sha256:{fingerprint}") from None
+
+    def get(self, reference: str) -> VerificationKey:
+        """The key for a certificate URL, `sha256:<hex>` fingerprint or `kid`."""
+        now = self._clock()
+        cached = self._keys.get(reference)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        path = self._path_for(reference)
+        if not path.is_file():
+            raise SignatureError(f"key {reference!r} is not installed under {self.directory}")
+        key = _load_key(path)
+        with self._lock:
+            self._keys[reference] = (now + self.ttl_s, key)
+            for expired in [ref for ref, (expires, _) in self._keys.items() if expires <= now]:
+                del self._keys[expired]
+        return key
+
+
+@functools.cache
+def key_store(directory: str, ttl_s: float = DEFAULT_KEY_TTL_S) -> KeyStore:
+    """The process-wide store for `directory`."""
+    return KeyStore(directory, ttl_s=ttl_s)
+
+
+# -- verification -------------------------------------------------------------
+
+_HASHES = {"256": "SHA256", "384": "SHA384", "512": "SHA512"}
+
+
+def _verify_jws(alg: str, public_key: Any, signature: bytes, signing_input: bytes) -> bool:
+    family, bits = alg[:2], alg[2:]
+    try:
+        if alg == "EdDSA":
+            if not isinstance(public_key, ed25519.Ed25519PublicKey):
+                return False
+            public_key.verify(signature, signing_input)
+            return True
+        if bits not in _HASHES:
+            return False
+        digest = getattr(hashes, _HASHES[bits])()
+        if family in ("RS", "PS"):
+            if not isinstance(public_key, rsa.RSAPublicKey):
+                return False
+            pad = (
+                padding.PKCS1v15()
+                if family == "RS"
+                else padding.PSS(mgf=padding.MGF1(digest), salt_length=digest.digest_size)
+            )
+            public_key.verify(signature, signing_input, pad, digest)
+            return True
+        if family == "ES":
+            if not isinstance(public_key, ec.EllipticCurvePublicKey) or len(signature) % 2:
+                return False
+            half = len(signature) // 2
+            der = encode_dss_signature(int.from_bytes(signature[:half], "big"), int.from_bytes(signature[half:], "big"))
+            public_key.verify(der, signing_input, ec.ECDSA(digest))
+            return True
+    except InvalidSignature:
+        return False
+    return False
+
+
+@dataclass
+class SignatureReport:
+    valid: bool
+    # One entry per signature, in verification order (latest first).
+    results: list[dict[str, Any]] = field(default_factory=list)
+    sections_canonicalized: int = 0
+
+    def errors(self) -> list[dict[str, Any]]:
+        return [result["error"] for result in self.results if "error" in result]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"valid": self.valid, "signatures": self.results}
+
+
+def _failure(signature_id: Any, index: int, code: str, message: str) -> dict[str, Any]:
+    return {
+        "id": signature_id,
+        "valid": False,
+        "error": {"code": code, "severity": "fatal", "field": f"signatures[{index}]", "message": message},
+    }
+
+
+def _profile(signature: dict[str, Any]) -> str:
+    """The signature profile: `profile` if set, else "transport" for a counter-signature, else "payload"."""
+    profile = signature.get("profile")
+    if isinstance(profile, str):
+        return profile
+    return "transport" if "previousSignature" in signature else "payload"
+
+
+def _check_one(
+    index: int,
+    signature: dict[str, Any],
+    by_id: dict[str, dict[str, Any]],
+    canonical: CanonicalMessage,
+    keys: KeyStore,
+    now: datetime,
+) -> dict[str, Any]:
+    signature_id = signature.get("id")
+    invalid = functools.partial(_failure, signature_id, index, "protocol-signature-invalid")
+    scope = signature.get("scope")
+    if not isinstance(scope, list) or not set(REQUIRED_SCOPE) <= set(scope) or not set(scope) <= set(SECTIONS):
+        return invalid(f"scope must contain {list(REQUIRED_SCOPE)} and only {list(SECTIONS)}")
+    previous = signature.get("previousSignature")
+    if "context" in scope and _profile(signature) != "transport":
+        return invalid(f"scope of a {_profile(signature)} signature must not include context")
+    previous_value = None
+    if previous is not None:
+        referenced = by_id.get(previous)
+        if referenced is None or referenced is signature:
+            return invalid(f"previousSignature {previous!r} does not name another signature")
+        previous_value = referenced.get("value")
+        if not isinstance(previous_value, str):
+            return invalid(f"previousSignature {previous!r} has no value")
+
+    value = signature.get("value")
+    parts = value.split(".") if isinstance(value, str) else []
+    if len(parts) != 3:
+        return invalid("value is not a compact JWS")
+    try:
+        header = json.loads(b64url_decode(parts[0]))
+        jws_signature = b64url_decode(parts[2])
+    except (ValueError, binascii.Error):
+        return invalid("JWS header or signature is not valid base64url JSON")
+    alg = header.get("alg") if isinstance(header, dict) else None
+    if not isinstance(alg, str) or alg == "none" or alg != signature.get("algorithm", alg):
+        return invalid(f"JWS alg {alg!r} does not match algorithm {signature.get('algorithm')!r}")
+
+    payload = canonical.payload(scope, previous_value)
+    if parts[1] and parts[1] != payload:
+        return invalid("JWS payload does not match the canonical form of the signed sections")
+
+    reference = header.get("x5t#S256")
+    if isinstance(reference, str):
+        try:
+            reference = "sha256:" + b64url_decode(reference).hex()
+        except (ValueError, binascii.Error):
+            return invalid("x5t#S256 is not valid base64url")
+    else:
+        reference = signature.get("certificate") or header.get("kid")
+    if not isinstance(reference, str):
+        return invalid("signature names no certificate, x5t#S256 or kid")
+    try:
+        key = keys.get(reference)
+    except SignatureError as e:
+        return invalid(str(e))
+
+    signing_input = f"{parts[0]}.{payload}".encode("ascii")
+    if not _verify_jws(alg, key.public_key, jws_signature, signing_input):
+        return invalid("signature does not verify (tampered content or wrong key)")
+    if key.not_after is not None and key.not_after < now:
+        expired = f"certificate expired at {key.not_after.isoformat()}"
+        return _failure(signature_id, index, "protocol-signature-expired", expired)
+    return {"id": signature_id, "valid": True}
+
+
+def verify_message(message: dict[str, Any], keys: KeyStore, *, now: datetime | None = None) -> SignatureReport:
+    """Verify every entry of `message["signatures"]`, latest first."""
+    signatures = message.get("signatures") or []
+    canonical = CanonicalMessage(message)
+    now = now or datetime.now(timezone.utc)
+    by_id: dict[str, dict[str, Any]] = {}
+    duplicates: set[Any] = set()
+    for signature in signatures:
+        signature_id = signature.get("id") if isinstance(signature, dict) else None
+        if signature_id in by_id:
+            duplicates.add(signature_id)
+        elif isinstance(signature_id, str):
+            by_id[signature_id] = signature
+
+    results = []
+    for index in reversed(range(len(signatures))):
+        signature = signatures[index]
+        if not isinstance(signature, dict) or not isinstance(signature.get("id"), str):
+            results.append(_failure(None, index, "protocol-signature-invalid", "signature has no id"))
+        elif signature["id"] in duplicates:
+            results.append(_failure(signature["id"], index, "protocol-signature-invalid", "signature id is not unique"))
+        else:
+            try:
+                results.append(_check_one(index, signature, by_id, canonical, keys, now))
+            except ValueError as e:
+                results.append(_failure(signature["id"], index, "protocol-signature-invalid", f"cannot canonicalize: {e}"))
+    return SignatureReport(
+        valid=all(result["valid"] for result in results),
+        results=results,
+        sections_canonicalized=canonical.sections_canonicalized,
+    )
+
+
+def signature_error(report: SignatureReport) -> EnvelopeError:
+    """The 400 error for a message whose signatures do not all verify."""
+    errors = report.errors()
+    codes = {error["code"] for error in errors}
+    code = "protocol-signature-expired" if codes == {"protocol-signature-expired"} else "protocol-signature-invalid"
+    return EnvelopeError(
+        status_code=400,
+        code=code,
+        message=f"{len(errors)} of {len(report.results)} signature(s) failed verification",
+        hint="Sign the JCS form of the scoped sections with a key the receiver trusts",
+        action="fix-message",
+        errors=errors,
+    )
+
+
+def sign(
+    message: dict[str, Any],
+    private_key: Any,
+    *,
+    signature_id: str,
+    party: dict[str, Any],
+    algorithm: str = "RS256",
+    scope: Sequence[str] = REQUIRED_SCOPE,
+    certificate: str | None = None,
+    kid: str | None = None,
+    previous: str | None = None,
+    detached: bool = True,
+) -> dict[str, Any]:
+    """Build a `signatures` entry for `message` (used by tests and benchmarks)."""
+    require_cryptography()
+    previous_value = None
+    if previous is not None:
+        previous_value = next(s["value"] for s in message.get("signatures") or [] if s.get("id") == previous)
+    header = {"alg": algorithm, **({"kid": kid} if kid else {})}
+    protected = b64url(canonicalize(header))
+    payload = CanonicalMessage(message).payload(scope, previous_value)
+    signing_input = f"{protected}.{payload}".encode("ascii")
+    family, bits = algorithm[:2], algorithm[2:]
+    if algorithm == "EdDSA":
+        raw = private_key.sign(signing_input)
+    else:
+        digest = getattr(hashes, _HASHES[bits])()
+        if family == "RS":
+            raw = private_key.sign(signing_input, padding.PKCS1v15(), digest)
+        elif family == "PS":
+            raw = private_key.sign(signing_input, padding.PSS(mgf=padding.MGF1(digest), salt_length=digest.digest_size), digest)
+        else:
+            r, s = decode_dss_signature(private_key.sign(signing_input, ec.ECDSA(digest)))
+            size = (private_key.curve.key_size + 7) // 8
+            raw = r.to_bytes(size, "big") + s.to_bytes(size, "big")
+    entry: dict[str, Any] = {"id": signature_id, "party": party, "scope": list(scope), "algorithm": algorithm}
+    if certificate:
+        entry["certificate"] = certificate
+    if previous:
+        entry["previousSignature"] = previous
+    entry["value"] = f"{protected}.{'' if detached else payload}.{b64url(raw)}"
+    return entry
+
+
+# -- batches ------------------------------------------------------------------
+
+
+def _verify_lines(lines: Sequence[bytes], keys: KeyStore) -> list[dict[str, Any] | None]:
+    reports: list[dict[str, Any] | None] = []
+    for line in lines:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            reports.append(None)
+            continue
+        if not isinstance(message, dict) or not message.get("signatures"):
+            reports.append(None)
+            continue
+        reports.append(verify_message(message, keys).to_dict())
+    return reports
+
+
+def signature_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """A spawn-context pool of `workers` processes for `verify_batch`; processes start on first use."""
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def verify_batch(
+    lines: Iterable[bytes],
+    keys: KeyStore,
+    *,
+    executor: concurrent.futures.Executor | None = None,
+    workers: int = 0,
+    chunk_size: int = 256,
+) -> list[dict[str, Any] | None]:
+    """Verify the signatures of every NDJSON line; one report per line (None: unsigned or not JSON).
+
+    Chunks of `chunk_size` lines are parsed and verified in `executor`, or in a
+    temporary spawn-context pool of `workers` processes; with neither, in the
+    calling thread.
+    """
+    lines = list(lines)
+    chunks = [lines[i : i + chunk_size] for i in range(0, len(lines), chunk_size)]
+    if executor is None and workers <= 0:
+        return [report for chunk in chunks for report in _verify_lines(chunk, keys)]
+    own = executor is None
+    if own:
+        executor = signature_pool(workers)
+    try:
+        return [report for reports in executor.map(_verify_lines, chunks, [keys] * len(chunks)) for report in reports]
+    finally:
+        if own:
+            executor.shutdown()
@@ -0,0 +1,217 @@
+"""
+In-process conversation pub/sub behind the SSE stream (spec 5.2.1, D1).
+
+`ConversationHub.publish` encodes a message into one `uemp-message` event
+frame and hands that same bytes object to every subscriber of its
+`meta.conversationId`; nothing is encoded when nobody listens. Each
+`Subscription` holds at most `queue_size` frames. A subscriber that falls
+further behind either loses its oldest frames (`drop-oldest`, counted in
+`dropped`) or is disconnected with a final `error` event (`disconnect`), so
+memory is bounded by subscribers x queue size, never by messages published.
+
+`complete` ends every subscription of a conversation with a `done` event. The
+hub is bound to the event loop that uses it and is not thread-safe.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any
+
+from uemp_envelope import EnvelopeError
+
+SLOW_CONSUMER_POLICIES = ("drop-oldest", "disconnect")
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_HEARTBEAT_S = 15.0
+
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def encode_event(event: str, data: Any) -> bytes:
+    """One SSE frame; `data` is encoded as single-line JSON."""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return b"event: " + event.encode("ascii") + b"\ndata: " + body.encode("utf-8") + b"\n\n"
+
+
+class Subscription:
+    """One subscriber's bounded queue of pre-encoded frames."""
+
+    __slots__ = (
+        "hub",
+        "conversation_id",
+        "delivered",
+        "dropped",
+        "closed",
+        "_frames",
+        "_final",
+        "_completed",
+        "_waiter",
+    )
+
+    def __init__(self, hub: ConversationHub, conversation_id: str) -> None:
+        self.hub = hub
+        self.conversation_id = conversation_id
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._frames: deque[bytes] = deque()
+        self._final: bytes | None = None
+        self._completed = False
+        # Pending while the consumer waits: True on a heartbeat timeout, None when woken.
+        self._waiter: asyncio.Future[bool | None] | None = None
+
+    def _offer(self, frame: bytes) -> None:
+        if len(self._frames) >= self.hub.queue_size:
+            if self.hub.slow_consumer == "disconnect":
+                failure = EnvelopeError(
+                    status_code=429,
+                    code="system-rate-limited",
+                    message=f"Subscriber fell more than {self.hub.queue_size} events behind",
+                    hint="Read the stream faster, or resubscribe and fetch the missed messages",
+                    action="retry",
+                )
+                self._frames.clear()
+                self._close(encode_event("error", failure.content()))
+                return
+            self._frames.popleft()
+            self.dropped += 1
+        self._frames.append(frame)
+        self._wake()
+
+    def _wake(self, timed_out: bool | None = None) -> None:
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(timed_out)
+
+    def _close(self, final: bytes | None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._final = final
+        self.hub._remove(self)
+        self._wake()
+
+    def _done(self) -> bytes:
+        summary: dict[str, Any] = {"conversationId": self.conversation_id, "messageCount": self.delivered}
+        if self.dropped:
+            summary["dropped"] = self.dropped
+        return encode_event("done", summary)
+
+    def close(self) -> None:
+        """Stop receiving; the frames already queued are still delivered."""
+        self._close(None)
+
+    async def frames(self, heartbeat_s: float | None = None) -> AsyncIterator[bytes]:
+        """Queued frames as they arrive, ending with the final `done`/`error` event.
+
+        Yields a comment frame after `heartbeat_s` idle seconds so proxies keep
+        the connection open. Unsubscribes when the consumer stops iterating.
+        """
+        try:
+            while True:
+                while self._frames:
+                    self.delivered += 1
+                    yield self._frames.popleft()
+                if self.closed:
+                    if self._completed:
+                        yield self._done()
+                    elif self._final is not None:
+                        yield self._final
+                    return
+                if await self._wait(heartbeat_s):
+                    yield HEARTBEAT
+        finally:
+            self.close()
+
+    async def _wait(self, timeout: float | None) -> bool | None:
+        # A future and a timer handle per wait; no task, unlike asyncio.wait_for.
+        loop = asyncio.get_running_loop()
+        self._waiter = loop.create_future()
+        timer = loop.call_later(timeout, self._wake, True) if timeout is not None else None
+        try:
+            return await self._waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+
+
+class ConversationHub:
+    """Fan-out of accepted messages to the subscribers of their conversation."""
+
+    def __init__(
+        self,
+        *,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        slow_consumer: str = "drop-oldest",
+        max_subscribers: int | None = None,
+        heartbeat_s: float | None = DEFAULT_HEARTBEAT_S,
+    ) -> None:
+        if slow_consumer not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"slow_consumer must be one of {SLOW_CONSUMER_POLICIES}, got {slow_consumer!r}")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.queue_size = queue_size
+        self.slow_consumer = slow_consumer
+        self.max_subscribers = max_subscribers
+        self.heartbeat_s = heartbeat_s
+        self.subscriber_count = 0
+        self._subscribers: dict[str, dict[Subscription, None]] = {}
+
+    def subscribe(self, conversation_id: str) -> Subscription:
+        """Start receiving the conversation's messages; raises EnvelopeError(503) at capacity."""
+        if self.max_subscribers is not None and self.subscriber_count >= self.max_subscribers:
+            raise EnvelopeError(
+                status_code=503,
+                code="system-service-unavailable",
+                message=f"Stream subscriber limit ({self.max_subscribers}) reached",
+                hint="Retry later",
+                action="retry",
+            )
+        subscription = Subscription(self, conversation_id)
+        self._subscribers.setdefault(conversation_id, {})[subscription] = None
+        self.subscriber_count += 1
+        return subscription
+
+    def _remove(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.conversation_id)
+        if subscribers is None or subscribers.pop(subscription, False) is False:
+            return
+        self.subscriber_count -= 1
+        if not subscribers:
+            del self._subscribers[subscription.conversation_id]
+
+    def publish(self, conversation_id: str, message: Any) -> int:
+        """Queue `message` for the conversation's subscribers; returns how many got it."""
+        subscribers = self._subscribers.get(conversation_id)
+        if not subscribers:
+            return 0
+        frame = encode_event("uemp-message", message)
+        # Slow consumers may disconnect (and unsubscribe) while offered a frame.
+        offered = list(subscribers)
+        for subscription in offered:
+            subscription._offer(frame)
+        return len(offered)
+
+    def complete(self, conversation_id: str) -> int:
+        """End the conversation's streams with a `done` event; returns how many ended."""
+        subscribers = list(self._subscribers.get(conversation_id, ()))
+        for subscription in subscribers:
+            subscription._completed = True
+            subscription._close(None)
+        return len(subscribers)
+
+    def close(self) -> None:
+        """End every stream (on shutdown) without a `done` event."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+
+
+def ends_conversation(meta: dict[str, Any]) -> bool:
+    """True when `meta.workflow` says the conversation reached a terminal state (spec C2)."""
+    workflow = meta.get("workflow")
+    return isinstance(workflow, dict) and workflow.get("validTransitions") == []
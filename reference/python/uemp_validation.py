@@ -0,0 +1,422 @@
+"""
+Native document validation through a profile's validation chain (spec 9.6.2).
+
+`ValidationChainExecutor` runs the stages of `validation-chain.json` in order,
+stops after a failed `fatal` stage, and enforces each stage's `timeoutMs`.
+Stages never run on the event loop: CPU-bound adapters go to a process pool
+when one is configured, everything else to a worker thread. A stage that
+times out is abandoned (its result is discarded) and reported as `timeout`.
+
+Adapter output is normalized into UEMP error structures (spec C3). A
+non-fatal stage whose adapter type has no implementation is reported as
+`skipped`; a fatal one makes the document unverifiable (503).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import multiprocessing.process
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from uemp_envelope import EnvelopeError
+from uemp_profiles import LoadedProfile
+from uemp_schematron import SchematronEngine, SchematronError, SchematronIssue, schematron_engine
+from uemp_xsd import SchemaSetCache, SchemaSetError, XSDIssue, parse_document, schema_set_cache
+
+# Adapters offloaded to the process pool (when the executor has one).
+CPU_BOUND_ADAPTERS = frozenset({"xsd", "schematron", "edi-grammar"})
+# Retry-After for a missing validator: assets are installed by an operator, not in seconds.
+UNAVAILABLE_RETRY_AFTER_S = 60.0
+
+
+class NativeValidationError(EnvelopeError):
+    """A request that cannot be validated at all (as opposed to an invalid document)."""
+
+
+def validator_unavailable(message: str) -> NativeValidationError:
+    return NativeValidationError(
+        status_code=503,
+        code="system-service-unavailable",
+        message=message,
+        hint="Install the validation assets under UEMP_XSD_ROOT / UEMP_SCHEMATRON_ROOT (see profiles/*.md)",
+        action="retry",
+        retry_after=UNAVAILABLE_RETRY_AFTER_S,
+    )
+
+
+@dataclass(frozen=True)
+class ValidatorAssets:
+    """The compiled-asset caches adapters validate against.
+
+    Pickles as its roots, so a worker process resolves the same roots to its
+    own process-wide caches (compiled once per worker).
+    """
+
+    xsd: SchemaSetCache
+    schematron: SchematronEngine
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_assets_for_roots, (str(self.xsd.root), str(self.schematron.root), self.schematron.pool_size))
+
+
+def _assets_for_roots(xsd_root: str, schematron_root: str, pool_size: int) -> ValidatorAssets:
+    return ValidatorAssets(schema_set_cache(Path(xsd_root)), schematron_engine(Path(schematron_root), pool_size))
+
+
+@dataclass
+class StageOutcome:
+    errors: list[dict[str, Any]] = field(default_factory=list)
+    failed: bool = False
+    # Adapter-specific details merged into the stage entry (asset id, compileMs, ...).
+    details: dict[str, Any] = field(default_factory=dict)
+    skipped: str | None = None
+
+
+# (document, stage config, stage mode, assets) -> outcome. Adapters run in worker
+# threads or processes; to be offloaded to a process they must be picklable
+# (module-level functions).
+StageAdapter = Callable[[Any, dict[str, Any], str, ValidatorAssets], StageOutcome]
+
+
+def _xsd_error_code(type_name: str, message: str) -> str:
+    if "ENUMERATION" in type_name:
+        return "validation-invalid-code"
+    if any(part in type_name for part in ("DATATYPE", "PATTERN", "LENGTH", "FACET", "INCLUSIVE", "EXCLUSIVE")):
+        return "validation-invalid-format"
+    if type_name == "SCHEMAV_CVC_COMPLEX_TYPE_4" or "Missing child element" in message:
+        return "validation-required-field"
+    return "validation-schema-failed"
+
+
+def _xsd_error(issue: XSDIssue, severity: str) -> dict[str, Any]:
+    return {
+        "code": _xsd_error_code(issue.type_name, issue.message),
+        "severity": severity,
+        "field": issue.path,
+        "message": issue.message,
+        "stage": "xsd",
+        "nativeCode": issue.type_name,
+        "location": {"line": issue.line, "column": issue.column},
+    }
+
+
+def _schematron_error(issue: SchematronIssue, mode: str) -> dict[str, Any]:
+    # Asserts flagged "warning"/"information" never fail a document, whatever the stage mode.
+    fatal = mode == "fatal" and issue.flag in ("fatal", "error")
+    return {
+        "code": "validation-constraint-failed",
+        "severity": "fatal" if fatal else "warning",
+        "field": issue.location,
+        "expected": issue.test,
+        "message": issue.text,
+        "stage": "schematron",
+        "nativeCode": issue.id,
+    }
+
+
+def _schema_set(config: Mapping[str, Any]) -> str | None:
+    return config.get("schemaSet") or config.get("schemaSetId") or config.get("schema_set")
+
+
+def _xslt_id(config: Mapping[str, Any]) -> str | None:
+    return config.get("xsltId") or config.get("xslt_id")
+
+
+def xsd_stage(document: Any, config: dict[str, Any], mode: str, assets: ValidatorAssets) -> StageOutcome:
+    schema_set = _schema_set(config)
+    if not schema_set:
+        return StageOutcome(skipped="xsd stage does not pin a schemaSet")
+    compiled = assets.xsd.schema_for(schema_set, document.getroot().tag)
+    issues = assets.xsd.validate(schema_set, document)
+    severity = "fatal" if mode == "fatal" else "warning"
+    return StageOutcome(
+        errors=[_xsd_error(issue, severity) for issue in issues],
+        failed=bool(issues),
+        details={"schemaSet": schema_set, "compileMs": compiled.compile_ms},
+    )
+
+
+def schematron_stage(document: Any, config: dict[str, Any], mode: str, assets: ValidatorAssets) -> StageOutcome:
+    xslt_id = _xslt_id(config)
+    if not xslt_id:
+        return StageOutcome(skipped="schematron stage has no xsltId")
+    run = assets.schematron.validate(xslt_id, document)
+    return StageOutcome(
+        errors=[_schematron_error(issue, mode) for issue in run.issues],
+        failed=any(issue.flag in ("fatal", "error") for issue in run.issues),
+        details={"xsltId": xslt_id, "compileMs": run.compile_ms, "executionMs": run.execution_ms},
+    )
+
+
+DEFAULT_ADAPTERS: Mapping[str, StageAdapter] = {"xsd": xsd_stage, "schematron": schematron_stage}
+
+
+def _run_offloaded(adapter: StageAdapter, xml: bytes, config: dict[str, Any], mode: str, assets: ValidatorAssets):
+    """Process-pool entry point: documents cross the process boundary as bytes."""
+    return adapter(parse_document(xml), config, mode, assets)
+
+
+def _warm_worker(assets: ValidatorAssets, warm_assets: tuple[tuple[str, str], ...]) -> None:
+    for adapter, asset in warm_assets:
+        try:
+            (assets.xsd.warm if adapter == "xsd" else assets.schematron.warm)(asset)
+        except (SchemaSetError, SchematronError):
+            pass
+
+
+def chain_assets(profiles: list[LoadedProfile]) -> list[tuple[str, str]]:
+    """Distinct (adapter, asset id) pairs referenced by the profiles' chains."""
+    found: list[tuple[str, str]] = []
+    for loaded in profiles:
+        for stage in (loaded.read_artifact("validationChain") or {}).get("stages", []):
+            config = stage.get("config") or {}
+            adapter = stage.get("adapter")
+            asset = _schema_set(config) if adapter == "xsd" else _xslt_id(config) if adapter == "schematron" else None
+            if asset and (adapter, asset) not in found:
+                found.append((adapter, asset))
+    return found
+
+
+def warm_validators(profiles: list[LoadedProfile], *, xsd: SchemaSetCache, schematron: SchematronEngine) -> list[dict[str, Any]]:
+    """Compile every XSD set and Schematron asset referenced by the profiles' chains.
+
+    Returns one entry per asset with its `compileMs`, or the `error` that kept
+    it from compiling (a missing asset does not stop the others).
+    """
+    report: list[dict[str, Any]] = []
+    for adapter, asset in chain_assets(profiles):
+        warm = xsd.warm if adapter == "xsd" else schematron.warm
+        try:
+            report.append({"adapter": adapter, "asset": asset, "compileMs": warm(asset)})
+        except (SchemaSetError, SchematronError) as e:
+            report.append({"adapter": adapter, "asset": asset, "error": str(e)})
+    return report
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+class _TrackingContext:
+    """The spawn context, remembering the worker processes a pool starts through it.
+
+    A pool's workers are otherwise only reachable through its private state;
+    this lets `ValidationChainExecutor` terminate them, including a worker that
+    is still starting up when its pool is recycled.
+    """
+
+    def __init__(self) -> None:
+        self._context = multiprocessing.get_context("spawn")
+        self.processes: list[multiprocessing.process.BaseProcess] = []
+
+    def Process(self, *args: Any, **kwargs: Any) -> multiprocessing.process.BaseProcess:  # noqa: N802 - context API
+        process = self._context.Process(*args, **kwargs)
+        self.processes.append(process)
+        return process
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._context, name)
+
+
+class ValidationChainExecutor:
+    """Run validation chains without blocking the event loop.
+
+    With `process_workers > 0`, adapters in `offload` run in a spawn-context
+    process pool (created on first use; `warm_assets` are compiled in each
+    worker as it starts). Other adapters, and all adapters when there is no
+    pool, run in the loop's default thread pool.
+
+    A stage that exceeds its `timeoutMs` (or `default_timeout_ms`) is
+    abandoned: a thread cannot be stopped, so it runs to completion and its
+    result is dropped. When abandoned stages occupy every worker process, those
+    processes are killed and the pool is replaced, so later requests are not
+    stuck behind them.
+    """
+
+    def __init__(
+        self,
+        assets: ValidatorAssets,
+        *,
+        adapters: Mapping[str, StageAdapter] | None = None,
+        process_workers: int = 0,
+        offload: frozenset[str] = CPU_BOUND_ADAPTERS,
+        default_timeout_ms: int | None = None,
+        warm_assets: tuple[tuple[str, str], ...] = (),
+    ) -> None:
+        self.assets = assets
+        self.adapters = dict(DEFAULT_ADAPTERS if adapters is None else adapters)
+        self.process_workers = process_workers
+        self.offload = offload
+        self.default_timeout_ms = default_timeout_ms
+        self.warm_assets = warm_assets
+        self._pool: concurrent.futures.ProcessPoolExecutor | None = None
+        self._abandoned: set[concurrent.futures.Future[Any]] = set()
+        self._context: _TrackingContext | None = None
+
+    def _process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            self._context = _TrackingContext()
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=self._context,
+                initializer=_warm_worker,
+                initargs=(self.assets, self.warm_assets),
+            )
+            self._abandoned = set()
+        return self._pool
+
+    def _abandon(self, pool: concurrent.futures.ProcessPoolExecutor, future: concurrent.futures.Future[Any]) -> None:
+        if future.cancel() or pool is not self._pool:
+            return
+        abandoned = self._abandoned
+        abandoned.add(future)
+        future.add_done_callback(abandoned.discard)
+        if len(abandoned) >= self.process_workers:
+            self._recycle()
+
+    def _recycle(self) -> None:
+        stuck, context, self._pool = self._pool, self._context, None
+        if stuck is None or context is None:
+            return
+        # Every worker is busy with an abandoned stage; a running stage cannot be
+        # interrupted, so its process is killed. Work queued behind it fails with
+        # BrokenProcessPool and is resubmitted to the replacement pool.
+        for process in context.processes:
+            if process.is_alive():
+                process.terminate()
+        stuck.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run_stage(
+        self,
+        adapter: StageAdapter,
+        adapter_name: str,
+        document: Any,
+        xml: bytes,
+        config: dict[str, Any],
+        mode: str,
+        timeout_s: float | None,
+    ) -> StageOutcome:
+        loop = asyncio.get_running_loop()
+        if self.process_workers > 0 and adapter_name in self.offload:
+            deadline = None if timeout_s is None else loop.time() + timeout_s
+            for attempt in range(2):
+                pool = self._process_pool()
+                future = pool.submit(_run_offloaded, adapter, xml, config, mode, self.assets)
+                try:
+                    remaining = None if deadline is None else max(deadline - loop.time(), 0)
+                    return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+                except TimeoutError:
+                    self._abandon(pool, future)
+                    raise
+                except concurrent.futures.process.BrokenProcessPool:
+                    if pool is self._pool:
+                        self._pool = None
+                    if attempt:
+                        raise
+        return await asyncio.wait_for(loop.run_in_executor(None, adapter, document, config, mode, self.assets), timeout_s)
+
+    async def run(self, loaded: LoadedProfile, xml: str | bytes) -> dict[str, Any]:
+        """Validate one native XML document with the chain of `loaded`.
+
+        Returns `{"valid", "profileId", "errors", "stages"}`. A fatal stage that
+        fails or times out stops the chain; a fatal stage whose adapter or
+        assets are missing raises `NativeValidationError` (503) instead of
+        reporting the document valid or invalid.
+        """
+        chain = loaded.read_artifact("validationChain") or {}
+        data = xml.encode("utf-8") if isinstance(xml, str) else xml
+        errors: list[dict[str, Any]] = []
+        stages: list[dict[str, Any]] = []
+
+        started = time.perf_counter()
+        try:
+            document = await asyncio.get_running_loop().run_in_executor(None, parse_document, data)
+        except SchemaSetError as e:
+            raise validator_unavailable(str(e)) from e
+        except Exception as e:
+            errors.append(
+                {
+                    "code": "validation-schema-failed",
+                    "severity": "fatal",
+                    "field": None,
+                    "message": f"Document is not well-formed XML: {e}",
+                    "stage": "parse",
+                }
+            )
+            stages.append({"adapter": "parse", "mode": "fatal", "status": "failed", "durationMs": _elapsed_ms(started)})
+            return {"valid": False, "profileId": loaded.profile.id, "errors": errors, "stages": stages}
+        stages.append({"adapter": "parse", "mode": "fatal", "status": "passed", "durationMs": _elapsed_ms(started)})
+
+        valid = True
+        for stage in chain.get("stages", []):
+            adapter_name = stage.get("adapter")
+            mode = stage.get("mode", "fatal")
+            config = stage.get("config") or {}
+            timeout_ms = stage.get("timeoutMs") or self.default_timeout_ms
+            entry: dict[str, Any] = {"adapter": adapter_name, "mode": mode}
+            if timeout_ms:
+                entry["timeoutMs"] = timeout_ms
+            adapter = self.adapters.get(adapter_name)
+            if adapter is None:
+                if mode == "fatal":
+                    # As with missing assets: the document cannot be judged, so it is not called valid.
+                    raise validator_unavailable(f"Validation adapter {adapter_name!r} is not available")
+                entry.update(status="skipped", reason=f"adapter {adapter_name!r} is not available", durationMs=0.0)
+                stages.append(entry)
+                continue
+
+            started = time.perf_counter()
+            try:
+                outcome = await self._run_stage(
+                    adapter, adapter_name, document, data, config, mode, timeout_ms / 1000 if timeout_ms else None
+                )
+            except TimeoutError:
+                entry.update(status="timeout", durationMs=_elapsed_ms(started))
+                stages.append(entry)
+                errors.append(
+                    {
+                        "code": "system-timeout",
+                        "severity": "fatal" if mode == "fatal" else "warning",
+                        "field": None,
+                        "message": f"{adapter_name} stage exceeded {timeout_ms} ms",
+                        "stage": adapter_name,
+                    }
+                )
+                if mode == "fatal":
+                    valid = False
+                    break
+                continue
+            except concurrent.futures.process.BrokenProcessPool as e:
+                raise validator_unavailable(f"{adapter_name} worker process exited unexpectedly") from e
+            except (SchemaSetError, SchematronError) as e:
+                if mode == "fatal":
+                    raise validator_unavailable(str(e)) from e
+                entry.update(status="skipped", reason=str(e), durationMs=_elapsed_ms(started))
+                stages.append(entry)
+                continue
+
+            entry.update(outcome.details)
+            if outcome.skipped is not None:
+                entry.update(status="skipped", reason=outcome.skipped, durationMs=_elapsed_ms(started))
+                stages.append(entry)
+                continue
+            errors.extend(outcome.errors)
+            entry.update(status="failed" if outcome.failed else "passed", durationMs=_elapsed_ms(started))
+            stages.append(entry)
+            if outcome.failed and mode == "fatal":
+                valid = False
+                break
+
+        return {"valid": valid, "profileId": loaded.profile.id, "errors": errors, "stages": stages}
@@ -0,0 +1,177 @@
+"""
+Compiled XSD schema sets for the `xsd` validation adapter (spec 9.6.2), cached per process.
+
+Third-party schemas are not bundled (spec 13.3). An allowlisted `schemaSet`
+(see `profiles/XSD_SCHEMA_SETS.md`) is read from `<root>/<schemaSet>/`, where
+`root` is `$UEMP_XSD_ROOT` or `profiles/xsd` in the repository. The entry-point
+XSD for a document is chosen by its root element, from an optional
+`schema-set.json` in the set directory:
+
+    {"entryPoints": {"{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice": "maindoc/UBL-Invoice-2.1.xsd"}}
+
+or else by scanning the set for global element declarations. Each entry point
+is compiled (with everything it imports) once per process.
+
+Requires lxml (`pip install lxml`).
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - exercised only without lxml
+    etree = None
+
+SCHEMA_SETS = ("IATA-NDC/21.3", "UBL/2.1", "CII/D16B", "ISO20022/MR2019")
+DEFAULT_XSD_ROOT = Path(os.environ.get("UEMP_XSD_ROOT") or Path(__file__).resolve().parents[2] / "profiles" / "xsd")
+MAX_ISSUES = 100
+
+_XS = "{http://www.w3.org/2001/XMLSchema}"
+
+
+class SchemaSetError(Exception):
+    """A schema set is not allowlisted, not installed, or cannot validate a document."""
+
+
+@dataclass(frozen=True, slots=True)
+class XSDIssue:
+    line: int
+    column: int
+    message: str
+    path: str | None
+    type_name: str
+
+
+@dataclass
+class CompiledSchema:
+    schema: Any
+    source: Path
+    compile_ms: float
+    # XMLSchema keeps its error log on the instance, so validations are serialized.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def require_lxml() -> None:
+    if etree is None:
+        raise SchemaSetError("XML validation requires lxml: pip install lxml")
+
+
+def parse_document(xml: str | bytes) -> Any:
+    """Parse an untrusted instance document (no DTDs, entities or network access)."""
+    require_lxml()
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False)
+    data = xml.encode("utf-8") if isinstance(xml, str) else xml
+    return etree.fromstring(data, parser).getroottree()
+
+
+def _schema_parser() -> Any:
+    return etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+class SchemaSetCache:
+    """Compile-once cache of XSD entry points for the allowlisted schema sets under `root`."""
+
+    def __init__(self, root: str | Path = DEFAULT_XSD_ROOT, *, allowlist: tuple[str, ...] = SCHEMA_SETS) -> None:
+        self.root = Path(root)
+        self.allowlist = allowlist
+        self._entry_points: dict[str, dict[str, Path]] = {}
+        self._compiled: dict[Path, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def set_dir(self, schema_set: str) -> Path:
+        if schema_set not in self.allowlist:
+            raise SchemaSetError(f"schemaSet {schema_set!r} is not allowlisted")
+        set_dir = self.root / schema_set
+        if not set_dir.is_dir():
+            raise SchemaSetError(f"schemaSet {schema_set!r} is not installed under {self.root}")
+        return set_dir
+
+    def entry_points(self, schema_set: str) -> dict[str, Path]:
+        """Root element (Clark notation) -> entry-point XSD, resolved once per set."""
+        found = self._entry_points.get(schema_set)
+        if found is not None:
+            return found
+        require_lxml()
+        set_dir = self.set_dir(schema_set)
+        with self._lock:
+            found = self._entry_points.get(schema_set)
+            if found is None:
+                found = self._entry_points[schema_set] = _find_entry_points(set_dir)
+        return found
+
+    def schema_for(self, schema_set: str, root_tag: str) -> CompiledSchema:
+        source = self.entry_points(schema_set).get(root_tag)
+        if source is None:
+            raise SchemaSetError(f"schemaSet {schema_set!r} declares no root element {root_tag}")
+        return self._compile(schema_set, source)
+
+    def _compile(self, schema_set: str, source: Path) -> CompiledSchema:
+        compiled = self._compiled.get(source)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(source)
+            if compiled is None:
+                started = time.perf_counter()
+                try:
+                    schema = etree.XMLSchema(etree.parse(str(source), _schema_parser()))
+                except (etree.XMLSchemaParseError, etree.XMLSyntaxError, OSError) as e:
+                    raise SchemaSetError(f"cannot compile {source.name} for schemaSet {schema_set!r}: {e}") from e
+                compiled = CompiledSchema(schema, source, round((time.perf_counter() - started) * 1000, 3))
+                self._compiled[source] = compiled
+        return compiled
+
+    def warm(self, schema_set: str) -> float:
+        """Compile every entry point of `schema_set` now; returns the compile time in ms."""
+        sources = sorted(set(self.entry_points(schema_set).values()))
+        return round(sum(self._compile(schema_set, source).compile_ms for source in sources), 3)
+
+    def validate(self, schema_set: str, document: Any) -> list[XSDIssue]:
+        """Validate a parsed document (lxml ElementTree); an empty list means valid."""
+        compiled = self.schema_for(schema_set, document.getroot().tag)
+        with compiled.lock:
+            if compiled.schema.validate(document):
+                return []
+            log = compiled.schema.error_log
+        return [
+            XSDIssue(line=e.line, column=e.column, message=e.message, path=e.path, type_name=e.type_name)
+            for e in list(log)[:MAX_ISSUES]
+        ]
+
+    def compiled_count(self) -> int:
+        return len(self._compiled)
+
+
+def _find_entry_points(set_dir: Path) -> dict[str, Path]:
+    manifest = set_dir / "schema-set.json"
+    if manifest.exists():
+        entries = json.loads(manifest.read_text(encoding="utf-8")).get("entryPoints", {})
+        return {tag: (set_dir / path).resolve() for tag, path in entries.items()}
+
+    found: dict[str, Path] = {}
+    for xsd in sorted(set_dir.rglob("*.xsd")):
+        try:
+            root = etree.parse(str(xsd), _schema_parser()).getroot()
+        except etree.XMLSyntaxError:
+            continue
+        namespace = root.get("targetNamespace")
+        for element in root.iterchildren(f"{_XS}element"):
+            name = element.get("name")
+            if name:
+                found.setdefault(f"{{{namespace}}}{name}" if namespace else name, xsd.resolve())
+    return found
+
+
+@functools.cache
+def schema_set_cache(root: Path = DEFAULT_XSD_ROOT) -> SchemaSetCache:
+    """The process-wide cache for `root`, shared by every app instance and request."""
+    return SchemaSetCache(root)
@@ -1,19 +1,17 @@
 from __future__ import annotations
 
 import sys
-from pathlib import Path
 
-from uemp_certification import load_pack
+from uemp_certification import DEFAULT_PACKS_ROOT, find_packs, load_pack
 
 
 def main(argv: list[str] | None = None) -> int:
-    repo_root = Path(__file__).resolve().parents[2]
-    packs_root = repo_root / "certification" / "packs"
+    packs_root = DEFAULT_PACKS_ROOT
     if not packs_root.exists():
         print(f"missing packs root: {packs_root}", file=sys.stderr)
         return 2
 
-    pack_paths = sorted(packs_root.rglob("pack.json"))
+    pack_paths = find_packs(packs_root)
     if not pack_paths:
         print("no packs found", file=sys.stderr)
         return 2